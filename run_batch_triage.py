@@ -11,6 +11,7 @@ import sys
 import json
 import traceback
 import asyncio
+from functools import lru_cache
 from tqdm.asyncio import tqdm_asyncio
 
 # Add project root to sys.path
@@ -18,38 +19,53 @@ project_root = Path(__file__).resolve().parent
 sys.path.insert(0, str(project_root))
 
 from src.core.database_manager import DatabaseManager
+from src.core.work_queue import WorkQueue, WorkflowLock, default_worker_id
 from src.core.config_loader import load_config, get_config
 from src.llm.llm_client import LLMClient
+from src.llm.batch_api import BatchJobRunner, DEFAULT_JOB_DIR, completion_window_seconds
 from src.core.prompt_manager import prompt_manager
 
-CONCURRENCY_LIMIT = 5
+# Records claimed per round trip, as a multiple of the LLM client's concurrency ceiling;
+# small enough that parallel triage processes share the tail of the backlog.
+CLAIM_BATCHES_PER_SLOT = 10
+
+# Batch API triage: job name prefix, workflow lock, and prefix of the lease owners
+# (which tells the batch workflow's long leases apart from the online workflow's).
+BATCH_TRIAGE_JOB_NAME = "triage"
+BATCH_TRIAGE_WORKFLOW_LOCK = "triage_batch"
+BATCH_TRIAGE_OWNER_PREFIX = "triage-batch:"
+
+@lru_cache(maxsize=1)
+def get_triage_vocabulary() -> tuple[str, str]:
+    """
+    Returns the (domains_str, event_types_str) prompt fragments. They only
+    depend on the schema registry, so they are built once per process.
+    """
+    # 提供必要的参数来生成提示词
+    try:
+        # 从注册表中提取事件类型名称
+        from src.event_extraction.schemas import EVENT_SCHEMA_REGISTRY
+        known_event_types = list(EVENT_SCHEMA_REGISTRY.keys())
+        event_types_str = "\n- ".join(known_event_types)
+        
+        # 领域信息
+        known_domains = ["financial", "circuit", "general"]
+        domains_str = "\n- ".join(known_domains)
+    except Exception as e:
+        print(f"Could not load event schemas: {e}")
+        # 提供备用值
+        event_types_str = "- company_merger_and_acquisition\n- investment_and_financing\n- executive_change"
+        domains_str = "- financial\n- circuit\n- general"
+    return domains_str, event_types_str
 
 class TriageAgent:
     """Uses an LLM to perform initial classification of texts."""
     def __init__(self):
         self.llm_client = LLMClient()
 
-    async def triage(self, text: str) -> dict:
-        """
-        Calls the LLM asynchronously to triage the text.
-        Returns a dictionary with event_type, confidence_score, and explanation.
-        """
-        # 提供必要的参数来生成提示词
-        try:
-            # 从注册表中提取事件类型名称
-            from src.event_extraction.schemas import EVENT_SCHEMA_REGISTRY
-            known_event_types = list(EVENT_SCHEMA_REGISTRY.keys())
-            event_types_str = "\n- ".join(known_event_types)
-            
-            # 领域信息
-            known_domains = ["financial", "circuit", "general"]
-            domains_str = "\n- ".join(known_domains)
-        except Exception as e:
-            print(f"Could not load event schemas: {e}")
-            # 提供备用值
-            event_types_str = "- company_merger_and_acquisition\n- investment_and_financing\n- executive_change"
-            domains_str = "- financial\n- circuit\n- general"
-        
+    def build_messages(self, text: str) -> list[dict]:
+        """Builds the triage prompt messages for a text."""
+        domains_str, event_types_str = get_triage_vocabulary()
         prompt = prompt_manager.get_prompt(
             "triage", 
             text_sample=text,
@@ -58,88 +74,276 @@ class TriageAgent:
         )
         
         # 将提示词转换为消息格式
-        messages = [{"role": "user", "content": prompt}]
+        return [{"role": "user", "content": prompt}]
+
+    def build_group_messages(self, texts: list[str]) -> list[dict]:
+        """
+        Builds one request for several texts. The instructions and type lists
+        form a system message that is identical for every request, so providers
+        with prefix caching only bill it once; the texts are keyed "1".."K".
+        """
+        domains_str, event_types_str = get_triage_vocabulary()
+        instructions = prompt_manager.get_prompt(
+            "triage_batch",
+            domains_str=domains_str,
+            event_types_str=event_types_str
+        )
+        texts_block = "\n\n".join(f"[{i}] {text}" for i, text in enumerate(texts, start=1))
+        return [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": f"--- TEXTS TO ANALYZE ---\n{texts_block}"},
+        ]
+
+    def parse_result(self, response) -> dict:
+        """Turns a parsed LLM response into a triage result dictionary."""
+        # 检查响应类型，如果是字符串则尝试解析
+        if isinstance(response, str):
+            try:
+                response = json.loads(response)
+            except json.JSONDecodeError:
+                print(f"Failed to parse LLM response as JSON: {response}")
+                return {"event_type": "parse_failed", "confidence_score": 0.0, "explanation": "JSON parse error"}
+        
+        # 确保response是字典类型
+        if not isinstance(response, dict):
+            print(f"Unexpected response type: {type(response)}, content: {response}")
+            return {"event_type": "format_error", "confidence_score": 0.0, "explanation": "Invalid response format"}
+        
+        return {
+            "event_type": response.get("event_type", "unknown"),
+            "confidence_score": response.get("confidence", response.get("confidence_score", 0.1)),
+            "explanation": response.get("explanation", response.get("notes", f"Domain: {response.get('domain', 'unknown')}, Status: {response.get('status', 'unknown')}"))
+        }
+
+    async def triage(self, text: str) -> dict:
+        """
+        Calls the LLM asynchronously to triage the text.
+        Returns a dictionary with event_type, confidence_score, and explanation.
+        """
+        messages = self.build_messages(text)
         
         try:
             response = await self.llm_client.get_json_response(messages, task_type="triage")
             if not response:
                 raise ValueError("LLM call failed or returned an empty response.")
-            
-            # 检查响应类型，如果是字符串则尝试解析
-            if isinstance(response, str):
-                try:
-                    response = json.loads(response)
-                except json.JSONDecodeError:
-                    print(f"Failed to parse LLM response as JSON: {response}")
-                    return {"event_type": "parse_failed", "confidence_score": 0.0, "explanation": "JSON parse error"}
-            
-            # 确保response是字典类型
-            if not isinstance(response, dict):
-                print(f"Unexpected response type: {type(response)}, content: {response}")
-                return {"event_type": "format_error", "confidence_score": 0.0, "explanation": "Invalid response format"}
-            
-            return {
-                "event_type": response.get("event_type", "unknown"),
-                "confidence_score": response.get("confidence", response.get("confidence_score", 0.1)),
-                "explanation": response.get("explanation", response.get("notes", f"Domain: {response.get('domain', 'unknown')}, Status: {response.get('status', 'unknown')}"))
-            }
+            result = self.parse_result(response)
+            if result["event_type"] in ("parse_failed", "format_error"):
+                self.llm_client.discard_cached_response(messages, task_type="triage")
+            return result
         except Exception as e:
             print(f"Triage failed for a record: {e}")
             return {"event_type": "triage_failed", "confidence_score": 0.0, "explanation": str(e)}
 
-async def worker(row, agent, db_manager, semaphore):
-    """A single worker to process one record."""
+    async def triage_group(self, texts: list[str]) -> list[dict]:
+        """
+        Triages several texts with a single request. Texts whose result is
+        missing from the response are triaged individually.
+        """
+        if len(texts) == 1:
+            return [await self.triage(texts[0])]
+
+        response = None
+        try:
+            response = await self.llm_client.get_json_response(
+                self.build_group_messages(texts), task_type="triage", expected_type=list
+            )
+        except Exception as e:
+            print(f"Grouped triage failed, falling back to single requests: {e}")
+
+        results_by_key = {}
+        for item in response or []:
+            if isinstance(item, dict) and 'id' in item:
+                results_by_key[str(item['id']).strip('[] ')] = self.parse_result(item)
+
+        results = []
+        for i, text in enumerate(texts, start=1):
+            result = results_by_key.get(str(i))
+            results.append(result if result is not None else await self.triage(text))
+        return results
+
+async def worker(rows, agent, queue, semaphore):
+    """A single worker to process a group of records with one request."""
     async with semaphore:
-        record_id, text = row['id'], row['source_text']
+        triage_results = await agent.triage_group([row['source_text'] for row in rows])
         
-        triage_result = await agent.triage(text)
-        
-        db_manager.update_record_after_triage(
-            record_id=record_id,
-            new_status="pending_review",
-            event_type=triage_result["event_type"],
-            confidence=triage_result["confidence_score"],
-            notes=triage_result["explanation"]
-        )
-        return triage_result['event_type'] != 'triage_failed'
+        for row, triage_result in zip(rows, triage_results):
+            queue.update_record_after_triage(
+                record_id=row['id'],
+                new_status="pending_review",
+                event_type=triage_result["event_type"],
+                confidence=triage_result["confidence_score"],
+                notes=triage_result["explanation"],
+                deferred=True
+            )
+        return [triage_result['event_type'] != 'triage_failed' for triage_result in triage_results]
+
+def group_records(rows: list[dict], records_per_request: int, max_chars_per_record: int) -> list[list[dict]]:
+    """
+    Packs short texts into groups of up to `records_per_request`; longer texts
+    get a request of their own.
+    """
+    groups, current = [], []
+    for row in rows:
+        if records_per_request <= 1 or len(row['source_text']) > max_chars_per_record:
+            groups.append([row])
+            continue
+        current.append(row)
+        if len(current) == records_per_request:
+            groups.append(current)
+            current = []
+    if current:
+        groups.append(current)
+    return groups
 
 async def run_triage_workflow():
     """The core logic of the batch triage workflow, now async."""
     print("\n--- Running Async Batch Triage Workflow ---")
     config = get_config()
-    db_path = config.get('database', {}).get('path')
-    if not db_path:
-        raise ValueError("Database path not found in configuration.")
-
-    db_manager = DatabaseManager(db_path)
-    records_df = db_manager.get_records_by_status_as_df('pending_triage')
+    db_manager = DatabaseManager.from_config(config.get('database', {}))
+    total_records = db_manager.get_record_count_by_status('pending_triage')
     
-    if records_df.empty:
+    if total_records == 0:
         print("No records are pending triage. Workflow complete.")
+        db_manager.close()
         return
 
-    total_records = len(records_df)
     print(f"Found {total_records} records to process.")
     agent = TriageAgent()
+    triage_config = config.get('triage_workflow', {})
+    records_per_request = triage_config.get('records_per_request', 1)
+    max_chars_per_record = triage_config.get('max_chars_per_record', 500)
     
-    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-    tasks = [worker(row, agent, db_manager, semaphore) for _, row in records_df.iterrows()]
+    # The semaphore only caps the task pool; the LLM client's adaptive rate limiter
+    # decides how many requests are actually in flight.
+    concurrency = agent.llm_client.max_concurrency
+    semaphore = asyncio.Semaphore(concurrency)
+    success_count = 0
+    processed_count = 0
+    progress = tqdm_asyncio(total=total_records, desc="Triaging Records")
     
-    results = await tqdm_asyncio.gather(*tasks, desc="Triaging Records")
+    try:
+        # Records are claimed with a lease, so several triage processes can share the backlog
+        # without triaging (and paying for) the same record twice.
+        async with WorkQueue(db_manager, 'pending_triage') as queue:
+            for batch in queue.iter_batches(concurrency * CLAIM_BATCHES_PER_SLOT, columns=['source_text']):
+                groups = group_records(batch, records_per_request, max_chars_per_record)
+                tasks = [worker(rows, agent, queue, semaphore) for rows in groups]
+                for future in asyncio.as_completed(tasks):
+                    outcomes = await future
+                    success_count += sum(outcomes)
+                    processed_count += len(outcomes)
+                    progress.update(len(outcomes))
+    finally:
+        progress.close()
+        # Write out any status updates still sitting in the write-behind queue.
+        db_manager.close()
+
+    print(f"\nTriage complete. {success_count}/{processed_count} records successfully moved to 'pending_review'.")
+    print(f"LLM rate limiting: {agent.llm_client.get_rate_limit_stats()}")
+
+async def run_triage_batch_workflow():
+    """
+    Triages every pending record through the provider's Batch API. Intended for
+    overnight backfills: cheaper and not subject to online rate limits, but
+    results arrive only when the whole batch is done. Re-running after an
+    interruption resumes the submitted batch jobs.
+
+    Records are claimed through a WorkQueue with a lease as long as the batch
+    completion window, so neither the online workflow nor another batch run
+    picks them up while their job is pending. Prompts are built one claimed
+    chunk at a time as the jobs are submitted.
+
+    Only one batch run at a time holds the workflow lock, so the batch leases
+    found at startup on records of unfinished jobs were left by a run that died;
+    they are reclaimed at once and the jobs resumed, instead of waiting for the
+    leases to expire.
+    """
+    print("\n--- Running Batch API Triage Workflow ---")
+    config = get_config()
+    db_manager = DatabaseManager.from_config(config.get('database', {}))
+    batch_config = config.get('llm', {}).get('batch', {})
+
+    try:
+        with WorkflowLock(db_manager, BATCH_TRIAGE_WORKFLOW_LOCK) as lock:
+            if not lock.acquired:
+                print("Another batch triage run is in progress. Workflow complete.")
+                return
+            job_records = BatchJobRunner(None, job_dir=batch_config.get('job_dir', DEFAULT_JOB_DIR)).record_jobs(BATCH_TRIAGE_JOB_NAME)
+            reclaimed = db_manager.reclaim_leases(list(job_records), BATCH_TRIAGE_OWNER_PREFIX)
+            if reclaimed:
+                print(f"Reclaimed {reclaimed} records left in progress by an interrupted batch run.")
+            await _triage_pending_through_batch_api(db_manager, batch_config)
+    finally:
+        db_manager.close()
+
+async def _triage_pending_through_batch_api(db_manager: DatabaseManager, batch_config: dict):
+    """Claims the pending records, runs them through the Batch API and stores the results."""
+    total_records = db_manager.get_record_count_by_status('pending_triage')
+
+    if total_records == 0:
+        print("No records are pending triage. Workflow complete.")
+        return
+
+    print(f"Found {total_records} records to triage via the Batch API.")
+    agent = TriageAgent()
+    chunk_size = batch_config.get('max_requests_per_batch', 5000)
+    lease_seconds = completion_window_seconds(batch_config.get('completion_window', '24h'))
+    owner = f"{BATCH_TRIAGE_OWNER_PREFIX}{default_worker_id()}"
+
+    def claimed_requests(queue):
+        for batch in queue.iter_batches(chunk_size, columns=['source_text']):
+            yield {
+                row['id']: agent.llm_client.add_json_system_message(agent.build_messages(row['source_text']))
+                for row in batch
+            }
+
+    # Responses are parsed before they are cached, and only cached if they parse to a result.
+    parsed_responses = {}
+
+    def parses(raw_response):
+        parsed_responses[raw_response] = agent.llm_client.parse_json_text(raw_response)
+        return isinstance(parsed_responses[raw_response], dict)
+
+    success_count = 0
+    async with WorkQueue(db_manager, 'pending_triage', owner=owner, lease_seconds=lease_seconds) as queue:
+        responses = await agent.llm_client.run_batch(
+            claimed_requests(queue), task_type="triage", job_name=BATCH_TRIAGE_JOB_NAME, validate=parses
+        )
+        for record_id, raw_response in responses.items():
+            if raw_response is None:
+                # No result (failed request or expired batch): the lease is released on exit,
+                # leaving the record pending for the next run.
+                continue
+            if raw_response in parsed_responses:
+                parsed = parsed_responses[raw_response]
+            else:
+                parsed = agent.llm_client.parse_json_text(raw_response)
+            triage_result = agent.parse_result(parsed) if parsed is not None else {
+                "event_type": "parse_failed", "confidence_score": 0.0, "explanation": "JSON parse error"
+            }
+            queue.update_record_after_triage(
+                record_id=record_id,
+                new_status="pending_review",
+                event_type=triage_result["event_type"],
+                confidence=triage_result["confidence_score"],
+                notes=triage_result["explanation"],
+                deferred=True
+            )
+            success_count += 1
 
-    success_count = sum(1 for r in results if r)
-    print(f"\nTriage complete. {success_count}/{total_records} records successfully moved to 'pending_review'.")
+    print(f"\nBatch triage complete. {success_count}/{len(responses)} records moved to 'pending_review'.")
 
 def main():
     """Main function to run the script from the command line for standalone execution."""
     parser = argparse.ArgumentParser(description="Run the batch triage workflow.")
     parser.add_argument("--config", type=Path, default="config.yaml", help="Path to the config.yaml file.")
+    parser.add_argument("--batch", action="store_true", help="Submit all pending records through the provider's Batch API (resumable).")
     args = parser.parse_args()
 
     try:
         print("Initializing configuration for standalone triage run...")
         load_config(args.config)
-        asyncio.run(run_triage_workflow())
+        asyncio.run(run_triage_batch_workflow() if args.batch else run_triage_workflow())
     except Exception as e:
         print(f"An error occurred during standalone triage run: {e}")
         traceback.print_exc()
@@ -18,6 +18,7 @@ sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import load_config, get_config
 from src.core.database_manager import DatabaseManager
+from src.core.work_queue import WorkflowLock, CORTEX_WORKFLOW_LOCK
 
 def direct_llm_call(prompt, model="deepseek-ai/DeepSeek-V2.5"):
     """直接调用API，绕过项目的LLMClient"""
@@ -70,6 +71,28 @@ def simple_clustering(events_to_cluster):
     
     return cluster_assignments, stats
 
+def join_existing_stories(db_manager, incremental_clusterer, cluster_assignments):
+    """
+    Events attached to a cluster that was already refined join its story directly
+    and skip refinement. Returns the assignments that still need refinement.
+    """
+    remaining = {}
+    story_members = {}
+    for event_id, cluster_id in cluster_assignments.items():
+        story_id = incremental_clusterer.story_of(cluster_id)
+        if story_id is None:
+            remaining[event_id] = cluster_id
+        else:
+            db_manager.update_cluster_info(event_id, cluster_id, 'pending_relationship_analysis')
+            story_members.setdefault(story_id, []).append(event_id)
+
+    for story_id, event_ids in story_members.items():
+        db_manager.update_story_info(event_ids, story_id, 'pending_relationship_analysis')
+    if story_members:
+        joined = sum(len(event_ids) for event_ids in story_members.values())
+        print(f"{joined} events joined {len(story_members)} existing stories.")
+    return remaining
+
 def run_cortex_workflow():
     """修改版Cortex工作流主函数"""
     print("\n--- Running Modified Cortex Workflow ---")
@@ -82,11 +105,30 @@ def run_cortex_workflow():
     # 1. Initialization
     config = get_config()
     db_path = config.get('database', {}).get('path')
-    db_manager = DatabaseManager(db_path)
+    with DatabaseManager(db_path) as db_manager:
+        # Only one Cortex run at a time: concurrent runs would hand out the same
+        # new cluster ids and overwrite each other's persisted cluster state.
+        with WorkflowLock(db_manager, CORTEX_WORKFLOW_LOCK) as lock:
+            if not lock.acquired:
+                print("Another Cortex run is in progress. Skipping this run.")
+                return
+            process_pending_events(config, db_manager)
 
+def process_pending_events(config, db_manager):
+    """Clusters the pending events and refines the clusters into stories."""
     # 2. Fetch pending events
     print("Fetching events pending clustering from the database...")
-    events_to_cluster = db_manager.get_records_by_status_as_df('pending_clustering').to_dict('records')
+    # Clustering needs the whole bucket, but only the columns it uses are loaded
+    # (no structured_data JSON) and no DataFrame is built. Incremental clustering
+    # only scores events that earlier runs have not; the noise pool is loaded
+    # when it is re-clustered.
+    columns = ['source_text', 'assigned_event_type', 'involved_entities']
+    incremental = config.get('cortex', {}).get('incremental', {}).get('enabled', False)
+    if incremental:
+        batches = db_manager.iter_unscored_clustering_records(columns=columns)
+    else:
+        batches = db_manager.iter_records_by_status('pending_clustering', columns=columns)
+    events_to_cluster = [event for batch in batches for event in batch]
     
     if not events_to_cluster:
         print("No events found pending clustering. Workflow complete.")
@@ -94,18 +136,38 @@ def run_cortex_workflow():
 
     print(f"Found {len(events_to_cluster)} events to process.")
 
-    # 3. Perform simplified clustering
-    print("Performing simplified clustering based on event types...")
-    cluster_assignments, stats = simple_clustering(events_to_cluster)
+    # 3. Perform clustering: incrementally against the persisted clusters, or
+    # simplified clustering based on event types.
+    incremental_clusterer = None
+    if incremental:
+        from src.cortex.vectorization_service import VectorizationService
+        from src.cortex.incremental_clusterer import IncrementalClusterer
+        print("Performing incremental clustering against persisted clusters...")
+        incremental_clusterer = IncrementalClusterer(VectorizationService(), db_manager)
+        noise_pool = []
+
+        def load_noise_pool():
+            noise_pool.extend(event for batch in db_manager.iter_clustering_noise_records(columns=columns) for event in batch)
+            return noise_pool
+
+        # Unassigned events are marked as noise and stay pending clustering; the
+        # marker keeps them from being scored again or re-triggering trigger_cortex.py.
+        cluster_assignments, stats = incremental_clusterer.process_events(events_to_cluster, load_noise_pool)
+        events_to_cluster.extend(noise_pool)
+        cluster_assignments = join_existing_stories(db_manager, incremental_clusterer, cluster_assignments)
+    else:
+        print("Performing simplified clustering based on event types...")
+        cluster_assignments, stats = simple_clustering(events_to_cluster)
     
     # Update database with cluster results
     print("Updating database with cluster assignments...")
     clustered_events = []
+    events_by_id = {event['id']: event for event in events_to_cluster}
     for event_id, cluster_id in cluster_assignments.items():
-        # All events are assigned to clusters (no noise in simplified version)
+        # Unassigned (noise) events are not in the assignments and stay pending clustering
         db_manager.update_cluster_info(event_id, cluster_id, 'pending_refinement')
         # Find the original event dict to pass to the next stage
-        event_data = next((event for event in events_to_cluster if event['id'] == event_id), None)
+        event_data = events_by_id.get(event_id)
         if event_data:
             event_data['cluster_id'] = cluster_id
             clustered_events.append(event_data)
@@ -164,6 +226,9 @@ def run_cortex_workflow():
                     }
                     all_stories.append(story)
                     processed_events += len(batch_events)
+                    if incremental_clusterer:
+                        # Events attached to this cluster later join its first story.
+                        incremental_clusterer.link_story(cluster_id, story_id)
                     
                     print(f"✅ 批次处理完成，故事ID: {story_id}, 事件数: {len(batch_events)}")
                     
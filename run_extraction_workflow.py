@@ -21,21 +21,24 @@ sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import load_config, get_config
 from src.core.database_manager import DatabaseManager
+from src.core.work_queue import WorkQueue, CORTEX_WORKFLOW_LOCK
 from src.llm.llm_client import LLMClient
 from src.core.prompt_manager import prompt_manager
+from trigger_cortex import get_cortex_trigger_counts
 
-# Concurrency limit adjusted to respect typical API rate limits (TPM is often the bottleneck)
-CONCURRENCY_LIMIT = 3
+# Records claimed per round trip, as a multiple of the LLM client's concurrency ceiling;
+# small enough that parallel extraction processes share the tail of the backlog.
+CLAIM_BATCHES_PER_SLOT = 10
 
 def check_and_trigger_cortex(db_manager: DatabaseManager):
     """检查待聚类事件数量，如果达到阈值则触发Cortex工作流。"""
-    config = get_config()
-    threshold = config.get('cortex_workflow', {}).get('trigger_threshold', 100)
-    
-    pending_count = db_manager.get_record_count_by_status('pending_clustering')
+    # 与 trigger_cortex.py 使用相同的计数与阈值（增量模式下只统计尚未评分的事件）
+    pending_count, threshold = get_cortex_trigger_counts(db_manager)
     print(f"检查Cortex触发器: {pending_count} 个事件待聚类 (阈值: {threshold})")
 
-    if pending_count >= threshold:
+    if pending_count >= threshold and db_manager.is_workflow_locked(CORTEX_WORKFLOW_LOCK):
+        print("Cortex工作流正在运行，跳过本次触发。")
+    elif pending_count >= threshold:
         print(f"事件数量达到阈值，正在后台触发Cortex工作流...")
         
         # 确保我们使用的是与当前环境相同的Python解释器
@@ -57,7 +60,9 @@ def check_and_trigger_cortex(db_manager: DatabaseManager):
             print(f"启动Cortex工作流失败: {e}")
 
 def load_processed_ids(file_path: Path) -> set:
-    """Reads the output file to get the IDs of already processed records."""
+    """
+    Reads the output file to get the IDs of already processed records.
+    """
     processed_ids = set()
     if not file_path.exists():
         return processed_ids
@@ -73,7 +78,42 @@ def load_processed_ids(file_path: Path) -> set:
                 continue
     return processed_ids
 
-async def worker(record, db_manager, llm_client, semaphore, file_lock, output_file_path):
+def _prepare_event(event: dict, record_id: str, text: str) -> dict:
+    """Adds the bookkeeping fields written with every extracted event."""
+    event['event_id'] = f"evt_{uuid.uuid4()}"
+    event['_source_id'] = record_id
+    event['text'] = text
+    return event
+
+async def _write_events(events: list[dict], file_lock: asyncio.Lock, output_file_path: Path):
+    """Appends events to the JSONL output file."""
+    async with file_lock:
+        with open(output_file_path, 'a', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+async def extract_streaming(record_id, text, messages, llm_client, file_lock, output_file_path, budget_tokens=None) -> int:
+    """
+    Streams the extraction, parsing each event as soon as it is complete and
+    aborting generation early when the output is malformed or over budget.
+
+    A record's events are buffered until its stream has completed and then
+    appended in one write, so an aborted stream leaves nothing in the output
+    file and a retry cannot duplicate events.
+
+    Returns:
+        The number of events written.
+    """
+    events = []
+    async for event in llm_client.stream_json_array(messages, task_type="extraction", budget_tokens=budget_tokens):
+        if not isinstance(event, dict):
+            llm_client.discard_cached_response(messages, task_type="extraction")
+            raise ValueError(f"LLM returned a non-object array element: {str(event)[:200]}")
+        events.append(_prepare_event(event, record_id, text))
+    await _write_events(events, file_lock, output_file_path)
+    return len(events)
+
+async def worker(record, queue, llm_client, semaphore, file_lock, output_file_path, streaming_config=None):
     """
     Processes a single record from the database. This function is designed to be run concurrently.
     """
@@ -88,37 +128,43 @@ async def worker(record, db_manager, llm_client, semaphore, file_lock, output_fi
             # 2. Format messages for LLM
             messages = [{"role": "user", "content": prompt_content}]
 
-            # 3. Call LLM
-            raw_response = await llm_client.get_raw_response(messages, task_type="extraction")
-            
-            if not raw_response:
-                raise ValueError("LLM call failed or returned an empty response.")
+            if streaming_config and streaming_config.get('enabled'):
+                # 3-4. Stream: events are parsed and written while the model is still generating.
+                events_written = await extract_streaming(
+                    record_id, text, messages, llm_client, file_lock, output_file_path,
+                    budget_tokens=streaming_config.get('budget_tokens')
+                )
+            else:
+                # 3. Call LLM
+                raw_response = await llm_client.get_raw_response(messages, task_type="extraction")
+                
+                if not raw_response:
+                    raise ValueError("LLM call failed or returned an empty response.")
 
-            # 3. Parse Response
-            try:
-                extracted_events = json.loads(raw_response)
-                if not isinstance(extracted_events, list):
-                    raise TypeError("LLM response is not a JSON array.")
-            except (json.JSONDecodeError, TypeError) as e:
-                raise ValueError(f"Failed to parse JSON array from LLM. Error: {e}. Raw response: {raw_response[:200]}...")
-
-            # 4. Write to File (with lock)
-            async with file_lock:
-                with open(output_file_path, 'a', encoding='utf-8') as f:
-                    for event in extracted_events:
-                        event['event_id'] = f"evt_{uuid.uuid4()}"
-                        event['_source_id'] = record_id
-                        event['text'] = text
-                        f.write(json.dumps(event, ensure_ascii=False) + '\n')
+                # 3. Parse Response
+                try:
+                    extracted_events = json.loads(raw_response)
+                    if not isinstance(extracted_events, list):
+                        raise TypeError("LLM response is not a JSON array.")
+                except (json.JSONDecodeError, TypeError) as e:
+                    # Otherwise a retry of this record would replay the same unusable output.
+                    llm_client.discard_cached_response(messages, task_type="extraction")
+                    raise ValueError(f"Failed to parse JSON array from LLM. Error: {e}. Raw response: {raw_response[:200]}...")
+
+                # 4. Write to File (with lock)
+                await _write_events(
+                    [_prepare_event(event, record_id, text) for event in extracted_events], file_lock, output_file_path
+                )
+                events_written = len(extracted_events)
             
             # 5. Update DB Status to 'pending_clustering'
-            db_manager.update_status_and_schema(record_id, "pending_clustering", "", f"Successfully extracted {len(extracted_events)} events.")
-            return {"id": record_id, "status": "success", "events_extracted": len(extracted_events)}
+            queue.update_status_and_schema(record_id, "pending_clustering", "", f"Successfully extracted {events_written} events.", deferred=True)
+            return {"id": record_id, "status": "success", "events_extracted": events_written}
 
         except Exception as e:
             error_message = f"Error processing record {record_id}: {e}"
             print(error_message)
-            db_manager.update_status_and_schema(record_id, "extraction_failed", "", str(e))
+            queue.update_status_and_schema(record_id, "extraction_failed", "", str(e), deferred=True)
             return {"id": record_id, "status": "failed", "error": str(e)}
 
 async def run_extraction_workflow():
@@ -127,55 +173,83 @@ async def run_extraction_workflow():
     config = get_config()
     db_path = config.get('database', {}).get('path')
     output_file_path = Path(config.get('extraction_workflow', {}).get('output_file'))
+    streaming_config = config.get('extraction_workflow', {}).get('streaming', {})
     
     if not db_path or not output_file_path:
         raise ValueError("Database path or output_file path not found in configuration.")
 
     output_file_path.parent.mkdir(exist_ok=True)
     
-    db_manager = DatabaseManager(db_path)
-    llm_client = LLMClient()
+    db_manager = DatabaseManager.from_config(config.get('database', {}))
+    try:
+        llm_client = LLMClient()
 
-    processed_ids = load_processed_ids(output_file_path)
-    if processed_ids:
-        print(f"Found {len(processed_ids)} records already processed, they will be skipped.")
+        processed_ids = load_processed_ids(output_file_path)
+        if processed_ids:
+            print(f"Found {len(processed_ids)} records already processed, they will be skipped.")
 
-    df_to_extract = db_manager.get_records_by_status_as_df('pending_extraction')
+        total_records = db_manager.get_record_count_by_status('pending_extraction')
 
-    if df_to_extract.empty:
-        print("No items found with status 'pending_extraction'.")
-        # Even if there's nothing to extract, we should check if Cortex needs to run
-        check_and_trigger_cortex(db_manager)
-        return
+        if total_records == 0:
+            print("No items found with status 'pending_extraction'.")
+            # Even if there's nothing to extract, we should check if Cortex needs to run
+            check_and_trigger_cortex(db_manager)
+            return
 
-    original_count = len(df_to_extract)
-    df_to_extract = df_to_extract[~df_to_extract['id'].isin(processed_ids)]
-    
-    if original_count > len(df_to_extract):
-        print(f"Skipped {original_count - len(df_to_extract)} already processed records.")
+        print(f"Found {total_records} records pending extraction...")
 
-    if df_to_extract.empty:
-        print("All pending records have already been processed.")
-        # Still check for Cortex trigger
-        check_and_trigger_cortex(db_manager)
-        return
+        # API rate limits (TPM is often the bottleneck) are enforced by the LLM client's
+        # adaptive limiter; the semaphore only caps the task pool.
+        concurrency = llm_client.max_concurrency
+        semaphore = asyncio.Semaphore(concurrency)
+        file_lock = asyncio.Lock()
+        processed_count = 0
+        success_count = 0
+        skipped_count = 0
+        progress = tqdm_asyncio(total=total_records, desc="Extracting Events")
 
-    total_records = len(df_to_extract)
-    print(f"Found {total_records} new records to process...")
+        try:
+            # Records are claimed with a lease, so several extraction processes can share the backlog
+            # without extracting (and paying for) the same record twice.
+            async with WorkQueue(db_manager, 'pending_extraction') as queue:
+                for batch in queue.iter_batches(concurrency * CLAIM_BATCHES_PER_SLOT, columns=['source_text']):
+                    new_records = []
+                    for record in batch:
+                        if record['id'] in processed_ids:
+                            # Events are already in the output file; only the status update was lost.
+                            queue.update_status_and_schema(record['id'], "pending_clustering", "", "Events already present in output file.", deferred=True)
+                            skipped_count += 1
+                            progress.update(1)
+                        else:
+                            new_records.append(record)
 
-    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-    file_lock = asyncio.Lock()
-    
-    tasks = [worker(row, db_manager, llm_client, semaphore, file_lock, output_file_path) for _, row in df_to_extract.iterrows()]
+                    tasks = [
+                        worker(record, queue, llm_client, semaphore, file_lock, output_file_path, streaming_config)
+                        for record in new_records
+                    ]
+                    for future in asyncio.as_completed(tasks):
+                        result = await future
+                        processed_count += 1
+                        if result['status'] == 'success':
+                            success_count += 1
+                        progress.update(1)
+        finally:
+            progress.close()
+            # Status updates are batched; make them visible before counting for Cortex.
+            db_manager.flush_pending_writes()
 
-    results = [await future for future in tqdm_asyncio.as_completed(tasks, total=total_records, desc="Extracting Events")]
+        if skipped_count:
+            print(f"Skipped {skipped_count} already processed records.")
 
-    success_count = sum(1 for r in results if r['status'] == 'success')
-    print(f"\n--- Event Extraction Workflow Finished ---")
-    print(f"Successfully processed: {success_count}/{total_records}")
+        print(f"\n--- Event Extraction Workflow Finished ---")
+        print(f"Successfully processed: {success_count}/{processed_count}")
+        print(f"LLM rate limiting: {llm_client.get_rate_limit_stats()}")
 
-    # --- Trigger Cortex Workflow ---
-    check_and_trigger_cortex(db_manager)
+        # --- Trigger Cortex Workflow ---
+        check_and_trigger_cortex(db_manager)
+    finally:
+        # Also stops the write-behind queue and closes the persistent connection.
+        db_manager.close()
 
 def main_standalone():
     """Main function for standalone execution."""
@@ -34,18 +34,6 @@ def log_processed_event(event_id, log_file):
     with open(log_file, 'a', encoding='utf-8') as f:
         f.write(event_id + '\n')
 
-def group_events_by_story(events):
-    """根据story_id对事件进行分组"""
-    print("根据story_id对事件进行分组...")
-    stories = {}
-    for event in events:
-        story_id = event.get('story_id', 'unassigned')
-        if story_id not in stories:
-            stories[story_id] = []
-        stories[story_id].append(event)
-    print(f"分组完成，共发现 {len(stories)} 个独立的故事单元。")
-    return stories
-
 async def run_relationship_analysis_workflow():
     """工作流主函数"""
     print("--- 开始关系分析与知识存储工作流 (V4 - 知识闭环版) ---")
@@ -86,29 +74,28 @@ async def run_relationship_analysis_workflow():
     processed_event_ids = load_processed_event_ids(log_file)
     print(f"发现 {len(processed_event_ids)} 个已处理的事件将被跳过。")
 
-    events_to_process_df = db_manager.get_records_by_status_as_df('pending_relationship_analysis')
+    pending_count = db_manager.get_record_count_by_status('pending_relationship_analysis')
     
-    if events_to_process_df.empty:
+    if pending_count == 0:
         print("没有需要进行关系分析的新事件。")
         storage_agent.close()
         return
 
-    events_to_process = [
-        row.to_dict() for _, row in events_to_process_df.iterrows() 
-        if row['id'] not in processed_event_ids
-    ]
-
-    if not events_to_process:
-        print("所有待处理的事件都已经被处理过。")
-        storage_agent.close()
-        return
-
-    print(f"发现 {len(events_to_process)} 个新事件需要进行关系分析。")
-
-    story_groups = group_events_by_story(events_to_process)
-    total_groups = len(story_groups)
+    # 按故事逐个加载事件，内存占用只与单个故事的大小有关，而不是整个待处理队列。
+    story_ids = db_manager.get_story_ids_by_status('pending_relationship_analysis')
+    total_groups = len(story_ids)
+    print(f"发现 {pending_count} 个事件待关系分析，分属 {total_groups} 个故事单元。")
+
+    for i, story_key in enumerate(story_ids):
+        story_id = story_key if story_key is not None else 'unassigned'
+        events_in_story = [
+            event for event in db_manager.get_records_by_story(story_key, 'pending_relationship_analysis')
+            if event['id'] not in processed_event_ids
+        ]
+        if not events_in_story:
+            print(f"故事 {story_id} 的事件都已经被处理过，跳过。")
+            continue
 
-    for i, (story_id, events_in_story) in enumerate(story_groups.items()):
         print(f"\n--- 正在处理故事 {i+1}/{total_groups}: {story_id} ---")
         
         if story_id == 'unassigned':
@@ -119,7 +106,7 @@ async def run_relationship_analysis_workflow():
         # 2.1. Use the Hybrid Retriever to get a context summary
         print("Retrieving relevant context...")
         # The retriever agent is now initialized and ready to be used.
-        context_summary = retriever_agent.retrieve_context(source_context)
+        context_summary = await retriever_agent.retrieve_context_async(source_context)
         print("Context retrieval complete.")
 
         # 2.2. Pass the context summary into the relationship analysis
@@ -146,25 +133,23 @@ async def run_relationship_analysis_workflow():
 
         # 2.4. Store all event nodes first
         print(f"开始为故事 '{story_id}' 的 {len(events_in_story)} 个事件节点进行存储...")
-        for event in events_in_story:
-            event_id = event['id']
-            if event_id in processed_event_ids:
-                continue
-            try:
-                storage_agent.store_event(event_id, event)
+        try:
+            await storage_agent.store_events_bulk_async(events_in_story)
+            for event in events_in_story:
                 # We still log after the node is stored. If relationship storage fails,
                 # the node won't be re-processed, but relationships can be re-inferred.
-                log_processed_event(event_id, log_file)
-                db_manager.update_status_and_schema(event_id, "completed_nodes_stored", "", "Successfully stored event and entity nodes.")
-            except Exception as e:
-                print(f"存储事件节点 {event_id} 时发生错误: {e}。")
-                db_manager.update_status_and_schema(event_id, "failed_storage", "", str(e))
+                log_processed_event(event['id'], log_file)
+                db_manager.update_status_and_schema(event['id'], "completed_nodes_stored", "", "Successfully stored event and entity nodes.")
+        except Exception as e:
+            print(f"存储故事 '{story_id}' 的事件节点时发生错误: {e}。")
+            for event in events_in_story:
+                db_manager.update_status_and_schema(event['id'], "failed_storage", "", str(e))
 
         # 2.5. Store all relationships in a single batch
         if relationships:
             print(f"开始为故事 '{story_id}' 的 {len(relationships)} 条关系进行存储...")
             try:
-                storage_agent.store_relationships(relationships)
+                await asyncio.to_thread(storage_agent.store_relationships, relationships)
                 # Update status for all involved events
                 all_event_ids_in_story = [e['id'] for e in events_in_story]
                 for event_id in all_event_ids_in_story:
@@ -178,6 +163,7 @@ async def run_relationship_analysis_workflow():
         print(f"--- 故事 {story_id} 处理完成 ---")
 
     storage_agent.close()
+    print(f"JSON解析统计 (llm_repair 为额外的模型修复调用): {llm_client.get_json_parse_stats()}")
     print("\n--- 工作流全部处理完成 ---")
 
 def main_standalone():
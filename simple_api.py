@@ -512,8 +512,12 @@ async def get_api_workflows():
     return workflows
 
 @app.get("/api/events")
-async def get_events(page: int = 0, page_size: int = 10):
-    """获取事件数据 - 分页 (已修复，查询正确的数据表)"""
+async def get_events(page: int = 0, page_size: int = 10, cursor: Optional[str] = None):
+    """获取事件数据 - 分页 (已修复，查询正确的数据表)
+
+    传入上一页返回的 `next_cursor` 时使用键集分页 (id < cursor)，每页都是一次
+    (processed, id) 索引范围扫描；不传 cursor 时保持原有的 page/OFFSET 语义。
+    """
     conn = None
     try:
         import sqlite3
@@ -521,23 +525,32 @@ async def get_events(page: int = 0, page_size: int = 10):
         conn = sqlite3.connect("master_state.db")
         conn.row_factory = sqlite3.Row  # 允许按列名访问数据
 
-        cursor = conn.cursor()
+        db_cursor = conn.cursor()
 
         # 首先，从正确的目标表 event_data 中获取总行数
-        cursor.execute("SELECT COUNT(*) FROM event_data WHERE processed = 1")
-        total_count = cursor.fetchone()[0]
+        db_cursor.execute("SELECT COUNT(*) FROM event_data WHERE processed = 1")
+        total_count = db_cursor.fetchone()[0]
 
         # 然后，获取分页后的详细数据
-        offset = page * page_size
-        cursor.execute("""
-            SELECT id, event_type, trigger, entities, summary 
-            FROM event_data 
-            WHERE processed = 1
-            ORDER BY id DESC
-            LIMIT ? OFFSET ?
-        """, (page_size, offset))
+        if cursor is not None:
+            db_cursor.execute("""
+                SELECT id, event_type, trigger, entities, summary 
+                FROM event_data 
+                WHERE processed = 1 AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (cursor, page_size))
+        else:
+            offset = page * page_size
+            db_cursor.execute("""
+                SELECT id, event_type, trigger, entities, summary 
+                FROM event_data 
+                WHERE processed = 1
+                ORDER BY id DESC
+                LIMIT ? OFFSET ?
+            """, (page_size, offset))
         
-        rows = cursor.fetchall()
+        rows = db_cursor.fetchall()
         
         # 将数据库行格式化为前端期望的JSON对象
         events = []
@@ -562,7 +575,8 @@ async def get_events(page: int = 0, page_size: int = 10):
                 "page": page,
                 "page_size": page_size,
                 "total": total_count,
-                "pages": (total_count + page_size - 1) // page_size
+                "pages": (total_count + page_size - 1) // page_size,
+                "next_cursor": events[-1]["id"] if len(events) == page_size else None
             }
         }
         
@@ -571,7 +585,7 @@ async def get_events(page: int = 0, page_size: int = 10):
         # 如果出错，返回一个结构完整的空响应
         return {
             "events": [],
-            "pagination": { "page": page, "page_size": page_size, "total": 0, "pages": 0 }
+            "pagination": { "page": page, "page_size": page_size, "total": 0, "pages": 0, "next_cursor": None }
         }
     finally:
         if conn:
@@ -27,6 +27,8 @@ project_root = Path(__file__).resolve().parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -60,12 +62,11 @@ class EnhancedCortexAgent:
     def _load_embedding_model(self):
         """加载 BGE 嵌入模型"""
         try:
-            from sentence_transformers import SentenceTransformer
             model_name = self.cortex_config.get('vectorizer', {}).get('model_name', 'BAAI/bge-large-zh-v1.5')
-            # 使用配置中的缓存目录
+            # 使用配置中的缓存目录；共享的推理线程在首次编码时加载模型
             cache_dir = self.config.get('model_settings', {}).get('cache_dir', '/home/kai/models')
-            self.embedding_model = SentenceTransformer(model_name, cache_folder=cache_dir)
-            logger.info(f"✅ 加载嵌入模型: {model_name} (缓存: {cache_dir})")
+            self.embedding_model = get_embedding_worker(model_name, cache_dir)
+            logger.info(f"✅ 使用共享嵌入模型: {model_name} (缓存: {cache_dir})")
         except Exception as e:
             logger.error(f"❌ 嵌入模型加载失败: {e}")
             self.embedding_model = None
@@ -219,7 +220,8 @@ class EnhancedCortexAgent:
         
         # 批量编码
         try:
-            embeddings = self.embedding_model.encode(texts, show_progress_bar=True)
+            model_name = self.cortex_config.get('vectorizer', {}).get('model_name', 'BAAI/bge-large-zh-v1.5')
+            embeddings = encode_texts(texts, model_name, self.embedding_model.encode)
             logger.info(f"✅ 语义特征提取完成: {embeddings.shape}")
             return embeddings
         except Exception as e:
@@ -4,8 +4,10 @@ This agent is responsible for retrieving relevant context from both the graph
 and vector databases to enrich the input for other agents.
 """
 
+import asyncio
 import jieba.analyse
-from sentence_transformers import SentenceTransformer
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from unittest.mock import MagicMock
 
@@ -17,6 +19,11 @@ sys.path.insert(0, str(project_root))
 
 from src.agents.storage_agent import StorageAgent
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts, encode_texts_async
+
+# One graph query plus one query per ChromaDB collection run concurrently.
+RETRIEVAL_WORKERS = 4
 
 class HybridRetrieverAgent:
     def __init__(self, storage_agent: StorageAgent):
@@ -28,17 +35,16 @@ class HybridRetrieverAgent:
         """
         self.storage_agent = storage_agent
         
-        try:
-            # Initialize the embedding model, reusing the same config as StorageAgent
-            model_config = get_config().get('cortex', {}).get('vectorizer', {})
-            model_name = model_config.get('model_name', 'BAAI/bge-large-zh-v1.5')
-            cache_dir = get_config().get('model_settings', {}).get('cache_dir')
-            self._embedding_model = SentenceTransformer(model_name, cache_folder=cache_dir)
-            print(f"Embedding model '{model_name}' loaded for HybridRetrieverAgent.")
-        except Exception as e:
-            print(f"Error loading embedding model for HybridRetrieverAgent: {e}")
-            self._embedding_model = None
-            raise
+        # Same config as StorageAgent, so both share one embedding worker and model.
+        model_config = get_config().get('cortex', {}).get('vectorizer', {})
+        model_name = model_config.get('model_name', 'BAAI/bge-large-zh-v1.5')
+        cache_dir = get_config().get('model_settings', {}).get('cache_dir')
+        self._embedding_model_name = model_name
+        self._embedding_model = get_embedding_worker(model_name, cache_dir)
+
+        self._executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix="hybrid-retrieval")
+        # Per-stage timings (ms) of the last retrieve_context call.
+        self.last_timings: Dict[str, float] = {}
             
         print("HybridRetrieverAgent initialized.")
 
@@ -54,22 +60,56 @@ class HybridRetrieverAgent:
         Returns:
             A string containing the synthesized context summary.
         """
+        timings = {}
+        start = time.perf_counter()
+        graph_future = self._start_graph_query(text, top_k_entities, timings, start)
+        vector_insights = self._query_vector_database(text, top_k=top_k_similar, timings=timings)
+        graph_facts, timings['graph_ms'] = graph_future.result()
+        return self._finish_retrieval(graph_facts, vector_insights, timings, start)
+
+    async def retrieve_context_async(self, text: str, top_k_entities: int = 5, top_k_similar: int = 3) -> str:
+        """
+        Async variant of retrieve_context for workflows running on an event loop:
+        the query is embedded through the embedding worker's encode_async and the
+        database queries run on worker threads, so the loop is never blocked.
+        """
+        timings = {}
+        start = time.perf_counter()
+        graph_future = self._start_graph_query(text, top_k_entities, timings, start)
+        vector_insights = await self._query_vector_database_async(text, top_k=top_k_similar, timings=timings)
+        graph_facts, timings['graph_ms'] = await asyncio.wrap_future(graph_future)
+        return self._finish_retrieval(graph_facts, vector_insights, timings, start)
+
+    def _start_graph_query(self, text: str, top_k_entities: int, timings: Dict[str, float], start: float):
+        """Extracts the key entities and starts the graph query on the executor."""
         print(f"--- Retrieving context for text: '{text[:100]}...' ---")
-        
+
         # 1. Quick Entity Extraction
         entities = self._extract_key_entities(text, top_k=top_k_entities)
+        timings['entities_ms'] = (time.perf_counter() - start) * 1000
         print(f"  Extracted key entities: {entities}")
 
-        # 2. Parallel Queries (simulated with sequential calls for now)
-        graph_facts = self._query_graph_database(entities)
-        vector_insights = self._query_vector_database(text, top_k=top_k_similar)
+        # 2. Parallel Queries: the graph query runs while the vector queries run
+        return self._executor.submit(self._timed, self._query_graph_database, entities)
 
+    def _finish_retrieval(self, graph_facts: List[str], vector_insights: List[str],
+                          timings: Dict[str, float], start: float) -> str:
+        """Synthesizes the context summary and records the stage timings."""
         # 3. Synthesize Context Summary
         summary = self._synthesize_summary(graph_facts, vector_insights)
         
-        print("--- Context retrieval complete. ---")
+        timings['total_ms'] = (time.perf_counter() - start) * 1000
+        self.last_timings = {stage: round(ms, 1) for stage, ms in timings.items()}
+        print(f"--- Context retrieval complete. Timings (ms): {self.last_timings} ---")
         return summary
 
+    @staticmethod
+    def _timed(fn, *args, **kwargs):
+        """Runs fn and returns its result with the elapsed time in milliseconds."""
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        return result, (time.perf_counter() - start) * 1000
+
     def _extract_key_entities(self, text: str, top_k: int) -> List[str]:
         """
         Extracts key entities/keywords from text using jieba, with a stopword filter.
@@ -94,70 +134,98 @@ class HybridRetrieverAgent:
         print(f"  (GraphDB) Querying for facts related to: {entities}")
         facts = []
         try:
+            # One round trip for all entities. For each entity, this finds the events it is
+            # involved in and any relationships those events have with other events.
+            query = """
+            UNWIND $entity_names AS entity_name
+            CALL {
+                WITH entity_name
+                MATCH (ent:Entity {name: entity_name})-[:INVOLVED_IN]->(evt1:Event)
+                OPTIONAL MATCH (evt1)-[r]-(evt2:Event)
+                RETURN ent.name AS entity, type(r) AS relationship, evt2.eventId AS related_event_id, evt1.assigned_event_type as event_type
+                LIMIT 5 // Limit results per entity to avoid overwhelming context
+            }
+            RETURN entity, relationship, related_event_id, event_type
+            """
             with self.storage_agent._neo4j_driver.session() as session:
-                for entity in entities:
-                    # This query finds events the entity is involved in, and any relationships
-                    # those events have with other events.
-                    query = """
-                    MATCH (ent:Entity {name: $entity_name})-[:INVOLVED_IN]->(evt1:Event)
-                    OPTIONAL MATCH (evt1)-[r]-(evt2:Event)
-                    RETURN ent.name AS entity, type(r) AS relationship, evt2.eventId AS related_event_id, evt1.assigned_event_type as event_type
-                    LIMIT 5 // Limit results per entity to avoid overwhelming context
-                    """
-                    result = session.run(query, entity_name=entity)
-                    for record in result:
-                        fact = f"实体 '{record['entity']}' 参与了 '{record['event_type']}' 事件"
-                        if record['relationship']:
-                            fact += f", 该事件与事件 {record['related_event_id']} 存在 '{record['relationship']}' 关系。"
-                        else:
-                            fact += "。"
-                        facts.append(fact)
+                result = session.run(query, entity_names=entities)
+                for record in result:
+                    fact = f"实体 '{record['entity']}' 参与了 '{record['event_type']}' 事件"
+                    if record['relationship']:
+                        fact += f", 该事件与事件 {record['related_event_id']} 存在 '{record['relationship']}' 关系。"
+                    else:
+                        fact += "。"
+                    facts.append(fact)
             
             print(f"  (GraphDB) Found {len(facts)} facts.")
-            return list(set(facts)) # Return unique facts
+            return list(dict.fromkeys(facts)) # Return unique facts
         except Exception as e:
             print(f"  (GraphDB) An error occurred during graph query: {e}")
             return []
 
-    def _query_vector_database(self, text: str, top_k: int) -> List[str]:
+    def _query_vector_database(self, text: str, top_k: int, timings: Dict[str, float] | None = None) -> List[str]:
         """
         Queries the vector database for semantically similar events or documents.
+        The query is embedded once and the three collections are queried in parallel;
+        stage timings are added to `timings` if given.
         """
+        timings = timings if timings is not None else {}
         if not self._embedding_model:
             print("  (VectorDB) Skipping query: embedding model not available.")
             return []
 
         print(f"  (VectorDB) Querying for documents similar to: '{text[:50]}...'")
         try:
-            query_embedding = self._embedding_model.encode(text, convert_to_tensor=False).tolist()
-            
-            # Query all three collections
-            source_results = self.storage_agent._source_text_collection.query(
-                query_embeddings=[query_embedding], n_results=top_k
-            )
-            event_results = self.storage_agent._event_desc_collection.query(
-                query_embeddings=[query_embedding], n_results=top_k
+            query_embedding, timings['embedding_ms'] = self._timed(
+                lambda: encode_texts([text], self._embedding_model_name, self._embedding_model.encode)[0].tolist()
             )
-            entity_results = self.storage_agent._entity_context_collection.query(
-                query_embeddings=[query_embedding], n_results=top_k
-            )
-
-            # Combine and deduplicate results
-            all_documents = set()
-            if source_results and source_results['documents']:
-                all_documents.update(source_results['documents'][0])
-            if event_results and event_results['documents']:
-                all_documents.update(event_results['documents'][0])
-            if entity_results and entity_results['documents']:
-                all_documents.update(entity_results['documents'][0])
+            return self._query_collections(query_embedding, top_k, timings)
+        except Exception as e:
+            print(f"  (VectorDB) An error occurred during vector query: {e}")
+            return []
 
-            print(f"  (VectorDB) Found {len(all_documents)} unique similar documents.")
-            return list(all_documents)
+    async def _query_vector_database_async(self, text: str, top_k: int, timings: Dict[str, float]) -> List[str]:
+        """Async variant of _query_vector_database."""
+        if not self._embedding_model:
+            print("  (VectorDB) Skipping query: embedding model not available.")
+            return []
 
+        print(f"  (VectorDB) Querying for documents similar to: '{text[:50]}...'")
+        try:
+            start = time.perf_counter()
+            embeddings = await encode_texts_async([text], self._embedding_model_name, self._embedding_model.encode_async)
+            timings['embedding_ms'] = (time.perf_counter() - start) * 1000
+            # Not on self._executor: _query_collections submits to it and waits.
+            return await asyncio.to_thread(self._query_collections, embeddings[0].tolist(), top_k, timings)
         except Exception as e:
             print(f"  (VectorDB) An error occurred during vector query: {e}")
             return []
 
+    def _query_collections(self, query_embedding: List[float], top_k: int, timings: Dict[str, float]) -> List[str]:
+        """Queries the three collections in parallel and returns their unique documents."""
+        # Query all three collections in parallel with the shared embedding
+        collections = [
+            self.storage_agent._source_text_collection,
+            self.storage_agent._event_desc_collection,
+            self.storage_agent._entity_context_collection,
+        ]
+        start = time.perf_counter()
+        futures = [
+            self._executor.submit(collection.query, query_embeddings=[query_embedding], n_results=top_k)
+            for collection in collections
+        ]
+        results = [future.result() for future in futures]
+        timings['vector_ms'] = (time.perf_counter() - start) * 1000
+
+        # Combine and deduplicate results
+        all_documents = {}
+        for collection_results in results:
+            if collection_results and collection_results['documents']:
+                all_documents.update(dict.fromkeys(collection_results['documents'][0]))
+
+        print(f"  (VectorDB) Found {len(all_documents)} unique similar documents.")
+        return list(all_documents)
+
     def _synthesize_summary(self, graph_facts: List[str], vector_insights: List[str]) -> str:
         """
         Combines the results from both databases into a single context summary.
@@ -82,16 +82,18 @@ class RelationshipAnalysisAgent:
                 print("Warning: LLM returned an empty response for relationship analysis.")
                 return "", None
 
-            # Use the client's robust JSON parsing for the response
-            parsed_json = await self.llm_client.get_json_response(
-                messages=[{"role": "user", "content": f"Please parse the following text into a valid JSON array. The text is: {raw_response}"}],
-                task_type=self.task_type
+            # Parse locally; a (cheap) LLM repair call is only made if that fails.
+            parsed_json = await self.llm_client.parse_or_repair_json(
+                raw_response,
+                task_type=self.task_type,
+                expected_type=list
             )
 
             if isinstance(parsed_json, list):
                 return raw_response, parsed_json
             else:
                 print(f"Warning: Failed to parse relationships into a list. Parsed data: {parsed_json}")
+                self.llm_client.discard_cached_response(messages, task_type=self.task_type)
                 return raw_response, None
 
         except Exception as e:
@@ -5,10 +5,10 @@ Neo4j graph database for structured knowledge and the ChromaDB vector store
 for semantic search capabilities.
 """
 
+import asyncio
 import chromadb
 import json
 from neo4j import GraphDatabase, basic_auth
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any
 
 # Add project root to sys.path
@@ -18,6 +18,8 @@ project_root = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts, encode_texts_async
 
 class StorageAgent:
     def __init__(self, neo4j_uri, neo4j_user, neo4j_password, chroma_db_path):
@@ -58,17 +60,21 @@ class StorageAgent:
             print(f"Error connecting to ChromaDB: {e}")
             raise
             
-        try:
-            # Initialize the embedding model
-            model_config = get_config().get('cortex', {}).get('vectorizer', {})
-            model_name = model_config.get('model_name', 'BAAI/bge-large-zh-v1.5')
-            cache_dir = get_config().get('model_settings', {}).get('cache_dir')
-            self._embedding_model = SentenceTransformer(model_name, cache_folder=cache_dir)
-            print(f"Embedding model '{model_name}' loaded for StorageAgent.")
-        except Exception as e:
-            print(f"Error loading embedding model for StorageAgent: {e}")
-            self._embedding_model = None
-            raise
+        # The shared embedding worker loads the model on the first encode.
+        model_config = get_config().get('cortex', {}).get('vectorizer', {})
+        model_name = model_config.get('model_name', 'BAAI/bge-large-zh-v1.5')
+        cache_dir = get_config().get('model_settings', {}).get('cache_dir')
+        self._embedding_model_name = model_name
+        self._embedding_model = get_embedding_worker(model_name, cache_dir)
+        print(f"Embedding model '{model_name}' registered for StorageAgent.")
+
+    def _encode(self, texts: List[str]):
+        """Encodes texts, reusing embeddings already in the embedding store."""
+        return encode_texts(texts, self._embedding_model_name, self._embedding_model.encode)
+
+    async def _encode_async(self, texts: List[str]):
+        """Async variant of _encode, going through the embedding worker's encode_async."""
+        return await encode_texts_async(texts, self._embedding_model_name, self._embedding_model.encode_async)
 
     def close(self):
         """Closes the database connections."""
@@ -90,6 +96,77 @@ class StorageAgent:
 
         print(f"--- Successfully stored event {event_id} ---")
 
+    def store_events_bulk(self, events: List[Dict[str, Any]]):
+        """
+        Stores a batch of events (e.g. all events of a story), each identified by
+        its 'id' key, and their entities. All texts are encoded in one batch, each
+        ChromaDB collection is written with one upsert and the graph with one
+        UNWIND statement per label, in a single Neo4j transaction.
+
+        Raises:
+            Exception: If the Neo4j write fails, so the caller can mark the
+                events as failed. ChromaDB errors are logged, as in store_event.
+        """
+        events = [event for event in events if event and event.get('id')]
+        if not events:
+            return
+        print(f"--- Storing {len(events)} events in bulk ---")
+        self._store_graph_bulk(events)
+        records = self._bulk_chroma_records(events)
+        if records is None:
+            return
+        try:
+            self._write_chroma_records(records)
+            print(f"  (ChromaDB) Successfully stored vectors for {len(events)} events.")
+        except Exception as e:
+            print(f"  (ChromaDB) Error storing vectors for {len(events)} events: {e}")
+
+    async def store_events_bulk_async(self, events: List[Dict[str, Any]]):
+        """
+        Async variant of store_events_bulk for workflows running on an event loop:
+        the texts are encoded through the embedding worker's encode_async and the
+        database writes run on worker threads. Raises like store_events_bulk.
+        """
+        events = [event for event in events if event and event.get('id')]
+        if not events:
+            return
+        print(f"--- Storing {len(events)} events in bulk ---")
+        await asyncio.to_thread(self._store_graph_bulk, events)
+        records = self._bulk_chroma_records(events)
+        if records is None:
+            return
+        try:
+            documents = self._chroma_documents(records)
+            if documents:
+                embeddings = (await self._encode_async(documents)).tolist()
+                await asyncio.to_thread(self._upsert_chroma_records, records, embeddings)
+            print(f"  (ChromaDB) Successfully stored vectors for {len(events)} events.")
+        except Exception as e:
+            print(f"  (ChromaDB) Error storing vectors for {len(events)} events: {e}")
+
+    def _store_graph_bulk(self, events: List[Dict[str, Any]]):
+        """Writes the event nodes and entity links of `events` in one Neo4j transaction."""
+        event_rows = [{"event_id": event['id'], "props": self._event_properties(event['id'], event)} for event in events]
+        entity_rows = [
+            {"event_id": event['id'], "entity_name": entity_name, "entity_type": entity_type}
+            for event in events
+            for entity_name, entity_type in self._entity_rows(event['id'], event)
+        ]
+        with self._neo4j_driver.session() as session:
+            session.execute_write(self._create_events_and_entities_bulk_tx, event_rows, entity_rows)
+        print(f"  (Neo4j) Successfully stored {len(event_rows)} event nodes and {len(entity_rows)} entity links.")
+
+    def _bulk_chroma_records(self, events: List[Dict[str, Any]]) -> Dict[str, List[tuple]] | None:
+        """Collects the ChromaDB records of `events`, or None if there is no embedding model."""
+        if not self._embedding_model:
+            print("  (ChromaDB) Skipping storage: embedding model not available.")
+            return None
+        records = {"source": [], "description": [], "entity": []}
+        for event in events:
+            for key, event_records in self._chroma_records(event['id'], event).items():
+                records[key].extend(event_records)
+        return records
+
     def store_relationships(self, relationships: List[Dict[str, Any]]):
         """
         Stores a list of relationships in Neo4j.
@@ -124,8 +201,7 @@ class StorageAgent:
         """
         # 1. Create the main Event node
         # We store the full event data as properties for rich context.
-        event_properties = {k: v if not isinstance(v, (dict, list)) else json.dumps(v) for k, v in event_data.items()}
-        event_properties['eventId'] = event_id # Ensure the primary ID is a property
+        event_properties = StorageAgent._event_properties(event_id, event_data)
         
         query = """
         MERGE (e:Event {eventId: $event_id})
@@ -134,25 +210,7 @@ class StorageAgent:
         tx.run(query, event_id=event_id, props=event_properties)
 
         # 2. Create Entity nodes and link them to the Event
-        # Assumes 'involved_entities' is a list of dicts with 'entity_name' and 'entity_type'
-        entities = []
-        involved_entities_str = event_data.get('involved_entities')
-        if isinstance(involved_entities_str, str):
-            try:
-                entities = json.loads(involved_entities_str)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode 'involved_entities' JSON for event {event_id}")
-                entities = []
-        
-        if not isinstance(entities, list):
-            entities = []
-
-        for entity in entities:
-            entity_name = entity.get('entity_name')
-            entity_type = entity.get('entity_type', 'Unknown') # Default type if not provided
-            if not entity_name:
-                continue
-
+        for entity_name, entity_type in StorageAgent._entity_rows(event_id, event_data):
             query = """
             MERGE (ent:Entity {name: $entity_name})
             ON CREATE SET ent.type = $entity_type
@@ -162,6 +220,59 @@ class StorageAgent:
             """
             tx.run(query, entity_name=entity_name, entity_type=entity_type, event_id=event_id)
 
+    @staticmethod
+    def _parse_entities(event_id: str, involved_entities) -> List[Any]:
+        """Returns 'involved_entities' (a list or its JSON encoding) as a list."""
+        entities = involved_entities
+        if isinstance(entities, str):
+            try:
+                entities = json.loads(entities)
+            except json.JSONDecodeError:
+                print(f"Warning: Could not decode 'involved_entities' JSON for event {event_id}")
+                entities = []
+        return entities if isinstance(entities, list) else []
+
+    @staticmethod
+    def _entity_rows(event_id: str, event_data: Dict[str, Any]) -> List[tuple]:
+        """
+        Returns the (entity_name, entity_type) pairs of an event.
+        Assumes 'involved_entities' is a list of dicts with 'entity_name' and 'entity_type'.
+        """
+        rows = []
+        for entity in StorageAgent._parse_entities(event_id, event_data.get('involved_entities')):
+            if not isinstance(entity, dict) or not entity.get('entity_name'):
+                continue
+            rows.append((entity['entity_name'], entity.get('entity_type', 'Unknown'))) # Default type if not provided
+        return rows
+
+    @staticmethod
+    def _event_properties(event_id: str, event_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Event data as Neo4j node properties; nested values are stored as JSON."""
+        properties = {k: v if not isinstance(v, (dict, list)) else json.dumps(v) for k, v in event_data.items()}
+        properties['eventId'] = event_id # Ensure the primary ID is a property
+        return properties
+
+    @staticmethod
+    def _create_events_and_entities_bulk_tx(tx, event_rows: List[Dict[str, Any]], entity_rows: List[Dict[str, Any]]):
+        """
+        Creates all event nodes with one UNWIND statement, then all entity nodes
+        and their INVOLVED_IN links with another.
+        """
+        tx.run("""
+        UNWIND $rows AS row
+        MERGE (e:Event {eventId: row.event_id})
+        SET e += row.props
+        """, rows=event_rows)
+        if entity_rows:
+            tx.run("""
+            UNWIND $rows AS row
+            MERGE (ent:Entity {name: row.entity_name})
+            ON CREATE SET ent.type = row.entity_type
+            WITH ent, row
+            MATCH (evt:Event {eventId: row.event_id})
+            MERGE (ent)-[:INVOLVED_IN]->(evt)
+            """, rows=entity_rows)
+
     @staticmethod
     def _create_event_relationships_tx(tx, relationships: List[Dict[str, Any]]):
         """
@@ -186,6 +297,94 @@ class StorageAgent:
                    rel_type=rel['relationship_type'].upper(), # Ensure rel type is uppercase
                    reason=rel.get('analysis_reason', ''))
 
+    def _chroma_records(self, event_id: str, event_data: Dict[str, Any]) -> Dict[str, List[tuple]]:
+        """
+        Builds the (document, id, metadata) records of an event for each ChromaDB
+        collection: 'source' texts, event 'description's and 'entity' contexts.
+        """
+        records = {"source": [], "description": [], "entity": []}
+
+        # 1. Original source text
+        source_text = event_data.get('source_text', '') or event_data.get('text', '')
+        if source_text:
+            records["source"].append((source_text, f"{event_id}_source", {"event_id": event_id, "type": "source_text"}))
+
+        # 2. Event description - 安全处理None值
+        structured_data = event_data.get('structured_data')
+        event_description = ""
+        # 如果structured_data是None，跳过处理
+        if structured_data is None:
+            print(f"  (ChromaDB) Skipping event description: structured_data is None for {event_id}")
+        else:
+            if isinstance(structured_data, str):
+                try:
+                    structured_data = json.loads(structured_data)
+                except json.JSONDecodeError:
+                    structured_data = {}
+            if isinstance(structured_data, dict):
+                event_description = structured_data.get('description', '')
+                if event_description:
+                    records["description"].append(
+                        (event_description, f"{event_id}_desc", {"event_id": event_id, "type": "event_description"})
+                    )
+
+        # 3. Entity-centric context - 安全处理None值
+        entities = event_data.get('involved_entities')
+        # 如果involved_entities是None，跳过处理
+        if entities is None:
+            print(f"  (ChromaDB) Skipping entities: involved_entities is None for {event_id}")
+        elif event_description:
+            # 获取事件描述用于实体上下文
+            for i, entity in enumerate(self._parse_entities(event_id, entities)):
+                # 安全检查entity不为None且为字典
+                if entity is not None and isinstance(entity, dict):
+                    entity_name = entity.get('entity_name')
+                    if entity_name:
+                        records["entity"].append((
+                            f"实体: {entity_name}; 事件: {event_description}",
+                            f"{event_id}_entity_{i}",
+                            {"event_id": event_id, "type": "entity_context"},
+                        ))
+        return records
+
+    def _write_chroma_records(self, records: Dict[str, List[tuple]]):
+        """
+        Encodes the documents of all collections in one batch and writes each
+        collection with a single upsert, so re-storing an event overwrites it.
+        """
+        documents = self._chroma_documents(records)
+        if not documents:
+            return
+        self._upsert_chroma_records(records, self._encode(documents).tolist())
+
+    def _chroma_collections(self) -> Dict[str, Any]:
+        """Returns the ChromaDB collections by record key."""
+        return {
+            "source": self._source_text_collection,
+            "description": self._event_desc_collection,
+            "entity": self._entity_context_collection,
+        }
+
+    def _chroma_documents(self, records: Dict[str, List[tuple]]) -> List[str]:
+        """Returns the documents of all collections, in the order _upsert_chroma_records expects."""
+        return [document for key in self._chroma_collections() for document, _, _ in records[key]]
+
+    def _upsert_chroma_records(self, records: Dict[str, List[tuple]], embeddings: List[List[float]]):
+        """Writes each collection with a single upsert, taking its slice of `embeddings`."""
+        offset = 0
+        for key, collection in self._chroma_collections().items():
+            if not records[key]:
+                continue
+            count = len(records[key])
+            docs, ids, metadatas = zip(*records[key])
+            collection.upsert(
+                documents=list(docs),
+                embeddings=embeddings[offset:offset + count],
+                metadatas=list(metadatas),
+                ids=list(ids)
+            )
+            offset += count
+
     def _store_in_chromadb(self, event_id: str, event_data: Dict[str, Any]):
         """
         Generates and stores embeddings for the event in ChromaDB.
@@ -200,85 +399,8 @@ class StorageAgent:
             return
 
         try:
-            # 1. Store original source text
-            source_text = event_data.get('source_text', '') or event_data.get('text', '') if event_data else ''
-            if source_text:
-                source_embedding = self._embedding_model.encode([source_text])[0].tolist()
-                self._source_text_collection.add(
-                    documents=[source_text],
-                    embeddings=[source_embedding],
-                    metadatas=[{"event_id": event_id, "type": "source_text"}],
-                    ids=[f"{event_id}_source"]
-                )
-
-            # 2. Store event description - 安全处理None值
-            structured_data = event_data.get('structured_data') if event_data else None
-            
-            # 如果structured_data是None，跳过处理
-            if structured_data is None:
-                print(f"  (ChromaDB) Skipping event description: structured_data is None for {event_id}")
-            else:
-                if isinstance(structured_data, str):
-                    try:
-                        structured_data = json.loads(structured_data)
-                    except json.JSONDecodeError:
-                        structured_data = {}
-                
-                if isinstance(structured_data, dict):
-                    event_description = structured_data.get('description', '')
-                    if event_description:
-                        desc_embedding = self._embedding_model.encode([event_description])[0].tolist()
-                        self._event_desc_collection.add(
-                            documents=[event_description],
-                            embeddings=[desc_embedding],
-                            metadatas=[{"event_id": event_id, "type": "event_description"}],
-                            ids=[f"{event_id}_desc"]
-                        )
-
-            # 3. Store entity-centric context - 安全处理None值
-            entities = event_data.get('involved_entities') if event_data else None
-            
-            # 如果involved_entities是None，跳过处理
-            if entities is None:
-                print(f"  (ChromaDB) Skipping entities: involved_entities is None for {event_id}")
-            else:
-                if isinstance(entities, str):
-                    try:
-                        entities = json.loads(entities)
-                    except json.JSONDecodeError:
-                        entities = []
-                
-                if not isinstance(entities, list):
-                    entities = []
-
-                entity_contexts = []
-                entity_ids = []
-                event_description = ""
-                
-                # 获取事件描述用于实体上下文
-                if structured_data and isinstance(structured_data, dict):
-                    event_description = structured_data.get('description', '')
-                
-                for i, entity in enumerate(entities):
-                    # 安全检查entity不为None且为字典
-                    if entity is not None and isinstance(entity, dict):
-                        entity_name = entity.get('entity_name')
-                        if entity_name and event_description:
-                            context = f"实体: {entity_name}; 事件: {event_description}"
-                            entity_contexts.append(context)
-                            entity_ids.append(f"{event_id}_entity_{i}")
-            
-                if entity_contexts:
-                    entity_embeddings = self._embedding_model.encode(entity_contexts).tolist()
-                    self._entity_context_collection.add(
-                        documents=entity_contexts,
-                        embeddings=entity_embeddings,
-                        metadatas=[{"event_id": event_id, "type": "entity_context"}] * len(entity_contexts),
-                        ids=entity_ids
-                    )
-            
+            self._write_chroma_records(self._chroma_records(event_id, event_data))
             print(f"  (ChromaDB) Successfully stored vectors for event {event_id}.")
-
         except Exception as e:
             print(f"  (ChromaDB) Error storing vectors for event {event_id}: {e}")
 
@@ -6,7 +6,6 @@ It handles data clustering, sample inspection, and schema generation based on us
 
 import pandas as pd
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import hdbscan
 import numpy as np
 import json
@@ -20,6 +19,8 @@ sys.path.insert(0, str(project_root))
 
 from src.core.database_manager import DatabaseManager
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts
 from src.llm.llm_client import LLMClient
 from src.core.prompt_manager import prompt_manager
 
@@ -60,17 +61,12 @@ class SchemaLearningToolkit:
         global_config = get_config()
         cache_dir = global_config.get('model_settings', {}).get('cache_dir')
 
-        print(f"Loading embedding model: {model_name}...")
+        print(f"Using embedding model: {model_name} (loaded on first use)")
         if cache_dir:
             print(f"Using cache directory: {cache_dir}")
         
-        try:
-            self.embedding_model = SentenceTransformer(model_name, cache_folder=cache_dir)
-            print("Embedding model loaded successfully.")
-        except Exception as e:
-            print(f"Error loading embedding model: {e}")
-            traceback.print_exc()
-            self.embedding_model = None
+        self.embedding_model_name = model_name
+        self.embedding_model = get_embedding_worker(model_name, cache_dir)
 
     def reload_data(self):
         """Reloads data from the database and clears caches."""
@@ -116,8 +112,14 @@ class SchemaLearningToolkit:
 
         print("Running clustering on individual event summaries...")
         
-        # Generate embeddings from the event summaries
-        embeddings = self.embedding_model.encode(self.event_df['event_summary'].tolist(), show_progress_bar=True)
+        # Generate embeddings from the event summaries; the encoding runs on the
+        # embedding worker thread so the event loop is not blocked.
+        embeddings = await asyncio.to_thread(
+            encode_texts,
+            self.event_df['event_summary'].tolist(),
+            self.embedding_model_name,
+            self.embedding_model.encode,
+        )
 
         # Perform clustering
         min_cluster_size = self.config.get('min_cluster_size', 3)
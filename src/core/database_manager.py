@@ -4,75 +4,344 @@ This module provides a centralized manager for all interactions with the
 master state SQLite database. It handles connection, table creation, and all
 CRUD (Create, Read, Update, Delete) operations, ensuring consistent and safe
 database access across the entire application.
+
+Connections are persistent per thread and run in WAL mode, so readers never
+block the writer. High-frequency per-record status updates from the concurrent
+workflow workers can be routed through a write-behind queue (`deferred=True`)
+that groups them into `executemany` transactions.
 """
 
+import functools
+import itertools
 import sqlite3
+import threading
+import time
+import weakref
 import pandas as pd
 from pathlib import Path
 from datetime import datetime
+from typing import Any, Callable, Iterator
+
+from src.core.db_migrations import apply_migrations
+
+# Connection tuning defaults; overridable via the `database` section of config.yaml.
+DEFAULT_JOURNAL_MODE = "WAL"
+DEFAULT_SYNCHRONOUS = "NORMAL"
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_WRITE_BATCH_SIZE = 500
+DEFAULT_WRITE_FLUSH_INTERVAL_MS = 200
+DEFAULT_READ_BATCH_SIZE = 500
+DEFAULT_LEASE_SECONDS = 600
+
+# Status held by records that a worker has claimed through the lease-based work queue.
+IN_PROGRESS_STATUS = "in_progress"
+# Cluster ID of pending events that incremental clustering has already scored
+# and left unassigned (the DBSCAN noise label).
+NOISE_CLUSTER_ID = -1
+# Cluster ID of noise events that were also left unassigned when the noise pool
+# was last re-clustered; they only take part in the next re-clustering.
+RECLUSTERED_NOISE_CLUSTER_ID = -2
+
+
+def _open_connection(db_path: Path, journal_mode: str, synchronous: str, busy_timeout_ms: int) -> sqlite3.Connection:
+    """Opens a connection and applies the journal, durability and busy-timeout settings."""
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000.0, check_same_thread=False)
+    conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+    return conn
+
+
+class _WriteBehindQueue:
+    """
+    Buffers UPDATE statements and flushes them in a single transaction once
+    `batch_size` rows are pending or the oldest pending row is older than
+    `flush_interval_ms`. Statement order is preserved: consecutive rows that
+    share the same SQL are sent as one `executemany` call.
+
+    A batch that fails to commit goes back to the head of the queue. The
+    background thread retries it with exponential backoff; an explicit
+    `flush()` or `close()` raises the error to its caller instead.
+
+    The queue writes through its own connection (flushes are serialized), so
+    it holds no reference to the DatabaseManager and does not keep it alive.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], batch_size: int, flush_interval_ms: int):
+        self._connect = connect
+        self._conn: sqlite3.Connection | None = None
+        self._batch_size = max(1, batch_size)
+        self._flush_interval = max(0, flush_interval_ms) / 1000.0
+        self._pending: list[tuple[str, tuple]] = []
+        self._oldest: float | None = None
+        self._retry_delay = 0.0
+        self._retry_at = 0.0
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    def put(self, query: str, params: tuple):
+        """Adds a statement to the queue, flushing inline if the batch is full."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write queue is closed.")
+            self._pending.append((query, params))
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            is_full = len(self._pending) >= self._batch_size and not self._retry_delay
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-write-behind", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        if is_full:
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Left queued; the background thread retries it with backoff.
+                pass
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """
+        Writes all pending statements in one transaction. Returns the row count.
+
+        Raises:
+            sqlite3.Error: If the transaction fails; the statements stay queued.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+                oldest, self._oldest = self._oldest, None
+            if not batch:
+                return 0
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                with self._conn:
+                    for query, group in itertools.groupby(batch, key=lambda item: item[0]):
+                        self._conn.executemany(query, [params for _, params in group])
+            except sqlite3.Error as e:
+                print(f"Error flushing {len(batch)} queued database writes: {e}")
+                with self._cond:
+                    self._pending[:0] = batch
+                    self._oldest = oldest
+                    self._retry_delay = min(max(self._retry_delay * 2, 0.05), 5.0)
+                    self._retry_at = time.monotonic() + self._retry_delay
+                raise
+            with self._cond:
+                self._retry_delay = 0.0
+            return len(batch)
+
+    def _run(self):
+        """Background loop that enforces the time-based flush and retries failed batches."""
+        while True:
+            with self._cond:
+                while not self._closed and not self._pending:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                due = self._retry_at if self._retry_delay else self._oldest + self._flush_interval
+                remaining = due - time.monotonic()
+                if remaining > 0 and (self._retry_delay or len(self._pending) < self._batch_size):
+                    self._cond.wait(remaining)
+                    continue
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
+
+    def close(self):
+        """
+        Stops the background thread, flushes whatever is left and closes the
+        queue's connection. Raises if the final flush fails; calling close()
+        again retries it.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
 
 class DatabaseManager:
     """A class to manage all database operations."""
 
-    def __init__(self, db_path: str | Path):
+    def __init__(
+        self,
+        db_path: str | Path,
+        journal_mode: str = DEFAULT_JOURNAL_MODE,
+        synchronous: str = DEFAULT_SYNCHRONOUS,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+        write_batch_size: int = DEFAULT_WRITE_BATCH_SIZE,
+        write_flush_interval_ms: int = DEFAULT_WRITE_FLUSH_INTERVAL_MS,
+        read_batch_size: int = DEFAULT_READ_BATCH_SIZE,
+        lease_seconds: float = DEFAULT_LEASE_SECONDS,
+    ):
         """
         Initializes the DatabaseManager.
 
         Args:
             db_path: The path to the SQLite database file.
+            journal_mode: SQLite journal mode, 'WAL' by default.
+            synchronous: SQLite `synchronous` level. 'NORMAL' is durable in WAL
+                mode except for the last transactions before a power loss.
+            busy_timeout_ms: How long a connection waits on a locked database.
+            write_batch_size: Number of deferred writes that triggers a flush.
+            write_flush_interval_ms: Maximum age of a deferred write before it is flushed.
+            read_batch_size: Default batch size for `iter_records_by_status`.
+            lease_seconds: Default lease duration for work-queue claims.
         """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(exist_ok=True)
+        self.journal_mode = journal_mode.upper()
+        self.synchronous = synchronous.upper()
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_batch_size = write_batch_size
+        self.write_flush_interval_ms = write_flush_interval_ms
+        self.read_batch_size = read_batch_size
+        self.lease_seconds = lease_seconds
+
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self._write_queue: _WriteBehindQueue | None = None
+        self._write_queue_finalizer: weakref.finalize | None = None
         self._initialize_database()
 
+    @classmethod
+    def from_config(cls, db_config: dict[str, Any]) -> "DatabaseManager":
+        """
+        Creates a DatabaseManager from the `database` section of config.yaml.
+        """
+        db_path = db_config.get('path')
+        if not db_path:
+            raise ValueError("Database path not found in configuration.")
+        return cls(
+            db_path,
+            journal_mode=db_config.get('journal_mode', DEFAULT_JOURNAL_MODE),
+            synchronous=db_config.get('synchronous', DEFAULT_SYNCHRONOUS),
+            busy_timeout_ms=db_config.get('busy_timeout_ms', DEFAULT_BUSY_TIMEOUT_MS),
+            write_batch_size=db_config.get('write_batch_size', DEFAULT_WRITE_BATCH_SIZE),
+            write_flush_interval_ms=db_config.get('write_flush_interval_ms', DEFAULT_WRITE_FLUSH_INTERVAL_MS),
+            read_batch_size=db_config.get('read_batch_size', DEFAULT_READ_BATCH_SIZE),
+            lease_seconds=db_config.get('lease_seconds', DEFAULT_LEASE_SECONDS),
+        )
+
     def _get_connection(self):
-        """Returns a new database connection."""
+        """
+        Returns the persistent connection owned by the calling thread, opening
+        and tuning it on first use. The connection stays open across calls, so
+        `with self._get_connection() as conn:` only scopes a transaction.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
         try:
-            return sqlite3.connect(self.db_path)
+            conn = _open_connection(self.db_path, self.journal_mode, self.synchronous, self.busy_timeout_ms)
         except sqlite3.Error as e:
             print(f"Error connecting to database at {self.db_path}: {e}")
             raise
+        self._local.conn = conn
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    def _get_write_queue(self) -> _WriteBehindQueue:
+        """Lazily creates the write-behind queue on first deferred write."""
+        if self._write_queue is None:
+            with self._connections_lock:
+                if self._write_queue is None:
+                    connect = functools.partial(
+                        _open_connection, self.db_path, self.journal_mode, self.synchronous, self.busy_timeout_ms
+                    )
+                    self._write_queue = _WriteBehindQueue(
+                        connect, self.write_batch_size, self.write_flush_interval_ms
+                    )
+                    # Flushes the queue when the manager is garbage collected or at interpreter
+                    # exit, without the strong reference an atexit hook would hold.
+                    self._write_queue_finalizer = weakref.finalize(self, self._write_queue.close)
+        return self._write_queue
+
+    def _enqueue_write(self, query: str, params: tuple):
+        """Queues a write statement for the next batched flush."""
+        self._get_write_queue().put(query, params)
+
+    def flush_pending_writes(self) -> int:
+        """
+        Flushes all deferred writes immediately.
+
+        Returns:
+            The number of statements written.
+
+        Raises:
+            sqlite3.Error: If the writes could not be committed; they stay queued.
+        """
+        if self._write_queue is None:
+            return 0
+        return self._write_queue.flush()
+
+    def close(self):
+        """
+        Flushes deferred writes and closes every connection opened by this manager.
+
+        Raises:
+            sqlite3.Error: If the deferred writes could not be committed; they
+                stay queued and calling close() again retries them.
+        """
+        if self._write_queue is not None:
+            self._write_queue.close()
+            self._write_queue_finalizer.detach()
+            self._write_queue = None
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Error closing database connection: {e}")
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
     def _initialize_database(self):
         """
-        Creates and alters the master_state table to ensure all necessary
-        columns exist.
+        Brings the database schema up to date by applying any pending
+        versioned migrations (see `src/core/db_migrations.py`).
         """
         try:
-            with self._get_connection() as conn:
-                cursor = conn.cursor()
-                # Create table if it doesn't exist
-                cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS master_state (
-                        id TEXT PRIMARY KEY,
-                        source_text TEXT NOT NULL,
-                        current_status TEXT NOT NULL,
-                        triage_confidence REAL,
-                        assigned_event_type TEXT,
-                        notes TEXT,
-                        last_updated TIMESTAMP
-                    )
-                """
-                )
-                
-                # Add new columns for Cortex workflow if they don't exist
-                self._add_column_if_not_exists(cursor, 'involved_entities', 'TEXT') # For storing entity JSON
-                self._add_column_if_not_exists(cursor, 'cluster_id', 'INTEGER')
-                self._add_column_if_not_exists(cursor, 'story_id', 'TEXT')
-                self._add_column_if_not_exists(cursor, 'structured_data', 'TEXT') # For storing full extracted event JSON
-                
-                conn.commit()
+            apply_migrations(self._get_connection())
         except sqlite3.Error as e:
             print(f"Failed to initialize database table: {e}")
             raise
 
-    def _add_column_if_not_exists(self, cursor: sqlite3.Cursor, column_name: str, column_type: str):
-        """Helper to add a column to the table if it's missing."""
-        cursor.execute(f"PRAGMA table_info(master_state)")
-        columns = [info[1] for info in cursor.fetchall()]
-        if column_name not in columns:
-            print(f"Adding missing column '{column_name}' to master_state table.")
-            cursor.execute(f"ALTER TABLE master_state ADD COLUMN {column_name} {column_type}")
+    def _get_table_columns(self) -> list[str]:
+        """Returns the column names of the master_state table."""
+        with self._get_connection() as conn:
+            return [info[1] for info in conn.execute("PRAGMA table_info(master_state)").fetchall()]
+
+    def _build_select_list(self, columns: list[str] | None, required: tuple[str, ...] = ('id',)) -> str:
+        """
+        Builds a validated SELECT column list. `required` columns are always
+        included; all columns are selected when `columns` is None.
+        """
+        if not columns:
+            return "*"
+        unknown = set(columns) - set(self._get_table_columns())
+        if unknown:
+            raise ValueError(f"Unknown master_state columns: {sorted(unknown)}")
+        return ", ".join(dict.fromkeys([*required, *columns]))
 
     def get_status_summary(self) -> dict[str, int]:
         """
@@ -108,39 +377,505 @@ class DatabaseManager:
             print(f"Error querying records with status '{status}': {e}")
             return pd.DataFrame()
 
-    def update_status_and_schema(self, record_id: str, new_status: str, schema_name: str, notes: str = ""):
+    def get_record_count_by_status(self, status: str) -> int:
+        """
+        Returns the number of records with a specific status.
+        """
+        query = "SELECT COUNT(*) FROM master_state WHERE current_status = ?"
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (status,)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting records with status '{status}': {e}")
+            return 0
+
+    def get_unscored_clustering_count(self) -> int:
+        """
+        Returns the number of records pending clustering that incremental
+        clustering has not scored yet, i.e. not marked as noise.
+        """
+        query = "SELECT COUNT(*) FROM master_state WHERE current_status = 'pending_clustering' AND (cluster_id IS NULL OR cluster_id >= 0)"
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting unscored records pending clustering: {e}")
+            return 0
+
+    def get_clustering_noise_count(self) -> int:
+        """
+        Returns the number of noise records that have not been re-clustered yet,
+        i.e. marked with NOISE_CLUSTER_ID.
+        """
+        query = "SELECT COUNT(*) FROM master_state WHERE current_status = 'pending_clustering' AND cluster_id = ?"
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (NOISE_CLUSTER_ID,)).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error counting clustering noise records: {e}")
+            return 0
+
+    def get_records_page_by_status(
+        self,
+        status: str,
+        page_size: int = 100,
+        after: tuple[str | None, str] | None = None,
+        columns: list[str] | None = None,
+        descending: bool = False,
+    ) -> tuple[list[dict], tuple[str | None, str] | None]:
+        """
+        Retrieves one page of records with a specific status using keyset
+        (cursor) pagination ordered by (last_updated, id).
+
+        Unlike LIMIT/OFFSET, each page is a range scan on the
+        `(current_status, last_updated, id)` index, so the cost per page does
+        not grow with how deep into the result set the caller is. Records that
+        were never updated (NULL `last_updated`) sort before all others, or
+        after them when `descending` is set.
+
+        Args:
+            status: The status to filter on.
+            page_size: Maximum number of records to return.
+            after: The cursor returned with the previous page, or None to start
+                from the beginning.
+            columns: Optional list of columns to return; all columns by default.
+            descending: If True, pages go from the most recently updated record
+                to the oldest.
+
+        Returns:
+            A tuple of (records, next_cursor). `next_cursor` is None once the
+            last page has been returned.
+        """
+        select_list = self._build_select_list(columns, required=('id', 'last_updated'))
+
+        order, comparator = ("DESC", "<") if descending else ("ASC", ">")
+        # NULL and non-NULL last_updated rows are paged as two separate segments,
+        # since row-value comparisons never match NULL.
+        segments = ["dated", "undated"] if descending else ["undated", "dated"]
+        if after is not None:
+            segments = segments[segments.index("undated" if after[0] is None else "dated"):]
+
+        rows: list[dict] = []
+        try:
+            with self._get_connection() as conn:
+                for i, segment in enumerate(segments):
+                    resume = after is not None and i == 0
+                    params: list[Any] = [status]
+                    if segment == "undated":
+                        where = "current_status = ? AND last_updated IS NULL"
+                        if resume:
+                            where += f" AND id {comparator} ?"
+                            params.append(after[1])
+                        order_by = f"id {order}"
+                    else:
+                        where = "current_status = ? AND last_updated IS NOT NULL"
+                        if resume:
+                            where += f" AND (last_updated, id) {comparator} (?, ?)"
+                            params.extend(after)
+                        order_by = f"last_updated {order}, id {order}"
+                    params.append(page_size - len(rows))
+
+                    cursor = conn.execute(
+                        f"SELECT {select_list} FROM master_state WHERE {where} ORDER BY {order_by} LIMIT ?",
+                        params
+                    )
+                    names = [description[0] for description in cursor.description]
+                    rows.extend(dict(zip(names, row)) for row in cursor.fetchall())
+                    if len(rows) >= page_size:
+                        break
+        except sqlite3.Error as e:
+            print(f"Error paging records with status '{status}': {e}")
+            return [], None
+
+        next_cursor = None
+        if len(rows) == page_size:
+            next_cursor = (rows[-1]['last_updated'], rows[-1]['id'])
+        if columns and 'last_updated' not in columns:
+            for row in rows:
+                del row['last_updated']
+        return rows, next_cursor
+
+    def iter_records_by_status(
+        self,
+        status: str,
+        batch_size: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Streams records with a specific status in batches of at most
+        `batch_size` dicts, so memory use does not depend on how many records
+        are waiting and the caller can start on the first batch immediately.
+
+        Batches are read with keyset pagination and records keep their status.
+        Workers that must not process the same record twice claim batches
+        with `claim_records` (or a `WorkQueue`) instead.
+
+        Args:
+            status: The status to read.
+            batch_size: Records per batch; defaults to `read_batch_size`.
+            columns: Optional list of columns to return (`id` is always included).
+
+        Yields:
+            Lists of record dicts.
+        """
+        batch_size = batch_size or self.read_batch_size
+        after = None
+        while True:
+            batch, after = self.get_records_page_by_status(status, batch_size, after=after, columns=columns)
+            if batch:
+                yield batch
+            if after is None:
+                return
+
+    def _iter_pending_clustering(
+        self,
+        cluster_filter: str,
+        batch_size: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Iterator[list[dict]]:
+        """Streams records pending clustering that match a cluster_id condition, in id order."""
+        batch_size = batch_size or self.read_batch_size
+        select_list = self._build_select_list(columns)
+        query = f"""
+            SELECT {select_list} FROM master_state
+            WHERE current_status = 'pending_clustering' AND ({cluster_filter}) AND id > ?
+            ORDER BY id LIMIT ?
+        """
+        after = ""
+        while True:
+            try:
+                with self._get_connection() as conn:
+                    cursor = conn.execute(query, (after, batch_size))
+                    names = [description[0] for description in cursor.description]
+                    batch = [dict(zip(names, row)) for row in cursor.fetchall()]
+            except sqlite3.Error as e:
+                print(f"Error reading records pending clustering: {e}")
+                return
+            if batch:
+                yield batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1]['id']
+
+    def iter_unscored_clustering_records(
+        self,
+        batch_size: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Iterator[list[dict]]:
+        """
+        Streams the records pending clustering that incremental clustering has
+        not scored yet (those counted by `get_unscored_clustering_count`).
+        """
+        return self._iter_pending_clustering("cluster_id IS NULL OR cluster_id >= 0", batch_size, columns)
+
+    def iter_clustering_noise_records(
+        self,
+        batch_size: int | None = None,
+        columns: list[str] | None = None,
+    ) -> Iterator[list[dict]]:
+        """Streams the noise pool: records pending clustering marked with either noise marker."""
+        return self._iter_pending_clustering("cluster_id < 0", batch_size, columns)
+
+    def claim_records(
+        self,
+        status: str,
+        limit: int,
+        owner: str,
+        lease_seconds: float | None = None,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        """
+        Atomically claims up to `limit` records with a specific status for one
+        worker. Claimed records move to `IN_PROGRESS_STATUS`, remember the
+        status they came from, and carry the owner and a lease expiry. Expired
+        leases are reclaimed first, so records abandoned by a crashed worker
+        become claimable again.
+
+        The select and the update are one `UPDATE ... RETURNING` statement, so
+        concurrent workers (threads, processes or machines sharing the file)
+        never receive the same record.
+
+        Args:
+            status: The status to claim records from.
+            limit: Maximum number of records to claim.
+            owner: Identifier of the claiming worker.
+            lease_seconds: How long the claim is valid without a heartbeat;
+                defaults to the manager's `lease_seconds`.
+            columns: Optional list of columns to return (`id` is always included).
+
+        Returns:
+            The claimed records as dicts; empty when nothing is available.
+        """
+        self.reclaim_expired_leases()
+        select_list = self._build_select_list(columns)
+        query = f"""
+            UPDATE master_state
+            SET current_status = ?, claimed_from_status = current_status,
+                lease_owner = ?, lease_expires_at = ?, last_updated = ?
+            WHERE id IN (
+                SELECT id FROM master_state
+                WHERE current_status = ?
+                ORDER BY last_updated, id
+                LIMIT ?
+            )
+            RETURNING {select_list}
+        """
+        lease_seconds = lease_seconds or self.lease_seconds
+        params = (IN_PROGRESS_STATUS, owner, time.time() + lease_seconds, datetime.now().isoformat(), status, limit)
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.execute(query, params)
+                names = [description[0] for description in cursor.description]
+                return [dict(zip(names, row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error claiming records with status '{status}': {e}")
+            return []
+
+    def renew_leases(self, owner: str, lease_seconds: float | None = None) -> int:
+        """
+        Extends the lease on every record the owner still has in progress.
+
+        Returns:
+            The number of leases renewed.
+        """
+        lease_seconds = lease_seconds or self.lease_seconds
+        query = """
+            UPDATE master_state SET lease_expires_at = ?
+            WHERE current_status = ? AND lease_owner = ?
+        """
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (time.time() + lease_seconds, IN_PROGRESS_STATUS, owner)).rowcount
+        except sqlite3.Error as e:
+            print(f"Error renewing leases for '{owner}': {e}")
+            return 0
+
+    def release_leases(self, owner: str, record_ids: list[str] | None = None) -> int:
+        """
+        Returns records the owner has in progress to the status they were
+        claimed from, e.g. on graceful shutdown. Limited to `record_ids` if given.
+
+        Returns:
+            The number of records released.
+        """
+        query = """
+            UPDATE master_state
+            SET current_status = claimed_from_status, lease_owner = NULL, lease_expires_at = NULL
+            WHERE current_status = ? AND lease_owner = ?
+        """
+        params: list[Any] = [IN_PROGRESS_STATUS, owner]
+        if record_ids is not None:
+            if not record_ids:
+                return 0
+            query += " AND id IN ({})".format(','.join('?' for _ in record_ids))
+            params.extend(record_ids)
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, params).rowcount
+        except sqlite3.Error as e:
+            print(f"Error releasing leases for '{owner}': {e}")
+            return 0
+
+    def reclaim_expired_leases(self) -> int:
+        """
+        Returns every in-progress record whose lease has expired to the status
+        it was claimed from.
+
+        Returns:
+            The number of records reclaimed.
+        """
+        query = """
+            UPDATE master_state
+            SET current_status = claimed_from_status, lease_owner = NULL, lease_expires_at = NULL
+            WHERE current_status = ? AND lease_expires_at < ?
+        """
+        try:
+            with self._get_connection() as conn:
+                reclaimed = conn.execute(query, (IN_PROGRESS_STATUS, time.time())).rowcount
+        except sqlite3.Error as e:
+            print(f"Error reclaiming expired leases: {e}")
+            return 0
+        if reclaimed:
+            print(f"Reclaimed {reclaimed} records with expired leases.")
+        return reclaimed
+
+    def reclaim_leases(self, record_ids: list[str], owner_prefix: str) -> int:
+        """
+        Returns the given in-progress records to the status they were claimed
+        from, whatever their lease expiry, if their owner starts with
+        `owner_prefix`. Used to take back the leases of a worker that is known
+        to have died, e.g. when a workflow holds the lock only one of its runs
+        can hold.
+
+        Returns:
+            The number of records reclaimed.
+        """
+        query = """
+            UPDATE master_state
+            SET current_status = claimed_from_status, lease_owner = NULL, lease_expires_at = NULL
+            WHERE current_status = ? AND substr(lease_owner, 1, ?) = ? AND id IN ({})
+        """
+        reclaimed = 0
+        try:
+            with self._get_connection() as conn:
+                for start in range(0, len(record_ids), 500):
+                    chunk = record_ids[start:start + 500]
+                    params = [IN_PROGRESS_STATUS, len(owner_prefix), owner_prefix, *chunk]
+                    reclaimed += conn.execute(query.format(','.join('?' for _ in chunk)), params).rowcount
+        except sqlite3.Error as e:
+            print(f"Error reclaiming leases of '{owner_prefix}': {e}")
+            return 0
+        return reclaimed
+
+    def acquire_workflow_lock(self, name: str, owner: str, lease_seconds: float | None = None) -> bool:
+        """
+        Takes the named workflow lock for an owner unless another owner holds
+        an unexpired lease on it. Atomic across processes sharing the file.
+
+        Returns:
+            True if the owner now holds the lock.
+        """
+        lease_seconds = lease_seconds or self.lease_seconds
+        now = time.time()
+        query = """
+            INSERT INTO workflow_locks (name, owner, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+            WHERE workflow_locks.expires_at < ? OR workflow_locks.owner = excluded.owner
+        """
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (name, owner, now + lease_seconds, now)).rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Error acquiring workflow lock '{name}': {e}")
+            return False
+
+    def renew_workflow_lock(self, name: str, owner: str, lease_seconds: float | None = None) -> bool:
+        """Extends the owner's lease on the named lock; False if it no longer holds it."""
+        lease_seconds = lease_seconds or self.lease_seconds
+        query = "UPDATE workflow_locks SET expires_at = ? WHERE name = ? AND owner = ?"
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (time.time() + lease_seconds, name, owner)).rowcount == 1
+        except sqlite3.Error as e:
+            print(f"Error renewing workflow lock '{name}': {e}")
+            return False
+
+    def release_workflow_lock(self, name: str, owner: str):
+        """Releases the named lock if the owner holds it."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute("DELETE FROM workflow_locks WHERE name = ? AND owner = ?", (name, owner))
+        except sqlite3.Error as e:
+            print(f"Error releasing workflow lock '{name}': {e}")
+
+    def is_workflow_locked(self, name: str) -> bool:
+        """Returns whether some owner holds an unexpired lease on the named lock."""
+        query = "SELECT 1 FROM workflow_locks WHERE name = ? AND expires_at >= ?"
+        try:
+            with self._get_connection() as conn:
+                return conn.execute(query, (name, time.time())).fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"Error checking workflow lock '{name}': {e}")
+            return False
+
+    def get_story_ids_by_status(self, status: str) -> list[str | None]:
+        """
+        Returns the distinct story IDs among records with a specific status.
+        Records without a story are reported as a single None entry.
+        """
+        query = "SELECT DISTINCT story_id FROM master_state WHERE current_status = ?"
+        try:
+            with self._get_connection() as conn:
+                return [row[0] for row in conn.execute(query, (status,)).fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error querying story IDs with status '{status}': {e}")
+            return []
+
+    def get_records_by_story(self, story_id: str | None, status: str, columns: list[str] | None = None) -> list[dict]:
+        """
+        Retrieves the records of one story that have a specific status.
+        A `story_id` of None selects the records that have no story.
+        """
+        select_list = self._build_select_list(columns)
+        story_clause = "story_id IS NULL" if story_id is None else "story_id = ?"
+        params = [status] if story_id is None else [status, story_id]
+        query = f"SELECT {select_list} FROM master_state WHERE current_status = ? AND {story_clause} ORDER BY id"
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.execute(query, params)
+                names = [description[0] for description in cursor.description]
+                return [dict(zip(names, row)) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error querying records for story '{story_id}': {e}")
+            return []
+
+    def update_status_and_schema(self, record_id: str, new_status: str, schema_name: str, notes: str = "",
+                                 deferred: bool = False, lease_owner: str | None = None):
         """
         Updates the status, assigned event type, and notes for a specific record.
+        The record's lease, if any, is cleared in the same statement.
+
+        With `deferred=True` the update is queued and written in the next batched
+        flush; it is not visible to readers until then. With `lease_owner` the
+        update only applies while that worker still holds the record's lease,
+        so a worker whose lease expired cannot overwrite the new owner's result.
         """
         query = """
             UPDATE master_state
-            SET current_status = ?, assigned_event_type = ?, notes = ?, last_updated = ?
+            SET current_status = ?, assigned_event_type = ?, notes = ?, last_updated = ?,
+                lease_owner = NULL, lease_expires_at = NULL
             WHERE id = ?
         """
+        params: tuple = (new_status, schema_name, notes, datetime.now().isoformat(), record_id)
+        if lease_owner is not None:
+            query += " AND lease_owner = ?"
+            params += (lease_owner,)
+        if deferred:
+            self._enqueue_write(query, params)
+            return
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, (new_status, schema_name, notes, datetime.now().isoformat(), record_id))
+                cursor.execute(query, params)
                 conn.commit()
                 if cursor.rowcount == 0:
-                    print(f"Warning: No record found with ID '{record_id}' to update.")
+                    if lease_owner is not None:
+                        print(f"Warning: Record '{record_id}' is not leased to '{lease_owner}'; update skipped.")
+                    else:
+                        print(f"Warning: No record found with ID '{record_id}' to update.")
         except sqlite3.Error as e:
             print(f"Error updating record '{record_id}': {e}")
 
-    def update_record_after_triage(self, record_id: str, new_status: str, event_type: str, confidence: float, notes: str):
+    def update_record_after_triage(self, record_id: str, new_status: str, event_type: str, confidence: float, notes: str,
+                                   deferred: bool = False, lease_owner: str | None = None):
         """
-        Specifically updates a record after the triage stage.
+        Specifically updates a record after the triage stage. The record's
+        lease, if any, is cleared in the same statement.
+
+        With `deferred=True` the update is queued and written in the next batched
+        flush; it is not visible to readers until then. With `lease_owner` the
+        update only applies while that worker still holds the record's lease.
         """
         query = """
             UPDATE master_state
-            SET current_status = ?, assigned_event_type = ?, triage_confidence = ?, notes = ?, last_updated = ?
+            SET current_status = ?, assigned_event_type = ?, triage_confidence = ?, notes = ?, last_updated = ?,
+                lease_owner = NULL, lease_expires_at = NULL
             WHERE id = ?
         """
+        params: tuple = (new_status, event_type, confidence, notes, datetime.now().isoformat(), record_id)
+        if lease_owner is not None:
+            query += " AND lease_owner = ?"
+            params += (lease_owner,)
+        if deferred:
+            self._enqueue_write(query, params)
+            return
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute(query, (new_status, event_type, confidence, notes, datetime.now().isoformat(), record_id))
+                cursor.execute(query, params)
                 conn.commit()
+                if cursor.rowcount == 0 and lease_owner is not None:
+                    print(f"Warning: Record '{record_id}' is not leased to '{lease_owner}'; triage result skipped.")
         except sqlite3.Error as e:
             print(f"Error updating record '{record_id}' after triage: {e}")
 
@@ -168,6 +903,25 @@ class DatabaseManager:
         except sqlite3.Error as e:
             print(f"Error updating cluster info for record '{record_id}': {e}")
 
+    def mark_clustering_noise(self, record_ids: list[str], cluster_id: int = NOISE_CLUSTER_ID):
+        """
+        Marks records that incremental clustering left unassigned with a noise
+        marker: NOISE_CLUSTER_ID after they were scored, or
+        RECLUSTERED_NOISE_CLUSTER_ID after a re-clustering of the noise pool.
+        They stay pending clustering, so the next re-clustering retries them,
+        but `get_unscored_clustering_count` no longer counts them.
+        """
+        if not record_ids:
+            return
+        query = "UPDATE master_state SET cluster_id = ?, last_updated = ? WHERE id = ? AND current_status = 'pending_clustering'"
+        now = datetime.now().isoformat()
+        try:
+            with self._get_connection() as conn:
+                conn.executemany(query, [(cluster_id, now, record_id) for record_id in record_ids])
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error marking {len(record_ids)} records as clustering noise: {e}")
+
     def update_story_info(self, event_ids: list[str], story_id: str, new_status: str):
         """
         Updates the story ID and status for a batch of events belonging to the same story.
@@ -247,6 +1001,93 @@ class DatabaseManager:
         except sqlite3.Error as e:
             print(f"Error bulk updating status for records: {e}")
 
+    def get_max_cluster_id(self) -> int:
+        """
+        Returns the highest cluster ID in use, in master_state or the incremental
+        clustering state, or -1 if there is none.
+        """
+        query = """
+            SELECT MAX(max_id) FROM (
+                SELECT MAX(cluster_id) AS max_id FROM master_state
+                UNION ALL
+                SELECT MAX(cluster_id) AS max_id FROM cortex_clusters
+            )
+        """
+        try:
+            with self._get_connection() as conn:
+                max_id = conn.execute(query).fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error querying the highest cluster ID: {e}")
+            raise
+        return -1 if max_id is None else max_id
+
+    def load_cluster_state(self) -> tuple[list[dict], list[tuple[str, int, int]]]:
+        """
+        Loads the persisted incremental clustering state.
+
+        Returns:
+            The cluster rows as dicts (cluster_id, story_id, centroid, anchor,
+            event_count, closed), and the entity postings as
+            (entity_name, cluster_id, event_count) tuples.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.execute(
+                    "SELECT cluster_id, story_id, centroid, anchor, event_count, closed FROM cortex_clusters ORDER BY cluster_id"
+                )
+                columns = [description[0] for description in cursor.description]
+                clusters = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                postings = conn.execute(
+                    "SELECT entity_name, cluster_id, event_count FROM cortex_cluster_entities"
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error loading incremental clustering state: {e}")
+            raise
+        return clusters, postings
+
+    def save_cluster_state(self, clusters: list[dict], posting_increments: list[tuple[str, int, int]]):
+        """
+        Upserts cluster rows and adds to the entity posting counts in one transaction.
+
+        Args:
+            clusters: Cluster rows as returned by `load_cluster_state`.
+            posting_increments: (entity_name, cluster_id, added_event_count) tuples.
+        """
+        now = datetime.now().isoformat()
+        try:
+            with self._get_connection() as conn:
+                conn.executemany("""
+                    INSERT INTO cortex_clusters (cluster_id, story_id, centroid, anchor, event_count, closed, last_updated)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (cluster_id) DO UPDATE SET
+                        story_id = excluded.story_id, centroid = excluded.centroid, anchor = excluded.anchor,
+                        event_count = excluded.event_count, closed = excluded.closed, last_updated = excluded.last_updated
+                """, [
+                    (c['cluster_id'], c['story_id'], c['centroid'], c['anchor'], c['event_count'], int(c['closed']), now)
+                    for c in clusters
+                ])
+                conn.executemany("""
+                    INSERT INTO cortex_cluster_entities (entity_name, cluster_id, event_count) VALUES (?, ?, ?)
+                    ON CONFLICT (entity_name, cluster_id) DO UPDATE SET event_count = event_count + excluded.event_count
+                """, posting_increments)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error saving incremental clustering state: {e}")
+            raise
+
+    def link_cluster_story(self, cluster_id: int, story_id: str):
+        """
+        Records the story a cluster was refined into, unless it already has one,
+        so later events attached to the cluster join that story.
+        """
+        query = "UPDATE cortex_clusters SET story_id = ?, last_updated = ? WHERE cluster_id = ? AND story_id IS NULL"
+        try:
+            with self._get_connection() as conn:
+                conn.execute(query, (story_id, datetime.now().isoformat(), cluster_id))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error linking cluster {cluster_id} to story '{story_id}': {e}")
+
 # It can also be useful to have a standalone function for one-off initialization
 def initialize_database(db_path: str | Path):
     """
@@ -285,6 +1126,18 @@ if __name__ == '__main__':
     assert not df_updated.empty
     assert df_updated.iloc[0]['cluster_id'] == 1
 
-    # 5. Clean up
+    # 5. Test keyset pagination
+    page, cursor = db_manager.get_records_page_by_status('pending_refinement', page_size=1)
+    assert page[0]['id'] == 'text01'
+    page, cursor = db_manager.get_records_page_by_status('pending_refinement', page_size=1, after=cursor)
+    assert page == [] and cursor is None
+
+    # 6. Test deferred (batched) writes
+    db_manager.update_status_and_schema("text01", "pending_triage", "", "queued", deferred=True)
+    assert db_manager.flush_pending_writes() == 1
+    assert not db_manager.get_records_by_status_as_df('pending_triage').empty
+
+    # 7. Clean up
+    db_manager.close()
     Path(test_db_path).unlink()
     print("\nDatabaseManager test complete and temp DB removed.")
\ No newline at end of file
@@ -0,0 +1,226 @@
+# src/core/db_migrations.py
+"""
+Versioned schema migrations for the master state SQLite database.
+
+The schema version is tracked in SQLite's `PRAGMA user_version`. On startup,
+`apply_migrations` runs every migration newer than the stored version, in order,
+each inside its own transaction together with the version bump, so a failed
+migration leaves the database at the previous version.
+
+To change the schema, append a new `Migration` to `MIGRATIONS`. Never edit or
+reorder a migration that has already shipped.
+"""
+
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class Migration:
+    """A single schema change, identified by a monotonically increasing version."""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def _get_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Returns the column names of a table."""
+    return [info[1] for info in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _create_master_state(conn: sqlite3.Connection):
+    """v1: The original master_state table."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS master_state (
+            id TEXT PRIMARY KEY,
+            source_text TEXT NOT NULL,
+            current_status TEXT NOT NULL,
+            triage_confidence REAL,
+            assigned_event_type TEXT,
+            notes TEXT,
+            last_updated TIMESTAMP
+        )
+    """)
+
+
+def _add_cortex_columns(conn: sqlite3.Connection):
+    """
+    v2: Columns used by the Cortex and extraction workflows.
+
+    Databases created before migrations existed may already have some of these
+    columns, so each one is only added if missing.
+    """
+    existing = set(_get_columns(conn, "master_state"))
+    for column_name, column_type in [
+        ("involved_entities", "TEXT"),  # For storing entity JSON
+        ("cluster_id", "INTEGER"),
+        ("story_id", "TEXT"),
+        ("structured_data", "TEXT"),  # For storing full extracted event JSON
+    ]:
+        if column_name not in existing:
+            conn.execute(f"ALTER TABLE master_state ADD COLUMN {column_name} {column_type}")
+
+
+def _add_master_state_indexes(conn: sqlite3.Connection):
+    """
+    v3: Indexes for the status-, story- and cluster-based access paths.
+
+    `id` is the last column of the status index so keyset pagination over
+    (last_updated, id) within a status is a single index range scan.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_master_state_status_updated
+        ON master_state (current_status, last_updated, id)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_master_state_story_id ON master_state (story_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_master_state_cluster_id ON master_state (cluster_id)")
+
+
+def _create_event_data(conn: sqlite3.Connection):
+    """
+    v4: The event_data table served to the frontend, plus the index used by
+    the keyset-paginated `/api/events` endpoint.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS event_data (
+            id TEXT PRIMARY KEY,
+            event_type TEXT NOT NULL,
+            trigger TEXT,
+            entities TEXT,
+            summary TEXT,
+            source_id TEXT,
+            processed INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (source_id) REFERENCES master_state (id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_event_data_processed_id ON event_data (processed, id)")
+
+
+def _add_lease_columns(conn: sqlite3.Connection):
+    """
+    v5: Lease bookkeeping for the claim-based work queue (see `work_queue.py`).
+
+    A claimed record sits in the `in_progress` status with the status it was
+    claimed from, the owning worker and a lease expiry (Unix seconds).
+    """
+    existing = set(_get_columns(conn, "master_state"))
+    for column_name, column_type in [
+        ("claimed_from_status", "TEXT"),
+        ("lease_owner", "TEXT"),
+        ("lease_expires_at", "REAL"),
+    ]:
+        if column_name not in existing:
+            conn.execute(f"ALTER TABLE master_state ADD COLUMN {column_name} {column_type}")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_master_state_lease
+        ON master_state (current_status, lease_owner, lease_expires_at)
+    """)
+
+
+def _create_cluster_state(conn: sqlite3.Connection):
+    """
+    v6: Persisted state of the incremental Cortex clustering (see
+    `src/cortex/incremental_clusterer.py`).
+
+    `centroid` is the float32 sum of the member embeddings (unit vectors) and
+    `anchor` the normalized centroid when the cluster was formed, used to detect
+    drift. `cortex_cluster_entities` holds the entity postings of each cluster.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cortex_clusters (
+            cluster_id INTEGER PRIMARY KEY,
+            story_id TEXT,
+            centroid BLOB NOT NULL,
+            anchor BLOB NOT NULL,
+            event_count INTEGER NOT NULL,
+            closed INTEGER NOT NULL DEFAULT 0,
+            last_updated TIMESTAMP
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS cortex_cluster_entities (
+            entity_name TEXT NOT NULL,
+            cluster_id INTEGER NOT NULL,
+            event_count INTEGER NOT NULL,
+            PRIMARY KEY (entity_name, cluster_id)
+        )
+    """)
+
+
+def _add_status_id_index(conn: sqlite3.Connection):
+    """
+    v7: Index for keyset pagination by id within a status, used to stream the
+    unscored events and the noise pool of incremental clustering separately.
+    """
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_master_state_status_id ON master_state (current_status, id)")
+
+
+def _create_workflow_locks(conn: sqlite3.Connection):
+    """
+    v8: Named, lease-based locks that keep a workflow (e.g. Cortex) from running
+    in several processes at once (see `WorkflowLock` in `work_queue.py`).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS workflow_locks (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "create master_state table", _create_master_state),
+    Migration(2, "add cortex workflow columns", _add_cortex_columns),
+    Migration(3, "index master_state by status, story and cluster", _add_master_state_indexes),
+    Migration(4, "create event_data table and index", _create_event_data),
+    Migration(5, "add work queue lease columns", _add_lease_columns),
+    Migration(6, "create incremental clustering state tables", _create_cluster_state),
+    Migration(7, "index master_state by status and id", _add_status_id_index),
+    Migration(8, "create workflow locks table", _create_workflow_locks),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Returns the schema version stored in the database header."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: list[Migration] = MIGRATIONS) -> list[int]:
+    """
+    Applies all pending migrations in version order.
+
+    Args:
+        conn: An open connection to the database to migrate.
+        migrations: The migration list; defaults to `MIGRATIONS`.
+
+    Returns:
+        The versions that were applied, in order.
+
+    Raises:
+        sqlite3.Error: If a migration fails. That migration is rolled back and
+            the remaining ones are not attempted.
+    """
+    applied = []
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= get_schema_version(conn):
+            continue
+        try:
+            # IMMEDIATE takes the write lock up front; re-check the version under
+            # the lock in case another process migrated while we were waiting.
+            conn.execute("BEGIN IMMEDIATE")
+            if migration.version <= get_schema_version(conn):
+                conn.commit()
+                continue
+            migration.apply(conn)
+            conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            conn.commit()
+        except sqlite3.Error as e:
+            conn.rollback()
+            print(f"Migration {migration.version} ({migration.description}) failed: {e}")
+            raise
+        print(f"Applied database migration {migration.version}: {migration.description}.")
+        applied.append(migration.version)
+    return applied
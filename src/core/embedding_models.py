@@ -0,0 +1,202 @@
+# src/core/embedding_models.py
+"""
+Process-wide registry of embedding models and their inference workers.
+
+Every component that embeds text asks `get_embedding_worker(model_name)` for
+the shared worker instead of loading its own SentenceTransformer, so a process
+holds one copy of each model, loaded on first use with the device, thread and
+backend settings from `model_settings` in config.yaml. The ONNX and OpenVINO
+backends of sentence-transformers (optionally with a quantized export selected
+through `model_kwargs`) can replace PyTorch on CPU-only machines.
+
+Each worker owns a single inference thread. `encode` and `encode_async` queue
+a request and wait for it; the thread coalesces requests that arrive within
+`max_batch_wait_ms` of each other into one micro-batch of up to `batch_size`
+texts, so concurrent callers (threads or asyncio tasks) share forward passes
+instead of competing for the CPU.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from src.core.config_loader import get_config
+
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_MAX_BATCH_WAIT_MS = 5.0
+
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _load_model(model_name: str, cache_dir: str | None = None):
+    """Loads a SentenceTransformer with the configured device, threads and backend."""
+    from sentence_transformers import SentenceTransformer
+
+    settings = get_config().get('model_settings', {})
+    num_threads = settings.get('num_threads')
+    if num_threads:
+        import torch
+        torch.set_num_threads(int(num_threads))
+
+    kwargs = {}
+    device = settings.get('device')
+    if device:
+        kwargs['device'] = device
+    backend = settings.get('backend', 'torch')
+    if backend != 'torch':
+        kwargs['backend'] = backend
+    if settings.get('model_kwargs'):
+        kwargs['model_kwargs'] = settings['model_kwargs']
+
+    cache_dir = cache_dir or settings.get('cache_dir')
+    print(f"Loading embedding model '{model_name}' (device={device or 'auto'}, backend={backend}, cache={cache_dir})...")
+    model = SentenceTransformer(model_name, cache_folder=cache_dir, **kwargs)
+    print(f"Embedding model '{model_name}' loaded.")
+    return model
+
+
+def get_embedding_model(model_name: str, cache_dir: str | None = None):
+    """
+    Returns the process-wide SentenceTransformer for `model_name`, loading it
+    on first use. Prefer `get_embedding_worker` for encoding.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            _models[model_name] = _load_model(model_name, cache_dir)
+        return _models[model_name]
+
+
+class EmbeddingInferenceWorker:
+    """A single inference thread that encodes queued requests in micro-batches."""
+
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_batch_wait_ms: float = DEFAULT_MAX_BATCH_WAIT_MS,
+        loader: Callable[[], Any] | None = None,
+    ):
+        """
+        Args:
+            model_name: The embedding model served by this worker.
+            batch_size: Texts per forward pass, and the micro-batch size that
+                stops the worker from waiting for more requests.
+            max_batch_wait_ms: How long the worker waits for further requests
+                to join a micro-batch once one has arrived.
+            loader: Returns the model; defaults to the process-wide registry.
+                The model is loaded by the worker thread on the first request.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_batch_wait = max_batch_wait_ms / 1000.0
+        self._loader = loader or partial(get_embedding_model, model_name)
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "texts": 0, "batches": 0}
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"embedding-worker-{self.model_name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queues texts for encoding and returns a future of their float32 embeddings."""
+        future: Future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._ensure_started()
+        self._queue.put((list(texts), future))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts, blocking until the worker has processed them."""
+        return self.submit(texts).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def _next_batch(self) -> list:
+        """
+        Waits for a request, then collects more until the batch is full or the
+        wait is over. Requests that queued up while the model was busy always join.
+        """
+        batch = [self._queue.get()]
+        count = len(batch[0][0])
+        deadline = time.monotonic() + self.max_batch_wait
+        while count < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            count += len(request[0])
+        # Requests cancelled while queued are dropped.
+        return [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+
+    def _run(self):
+        model = None
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                if model is None:
+                    model = self._loader()
+                vectors = np.asarray(
+                    model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True, show_progress_bar=False),
+                    dtype=np.float32,
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+            with self._lock:
+                self._stats["requests"] += len(batch)
+                self._stats["texts"] += len(texts)
+                self._stats["batches"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Returns request, text and micro-batch counters."""
+        with self._lock:
+            return dict(self._stats)
+
+
+_workers: Dict[str, EmbeddingInferenceWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_embedding_worker(model_name: str, cache_dir: str | None = None) -> EmbeddingInferenceWorker:
+    """
+    Returns the process-wide inference worker for a model. Creating the worker
+    does not load the model; the first request does.
+    """
+    with _workers_lock:
+        if model_name not in _workers:
+            settings = get_config().get('model_settings', {})
+            _workers[model_name] = EmbeddingInferenceWorker(
+                model_name,
+                batch_size=settings.get('batch_size', DEFAULT_BATCH_SIZE),
+                max_batch_wait_ms=settings.get('max_batch_wait_ms', DEFAULT_MAX_BATCH_WAIT_MS),
+                loader=partial(get_embedding_model, model_name, cache_dir),
+            )
+        return _workers[model_name]
@@ -0,0 +1,320 @@
+# src/core/embedding_store.py
+"""
+A persistent, content-addressed store of text embeddings shared by every
+component that encodes text (Cortex vectorizer, StorageAgent, retrievers,
+schema learning, BGEEmbedder).
+
+Each (model name, model version) pair owns one append-only matrix file of
+`dtype` rows, read through a memory map, so a text is embedded once per model
+for the lifetime of the corpus no matter which workflow asks for it. A small
+SQLite index maps the SHA-256 of a text to its row in that matrix. Writers
+allocate rows inside an IMMEDIATE transaction, so several processes can fill
+the same store; rows written by a transaction that did not commit are simply
+overwritten later.
+
+Bump `model_version` in config.yaml when the weights behind a model name
+change, so stale vectors are not reused.
+"""
+
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List
+
+import numpy as np
+
+from src.core.config_loader import get_config
+
+DEFAULT_STORE_PATH = "output/cache/embeddings"
+DEFAULT_DTYPE = "float16"
+DEFAULT_MODEL_VERSION = "1"
+# SQLite limits the number of bound parameters per statement.
+LOOKUP_CHUNK_SIZE = 500
+
+
+def compute_text_hash(text: str) -> str:
+    """Returns the content hash used to key a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Memory-mapped embedding matrix for one model, indexed by text hash in SQLite."""
+
+    def __init__(
+        self,
+        model_name: str,
+        model_version: str = DEFAULT_MODEL_VERSION,
+        path: str | Path = DEFAULT_STORE_PATH,
+        dtype: str = DEFAULT_DTYPE,
+    ):
+        """
+        Initializes the store and creates its index tables if needed.
+
+        Args:
+            model_name: Name of the embedding model; part of the key.
+            model_version: Version of the model weights; part of the key.
+            path: Directory holding the index database and the matrix files.
+            dtype: Storage precision of the vectors, 'float16' or 'float32'.
+                Vectors are always returned as float32.
+        """
+        self.model_name = model_name
+        self.model_version = str(model_version)
+        self.model_key = hashlib.sha256(f"{model_name}\0{self.model_version}".encode("utf-8")).hexdigest()[:16]
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.matrix_path = self.path / f"{self.model_key}.{self.dtype.name}"
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._stats = {"hits": 0, "misses": 0, "writes": 0}
+
+        with self._get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_models (
+                    model_key TEXT PRIMARY KEY,
+                    model_name TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    dtype TEXT NOT NULL,
+                    dimension INTEGER,
+                    row_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embedding_index (
+                    model_key TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    row INTEGER NOT NULL,
+                    PRIMARY KEY (model_key, text_hash)
+                )
+            """)
+            conn.execute(
+                "INSERT OR IGNORE INTO embedding_models (model_key, model_name, model_version, dtype) VALUES (?, ?, ?, ?)",
+                (self.model_key, model_name, self.model_version, self.dtype.name),
+            )
+
+    @classmethod
+    def from_config(cls, model_name: str, store_config: Dict[str, Any]) -> "EmbeddingStore | None":
+        """
+        Creates a store from the `embedding_store` section of config.yaml, or
+        returns None if the store is disabled.
+        """
+        if not store_config.get('enabled', False):
+            return None
+        return cls(
+            model_name,
+            model_version=store_config.get('model_version', DEFAULT_MODEL_VERSION),
+            path=store_config.get('path', DEFAULT_STORE_PATH),
+            dtype=store_config.get('dtype', DEFAULT_DTYPE),
+        )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Returns this thread's persistent connection to the index database."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path / "embedding_index.db", timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _lookup_rows(self, conn: sqlite3.Connection, text_hashes: List[str]) -> Dict[str, int]:
+        """Returns the matrix rows of the hashes that are stored."""
+        rows = {}
+        for start in range(0, len(text_hashes), LOOKUP_CHUNK_SIZE):
+            chunk = text_hashes[start:start + LOOKUP_CHUNK_SIZE]
+            query = "SELECT text_hash, row FROM embedding_index WHERE model_key = ? AND text_hash IN ({})".format(
+                ','.join('?' for _ in chunk)
+            )
+            rows.update(conn.execute(query, [self.model_key, *chunk]).fetchall())
+        return rows
+
+    def _read_rows(self, rows: List[int], dimension: int) -> np.ndarray:
+        """Reads matrix rows as float32, remapping the file if it grew since it was mapped."""
+        with self._lock:
+            needed = max(rows) + 1
+            if self._matrix is None or self._matrix.shape[0] < needed:
+                num_rows = self.matrix_path.stat().st_size // (dimension * self.dtype.itemsize)
+                self._matrix = np.memmap(self.matrix_path, dtype=self.dtype, mode='r', shape=(num_rows, dimension))
+            return np.asarray(self._matrix[rows], dtype=np.float32)
+
+    def get_many(self, texts: List[str]) -> tuple[np.ndarray | None, List[int]]:
+        """
+        Looks up stored embeddings.
+
+        Returns:
+            A float32 array with one row per text (rows of missing texts are
+            zero), or None if nothing is stored yet, and the indices of the
+            texts that are missing.
+        """
+        text_hashes = [compute_text_hash(text) for text in texts]
+        try:
+            conn = self._get_connection()
+            dimension = conn.execute(
+                "SELECT dimension FROM embedding_models WHERE model_key = ?", (self.model_key,)
+            ).fetchone()[0]
+            stored = self._lookup_rows(conn, list(set(text_hashes))) if dimension else {}
+        except sqlite3.Error as e:
+            print(f"Embedding store read failed: {e}")
+            dimension, stored = None, {}
+
+        found = [i for i, text_hash in enumerate(text_hashes) if text_hash in stored]
+        missing = [i for i, text_hash in enumerate(text_hashes) if text_hash not in stored]
+        with self._lock:
+            self._stats["hits"] += len(found)
+            self._stats["misses"] += len(missing)
+        if not found:
+            return None, missing
+        vectors = np.zeros((len(texts), dimension), dtype=np.float32)
+        vectors[found] = self._read_rows([stored[text_hashes[i]] for i in found], dimension)
+        return vectors, missing
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Appends the embeddings of texts that are not stored yet."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not texts:
+            return
+        text_hashes = [compute_text_hash(text) for text in texts]
+        conn = self._get_connection()
+        try:
+            # IMMEDIATE takes the write lock up front, so row allocation is serialized across processes.
+            conn.execute("BEGIN IMMEDIATE")
+            dimension, row_count = conn.execute(
+                "SELECT dimension, row_count FROM embedding_models WHERE model_key = ?", (self.model_key,)
+            ).fetchone()
+            if dimension is None:
+                dimension = vectors.shape[1]
+            elif dimension != vectors.shape[1]:
+                raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match the stored dimension {dimension}.")
+
+            stored = self._lookup_rows(conn, text_hashes)
+            new = {}
+            for text_hash, vector in zip(text_hashes, vectors):
+                if text_hash not in stored and text_hash not in new:
+                    new[text_hash] = vector
+            if new:
+                with open(self.matrix_path, 'ab') as f:
+                    f.truncate(row_count * dimension * self.dtype.itemsize)
+                    f.write(np.stack(list(new.values())).astype(self.dtype).tobytes())
+                conn.executemany(
+                    "INSERT INTO embedding_index (model_key, text_hash, row) VALUES (?, ?, ?)",
+                    [(self.model_key, text_hash, row_count + i) for i, text_hash in enumerate(new)],
+                )
+                conn.execute(
+                    "UPDATE embedding_models SET dimension = ?, row_count = ? WHERE model_key = ?",
+                    (dimension, row_count + len(new), self.model_key),
+                )
+            conn.commit()
+        except (sqlite3.Error, OSError, ValueError) as e:
+            conn.rollback()
+            print(f"Embedding store write failed: {e}")
+            return
+        with self._lock:
+            self._stats["writes"] += len(new)
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], Any]) -> np.ndarray:
+        """
+        Returns float32 embeddings for `texts`, calling `encode_fn` only for the
+        distinct texts that are not stored yet and storing its results.
+        """
+        if not texts:
+            return np.asarray(encode_fn([]), dtype=np.float32)
+        vectors, missing = self.get_many(texts)
+        if not missing:
+            return vectors
+
+        missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = np.asarray(encode_fn(missing_texts), dtype=np.float32)
+        self.put_many(missing_texts, encoded)
+        return self._fill_missing(texts, vectors, missing, missing_texts, encoded)
+
+    async def encode_async(self, texts: List[str], encode_fn: Callable[[List[str]], Awaitable[Any]]) -> np.ndarray:
+        """
+        Async variant of `encode`: `encode_fn` is awaited and the store is read
+        and written on a worker thread, so the event loop is never blocked.
+        """
+        if not texts:
+            return np.asarray(await encode_fn([]), dtype=np.float32)
+        vectors, missing = await asyncio.to_thread(self.get_many, texts)
+        if not missing:
+            return vectors
+
+        missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+        encoded = np.asarray(await encode_fn(missing_texts), dtype=np.float32)
+        await asyncio.to_thread(self.put_many, missing_texts, encoded)
+        return self._fill_missing(texts, vectors, missing, missing_texts, encoded)
+
+    @staticmethod
+    def _fill_missing(texts: List[str], vectors: np.ndarray | None, missing: List[int],
+                      missing_texts: List[str], encoded: np.ndarray) -> np.ndarray:
+        """Copies the freshly encoded rows into the result of `get_many`."""
+        if vectors is None:
+            vectors = np.zeros((len(texts), encoded.shape[1]), dtype=np.float32)
+        position = {text: i for i, text in enumerate(missing_texts)}
+        vectors[missing] = encoded[[position[texts[i]] for i in missing]]
+        return vectors
+
+    def stats(self) -> Dict[str, int]:
+        """Returns hit/miss/write counters of this process."""
+        with self._lock:
+            return dict(self._stats)
+
+
+_stores: Dict[tuple, EmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(model_name: str) -> EmbeddingStore | None:
+    """
+    Returns the process-wide store for a model, created from the
+    `embedding_store` config section on first use, or None if it is disabled.
+    """
+    try:
+        store_config = get_config().get('embedding_store', {})
+    except ValueError:
+        return None  # No configuration loaded, e.g. when used as a library.
+    if not store_config.get('enabled', False):
+        return None
+    key = (model_name, str(store_config.get('model_version', DEFAULT_MODEL_VERSION)), store_config.get('path', DEFAULT_STORE_PATH))
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = EmbeddingStore.from_config(model_name, store_config)
+        return _stores[key]
+
+
+def get_embedding_store_stats() -> Dict[str, Dict[str, int]]:
+    """Returns the counters of every store opened by this process, by model name."""
+    with _stores_lock:
+        stores = list(_stores.values())
+    totals: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "writes": 0})
+    for store in stores:
+        for counter, value in store.stats().items():
+            totals[store.model_name][counter] += value
+    return dict(totals)
+
+
+def encode_texts(texts: List[str], model_name: str, encode_fn: Callable[[List[str]], Any]) -> np.ndarray:
+    """
+    Encodes texts through the embedding store of `model_name` when it is
+    enabled, otherwise calls `encode_fn` directly. Returns a float32 array.
+    """
+    store = get_embedding_store(model_name)
+    if store is None:
+        return np.asarray(encode_fn(texts), dtype=np.float32)
+    return store.encode(texts, encode_fn)
+
+
+async def encode_texts_async(texts: List[str], model_name: str,
+                             encode_fn: Callable[[List[str]], Awaitable[Any]]) -> np.ndarray:
+    """
+    Async variant of `encode_texts` for callers running on an event loop;
+    `encode_fn` is a coroutine function such as `EmbeddingInferenceWorker.encode_async`.
+    """
+    store = get_embedding_store(model_name)
+    if store is None:
+        return np.asarray(await encode_fn(texts), dtype=np.float32)
+    return await store.encode_async(texts, encode_fn)
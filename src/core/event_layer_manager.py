@@ -178,6 +178,9 @@ class EventLayerManager:
                 # 如果存储层支持批量操作
                 batch_results = self.storage.store_events_batch(events)
                 results.update(batch_results)
+                for event in events:
+                    if batch_results.get(event.id):
+                        self._update_event_cache(event.id, event)
             else:
                 # 逐个存储
                 for event in events:
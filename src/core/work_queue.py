@@ -0,0 +1,209 @@
+# src/core/work_queue.py
+"""
+A lease-based work queue on top of the master_state table.
+
+Several workers (in one process, several processes, or several machines that
+share the database file) can pull records of the same status without ever
+processing the same record twice:
+
+    queue = WorkQueue(db_manager, 'pending_triage')
+    async with queue:
+        for batch in queue.iter_batches(50):
+            ...  # process, then set each record's final status through the queue:
+            queue.update_status_and_schema(record_id, 'pending_review', '', 'done', deferred=True)
+
+Claimed records are moved to the `in_progress` status with an owner and a lease
+expiry. While the queue is entered, a background heartbeat keeps the leases
+alive. Leases that are not renewed (e.g. the worker crashed) expire and the
+records are returned to their original status by the next claim from any
+worker. On exit, records that are still in progress are released immediately.
+
+Final-status updates made through the queue are fenced by the lease owner: a
+worker whose lease has expired (and whose record may have been claimed by
+someone else) cannot overwrite the record.
+"""
+
+import asyncio
+import os
+import socket
+import threading
+import uuid
+from typing import Iterator
+
+from src.core.database_manager import DatabaseManager
+
+
+# Name of the lock held by a running Cortex workflow.
+CORTEX_WORKFLOW_LOCK = "cortex"
+
+
+def default_worker_id() -> str:
+    """Returns an identifier that is unique across hosts and processes."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class WorkQueue:
+    """Claims records of one status for a single worker using renewable leases."""
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        status: str,
+        owner: str | None = None,
+        lease_seconds: float | None = None,
+        heartbeat_interval: float | None = None,
+    ):
+        """
+        Initializes the WorkQueue.
+
+        Args:
+            db_manager: The DatabaseManager to claim through.
+            status: The status to take work from, e.g. 'pending_triage'.
+            owner: Worker identifier; a host/pid-based one is generated if omitted.
+            lease_seconds: Lease duration; defaults to the manager's `lease_seconds`.
+            heartbeat_interval: Seconds between lease renewals; defaults to a
+                third of the lease duration.
+        """
+        self.db_manager = db_manager
+        self.status = status
+        self.owner = owner or default_worker_id()
+        self.lease_seconds = lease_seconds or db_manager.lease_seconds
+        self.heartbeat_interval = heartbeat_interval or self.lease_seconds / 3
+        self._heartbeat_task: asyncio.Task | None = None
+
+    def claim(self, limit: int, columns: list[str] | None = None) -> list[dict]:
+        """Claims up to `limit` records; returns an empty list when none are left."""
+        return self.db_manager.claim_records(
+            self.status, limit, self.owner, lease_seconds=self.lease_seconds, columns=columns
+        )
+
+    def iter_batches(self, batch_size: int | None = None, columns: list[str] | None = None) -> Iterator[list[dict]]:
+        """Yields claimed batches until no record with the queue's status is left."""
+        batch_size = batch_size or self.db_manager.read_batch_size
+        while True:
+            batch = self.claim(batch_size, columns=columns)
+            if not batch:
+                return
+            yield batch
+
+    def update_status_and_schema(self, record_id: str, new_status: str, schema_name: str, notes: str = "",
+                                 deferred: bool = False):
+        """Sets a claimed record's final status, provided this worker still holds its lease."""
+        self.db_manager.update_status_and_schema(
+            record_id, new_status, schema_name, notes, deferred=deferred, lease_owner=self.owner
+        )
+
+    def update_record_after_triage(self, record_id: str, new_status: str, event_type: str, confidence: float,
+                                   notes: str, deferred: bool = False):
+        """Stores a claimed record's triage result, provided this worker still holds its lease."""
+        self.db_manager.update_record_after_triage(
+            record_id, new_status, event_type, confidence, notes, deferred=deferred, lease_owner=self.owner
+        )
+
+    def heartbeat(self) -> int:
+        """Renews the leases on all records this worker still has in progress."""
+        return self.db_manager.renew_leases(self.owner, lease_seconds=self.lease_seconds)
+
+    def release(self, record_ids: list[str] | None = None) -> int:
+        """Returns unfinished records to the queue's status for other workers."""
+        return self.db_manager.release_leases(self.owner, record_ids)
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self.heartbeat()
+
+    async def __aenter__(self) -> "WorkQueue":
+        self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        # Deferred final-status writes must land before anything still in progress is released.
+        self.db_manager.flush_pending_writes()
+        released = self.release()
+        if released:
+            print(f"Released {released} unfinished records back to '{self.status}'.")
+
+
+class WorkflowLock:
+    """
+    Keeps a workflow from running in several processes at once through a named,
+    lease-based lock in the database:
+
+        with WorkflowLock(db_manager, CORTEX_WORKFLOW_LOCK) as lock:
+            if not lock.acquired:
+                return  # another process is running the workflow
+            ...
+
+    While the lock is held, a background thread renews the lease, so a
+    long-running workflow keeps it; if the process dies, the lease expires and
+    the next run takes the lock over.
+    """
+
+    def __init__(
+        self,
+        db_manager: DatabaseManager,
+        name: str,
+        owner: str | None = None,
+        lease_seconds: float | None = None,
+        heartbeat_interval: float | None = None,
+    ):
+        """
+        Initializes the WorkflowLock.
+
+        Args:
+            db_manager: The DatabaseManager holding the lock table.
+            name: The lock name, e.g. CORTEX_WORKFLOW_LOCK.
+            owner: Holder identifier; a host/pid-based one is generated if omitted.
+            lease_seconds: Lease duration; defaults to the manager's `lease_seconds`.
+            heartbeat_interval: Seconds between lease renewals; defaults to a
+                third of the lease duration.
+        """
+        self.db_manager = db_manager
+        self.name = name
+        self.owner = owner or default_worker_id()
+        self.lease_seconds = lease_seconds or db_manager.lease_seconds
+        self.heartbeat_interval = heartbeat_interval or self.lease_seconds / 3
+        self.acquired = False
+        self._stop = threading.Event()
+        self._heartbeat_thread: threading.Thread | None = None
+
+    def acquire(self) -> bool:
+        """Takes the lock and starts renewing it; returns False if another owner holds it."""
+        self.acquired = self.db_manager.acquire_workflow_lock(self.name, self.owner, self.lease_seconds)
+        if self.acquired:
+            self._stop.clear()
+            self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self._heartbeat_thread.start()
+        return self.acquired
+
+    def release(self):
+        """Stops renewing the lease and releases the lock."""
+        if not self.acquired:
+            return
+        self._stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        self.db_manager.release_workflow_lock(self.name, self.owner)
+        self.acquired = False
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            if not self.db_manager.renew_workflow_lock(self.name, self.owner, self.lease_seconds):
+                print(f"Lost workflow lock '{self.name}'.")
+                return
+
+    def __enter__(self) -> "WorkflowLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
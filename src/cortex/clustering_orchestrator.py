@@ -1,12 +1,34 @@
 # src/cortex/clustering_orchestrator.py
 
 import numpy as np
-from sklearn.cluster import DBSCAN
-from sklearn.metrics.pairwise import pairwise_distances
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sklearn.cluster import DBSCAN, HDBSCAN
+from sklearn.preprocessing import normalize
 from .vectorization_service import VectorizationService
 from src.core.config_loader import get_config
 import json
 
+# Rows of the distance matrix computed per block; bounds the temporary memory
+# to a few (block_size x n) float32 arrays.
+DEFAULT_DISTANCE_BLOCK_SIZE = 1024
+
+# Candidate pairs whose exact distance is computed at once by the sparse backend;
+# bounds the two gathered (chunk x dim) float32 embedding arrays.
+DEFAULT_PAIR_CHUNK_SIZE = 16384
+
+# Largest possible combined cosine/Jaccard distance; HDBSCAN treats pairs missing
+# from the sparse graph as this far apart.
+MAX_COMBINED_DISTANCE = 2.0
+
+# Memory for the (rows x n) float32 similarity matrix of the exact nearest-neighbor
+# search the sparse backend falls back to without hnswlib.
+DEFAULT_EXACT_SEARCH_MEMORY_MB = 256
+
+# HNSW index parameters used when hnswlib is available.
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+
 class ClusteringOrchestrator:
     """
     Orchestrates the "coarse clustering" process.
@@ -25,13 +47,23 @@ class ClusteringOrchestrator:
         self.dbscan_eps = clustering_config.get('dbscan_eps', 0.5)
         self.dbscan_min_samples = clustering_config.get('dbscan_min_samples', 2)
         self.entity_weight = clustering_config.get('entity_weight', 0.3)
-        print("ClusteringOrchestrator initialized with DBSCAN and entity weighting parameters.")
+        self.distance_block_size = clustering_config.get('distance_block_size', DEFAULT_DISTANCE_BLOCK_SIZE)
+        # "dense" builds the full n x n distance matrix; "sparse" only keeps candidate pairs.
+        self.backend = clustering_config.get('backend', 'dense')
+        sparse_config = clustering_config.get('sparse', {})
+        self.sparse_algorithm = sparse_config.get('algorithm', 'dbscan')
+        self.n_neighbors = sparse_config.get('n_neighbors', 32)
+        self.max_posting_size = sparse_config.get('max_posting_size', 1000)
+        self.hdbscan_min_cluster_size = sparse_config.get('hdbscan_min_cluster_size', 5)
+        self.exact_search_memory_mb = sparse_config.get('exact_search_memory_mb', DEFAULT_EXACT_SEARCH_MEMORY_MB)
+        if self.backend not in ('dense', 'sparse'):
+            raise ValueError(f"Unknown clustering backend '{self.backend}', expected 'dense' or 'sparse'.")
+        if self.sparse_algorithm not in ('dbscan', 'hdbscan'):
+            raise ValueError(f"Unknown sparse clustering algorithm '{self.sparse_algorithm}', expected 'dbscan' or 'hdbscan'.")
+        print(f"ClusteringOrchestrator initialized with the {self.backend} backend and entity weighting parameters.")
 
-    def _calculate_jaccard_distance(self, events: list[dict], stats: dict) -> np.ndarray:
-        """Calculates the Jaccard distance matrix based on shared entities."""
-        num_events = len(events)
-        jaccard_dist_matrix = np.zeros((num_events, num_events))
-        
+    def _parse_entity_sets(self, events: list[dict], stats: dict) -> list[set]:
+        """Parses each event's involved_entities into a set of entity names."""
         entity_sets = []
         for event in events:
             try:
@@ -52,30 +84,217 @@ class ClusteringOrchestrator:
                 # All entity parsing errors are caught here
                 stats['entity_parsing_warnings'] += 1
                 entity_sets.append(set())
+        return entity_sets
 
+    def _build_entity_incidence(self, entity_sets: list[set]) -> sparse.csr_matrix:
+        """
+        Builds the sparse (events x entities) 0/1 incidence matrix. The product of
+        two rows counts the entities the two events share.
+        """
+        vocabulary = {}
+        indices, indptr = [], [0]
+        for entity_names in entity_sets:
+            indices.extend(vocabulary.setdefault(name, len(vocabulary)) for name in entity_names)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        return sparse.csr_matrix(
+            (data, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(entity_sets), max(len(vocabulary), 1))
+        )
 
-        for i in range(num_events):
-            for j in range(i, num_events):
-                if i == j:
-                    jaccard_dist_matrix[i, j] = 0.0
-                    continue
-                
-                set1 = entity_sets[i]
-                set2 = entity_sets[j]
-                
-                intersection = len(set1.intersection(set2))
-                union = len(set1.union(set2))
-                
-                if union == 0:
-                    jaccard_similarity = 0.0
-                else:
-                    jaccard_similarity = intersection / union
-                
-                distance = 1.0 - jaccard_similarity
-                jaccard_dist_matrix[i, j] = distance
-                jaccard_dist_matrix[j, i] = distance
-                
-        return jaccard_dist_matrix
+    def _jaccard_distance_block(self, incidence: sparse.csr_matrix, set_sizes: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """
+        Jaccard distances between events [start, stop) and all events, as float32.
+        Intersections come from a sparse matrix product; |A u B| = |A| + |B| - |A n B|.
+        Two events without entities are at distance 1, as before.
+        """
+        intersection = (incidence[start:stop] @ incidence.T).toarray().astype(np.float32, copy=False)
+        union = set_sizes[start:stop, None] + set_sizes[None, :] - intersection
+        similarity = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+        return 1.0 - similarity
+
+    def _calculate_combined_distance(self, vectors: np.ndarray, events: list[dict], stats: dict) -> np.ndarray:
+        """
+        Calculates (1 - entity_weight) * cosine + entity_weight * Jaccard distance
+        directly into a single float32 matrix, one block of rows at a time, so
+        no full-size float64 intermediate matrices are allocated.
+        """
+        num_events = len(events)
+        unit_vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        incidence = self._build_entity_incidence(self._parse_entity_sets(events, stats))
+        set_sizes = np.asarray(incidence.sum(axis=1), dtype=np.float32).ravel()
+
+        combined_dist_matrix = np.empty((num_events, num_events), dtype=np.float32)
+        for start in range(0, num_events, self.distance_block_size):
+            stop = min(start + self.distance_block_size, num_events)
+            cosine_block = 1.0 - unit_vectors[start:stop] @ unit_vectors.T
+            np.clip(cosine_block, 0.0, 2.0, out=cosine_block)
+            jaccard_block = self._jaccard_distance_block(incidence, set_sizes, start, stop)
+            combined_dist_matrix[start:stop] = (1 - self.entity_weight) * cosine_block + self.entity_weight * jaccard_block
+        np.fill_diagonal(combined_dist_matrix, 0.0)
+        return combined_dist_matrix
+
+    def _pair_distances(self, unit_vectors: np.ndarray, incidence: sparse.csr_matrix, set_sizes: np.ndarray,
+                        rows: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Combined cosine/Jaccard distance of the given event pairs only, as float32."""
+        distances = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), DEFAULT_PAIR_CHUNK_SIZE):
+            r = rows[start:start + DEFAULT_PAIR_CHUNK_SIZE]
+            c = cols[start:start + DEFAULT_PAIR_CHUNK_SIZE]
+            cosine = 1.0 - np.einsum('ij,ij->i', unit_vectors[r], unit_vectors[c])
+            np.clip(cosine, 0.0, 2.0, out=cosine)
+            intersection = np.asarray(incidence[r].multiply(incidence[c]).sum(axis=1), dtype=np.float32).ravel()
+            union = set_sizes[r] + set_sizes[c] - intersection
+            similarity = np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+            distances[start:start + len(r)] = (1 - self.entity_weight) * cosine + self.entity_weight * (1.0 - similarity)
+        return distances
+
+    def _build_ann_index(self, unit_vectors: np.ndarray):
+        """
+        Builds an HNSW inner-product index over the unit vectors, or returns None
+        when hnswlib is not installed (the exact blocked search is used instead).
+        """
+        try:
+            import hnswlib
+        except ImportError:
+            print("hnswlib not installed, falling back to exact nearest-neighbor search.")
+            return None
+        index = hnswlib.Index(space='ip', dim=unit_vectors.shape[1])
+        index.init_index(max_elements=len(unit_vectors), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+        index.add_items(unit_vectors, np.arange(len(unit_vectors)))
+        index.set_ef(max(2 * self.n_neighbors, 64))
+        return index
+
+    def _semantic_neighbors(self, unit_vectors: np.ndarray, index, start: int, stop: int) -> np.ndarray:
+        """Indices of the (approximate) nearest neighbors of events [start, stop) by cosine similarity."""
+        k = min(self.n_neighbors + 1, len(unit_vectors))  # +1: an event is its own nearest neighbor
+        if index is not None:
+            labels, _ = index.knn_query(unit_vectors[start:stop], k=k)
+            return labels.astype(np.int64)
+        if k == len(unit_vectors):
+            return np.broadcast_to(np.arange(k), (stop - start, k))
+        # The exact search is done in row chunks sized to the memory budget rather
+        # than distance_block_size, since each row holds n similarities.
+        chunk_rows = max(1, int(self.exact_search_memory_mb * 2**20) // (4 * len(unit_vectors)))
+        neighbors = np.empty((stop - start, k), dtype=np.int64)
+        for chunk_start in range(start, stop, chunk_rows):
+            chunk_stop = min(chunk_start + chunk_rows, stop)
+            similarity = unit_vectors[chunk_start:chunk_stop] @ unit_vectors.T
+            neighbors[chunk_start - start:chunk_stop - start] = np.argpartition(similarity, -k, axis=1)[:, -k:]
+        return neighbors
+
+    def _calculate_sparse_distance_graph(self, vectors: np.ndarray, events: list[dict], stats: dict) -> sparse.csr_matrix:
+        """
+        Builds a sparse, symmetric graph of combined distances between candidate pairs:
+        each event's n_neighbors nearest neighbors by embedding, plus every event sharing
+        an entity with it. Entities shared by more than max_posting_size events (e.g. a
+        country) are too generic to pair events up on and only count towards the Jaccard
+        distance. For DBSCAN only edges within eps are kept; missing edges are treated
+        as infinitely far apart.
+        """
+        num_events = len(events)
+        unit_vectors = normalize(np.asarray(vectors, dtype=np.float32))
+        incidence = self._build_entity_incidence(self._parse_entity_sets(events, stats))
+        set_sizes = np.asarray(incidence.sum(axis=1), dtype=np.float32).ravel()
+        posting_sizes = incidence.getnnz(axis=0)
+        postings = incidence[:, posting_sizes <= self.max_posting_size]
+        postings_t = postings.T.tocsr()
+        index = self._build_ann_index(unit_vectors)
+        max_distance = self.dbscan_eps if self.sparse_algorithm == 'dbscan' else np.inf
+
+        keys, distances = [], []
+        for start in range(0, num_events, self.distance_block_size):
+            stop = min(start + self.distance_block_size, num_events)
+            neighbors = self._semantic_neighbors(unit_vectors, index, start, stop)
+            semantic_rows = np.repeat(np.arange(start, stop), neighbors.shape[1])
+            semantic_cols = neighbors.ravel()
+            shared = (postings[start:stop] @ postings_t).tocoo()
+            shared_rows = shared.row.astype(np.int64) + start
+            upper = shared_rows < shared.col  # the pair is also found from the other event's block
+            rows = np.concatenate([semantic_rows, shared_rows[upper]])
+            cols = np.concatenate([semantic_cols, shared.col[upper].astype(np.int64)])
+            block_keys = np.unique(np.minimum(rows, cols) * num_events + np.maximum(rows, cols))
+            block_rows, block_cols = np.divmod(block_keys, num_events)
+            off_diagonal = block_rows != block_cols
+            block_keys, block_rows, block_cols = block_keys[off_diagonal], block_rows[off_diagonal], block_cols[off_diagonal]
+            stats['candidate_pairs'] += len(block_keys)
+
+            block_distances = self._pair_distances(unit_vectors, incidence, set_sizes, block_rows, block_cols)
+            within = block_distances <= max_distance
+            keys.append(block_keys[within])
+            distances.append(block_distances[within])
+
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        distances = np.concatenate(distances) if distances else np.empty(0, dtype=np.float32)
+        keys, first = np.unique(keys, return_index=True)
+        distances = distances[first]
+        rows, cols = np.divmod(keys, num_events)
+        stats['graph_edges'] = len(keys)
+        # Explicitly stored zero distances (duplicate events) are kept as edges.
+        return sparse.csr_matrix(
+            (np.concatenate([distances, distances]), (np.concatenate([rows, cols]), np.concatenate([cols, rows]))),
+            shape=(num_events, num_events)
+        )
+
+    def _connect_components(self, graph: sparse.csr_matrix, stats: dict) -> sparse.csr_matrix:
+        """
+        Chains the connected components of the graph together with edges at the largest
+        combined distance, since HDBSCAN rejects a disconnected sparse graph. The bridges
+        are no closer than the missing pairs they stand in for, so they only join the
+        components at the root of the cluster hierarchy.
+        """
+        num_components, component_labels = connected_components(graph, directed=False)
+        stats['graph_components'] = num_components
+        if num_components <= 1:
+            return graph
+        _, representatives = np.unique(component_labels, return_index=True)
+        coo = graph.tocoo()
+        bridge_rows, bridge_cols = representatives[:-1], representatives[1:]
+        bridge_distances = np.full(2 * len(bridge_rows), MAX_COMBINED_DISTANCE, dtype=coo.data.dtype)
+        return sparse.csr_matrix(
+            (np.concatenate([coo.data, bridge_distances]),
+             (np.concatenate([coo.row, bridge_rows, bridge_cols]), np.concatenate([coo.col, bridge_cols, bridge_rows]))),
+            shape=graph.shape
+        )
+
+    def _cluster_sparse(self, vectors: np.ndarray, events: list[dict], stats: dict) -> np.ndarray:
+        """Clusters on the sparse candidate graph with DBSCAN or HDBSCAN and returns the labels."""
+        stats['candidate_pairs'] = 0
+        print(f"Building sparse distance graph with n_neighbors={self.n_neighbors} and entity_weight={self.entity_weight}...")
+        graph = self._calculate_sparse_distance_graph(vectors, events, stats)
+        print(f"Sparse graph has {stats['graph_edges']} edges out of {stats['candidate_pairs']} candidate pairs.")
+
+        if self.sparse_algorithm == 'hdbscan':
+            print(f"Applying HDBSCAN with min_cluster_size={self.hdbscan_min_cluster_size} and min_samples={self.dbscan_min_samples}...")
+            graph = self._connect_components(graph, stats)
+            # Pairs that are not in the graph get the largest possible combined distance.
+            clusterer = HDBSCAN(min_cluster_size=self.hdbscan_min_cluster_size, min_samples=self.dbscan_min_samples,
+                                metric='precomputed', metric_params={'max_distance': MAX_COMBINED_DISTANCE}, copy=False)
+        else:
+            print(f"Applying DBSCAN with eps={self.dbscan_eps} and min_samples={self.dbscan_min_samples}...")
+            clusterer = DBSCAN(eps=self.dbscan_eps, min_samples=self.dbscan_min_samples, metric='precomputed')
+        clusterer.fit(graph)
+        return clusterer.labels_
+
+    def cluster_vectors(self, vectors: np.ndarray, events: list[dict], stats: dict) -> np.ndarray:
+        """
+        Clusters events whose embeddings are already known and returns one label
+        per event (-1 for noise). `stats` must contain the entity parsing counters.
+        """
+        if self.backend == 'sparse':
+            # Combined distances of candidate pairs only, clustered as a sparse graph.
+            return self._cluster_sparse(vectors, events, stats)
+
+        # Cosine distance of the text vectors combined with the Jaccard distance of the
+        # shared entities, computed block by block into one float32 matrix.
+        print(f"Calculating combined cosine/Jaccard distance matrix with entity_weight={self.entity_weight}...")
+        combined_dist_matrix = self._calculate_combined_distance(vectors, events, stats)
+
+        # Apply DBSCAN on the precomputed combined distance matrix
+        print(f"Applying DBSCAN with eps={self.dbscan_eps} and min_samples={self.dbscan_min_samples}...")
+        dbscan = DBSCAN(eps=self.dbscan_eps, min_samples=self.dbscan_min_samples, metric='precomputed')
+        dbscan.fit(combined_dist_matrix)
+        return dbscan.labels_
 
     def cluster_events(self, events: list[dict]) -> tuple[dict, dict]:
         """
@@ -100,23 +319,8 @@ class ClusteringOrchestrator:
         vectors = self.vectorizer.get_embeddings(texts_to_embed)
         vectors_np = np.array(vectors)
 
-        # 2. Calculate cosine distance matrix from text vectors
-        print("Calculating cosine distance matrix...")
-        cosine_dist_matrix = pairwise_distances(vectors_np, metric='cosine')
-
-        # 3. Calculate Jaccard distance matrix from entities
-        print("Calculating Jaccard distance matrix from entities...")
-        jaccard_dist_matrix = self._calculate_jaccard_distance(events, stats)
-
-        # 4. Combine distances with weighting
-        print(f"Combining distance matrices with entity_weight={self.entity_weight}...")
-        combined_dist_matrix = (1 - self.entity_weight) * cosine_dist_matrix + self.entity_weight * jaccard_dist_matrix
-
-        # 5. Apply DBSCAN on the precomputed combined distance matrix
-        print(f"Applying DBSCAN with eps={self.dbscan_eps} and min_samples={self.dbscan_min_samples}...")
-        dbscan = DBSCAN(eps=self.dbscan_eps, min_samples=self.dbscan_min_samples, metric='precomputed')
-        dbscan.fit(combined_dist_matrix)
-        labels = dbscan.labels_
+        # 2-5. Combined cosine/Jaccard distances, clustered with DBSCAN (or HDBSCAN)
+        labels = self.cluster_vectors(vectors_np, events, stats)
 
         # 6. Map cluster labels back to event IDs and update stats
         cluster_assignments = {event.get('id'): int(labels[i]) for i, event in enumerate(events) if event.get('id')}
@@ -0,0 +1,274 @@
+# src/cortex/incremental_clusterer.py
+
+from collections import Counter
+from typing import Callable
+import numpy as np
+from sklearn.preprocessing import normalize
+from .clustering_orchestrator import ClusteringOrchestrator
+from .vectorization_service import VectorizationService
+from src.core.config_loader import get_config
+from src.core.database_manager import DatabaseManager, NOISE_CLUSTER_ID, RECLUSTERED_NOISE_CLUSTER_ID
+
+class IncrementalClusterer:
+    """
+    Online variant of the Cortex "coarse clustering".
+
+    Each cluster is persisted as the sum of its members' normalized embeddings
+    (its centroid) plus entity postings (entity name -> clusters mentioning it).
+    A new event is compared only with the clusters sharing one of its entities
+    and the `n_probe` nearest centroids, and attached to the closest one within
+    `attach_eps`, so the cost per event does not grow with the backlog.
+
+    Events that fit no cluster join the "noise" pool, which stays pending
+    clustering but is not scored again by later runs. The pool is re-clustered
+    with the ClusteringOrchestrator once `recluster_min_events` events have
+    joined it since its last re-clustering, or when a cluster has drifted: a
+    cluster whose centroid moved more than `drift_threshold` (cosine distance)
+    from where it started is closed to new events, and its would-be members are
+    re-clustered.
+    """
+
+    def __init__(self, vectorization_service: VectorizationService, db_manager: DatabaseManager,
+                 orchestrator: ClusteringOrchestrator | None = None):
+        """
+        Initializes the IncrementalClusterer and loads the persisted cluster state.
+        """
+        self.vectorizer = vectorization_service
+        self.db_manager = db_manager
+        self.orchestrator = orchestrator or ClusteringOrchestrator(vectorization_service)
+        config = get_config()
+        cortex_config = config.get('cortex', {})
+        incremental_config = cortex_config.get('incremental', {})
+        self.attach_eps = incremental_config.get('attach_eps', self.orchestrator.dbscan_eps)
+        self.n_probe = incremental_config.get('n_probe', 8)
+        self.drift_threshold = incremental_config.get('drift_threshold', 0.15)
+        self.recluster_min_events = incremental_config.get(
+            'recluster_min_events', cortex_config.get('trigger_threshold', 100)
+        )
+        self.entity_weight = self.orchestrator.entity_weight
+        self.max_posting_size = self.orchestrator.max_posting_size
+        self._load_state()
+        print(f"IncrementalClusterer initialized with {len(self.cluster_ids)} persisted clusters.")
+
+    def _load_state(self):
+        """Loads centroids and postings from the database into memory."""
+        clusters, postings = self.db_manager.load_cluster_state()
+        self.cluster_ids = [c['cluster_id'] for c in clusters]
+        self.story_ids = [c['story_id'] for c in clusters]
+        self._rows = {cluster_id: row for row, cluster_id in enumerate(self.cluster_ids)}
+        if clusters:
+            self._sums = np.stack([np.frombuffer(c['centroid'], dtype=np.float32) for c in clusters])
+            self._anchors = np.stack([np.frombuffer(c['anchor'], dtype=np.float32) for c in clusters])
+        else:
+            self._sums = self._anchors = None
+        self._units = None if self._sums is None else normalize(self._sums)
+        self._counts = np.array([c['event_count'] for c in clusters], dtype=np.int64)
+        self._closed = np.array([bool(c['closed']) for c in clusters], dtype=bool)
+        # entity name -> {cluster row: member count}, and the reverse per cluster row
+        self._postings: dict[str, dict[int, int]] = {}
+        self._cluster_entities: list[set] = [set() for _ in clusters]
+        for entity_name, cluster_id, event_count in postings:
+            row = self._rows.get(cluster_id)
+            if row is not None:
+                self._postings.setdefault(entity_name, {})[row] = event_count
+                self._cluster_entities[row].add(entity_name)
+        self._next_cluster_id = self.db_manager.get_max_cluster_id() + 1
+        self._dirty_rows: set[int] = set()
+        self._posting_increments: Counter = Counter()
+
+    def _save_state(self):
+        """Writes the clusters and postings changed since the last save."""
+        if not self._dirty_rows and not self._posting_increments:
+            return
+        clusters = [
+            {
+                'cluster_id': self.cluster_ids[row], 'story_id': self.story_ids[row],
+                'centroid': self._sums[row].tobytes(), 'anchor': self._anchors[row].tobytes(),
+                'event_count': int(self._counts[row]), 'closed': bool(self._closed[row]),
+            }
+            for row in sorted(self._dirty_rows)
+        ]
+        posting_increments = [
+            (entity_name, self.cluster_ids[row], count) for (entity_name, row), count in self._posting_increments.items()
+        ]
+        self.db_manager.save_cluster_state(clusters, posting_increments)
+        self._dirty_rows.clear()
+        self._posting_increments.clear()
+
+    def story_of(self, cluster_id: int) -> str | None:
+        """Returns the story a persisted cluster was refined into, if any."""
+        row = self._rows.get(cluster_id)
+        return None if row is None else self.story_ids[row]
+
+    def link_story(self, cluster_id: int, story_id: str):
+        """Records the story a cluster was refined into. The first story of a cluster wins."""
+        row = self._rows.get(cluster_id)
+        if row is None or self.story_ids[row] is not None:
+            return
+        self.story_ids[row] = story_id
+        self.db_manager.link_cluster_story(cluster_id, story_id)
+
+    def _candidate_rows(self, similarity: np.ndarray, entity_names: set) -> set[int]:
+        """Clusters sharing a (non-generic) entity with the event, plus the n_probe nearest centroids."""
+        candidates = set()
+        for name in entity_names:
+            posting = self._postings.get(name, {})
+            if len(posting) <= self.max_posting_size:
+                candidates.update(posting)
+        n_probe = min(self.n_probe, len(similarity))
+        if n_probe:
+            candidates.update(np.argpartition(similarity, -n_probe)[-n_probe:].tolist())
+        return candidates
+
+    def _attach(self, vector: np.ndarray, entity_names: set) -> int | None:
+        """
+        Attaches an event to the closest open cluster within attach_eps and returns
+        the cluster row, or None. The distance mirrors the batch one: cosine distance
+        to the centroid combined with the share of the event's entities the cluster
+        does not mention.
+        """
+        if self._units is None:
+            return None
+        similarity = self._units @ vector
+        best_row, best_distance = None, np.inf
+        for row in self._candidate_rows(similarity, entity_names):
+            if self._closed[row]:
+                continue
+            cosine = min(max(1.0 - float(similarity[row]), 0.0), 2.0)
+            overlap = len(entity_names & self._cluster_entities[row]) / len(entity_names) if entity_names else 0.0
+            distance = (1 - self.entity_weight) * cosine + self.entity_weight * (1.0 - overlap)
+            if distance < best_distance:
+                best_row, best_distance = row, distance
+        if best_distance > self.attach_eps:
+            return None
+        self._add_members(best_row, vector[None, :], [entity_names])
+        return best_row
+
+    def _add_members(self, row: int, vectors: np.ndarray, entity_sets: list[set]):
+        """Adds member embeddings and entities to a cluster row."""
+        self._sums[row] += vectors.sum(axis=0)
+        self._units[row] = normalize(self._sums[row][None, :])[0]
+        self._counts[row] += len(vectors)
+        for entity_names in entity_sets:
+            for name in entity_names:
+                posting = self._postings.setdefault(name, {})
+                posting[row] = posting.get(row, 0) + 1
+                self._posting_increments[(name, row)] += 1
+            self._cluster_entities[row].update(entity_names)
+        self._dirty_rows.add(row)
+
+    def _create_clusters(self, groups: list[tuple[np.ndarray, list[set]]]) -> list[int]:
+        """Adds the clusters formed by re-clustering, given as (member vectors, member entity sets), and returns their rows."""
+        first_row = len(self.cluster_ids)
+        totals = np.stack([vectors.sum(axis=0) for vectors, _ in groups])
+        if self._sums is None:
+            self._sums = np.zeros((0, totals.shape[1]), dtype=np.float32)
+            self._anchors = self._units = self._sums
+        self._sums = np.vstack([self._sums, np.zeros_like(totals)])
+        self._units = np.vstack([self._units, np.zeros_like(totals)])
+        self._anchors = np.vstack([self._anchors, normalize(totals)])
+        self._counts = np.concatenate([self._counts, np.zeros(len(groups), dtype=np.int64)])
+        self._closed = np.concatenate([self._closed, np.zeros(len(groups), dtype=bool)])
+        rows = list(range(first_row, first_row + len(groups)))
+        for row, (vectors, entity_sets) in zip(rows, groups):
+            self.cluster_ids.append(self._next_cluster_id)
+            self.story_ids.append(None)
+            self._cluster_entities.append(set())
+            self._rows[self._next_cluster_id] = row
+            self._next_cluster_id += 1
+            self._add_members(row, vectors, entity_sets)
+        return rows
+
+    def _has_drifted(self, row: int) -> bool:
+        """True if the cluster's centroid moved more than drift_threshold from its anchor."""
+        return 1.0 - float(self._units[row] @ self._anchors[row]) > self.drift_threshold
+
+    def process_events(self, events: list[dict],
+                       load_noise_pool: Callable[[], list[dict]] | None = None) -> tuple[dict, dict]:
+        """
+        Attaches new events to persisted clusters and re-clusters the noise pool if needed.
+        Returns a tuple of cluster assignments (event ID -> cluster ID) for the events
+        that were placed, and processing statistics. Unplaced events are left out and
+        marked as noise in the database.
+
+        Args:
+            events: Events not scored by an earlier run.
+            load_noise_pool: Returns the events of the noise pool when it is re-clustered;
+                pool events that are placed are included in the assignments.
+        """
+        stats = {
+            'total_events_processed': len(events),
+            'entity_parsing_success': 0,
+            'entity_parsing_warnings': 0,
+            'attached_events': 0,
+            'drifted_clusters': 0,
+            'reclustered_events': 0,
+            'clusters_found': 0,
+            'noise_points': 0
+        }
+        if not events:
+            return {}, stats
+
+        print(f"Starting incremental clustering for {len(events)} events...")
+        texts_to_embed = [event.get('source_text', '') for event in events]
+        vectors = normalize(np.asarray(self.vectorizer.get_embeddings(texts_to_embed), dtype=np.float32))
+        entity_sets = self.orchestrator._parse_entity_sets(events, stats)
+
+        # 1. Attach each event to an existing cluster, in arrival order.
+        assignments = {}
+        remainder = []
+        touched_rows = set()
+        for i, event in enumerate(events):
+            row = self._attach(vectors[i], entity_sets[i])
+            if row is None:
+                remainder.append(i)
+                continue
+            touched_rows.add(row)
+            if event.get('id'):
+                assignments[event['id']] = self.cluster_ids[row]
+        stats['attached_events'] = len(events) - len(remainder)
+
+        # 2. Close clusters that drifted away from where they started.
+        for row in touched_rows:
+            if self._has_drifted(row):
+                self._closed[row] = True
+                self._dirty_rows.add(row)
+                stats['drifted_clusters'] += 1
+
+        # 3. Re-cluster the noise pool once enough new noise has joined it since
+        # its last re-clustering, or after drift.
+        new_noise = len(remainder) + self.db_manager.get_clustering_noise_count()
+        recluster = new_noise > 0 and (new_noise >= self.recluster_min_events or stats['drifted_clusters'] > 0)
+        pool = load_noise_pool() if recluster and load_noise_pool else []
+        if pool:
+            remainder.extend(range(len(events), len(events) + len(pool)))
+            events = events + pool
+            pool_vectors = self.vectorizer.get_embeddings([event.get('source_text', '') for event in pool])
+            vectors = np.vstack([vectors, normalize(np.asarray(pool_vectors, dtype=np.float32))])
+            entity_sets = entity_sets + self.orchestrator._parse_entity_sets(pool, stats)
+        if recluster and remainder:
+            print(f"Re-clustering {len(remainder)} unattached events...")
+            stats['reclustered_events'] = len(remainder)
+            remainder_events = [events[i] for i in remainder]
+            parsing_stats = {'entity_parsing_success': 0, 'entity_parsing_warnings': 0}
+            labels = self.orchestrator.cluster_vectors(vectors[remainder], remainder_events, parsing_stats)
+            remainder = np.asarray(remainder)
+            clusters = [remainder[labels == label] for label in sorted(set(labels) - {-1})]
+            if clusters:
+                rows = self._create_clusters([(vectors[members], [entity_sets[i] for i in members]) for members in clusters])
+                for row, members in zip(rows, clusters):
+                    for i in members:
+                        if events[i].get('id'):
+                            assignments[events[i]['id']] = self.cluster_ids[row]
+            stats['clusters_found'] = len(clusters)
+            stats['noise_points'] = int(np.sum(labels == -1))
+            noise, noise_marker = remainder[labels == -1], RECLUSTERED_NOISE_CLUSTER_ID
+        else:
+            stats['noise_points'] = len(remainder)
+            noise, noise_marker = remainder, NOISE_CLUSTER_ID
+
+        self._save_state()
+        self.db_manager.mark_clustering_noise([events[i]['id'] for i in noise if events[i].get('id')], noise_marker)
+        print(f"Incremental clustering complete. Attached {stats['attached_events']} events, "
+              f"found {stats['clusters_found']} new clusters, {stats['noise_points']} events left unclustered.")
+        return assignments, stats
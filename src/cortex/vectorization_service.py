@@ -1,7 +1,8 @@
 # src/cortex/vectorization_service.py
 
-from sentence_transformers import SentenceTransformer
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts
 import numpy as np
 
 class VectorizationService:
@@ -13,8 +14,8 @@ class VectorizationService:
     def __init__(self):
         """
         Initializes the VectorizationService.
-        It loads a local sentence-transformers model based on the configuration,
-        using a centralized cache directory.
+        It uses the process-wide worker of the configured local sentence-transformers
+        model, which is loaded from the centralized cache directory on first use.
         """
         config = get_config()
         vectorizer_config = config.get('cortex', {}).get('vectorizer', {})
@@ -34,21 +35,22 @@ class VectorizationService:
 
         print(f"Initializing VectorizationService with local model: {model_name}")
         print(f"Using cache directory: {cache_dir}")
-        self.model = SentenceTransformer(model_name, cache_folder=cache_dir)
+        self.model_name = model_name
+        self.model = get_embedding_worker(model_name, cache_dir)
         print("VectorizationService initialized successfully.")
 
     def get_embedding(self, text: str) -> list[float]:
         """
         Generates an embedding for a single piece of text.
         """
-        embedding = self.model.encode(text, convert_to_numpy=True)
-        return embedding.tolist()
+        return self.get_embeddings([text])[0]
 
     def get_embeddings(self, texts: list[str]) -> list[list[float]]:
         """
-        Generates embeddings for a batch of texts.
+        Generates embeddings for a batch of texts. Texts already in the embedding
+        store are not encoded again.
         """
         print(f"Generating embeddings for a batch of {len(texts)} texts using local model...")
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
+        embeddings = encode_texts(texts, self.model_name, self.model.encode)
         print("Embeddings generated successfully.")
-        return embeddings.tolist()
\ No newline at end of file
+        return embeddings.tolist()
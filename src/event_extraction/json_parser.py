@@ -4,18 +4,19 @@ import logging
 from typing import Dict, Any, List, Optional, Union, Tuple
 from datetime import datetime
 from dataclasses import dataclass
-import jsonschema
-from jsonschema import validate, ValidationError
 
 logger = logging.getLogger(__name__)
 
+# JSON值（对象或数组）的起始字符
+_JSON_START_PATTERN = re.compile(r'[\[{]')
+
 @dataclass
 class ParseResult:
     """
     JSON解析结果类
     """
     success: bool
-    data: Optional[Dict[str, Any]]
+    data: Optional[Union[Dict[str, Any], List[Any]]]
     error_message: Optional[str]
     confidence_score: float
     parsing_method: str
@@ -31,19 +32,25 @@ class EnhancedJSONParser:
         self.parsing_strategies = [
             self._parse_direct_json,
             self._parse_code_block_json,
+            self._parse_embedded_json,
             self._parse_regex_extracted_json,
             self._parse_cleaned_json,
             self._parse_partial_json,
+            self._parse_truncated_array,
             self._parse_structured_text
         ]
     
-    def parse(self, response: str, expected_schema: Optional[Dict[str, Any]] = None) -> ParseResult:
+    def parse(self,
+              response: str,
+              expected_schema: Optional[Dict[str, Any]] = None,
+              expected_type: Optional[type] = None) -> ParseResult:
         """
         解析LLM响应中的JSON数据
         
         Args:
             response: LLM原始响应
             expected_schema: 期望的JSON模式
+            expected_type: 期望的顶层类型 (dict 或 list)，类型不符的结果会被跳过
             
         Returns:
             ParseResult对象
@@ -58,10 +65,16 @@ class EnhancedJSONParser:
                 raw_response=response
             )
         
+        # 推理模型可能在输出前附带 <think>...</think> 推理过程
+        response = self._strip_reasoning(response)
+        
         # 尝试各种解析策略
         for i, strategy in enumerate(self.parsing_strategies):
             try:
                 result = strategy(response)
+                if result.success and expected_type is not None and not isinstance(result.data, expected_type):
+                    logger.debug(f"解析策略 {result.parsing_method} 的结果类型不符: {type(result.data).__name__}")
+                    continue
                 if result.success:
                     # 如果提供了模式，进行验证
                     if expected_schema:
@@ -133,6 +146,44 @@ class EnhancedJSONParser:
         
         raise ValueError("No valid JSON found in code blocks")
     
+    def _strip_reasoning(self, response: str) -> str:
+        """
+        移除推理模型输出中的 <think>...</think> 段落
+        """
+        stripped = re.sub(r'<think>[\s\S]*?</think>', '', response).strip()
+        return stripped or response
+    
+    def _parse_embedded_json(self, response: str) -> ParseResult:
+        """
+        提取文本中嵌入的最长完整JSON值（对象或数组）
+        """
+        decoder = json.JSONDecoder()
+        best, best_length = None, 0
+        idx = 0
+        while True:
+            match = _JSON_START_PATTERN.search(response, idx)
+            if not match:
+                break
+            try:
+                data, end = decoder.raw_decode(response, match.start())
+            except json.JSONDecodeError:
+                idx = match.start() + 1
+                continue
+            if isinstance(data, (dict, list)) and end - match.start() > best_length:
+                best, best_length = data, end - match.start()
+            idx = end
+        
+        if best is None:
+            raise ValueError("No embedded JSON value found")
+        return ParseResult(
+            success=True,
+            data=best,
+            error_message=None,
+            confidence_score=0.85,
+            parsing_method="embedded_json",
+            raw_response=response
+        )
+    
     def _parse_regex_extracted_json(self, response: str) -> ParseResult:
         """
         使用正则表达式提取JSON
@@ -237,6 +288,39 @@ class EnhancedJSONParser:
         except json.JSONDecodeError as e:
             raise ValueError(f"Partial JSON parsing failed: {str(e)}")
     
+    def _parse_truncated_array(self, response: str) -> ParseResult:
+        """
+        从被截断的JSON数组（如超出 max_tokens）中恢复已完整输出的元素
+        """
+        start_idx = response.find('[')
+        if start_idx == -1:
+            raise ValueError("No JSON array start found")
+        
+        decoder = json.JSONDecoder()
+        items = []
+        idx = start_idx + 1
+        while True:
+            while idx < len(response) and response[idx] in ' \t\r\n,':
+                idx += 1
+            if idx >= len(response) or response[idx] == ']':
+                break
+            try:
+                item, idx = decoder.raw_decode(response, idx)
+            except json.JSONDecodeError:
+                break
+            items.append(item)
+        
+        if not items:
+            raise ValueError("No complete array elements found")
+        return ParseResult(
+            success=True,
+            data=items,
+            error_message=None,
+            confidence_score=0.4,
+            parsing_method="truncated_array",
+            raw_response=response
+        )
+    
     def _parse_structured_text(self, response: str) -> ParseResult:
         """
         从结构化文本中提取信息并转换为JSON
@@ -356,6 +440,11 @@ class EnhancedJSONParser:
         """
         根据模式验证数据
         """
+        try:
+            from jsonschema import validate, ValidationError
+        except ImportError:
+            logger.warning("jsonschema 未安装，跳过模式验证")
+            return False
         try:
             validate(instance=data, schema=schema)
             return True
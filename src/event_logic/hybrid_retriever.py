@@ -78,37 +78,78 @@ class HybridSearchResult:
 
 
 class BGEEmbedder:
-    """BGE嵌入向量化器"""
+    """BGE嵌入向量化器（向量经由嵌入存储复用，同一文本只编码一次）"""
     
     def __init__(self, embedding_model=None, ollama_url: str = "http://localhost:11434", 
-                 model_name: str = "smartcreation/bge-large-zh-v1.5:latest"):
+                 model_name: str = "smartcreation/bge-large-zh-v1.5:latest",
+                 local_model_name: str = "BAAI/bge-large-zh-v1.5",
+                 batch_size: int = 32):
         self.embedding_model = embedding_model
         self.ollama_url = ollama_url
         self.model_name = model_name
+        # 本地模型在嵌入存储中的键名，与其他组件加载的同一模型共享向量
+        self.local_model_name = local_model_name
+        # 每次模型调用/Ollama请求的文本数
+        self.batch_size = max(1, batch_size)
+        # 复用HTTP连接，避免每个批次重新建立TCP连接
+        self.session = requests.Session()
         self.logger = logging.getLogger(__name__)
         if self.embedding_model:
             self.logger.info("BGEEmbedder is using a pre-loaded local SentenceTransformer model.")
         else:
             self.logger.info(f"BGEEmbedder is configured to use Ollama service at {ollama_url}.")
 
-    def embed_text(self, text: str) -> BGEEmbedding:
-        """对单个文本进行向量化"""
-        # 优先使用本地模型
-        if self.embedding_model:
+    def _encode(self, texts: List[str], model_name: str, encode_fn) -> np.ndarray:
+        """经由嵌入存储向量化，已存储的文本不再重复编码"""
+        # 延迟导入，避免 src.core 与本模块之间的循环导入
+        from src.core.embedding_store import encode_texts
+        return encode_texts(texts, model_name, encode_fn)
+
+    def _encode_in_buckets(self, texts: List[str], model_name: str, encode_fn) -> List[Optional[List[float]]]:
+        """
+        按文本长度排序后分批编码（每批经由嵌入存储），使同一批次内的文本长度相近、填充最少，
+        结果按原始顺序返回。某一批失败时只记录错误，该批文本的结果为 None，其余批次的向量保留
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            bucket = order[start:start + self.batch_size]
             try:
-                embedding_vector = self.embedding_model.encode([text])[0].tolist()
-                return BGEEmbedding(
-                    vector=embedding_vector,
-                    dimension=len(embedding_vector),
-                    model_name="local_bge" # Use a generic name
-                )
+                bucket_vectors = self._encode([texts[i] for i in bucket], model_name, encode_fn).tolist()
+            except requests.exceptions.RequestException as e:
+                self.logger.error(f"无法连接到BGE嵌入服务 at {self.ollama_url}. 请确保服务正在运行. 错误: {e}")
+                continue
             except Exception as e:
-                self.logger.error(f"Local embedding failed: {e}")
-                return BGEEmbedding(vector=[0.0] * 1024, dimension=1024)
+                self.logger.error(f"BGE嵌入向量化失败（本批 {len(bucket)} 条文本）: {e}")
+                continue
+            for i, vector in zip(bucket, bucket_vectors):
+                vectors[i] = vector
+        return vectors
 
-        # 如果没有本地模型，则回退到Ollama服务
-        try:
-            response = requests.post(
+    def _ollama_embed(self, texts: List[str]) -> List[List[float]]:
+        """通过Ollama的批量接口 /api/embed 向量化一批文本，旧版服务回退到逐条的 /api/embeddings"""
+        response = self.session.post(
+            f"{self.ollama_url}/api/embed",
+            json={
+                "model": self.model_name,
+                "input": texts
+            },
+            timeout=30 + len(texts)
+        )
+        if response.status_code == 404:
+            return self._ollama_embed_legacy(texts)
+        response.raise_for_status()
+
+        vectors = response.json().get("embeddings", [])
+        if len(vectors) != len(texts) or not all(vectors):
+            raise ValueError("Ollama返回了空的嵌入向量")
+        return vectors
+
+    def _ollama_embed_legacy(self, texts: List[str]) -> List[List[float]]:
+        """逐条调用旧版 /api/embeddings 接口"""
+        vectors = []
+        for text in texts:
+            response = self.session.post(
                 f"{self.ollama_url}/api/embeddings",
                 json={
                     "model": self.model_name,
@@ -118,33 +159,39 @@ class BGEEmbedder:
             )
             response.raise_for_status()
             
-            result = response.json()
-            embedding_vector = result.get("embedding", [])
-            
-            return BGEEmbedding(
-                vector=embedding_vector,
-                dimension=len(embedding_vector),
-                model_name=self.model_name
-            )
-            
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"无法连接到BGE嵌入服务 at {self.ollama_url}. 请确保服务正在运行. 错误: {e}")
-            return BGEEmbedding(vector=[0.0] * 1024, dimension=1024)
-        except Exception as e:
-            self.logger.error(f"BGE嵌入向量化失败: {e}")
-            return BGEEmbedding(vector=[0.0] * 1024, dimension=1024)
+            embedding_vector = response.json().get("embedding", [])
+            if not embedding_vector:
+                raise ValueError("Ollama返回了空的嵌入向量")
+            vectors.append(embedding_vector)
+        return vectors
+
+    def embed_text(self, text: str) -> BGEEmbedding:
+        """对单个文本进行向量化"""
+        return self.embed_batch([text])[0]
     
     def embed_batch(self, texts: List[str]) -> List[BGEEmbedding]:
-        """批量文本向量化"""
-        embeddings = []
-        for text in texts:
-            embedding = self.embed_text(text)
-            embeddings.append(embedding)
-        return embeddings
+        """批量文本向量化：按长度分桶、每批 batch_size 条，失败批次中的文本返回零向量"""
+        if not texts:
+            return []
+
+        # 优先使用本地模型，如果没有本地模型，则回退到Ollama服务
+        if self.embedding_model:
+            vectors = self._encode_in_buckets(texts, self.local_model_name, self.embedding_model.encode)
+            model_name = "local_bge" # Use a generic name
+        else:
+            vectors = self._encode_in_buckets(texts, self.model_name, self._ollama_embed)
+            model_name = self.model_name
+
+        # 零向量与成功批次的维度一致，全部失败时沿用 bge-large 的 1024 维
+        dimension = next((len(vector) for vector in vectors if vector is not None), 1024)
+        return [
+            BGEEmbedding(vector=vector, dimension=len(vector), model_name=model_name)
+            if vector is not None else BGEEmbedding(vector=[0.0] * dimension, dimension=dimension)
+            for vector in vectors
+        ]
     
-    def embed_event(self, event: Event) -> BGEEmbedding:
-        """对事件进行向量化"""
-        # 构建事件的文本表示
+    def _event_text(self, event: Event) -> str:
+        """构建事件的文本表示"""
         event_text = f"{event.text}"
         if hasattr(event, 'participants') and event.participants:
             entities_text = ", ".join([f"{e.name}({e.entity_type})" for e in event.participants])
@@ -152,16 +199,15 @@ class BGEEmbedder:
         
         if hasattr(event, 'event_type') and event.event_type:
             event_text += f" 类型: {event.event_type.value}"
-            
-        return self.embed_text(event_text)
+        return event_text
+
+    def embed_event(self, event: Event) -> BGEEmbedding:
+        """对事件进行向量化"""
+        return self.embed_text(self._event_text(event))
     
     def batch_embed_events(self, events: List[Event]) -> List[BGEEmbedding]:
         """批量事件向量化"""
-        embeddings = []
-        for event in events:
-            embedding = self.embed_event(event)
-            embeddings.append(embedding)
-        return embeddings
+        return self.embed_batch([self._event_text(event) for event in events])
 
 
 class ChromaDBRetriever:
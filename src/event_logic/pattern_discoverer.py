@@ -142,29 +142,21 @@ class PatternDiscoverer:
         """批量向量化事件"""
         self.logger.info("开始批量向量化事件")
         
-        embeddings = []
-        batch_size = 10  # 批处理大小
-        
-        for i in range(0, len(events), batch_size):
-            batch_events = events[i:i + batch_size]
-            batch_texts = []
-            
-            for event in batch_events:
-                # 构建事件文本表示
-                # 修改这里：使用 event.text 或 event.summary 代替 description
-                event_text = event.text  # 或者 event.summary
-                if hasattr(event, 'event_type') and event.event_type:
-                    event_text += f" [类型: {event.event_type}]"
-                if hasattr(event, 'entities') and event.entities:
-                    entities_text = ", ".join([e.name for e in event.entities])
-                    event_text += f" [实体: {entities_text}]"
-                
-                batch_texts.append(event_text)
+        texts = []
+        for event in events:
+            # 构建事件文本表示
+            # 修改这里：使用 event.text 或 event.summary 代替 description
+            event_text = event.text  # 或者 event.summary
+            if hasattr(event, 'event_type') and event.event_type:
+                event_text += f" [类型: {event.event_type}]"
+            if hasattr(event, 'entities') and event.entities:
+                entities_text = ", ".join([e.name for e in event.entities])
+                event_text += f" [实体: {entities_text}]"
             
-            # 批量向量化
-            batch_embeddings = self.embedder.embed_batch(batch_texts)
-            for embedding in batch_embeddings:
-                embeddings.append(embedding.vector)
+            texts.append(event_text)
+        
+        # 批量向量化（BGEEmbedder 按长度分桶并按其 batch_size 分批）
+        embeddings = [embedding.vector for embedding in self.embedder.embed_batch(texts)]
         
         self.logger.info(f"向量化完成，向量数量: {len(embeddings)}")
         return embeddings
@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import TypedDict, Union, Literal, Generic, TypeVar
+from typing import Any, TypedDict, Union, Literal, Generic, TypeVar
 
 import numpy as np
 
@@ -86,6 +86,23 @@ class BaseKVStorage(Generic[T], StorageNameSpace):
     async def drop(self):
         raise NotImplementedError
 
+    # Entries of a dict-valued record, e.g. the cached responses of one query
+    # mode. The defaults read and rewrite the whole record; storages that can
+    # address single entries override them.
+    async def get_entry(self, id: str, sub_id: str) -> Union[Any, None]:
+        return (await self.get_by_id(id) or {}).get(sub_id)
+
+    async def get_entries(self, id: str) -> dict[str, Any]:
+        return await self.get_by_id(id) or {}
+
+    async def upsert_entries(self, id: str, entries: dict[str, Any]):
+        record = await self.get_by_id(id)
+        if record is None:
+            await self.upsert({id: dict(entries)})
+            return
+        record.update(entries)
+        await self.upsert({id: record})
+
 
 @dataclass
 class BaseGraphStorage(StorageNameSpace):
@@ -24,6 +24,8 @@ from .utils import (
     EmbeddingFunc,
     compute_mdhash_id,
     limit_async_func_call,
+    call_priority,
+    PRIORITY_QUERY,
     convert_response_to_json,
     logger,
     set_logger,
@@ -38,8 +40,11 @@ from .base import (
 
 from .storage import (
     JsonKVStorage,
+    SQLiteKVStorage,
     NanoVectorDBStorage,
+    MmapVectorDBStorage,
     NetworkXStorage,
+    NetworkXBinaryStorage,
 )
 
 # future KG integrations
@@ -216,10 +221,6 @@ class HyperGraphRAG:
             if self.enable_llm_cache
             else None
         )
-        self.embedding_func = limit_async_func_call(self.embedding_func_max_async)(
-            self.embedding_func
-        )
-
         self.full_docs = self.key_string_value_json_storage_cls(
             namespace="full_docs",
             global_config=asdict(self),
@@ -266,17 +267,20 @@ class HyperGraphRAG:
         return {
             # kv storage
             "JsonKVStorage": JsonKVStorage,
+            "SQLiteKVStorage": SQLiteKVStorage,
             "OracleKVStorage": OracleKVStorage,
             "MongoKVStorage": MongoKVStorage,
             "TiDBKVStorage": TiDBKVStorage,
             # vector storage
             "NanoVectorDBStorage": NanoVectorDBStorage,
+            "MmapVectorDBStorage": MmapVectorDBStorage,
             "OracleVectorDBStorage": OracleVectorDBStorage,
             "MilvusVectorDBStorge": MilvusVectorDBStorge,
             "ChromaVectorDBStorage": ChromaVectorDBStorage,
             "TiDBVectorDBStorage": TiDBVectorDBStorage,
             # graph storage
             "NetworkXStorage": NetworkXStorage,
+            "NetworkXBinaryStorage": NetworkXBinaryStorage,
             "Neo4JStorage": Neo4JStorage,
             "OracleGraphStorage": OracleGraphStorage,
             # "ArangoDBStorage": ArangoDBStorage
@@ -541,16 +545,18 @@ class HyperGraphRAG:
 
     async def aquery(self, query: str, param: QueryParam = QueryParam()):
         if param.mode in ["hybrid"]:
-            response = await kg_query(
-                query,
-                self.chunk_entity_relation_graph,
-                self.entities_vdb,
-                self.hyperedges_vdb,
-                self.text_chunks,
-                param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache,
-            )
+            # query-time LLM and embedding calls go ahead of queued insert-time calls
+            with call_priority(PRIORITY_QUERY):
+                response = await kg_query(
+                    query,
+                    self.chunk_entity_relation_graph,
+                    self.entities_vdb,
+                    self.hyperedges_vdb,
+                    self.text_chunks,
+                    param,
+                    asdict(self),
+                    hashing_kv=self.llm_response_cache,
+                )
         await self._query_done()
         return response
 
@@ -566,6 +572,13 @@ class HyperGraphRAG:
         loop = always_get_an_event_loop()
         return loop.run_until_complete(self.adelete_by_entity(entity_name))
 
+    def limiter_metrics(self) -> dict:
+        """Queue depth and wait times of the LLM and embedding concurrency limiters"""
+        return {
+            "llm": self.llm_model_func.limiter.metrics(),
+            "embedding": self.embedding_func.limiter.metrics(),
+        }
+
     async def adelete_by_entity(self, entity_name: str):
         entity_name = f'"{entity_name.upper()}"'
 
@@ -1,6 +1,11 @@
 import asyncio
 import html
+import json
 import os
+import pickle
+import sqlite3
+import struct
+from array import array
 from tqdm.asyncio import tqdm as tqdm_async
 from dataclasses import dataclass
 from typing import Any, Union, cast
@@ -63,6 +68,243 @@ class JsonKVStorage(BaseKVStorage):
         self._data = {}
 
 
+@dataclass
+class SQLiteKVStorage(BaseKVStorage):
+    """KV storage backed by an embedded SQLite file (``kv_store_<ns>.sqlite``).
+
+    Values are loaded lazily by key, new keys are buffered and written in one
+    transaction per ``index_done_callback``, so a crash leaves the last committed
+    state intact instead of a half-written JSON file. An existing
+    ``kv_store_<ns>.json`` is imported once on first open.
+
+    Dict-valued records accessed through the entry API (the LLM response cache
+    keeps one record per mode) are stored one row per ``(id, sub_id)`` in
+    ``kv_entries``, so a cache hit reads one row and a new response writes one.
+    A record stored whole is split into entries the first time it is accessed
+    that way. The file is compacted after a commit once the free pages or the
+    WAL outgrow the thresholds below.
+    """
+
+    # stay below SQLite's default host-parameter limit
+    _QUERY_CHUNK_SIZE = 500
+    # VACUUM once this share of the file is free pages (and at least _COMPACT_MIN_BYTES)
+    _COMPACT_FREE_RATIO = 0.25
+    _COMPACT_MIN_BYTES = 4 * 1024 * 1024
+    # checkpoint and truncate the WAL once it grows past this size
+    _COMPACT_WAL_BYTES = 64 * 1024 * 1024
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._file_name = os.path.join(
+            working_dir, f"kv_store_{self.namespace}.sqlite"
+        )
+        self._conn = sqlite3.connect(self._file_name, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv (id TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv_entries (id TEXT NOT NULL, sub_id TEXT NOT NULL,"
+            " value TEXT NOT NULL, PRIMARY KEY (id, sub_id)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        # decoded values handed out to callers, kept so in-place edits are visible
+        self._cache: dict[str, Any] = {}
+        self._pending: dict[str, Any] = {}
+        self._pending_entries: dict[tuple[str, str], Any] = {}
+        # ids whose whole-record row (if any) has been moved into kv_entries
+        self._split_ids: set[str] = set()
+        self._moved_ids: set[str] = set()
+        self._dropped = False
+        self._import_json()
+        count = self._conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0]
+        logger.info(f"Load KV {self.namespace} with {count} data")
+
+    def _import_json(self):
+        json_file = os.path.join(
+            self.global_config["working_dir"], f"kv_store_{self.namespace}.json"
+        )
+        # user_version marks a store that already went through the import check
+        if self._conn.execute("PRAGMA user_version").fetchone()[0]:
+            return
+        data = (load_json(json_file) or {}) if os.path.exists(json_file) else {}
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO kv (id, value) VALUES (?, ?)",
+                ((k, json.dumps(v, ensure_ascii=False)) for k, v in data.items()),
+            )
+            self._conn.execute("PRAGMA user_version = 1")
+        if data:
+            logger.info(f"Imported {len(data)} records from {json_file}")
+
+    def _chunks(self, ids: list[str]):
+        for i in range(0, len(ids), self._QUERY_CHUNK_SIZE):
+            yield ids[i : i + self._QUERY_CHUNK_SIZE]
+
+    def _load(self, ids: list[str]) -> dict[str, Any]:
+        """Return the values for ``ids`` that exist, reading uncached ones from disk."""
+        found = {}
+        missing = []
+        for id in ids:
+            if id in self._pending:
+                found[id] = self._pending[id]
+            elif id in self._cache:
+                found[id] = self._cache[id]
+            elif not self._dropped:
+                missing.append(id)
+        for chunk in self._chunks(list(dict.fromkeys(missing))):
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(
+                f"SELECT id, value FROM kv WHERE id IN ({placeholders})", chunk
+            )
+            for id, value in rows:
+                self._cache[id] = found[id] = json.loads(value)
+        return found
+
+    async def all_keys(self) -> list[str]:
+        keys = (
+            []
+            if self._dropped
+            else [row[0] for row in self._conn.execute("SELECT id FROM kv")]
+        )
+        return keys + [k for k in self._pending if k not in self._cache]
+
+    async def index_done_callback(self):
+        with self._conn:
+            if self._dropped:
+                self._conn.execute("DELETE FROM kv")
+                self._conn.execute("DELETE FROM kv_entries")
+            self._conn.executemany(
+                "DELETE FROM kv WHERE id = ?", ((id,) for id in self._moved_ids)
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv (id, value) VALUES (?, ?)",
+                (
+                    (k, json.dumps(v, ensure_ascii=False))
+                    for k, v in self._pending.items()
+                ),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO kv_entries (id, sub_id, value) VALUES (?, ?, ?)",
+                (
+                    (id, sub_id, json.dumps(v, ensure_ascii=False))
+                    for (id, sub_id), v in self._pending_entries.items()
+                ),
+            )
+        # freshly inserted values are dropped from memory once they are on disk
+        self._cache.update(
+            {k: v for k, v in self._pending.items() if k in self._cache}
+        )
+        self._pending = {}
+        self._pending_entries = {}
+        self._moved_ids = set()
+        self._dropped = False
+        self._maybe_compact()
+
+    def _split_record(self, id: str):
+        """Move a record stored whole in ``kv`` into one ``kv_entries`` row per entry at the next commit."""
+        if id in self._split_ids:
+            return
+        self._split_ids.add(id)
+        record = self._load([id]).get(id)
+        if not isinstance(record, dict):
+            return
+        for sub_id, value in record.items():
+            self._pending_entries.setdefault((id, sub_id), value)
+        self._moved_ids.add(id)
+        self._cache.pop(id, None)
+        self._pending.pop(id, None)
+
+    async def get_entry(self, id: str, sub_id: str):
+        self._split_record(id)
+        if (id, sub_id) in self._pending_entries:
+            return self._pending_entries[(id, sub_id)]
+        if self._dropped:
+            return None
+        row = self._conn.execute(
+            "SELECT value FROM kv_entries WHERE id = ? AND sub_id = ?", (id, sub_id)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    async def get_entries(self, id: str) -> dict[str, Any]:
+        self._split_record(id)
+        entries = (
+            {}
+            if self._dropped
+            else {
+                sub_id: json.loads(value)
+                for sub_id, value in self._conn.execute(
+                    "SELECT sub_id, value FROM kv_entries WHERE id = ?", (id,)
+                )
+            }
+        )
+        entries.update(
+            {sub_id: v for (k, sub_id), v in self._pending_entries.items() if k == id}
+        )
+        return entries
+
+    async def upsert_entries(self, id: str, entries: dict[str, Any]):
+        self._split_record(id)
+        for sub_id, value in entries.items():
+            self._pending_entries[(id, sub_id)] = value
+
+    async def get_by_id(self, id):
+        return self._load([id]).get(id, None)
+
+    async def get_by_ids(self, ids, fields=None):
+        found = self._load(ids)
+        if fields is None:
+            return [found.get(id, None) for id in ids]
+        return [
+            (
+                {k: v for k, v in found[id].items() if k in fields}
+                if found.get(id, None)
+                else None
+            )
+            for id in ids
+        ]
+
+    async def filter_keys(self, data: list[str]) -> set[str]:
+        return set(data) - set(self._load(data))
+
+    async def upsert(self, data: dict[str, dict]):
+        existing = self._load(list(data))
+        left_data = {k: v for k, v in data.items() if k not in existing}
+        self._pending.update(left_data)
+        # like JsonKVStorage, an existing key is only rewritten when the caller
+        # edited the object it got from get_by_id in place
+        for k, v in data.items():
+            if k in existing and existing[k] is v:
+                self._pending[k] = v
+        return left_data
+
+    async def drop(self):
+        self._cache = {}
+        self._pending = {}
+        self._pending_entries = {}
+        self._moved_ids = set()
+        self._dropped = True
+
+    def compact(self):
+        """Reclaim space left by rewritten values and fold the WAL into the main file."""
+        self._conn.execute("VACUUM")
+        # VACUUM itself goes through the WAL, so checkpoint afterwards
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def _maybe_compact(self):
+        page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+        free_bytes = self._conn.execute("PRAGMA freelist_count").fetchone()[0] * page_size
+        wal_file = self._file_name + "-wal"
+        wal_bytes = os.path.getsize(wal_file) if os.path.exists(wal_file) else 0
+        if free_bytes >= max(self._COMPACT_MIN_BYTES, self._COMPACT_FREE_RATIO * page_count * page_size):
+            logger.info(f"Compacting KV {self.namespace}: {free_bytes} bytes free")
+            self.compact()
+        elif wal_bytes >= self._COMPACT_WAL_BYTES:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
 @dataclass
 class NanoVectorDBStorage(BaseVectorStorage):
     cosine_better_than_threshold: float = 0.2
@@ -174,6 +416,399 @@ class NanoVectorDBStorage(BaseVectorStorage):
         self._client.save()
 
 
+@dataclass
+class MmapVectorDBStorage(BaseVectorStorage):
+    """Vector storage on a memory-mapped matrix plus a SQLite metadata table.
+
+    Normalized vectors are appended to ``vdb_<ns>.<generation>.bin`` (row-major
+    float32 or float16, selected with ``vector_db_storage_cls_kwargs["dtype"]``)
+    and mapped read-only, so startup only opens files and memory follows the
+    pages a query touches. ``vdb_<ns>.sqlite`` maps rows to ids and metadata;
+    deletes and re-upserts tombstone the old row, and ``compact`` rewrites the
+    live rows into the next generation once tombstones pile up. Queries scan
+    the matrix in blocks, or use an HNSW index once a namespace has
+    ``hnsw_min_rows`` live rows and hnswlib is installed. An existing
+    NanoVectorDB ``vdb_<ns>.json`` is imported once on first open.
+    """
+
+    cosine_better_than_threshold: float = 0.2
+
+    # rows multiplied per block during a brute-force query
+    _BLOCK_ROWS = 65536
+    _QUERY_CHUNK_SIZE = 500
+    # compact once tombstones make up this share of the rows
+    _COMPACT_RATIO = 0.25
+    _HNSW_M = 16
+    _HNSW_EF_CONSTRUCTION = 200
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        storage_kwargs = self.global_config.get("vector_db_storage_cls_kwargs") or {}
+        self._file_prefix = os.path.join(working_dir, f"vdb_{self.namespace}")
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self._hnsw_min_rows = storage_kwargs.get("hnsw_min_rows", 100_000)
+        self.cosine_better_than_threshold = self.global_config.get(
+            "cosine_better_than_threshold", self.cosine_better_than_threshold
+        )
+
+        self._conn = sqlite3.connect(
+            f"{self._file_prefix}.sqlite", check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS vectors (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS vectors_live_id ON vectors (id) WHERE deleted = 0"
+        )
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self._dim = int(meta.get("dim", self.embedding_func.embedding_dim))
+        if self._dim != self.embedding_func.embedding_dim:
+            raise ValueError(
+                f"{self._file_prefix}.sqlite holds {self._dim}-d vectors, "
+                f"embedding_func returns {self.embedding_func.embedding_dim}-d"
+            )
+        self._dtype = np.dtype(meta.get("dtype", storage_kwargs.get("dtype", "float32")))
+        self._generation = int(meta.get("generation", 0))
+        if not meta:
+            self._set_meta(dim=self._dim, dtype=self._dtype.name, generation=0)
+            self._import_nano_vectordb()
+
+        # rows past the last committed one are leftovers of an interrupted append
+        self._rows = self._conn.execute(
+            "SELECT COALESCE(MAX(row) + 1, 0) FROM vectors"
+        ).fetchone()[0]
+        self._deleted = np.zeros(self._rows, dtype=bool)
+        self._deleted[
+            [row for (row,) in self._conn.execute("SELECT row FROM vectors WHERE deleted = 1")]
+        ] = True
+        self._open_matrix()
+        self._index = None
+        self._index_dirty = False
+        logger.info(
+            f"Load vector storage {self.namespace} with {self._live_rows()} vectors"
+        )
+
+    @property
+    def _data_file(self) -> str:
+        return f"{self._file_prefix}.{self._generation}.bin"
+
+    def _set_meta(self, **values):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(k, str(v)) for k, v in values.items()],
+            )
+
+    def _live_rows(self) -> int:
+        return self._rows - int(self._deleted.sum())
+
+    def _open_matrix(self):
+        self._matrix = (
+            np.memmap(self._data_file, dtype=self._dtype, mode="r", shape=(self._rows, self._dim))
+            if self._rows
+            else None
+        )
+
+    def _write_rows(self, path: str, offset_rows: int, vectors: np.ndarray):
+        """Write ``vectors`` starting at row ``offset_rows`` and fsync, dropping anything after them."""
+        mode = "r+b" if os.path.exists(path) else "wb"
+        with open(path, mode) as f:
+            f.seek(offset_rows * self._dim * self._dtype.itemsize)
+            f.write(np.ascontiguousarray(vectors, dtype=self._dtype).tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _live_rows_for_ids(self, ids: list[str]) -> dict[int, str]:
+        rows = {}
+        for i in range(0, len(ids), self._QUERY_CHUNK_SIZE):
+            chunk = ids[i : i + self._QUERY_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows.update(
+                self._conn.execute(
+                    f"SELECT row, id FROM vectors WHERE deleted = 0 AND id IN ({placeholders})",
+                    chunk,
+                )
+            )
+        return rows
+
+    def _append(self, ids: list[str], metas: list[dict], vectors: np.ndarray) -> list[str]:
+        """Append rows for ``ids``, tombstoning their previous rows; returns the ids that existed."""
+        start = self._rows
+        self._write_rows(self._data_file, start, vectors)
+        old = self._live_rows_for_ids(ids)
+        old_rows = list(old)
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE vectors SET deleted = 1 WHERE row = ?", [(row,) for row in old_rows]
+            )
+            self._conn.executemany(
+                "INSERT INTO vectors (row, id, data) VALUES (?, ?, ?)",
+                [
+                    (start + i, id, json.dumps(meta, ensure_ascii=False))
+                    for i, (id, meta) in enumerate(zip(ids, metas))
+                ],
+            )
+        self._rows += len(ids)
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(ids), dtype=bool)])
+        self._deleted[old_rows] = True
+        self._open_matrix()
+        if self._index is not None:
+            if self._index.get_max_elements() < self._rows:
+                self._index.resize_index(2 * self._rows)
+            self._index.add_items(vectors, np.arange(start, self._rows))
+            for row in old_rows:
+                self._index.mark_deleted(row)
+            self._index_dirty = True
+        return list(old.values())
+
+    def _tombstone(self, rows: list[int]):
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE vectors SET deleted = 1 WHERE row = ?", [(row,) for row in rows]
+            )
+        self._deleted[rows] = True
+        if self._index is not None:
+            for row in rows:
+                self._index.mark_deleted(row)
+            self._index_dirty = True
+
+    def _import_nano_vectordb(self):
+        json_file = f"{self._file_prefix}.json"
+        storage = load_json(json_file) if os.path.exists(json_file) else None
+        if not storage or not storage.get("data"):
+            return
+        import base64
+
+        matrix = np.frombuffer(base64.b64decode(storage["matrix"]), dtype=np.float32)
+        matrix = matrix.reshape(-1, storage["embedding_dim"])
+        if matrix.shape[1] != self._dim:
+            logger.warning(f"Skip importing {json_file}: dimension {matrix.shape[1]} != {self._dim}")
+            return
+        self._rows = 0
+        self._deleted = np.zeros(0, dtype=bool)
+        self._index = None
+        self._append(
+            [d["__id__"] for d in storage["data"]],
+            [{k: v for k, v in d.items() if k != "__id__"} for d in storage["data"]],
+            self._normalize(matrix),
+        )
+        logger.info(f"Imported {len(storage['data'])} vectors from {json_file}")
+
+    def _ann_index(self):
+        """HNSW index over all rows, built on first use for large namespaces."""
+        if self._index is not None or self._live_rows() < self._hnsw_min_rows:
+            return self._index
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        index = hnswlib.Index(space="ip", dim=self._dim)
+        index_file = f"{self._file_prefix}.hnsw"
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        if os.path.exists(index_file) and meta.get("hnsw_state") == f"{self._generation}:{self._rows}":
+            index.load_index(index_file, max_elements=2 * self._rows)
+            # rows may have been tombstoned after the index was saved
+            for row in np.flatnonzero(self._deleted):
+                try:
+                    index.mark_deleted(int(row))
+                except RuntimeError:
+                    pass  # already deleted in the saved index
+        else:
+            index.init_index(
+                max_elements=2 * self._rows,
+                ef_construction=self._HNSW_EF_CONSTRUCTION,
+                M=self._HNSW_M,
+            )
+            for start in range(0, self._rows, self._BLOCK_ROWS):
+                stop = min(start + self._BLOCK_ROWS, self._rows)
+                index.add_items(
+                    np.asarray(self._matrix[start:stop], dtype=np.float32),
+                    np.arange(start, stop),
+                )
+            for row in np.flatnonzero(self._deleted):
+                index.mark_deleted(int(row))
+            self._index_dirty = True
+        self._index = index
+        return index
+
+    def _top_k_rows(self, query: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine scores of the ``top_k`` live vectors closest to ``query``."""
+        k = min(top_k, self._live_rows())
+        if k <= 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+        index = self._ann_index()
+        if index is not None:
+            index.set_ef(max(2 * k, 64))
+            labels, distances = index.knn_query(query, k=k)
+            return labels[0].astype(np.int64), 1.0 - distances[0]
+
+        rows, scores = [], []
+        for start in range(0, self._rows, self._BLOCK_ROWS):
+            stop = min(start + self._BLOCK_ROWS, self._rows)
+            block_scores = np.asarray(self._matrix[start:stop], dtype=np.float32) @ query
+            block_scores[self._deleted[start:stop]] = -np.inf
+            if len(block_scores) > k:
+                best = np.argpartition(block_scores, -k)[-k:]
+            else:
+                best = np.arange(len(block_scores))
+            rows.append(best + start)
+            scores.append(block_scores[best])
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        order = np.argsort(-scores)[:k]
+        return rows[order], scores[order]
+
+    async def upsert(self, data: dict[str, dict]):
+        logger.info(f"Inserting {len(data)} vectors to {self.namespace}")
+        if not len(data):
+            logger.warning("You insert an empty data to vector DB")
+            return []
+        ids = list(data)
+        metas = [
+            {k1: v1 for k1, v1 in v.items() if k1 in self.meta_fields}
+            for v in data.values()
+        ]
+        contents = [v["content"] for v in data.values()]
+        batches = [
+            contents[i : i + self._max_batch_size]
+            for i in range(0, len(contents), self._max_batch_size)
+        ]
+
+        async def wrapped_task(batch):
+            result = await self.embedding_func(batch)
+            pbar.update(1)
+            return result
+
+        embedding_tasks = [wrapped_task(batch) for batch in batches]
+        pbar = tqdm_async(
+            total=len(embedding_tasks), desc="Generating embeddings", unit="batch"
+        )
+        embeddings_list = await asyncio.gather(*embedding_tasks)
+
+        embeddings = np.concatenate(embeddings_list)
+        if len(embeddings) != len(ids):
+            # sometimes the embedding is not returned correctly. just log it.
+            logger.error(
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(ids)}"
+            )
+            return []
+        updated = self._append(ids, metas, self._normalize(embeddings))
+        updated_set = set(updated)
+        return {"update": updated, "insert": [id for id in ids if id not in updated_set]}
+
+    async def query(self, query: str, top_k=5):
+        embedding = await self.embedding_func([query])
+        rows, scores = self._top_k_rows(self._normalize(embedding[0]), top_k)
+        keep = scores >= self.cosine_better_than_threshold
+        rows, scores = rows[keep].tolist(), scores[keep].tolist()
+        if not rows:
+            return []
+        placeholders = ",".join("?" * len(rows))
+        records = {
+            row: (id, json.loads(data))
+            for row, id, data in self._conn.execute(
+                f"SELECT row, id, data FROM vectors WHERE deleted = 0 AND row IN ({placeholders})", rows
+            )
+        }
+        return [
+            {**records[row][1], "id": records[row][0], "distance": score}
+            for row, score in zip(rows, scores)
+            if row in records
+        ]
+
+    async def delete_entity(self, entity_name: str):
+        try:
+            rows = self._live_rows_for_ids([compute_mdhash_id(entity_name, prefix="ent-")])
+            if rows:
+                self._tombstone(list(rows))
+                logger.info(f"Entity {entity_name} have been deleted.")
+            else:
+                logger.info(f"No entity found with name {entity_name}.")
+        except Exception as e:
+            logger.error(f"Error while deleting entity {entity_name}: {e}")
+
+    async def delete_relation(self, entity_name: str):
+        try:
+            rows = [
+                row
+                for (row,) in self._conn.execute(
+                    """SELECT row FROM vectors WHERE deleted = 0
+                       AND (json_extract(data, '$.src_id') = ? OR json_extract(data, '$.tgt_id') = ?)""",
+                    (entity_name, entity_name),
+                )
+            ]
+            if rows:
+                self._tombstone(rows)
+                logger.info(
+                    f"All relations related to entity {entity_name} have been deleted."
+                )
+            else:
+                logger.info(f"No relations found for entity {entity_name}.")
+        except Exception as e:
+            logger.error(
+                f"Error while deleting relations for entity {entity_name}: {e}"
+            )
+
+    def compact(self):
+        """Rewrite the live rows into the next generation file and renumber them."""
+        live = np.flatnonzero(~self._deleted)
+        new_generation = self._generation + 1
+        new_file = f"{self._file_prefix}.{new_generation}.bin"
+        self._write_rows(new_file, 0, np.empty((0, self._dim), dtype=self._dtype))
+        for start in range(0, len(live), self._BLOCK_ROWS):
+            self._write_rows(new_file, start, self._matrix[live[start : start + self._BLOCK_ROWS]])
+        with self._conn:
+            self._conn.execute("DELETE FROM vectors WHERE deleted = 1")
+            # ascending order keeps every target row free when it is assigned
+            self._conn.executemany(
+                "UPDATE vectors SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)",
+                (str(new_generation),),
+            )
+        old_file = self._data_file
+        self._generation = new_generation
+        self._rows = len(live)
+        self._deleted = np.zeros(self._rows, dtype=bool)
+        self._open_matrix()
+        if os.path.exists(old_file):
+            os.remove(old_file)
+        self._index = None
+        if os.path.exists(f"{self._file_prefix}.hnsw"):
+            os.remove(f"{self._file_prefix}.hnsw")
+        logger.info(f"Compacted {self.namespace} to {self._rows} vectors")
+
+    async def index_done_callback(self):
+        if self._rows and self._deleted.sum() >= self._COMPACT_RATIO * self._rows:
+            self.compact()
+        if self._index is not None and self._index_dirty:
+            self._index.save_index(f"{self._file_prefix}.hnsw")
+            self._set_meta(hnsw_state=f"{self._generation}:{self._rows}")
+            self._index_dirty = False
+
+
 @dataclass
 class NetworkXStorage(BaseGraphStorage):
     @staticmethod
@@ -254,6 +889,12 @@ class NetworkXStorage(BaseGraphStorage):
     async def index_done_callback(self):
         NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
 
+    def export_graphml(self, file_name: Union[str, None] = None) -> str:
+        """Write the current graph as GraphML, by default to graph_<ns>.graphml"""
+        file_name = file_name or self._graphml_xml_file
+        NetworkXStorage.write_nx_graph(self._graph, file_name)
+        return file_name
+
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
 
@@ -341,3 +982,193 @@ class NetworkXStorage(BaseGraphStorage):
         }
         logger.info(f"NetworkX graph stats: {stats}")
         return stats
+
+
+@dataclass
+class NetworkXBinaryStorage(NetworkXStorage):
+    """NetworkX graph persisted as a binary snapshot plus an append-only delta log.
+
+    ``graph_<ns>.snapshot`` holds the node list and the edges as integer
+    source/target columns; every ``index_done_callback`` appends the node and
+    edge changes since the last call to ``graph_<ns>.delta`` as one frame, so
+    persisting an insert batch costs O(delta). The log is replayed on load and
+    folded into a new snapshot once it outgrows ``_COMPACT_RATIO`` of it.
+    GraphML is only written by ``export_graphml``; an existing
+    ``graph_<ns>.graphml`` is imported when there is no snapshot yet.
+    """
+
+    _COMPACT_RATIO = 0.5
+    _COMPACT_MIN_BYTES = 1 << 20
+    _SNAPSHOT_VERSION = 1
+    _FRAME_HEADER = struct.Struct("<I")
+
+    def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._graphml_xml_file = os.path.join(
+            working_dir, f"graph_{self.namespace}.graphml"
+        )
+        self._snapshot_file = os.path.join(
+            working_dir, f"graph_{self.namespace}.snapshot"
+        )
+        self._delta_file = os.path.join(working_dir, f"graph_{self.namespace}.delta")
+        self._pending: list[tuple] = []
+
+        self._graph = self._load_snapshot()
+        imported = False
+        if self._graph is None:
+            self._graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
+            imported = self._graph is not None
+            self._graph = self._graph or nx.Graph()
+        replayed = self._replay_delta()
+        if imported:
+            self._compact()
+        logger.info(
+            f"Loaded graph {self.namespace} with {self._graph.number_of_nodes()} nodes, "
+            f"{self._graph.number_of_edges()} edges ({replayed} delta frames replayed)"
+        )
+        self._node_embed_algorithms = {
+            "node2vec": self._node2vec_embed,
+        }
+
+    def _load_snapshot(self) -> Union[nx.Graph, None]:
+        if not os.path.exists(self._snapshot_file):
+            return None
+        with open(self._snapshot_file, "rb") as f:
+            snapshot = pickle.load(f)
+        graph = nx.Graph()
+        nodes = snapshot["nodes"]
+        graph.add_nodes_from(zip(nodes, snapshot["node_attrs"]))
+        graph.add_edges_from(
+            (nodes[src], nodes[tgt], attrs)
+            for src, tgt, attrs in zip(
+                snapshot["edge_src"], snapshot["edge_tgt"], snapshot["edge_attrs"]
+            )
+        )
+        return graph
+
+    def _write_snapshot(self):
+        nodes = list(self._graph.nodes)
+        position = {node: i for i, node in enumerate(nodes)}
+        edges = list(self._graph.edges(data=True))
+        snapshot = {
+            "version": self._SNAPSHOT_VERSION,
+            "nodes": nodes,
+            "node_attrs": [self._graph.nodes[node] for node in nodes],
+            "edge_src": array("I", (position[src] for src, _, _ in edges)),
+            "edge_tgt": array("I", (position[tgt] for _, tgt, _ in edges)),
+            "edge_attrs": [attrs for _, _, attrs in edges],
+        }
+        tmp_file = f"{self._snapshot_file}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self._snapshot_file)
+
+    def _apply(self, ops: list[tuple]):
+        for op in ops:
+            if op[0] == "node":
+                self._graph.add_node(op[1], **op[2])
+            elif op[0] == "edge":
+                self._graph.add_edge(op[1], op[2], **op[3])
+            elif op[0] == "delete_node" and self._graph.has_node(op[1]):
+                self._graph.remove_node(op[1])
+
+    def _replay_delta(self) -> int:
+        """Apply the delta log; a torn last frame from a crash is cut off"""
+        if not os.path.exists(self._delta_file):
+            return 0
+        frames = 0
+        with open(self._delta_file, "r+b") as f:
+            data = f.read()
+            offset = 0
+            while offset < len(data):
+                end = offset + self._FRAME_HEADER.size
+                if end > len(data):
+                    break
+                (length,) = self._FRAME_HEADER.unpack_from(data, offset)
+                if end + length > len(data):
+                    break
+                try:
+                    ops = pickle.loads(data[end : end + length])
+                except Exception as e:
+                    logger.warning(f"Unreadable frame in {self._delta_file}: {e}")
+                    break
+                self._apply(ops)
+                frames += 1
+                offset = end + length
+            if offset < len(data):
+                logger.warning(
+                    f"Truncating {len(data) - offset} bytes of incomplete delta log {self._delta_file}"
+                )
+                f.truncate(offset)
+        return frames
+
+    def _compact(self):
+        """Fold the delta log into a new snapshot"""
+        self._write_snapshot()
+        # replaying the old log over the new snapshot is harmless, so a crash here loses nothing
+        with open(self._delta_file, "wb") as f:
+            os.fsync(f.fileno())
+        logger.info(
+            f"Compacted graph {self.namespace} to {self._graph.number_of_nodes()} nodes, "
+            f"{self._graph.number_of_edges()} edges"
+        )
+
+    async def index_done_callback(self):
+        if self._pending:
+            frame = pickle.dumps(self._pending, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(self._delta_file, "ab") as f:
+                f.write(self._FRAME_HEADER.pack(len(frame)) + frame)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending = []
+        delta_size = (
+            os.path.getsize(self._delta_file) if os.path.exists(self._delta_file) else 0
+        )
+        snapshot_size = (
+            os.path.getsize(self._snapshot_file)
+            if os.path.exists(self._snapshot_file)
+            else 0
+        )
+        if delta_size > max(self._COMPACT_MIN_BYTES, self._COMPACT_RATIO * snapshot_size):
+            self._compact()
+
+    def _record_node(self, node_id: str):
+        self._pending.append(("node", node_id, dict(self._graph.nodes[node_id])))
+
+    def _record_edge(self, source_node_id: str, target_node_id: str):
+        self._pending.append(
+            (
+                "edge",
+                source_node_id,
+                target_node_id,
+                dict(self._graph.edges[source_node_id, target_node_id]),
+            )
+        )
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]):
+        await super().upsert_node(node_id, node_data)
+        self._record_node(node_id)
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ):
+        await super().upsert_edge(source_node_id, target_node_id, edge_data)
+        self._record_edge(source_node_id, target_node_id)
+
+    async def delete_node(self, node_id: str):
+        existed = self._graph.has_node(node_id)
+        await super().delete_node(node_id)
+        if existed:
+            self._pending.append(("delete_node", node_id))
+
+    async def batch_upsert_nodes(self, nodes_data: list):
+        await super().batch_upsert_nodes(nodes_data)
+        for node in nodes_data:
+            self._record_node(node["node_id"])
+
+    async def batch_upsert_edges(self, edges_data: list):
+        await super().batch_upsert_edges(edges_data)
+        for edge in edges_data:
+            self._record_edge(edge["source_node_id"], edge["target_node_id"])
@@ -1,11 +1,17 @@
 import asyncio
+import base64
+import contextvars
+import heapq
 import html
 import io
 import csv
+import itertools
 import json
 import logging
 import os
 import re
+import time
+from contextlib import asynccontextmanager, contextmanager
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
@@ -111,23 +117,112 @@ def compute_mdhash_id(content, prefix: str = ""):
     return prefix + md5(content.encode()).hexdigest()
 
 
+# Lower values are served first; query-time calls preempt bulk insert-time calls.
+PRIORITY_QUERY = 0
+PRIORITY_INSERT = 10
+
+_call_priority: contextvars.ContextVar[int] = contextvars.ContextVar(
+    "hypergraphrag_call_priority", default=PRIORITY_INSERT
+)
+
+
+@contextmanager
+def call_priority(priority: int):
+    """Run limited calls made in this context (and tasks it spawns) at ``priority``"""
+    token = _call_priority.set(priority)
+    try:
+        yield
+    finally:
+        _call_priority.reset(token)
+
+
+class PriorityLimiter:
+    """At most ``max_size`` concurrent holders; waiters are woken by priority, then FIFO.
+
+    Futures are created from the running loop on demand, so the limiter is not
+    bound to the loop it was created in.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max(1, max_size)
+        self._active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._acquired = 0
+        self._waited = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    async def acquire(self, priority: int = PRIORITY_INSERT):
+        if self._active < self.max_size and not self._waiters:
+            self._active += 1
+            self._acquired += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # the slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        wait = time.perf_counter() - start
+        self._acquired += 1
+        self._waited += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+
+    def release(self):
+        self._active -= 1
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # hand the slot straight to the waiter so nobody can overtake it
+                self._active += 1
+                future.set_result(None)
+                break
+
+    @asynccontextmanager
+    async def slot(self, priority: Union[int, None] = None):
+        await self.acquire(_call_priority.get() if priority is None else priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> dict:
+        queued = [p for p, _, future in self._waiters if not future.done()]
+        return {
+            "max_size": self.max_size,
+            "active": self._active,
+            "queue_depth": len(queued),
+            "queue_depth_by_priority": {p: queued.count(p) for p in sorted(set(queued))},
+            "acquired": self._acquired,
+            "waited": self._waited,
+            "avg_wait_seconds": self._total_wait / self._waited if self._waited else 0.0,
+            "max_wait_seconds": self._max_wait,
+        }
+
+
 def limit_async_func_call(max_size: int, waitting_time: float = 0.0001):
-    """Add restriction of maximum async calling times for a async func"""
+    """Add restriction of maximum async calling times for a async func
+
+    Calls wait on a PriorityLimiter (exposed as ``.limiter`` on the wrapper) at
+    the priority set with ``call_priority``; ``waitting_time`` is kept for
+    backward compatibility and no longer used.
+    """
 
     def final_decro(func):
-        """Not using async.Semaphore to aovid use nest-asyncio"""
-        __current_size = 0
+        limiter = PriorityLimiter(max_size)
 
         @wraps(func)
         async def wait_func(*args, **kwargs):
-            nonlocal __current_size
-            while __current_size >= max_size:
-                await asyncio.sleep(waitting_time)
-            __current_size += 1
-            result = await func(*args, **kwargs)
-            __current_size -= 1
-            return result
+            async with limiter.slot():
+                return await func(*args, **kwargs)
 
+        wait_func.limiter = limiter
         return wait_func
 
     return final_decro
@@ -339,37 +434,19 @@ async def get_best_cached_response(
     llm_func=None,
     original_prompt=None,
 ) -> Union[str, None]:
-    # Get mode-specific cache
-    mode_cache = await hashing_kv.get_by_id(mode)
-    if not mode_cache:
+    index = get_embedding_cache_index(hashing_kv, mode)
+    if not index.loaded:
+        # built from the stored entries once; save_to_cache keeps it current
+        index.sync(await hashing_kv.get_entries(mode))
+        index.loaded = True
+    best_cache_id, best_similarity = index.best_match(current_embedding)
+    if best_cache_id is None:
         return None
-
-    best_similarity = -1
-    best_response = None
-    best_prompt = None
-    best_cache_id = None
-
-    # Only iterate through cache entries for this mode
-    for cache_id, cache_data in mode_cache.items():
-        if cache_data["embedding"] is None:
-            continue
-
-        # Convert cached embedding list to ndarray
-        cached_quantized = np.frombuffer(
-            bytes.fromhex(cache_data["embedding"]), dtype=np.uint8
-        ).reshape(cache_data["embedding_shape"])
-        cached_embedding = dequantize_embedding(
-            cached_quantized,
-            cache_data["embedding_min"],
-            cache_data["embedding_max"],
-        )
-
-        similarity = cosine_similarity(current_embedding, cached_embedding)
-        if similarity > best_similarity:
-            best_similarity = similarity
-            best_response = cache_data["return"]
-            best_prompt = cache_data["original_prompt"]
-            best_cache_id = cache_id
+    best_entry = await hashing_kv.get_entry(mode, best_cache_id)
+    if best_entry is None:
+        return None
+    best_response = best_entry["return"]
+    best_prompt = best_entry["original_prompt"]
 
     if best_similarity > similarity_threshold:
         # If LLM check is enabled and all required parameters are provided
@@ -447,6 +524,157 @@ def dequantize_embedding(
     return (quantized * scale + min_val).astype(np.float32)
 
 
+def encode_cached_embedding(quantized: np.ndarray) -> str:
+    """Serialize a quantized embedding for the LLM cache as base64 of its raw bytes"""
+    return base64.b64encode(quantized.astype(np.uint8).tobytes()).decode("ascii")
+
+
+def decode_cached_embedding(cache_data: dict) -> np.ndarray:
+    """Raw uint8 bytes of a cached embedding, written as base64 or (older caches) hex"""
+    if cache_data.get("embedding_encoding") == "base64":
+        raw = base64.b64decode(cache_data["embedding"])
+    else:
+        raw = bytes.fromhex(cache_data["embedding"])
+    return np.frombuffer(raw, dtype=np.uint8)
+
+
+class EmbeddingCacheIndex:
+    """In-memory matrix of the quantized query embeddings cached for one mode.
+
+    Rows stay uint8; cosine similarity is computed on the fly from
+    x = scale * q + min, so a lookup is a few blocked matrix-vector products
+    instead of decoding and comparing every entry in Python.
+    """
+
+    # small enough that each float32 copy of a block stays in cache
+    _BLOCK_ROWS = 4096
+
+    def __init__(self, bits: int = 8):
+        self._levels = 2**bits - 1
+        # set once the entries already in storage have been indexed
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._dim = None
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._seen: set[str] = set()
+        self._quantized = np.empty((0, 0), dtype=np.uint8)
+        self._scale = np.empty(0, dtype=np.float32)
+        self._offset = np.empty(0, dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _reserve(self, extra: int):
+        needed = len(self._ids) + extra
+        if needed <= len(self._scale):
+            return
+        capacity = max(needed, 2 * len(self._scale), 64)
+        quantized = np.zeros((capacity, self._dim), dtype=np.uint8)
+        quantized[: len(self._ids)] = self._quantized[: len(self._ids)]
+        self._quantized = quantized
+        for name in ("_scale", "_offset", "_norms"):
+            grown = np.zeros(capacity, dtype=np.float32)
+            grown[: len(self._ids)] = getattr(self, name)[: len(self._ids)]
+            setattr(self, name, grown)
+
+    def mark_seen(self, cache_ids: list[str]):
+        """Record entries that have no embedding, so sync does not revisit them"""
+        self._seen.update(cache_ids)
+
+    def add_many(self, cache_ids: list[str], quantized: np.ndarray, min_vals, max_vals):
+        """Add or replace rows; ``quantized`` is an (n, dim) uint8 matrix"""
+        self._seen.update(cache_ids)
+        if not len(cache_ids):
+            return
+        quantized = np.asarray(quantized, dtype=np.uint8).reshape(len(cache_ids), -1)
+        if self._dim is None:
+            self._dim = quantized.shape[1]
+            self._quantized = np.empty((0, self._dim), dtype=np.uint8)
+        if quantized.shape[1] != self._dim:
+            logger.warning(
+                f"Skip {len(cache_ids)} cached embeddings of dimension {quantized.shape[1]} != {self._dim}"
+            )
+            return
+        offset = np.asarray(min_vals, dtype=np.float32)
+        scale = (np.asarray(max_vals, dtype=np.float32) - offset) / self._levels
+        norms = np.linalg.norm(
+            quantized * scale[:, None] + offset[:, None], axis=1
+        ).astype(np.float32)
+        # a zero vector matches nothing instead of dividing by zero
+        norms[norms == 0] = np.inf
+
+        self._reserve(len(cache_ids))
+        for i, cache_id in enumerate(cache_ids):
+            row = self._rows.get(cache_id)
+            if row is None:
+                row = self._rows[cache_id] = len(self._ids)
+                self._ids.append(cache_id)
+            self._quantized[row] = quantized[i]
+            self._scale[row] = scale[i]
+            self._offset[row] = offset[i]
+            self._norms[row] = norms[i]
+
+    def sync(self, mode_cache: dict):
+        """Index the entries of ``mode_cache`` that this index has not seen yet"""
+        if len(mode_cache) == len(self._seen):
+            return
+        if not self._seen.issubset(mode_cache):
+            self._reset()
+        cache_ids, quantized, min_vals, max_vals = [], [], [], []
+        for cache_id, cache_data in mode_cache.items():
+            if cache_id in self._seen:
+                continue
+            if cache_data.get("embedding") is None:
+                self.mark_seen([cache_id])
+                continue
+            cache_ids.append(cache_id)
+            quantized.append(decode_cached_embedding(cache_data))
+            min_vals.append(cache_data["embedding_min"])
+            max_vals.append(cache_data["embedding_max"])
+        if not cache_ids:
+            return
+        dims = {len(q) for q in quantized}
+        for dim in dims:
+            picked = [i for i, q in enumerate(quantized) if len(q) == dim]
+            self.add_many(
+                [cache_ids[i] for i in picked],
+                np.stack([quantized[i] for i in picked]),
+                [min_vals[i] for i in picked],
+                [max_vals[i] for i in picked],
+            )
+
+    def best_match(self, embedding) -> tuple[Union[str, None], float]:
+        """Id and cosine similarity of the most similar cached embedding"""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        embedding_norm = np.linalg.norm(embedding)
+        if not self._ids or len(embedding) != self._dim or embedding_norm == 0:
+            return None, -1
+        embedding_sum = embedding.sum()
+        best_row, best_similarity = None, -1
+        for start in range(0, len(self._ids), self._BLOCK_ROWS):
+            stop = min(start + self._BLOCK_ROWS, len(self._ids))
+            dots = self._quantized[start:stop].astype(np.float32) @ embedding
+            similarities = (
+                self._scale[start:stop] * dots + self._offset[start:stop] * embedding_sum
+            ) / (self._norms[start:stop] * embedding_norm)
+            row = int(np.argmax(similarities))
+            if similarities[row] > best_similarity:
+                best_row, best_similarity = start + row, float(similarities[row])
+        return self._ids[best_row], best_similarity
+
+
+def get_embedding_cache_index(hashing_kv, mode: str) -> EmbeddingCacheIndex:
+    """The embedding index kept alongside ``hashing_kv`` for ``mode``, created on first use"""
+    indexes = hashing_kv.__dict__.setdefault("_embedding_cache_indexes", {})
+    if mode not in indexes:
+        indexes[mode] = EmbeddingCacheIndex()
+    return indexes[mode]
+
+
 async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
     """Generic cache handling function"""
     if hashing_kv is None:
@@ -454,9 +682,9 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
 
     # For naive mode, only use simple cache matching
     if mode == "naive":
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        cached = await hashing_kv.get_entry(mode, args_hash)
+        if cached is not None:
+            return cached["return"], None, None, None
         return None, None, None, None
 
     # Get embedding cache configuration
@@ -488,9 +716,9 @@ async def handle_cache(hashing_kv, args_hash, prompt, mode="default"):
             return best_cached_response, None, None, None
     else:
         # Use regular cache
-        mode_cache = await hashing_kv.get_by_id(mode) or {}
-        if args_hash in mode_cache:
-            return mode_cache[args_hash]["return"], None, None, None
+        cached = await hashing_kv.get_entry(mode, args_hash)
+        if cached is not None:
+            return cached["return"], None, None, None
 
     return None, quantized, min_val, max_val
 
@@ -510,22 +738,31 @@ async def save_to_cache(hashing_kv, cache_data: CacheData):
     if hashing_kv is None or hasattr(cache_data.content, "__aiter__"):
         return
 
-    mode_cache = await hashing_kv.get_by_id(cache_data.mode) or {}
-
-    mode_cache[cache_data.args_hash] = {
+    has_embedding = cache_data.quantized is not None
+    entry = {
         "return": cache_data.content,
-        "embedding": cache_data.quantized.tobytes().hex()
-        if cache_data.quantized is not None
-        else None,
-        "embedding_shape": cache_data.quantized.shape
-        if cache_data.quantized is not None
+        "embedding": encode_cached_embedding(cache_data.quantized)
+        if has_embedding
         else None,
-        "embedding_min": cache_data.min_val,
-        "embedding_max": cache_data.max_val,
+        "embedding_encoding": "base64" if has_embedding else None,
+        "embedding_shape": cache_data.quantized.shape if has_embedding else None,
+        "embedding_min": float(cache_data.min_val) if has_embedding else None,
+        "embedding_max": float(cache_data.max_val) if has_embedding else None,
         "original_prompt": cache_data.prompt,
     }
 
-    await hashing_kv.upsert({cache_data.mode: mode_cache})
+    index = get_embedding_cache_index(hashing_kv, cache_data.mode)
+    if has_embedding:
+        index.add_many(
+            [cache_data.args_hash],
+            cache_data.quantized[None, :],
+            [cache_data.min_val],
+            [cache_data.max_val],
+        )
+    else:
+        index.mark_seen([cache_data.args_hash])
+
+    await hashing_kv.upsert_entries(cache_data.mode, {cache_data.args_hash: entry})
 
 
 def safe_unicode_decode(content):
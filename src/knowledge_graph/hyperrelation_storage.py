@@ -14,7 +14,6 @@ import logging
 
 import chromadb
 from neo4j import GraphDatabase
-from sentence_transformers import SentenceTransformer
 
 # Add project root to sys.path to import other modules
 import sys
@@ -22,6 +21,8 @@ from pathlib import Path
 project_root = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(project_root))
 from src.core.config_loader import get_config
+from src.core.embedding_models import get_embedding_worker
+from src.core.embedding_store import encode_texts
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,10 @@ class HyperRelationStorage:
             metadata={"hnsw:space": "cosine"}
         )
         
-        print(f"正在加载嵌入模型: {model_name}")
+        print(f"使用共享嵌入模型: {model_name} (首次编码时加载)")
         print(f"使用缓存目录: {model_cache_dir}")
-        self.embedding_model = SentenceTransformer(model_name, cache_folder=model_cache_dir)
+        self.embedding_model_name = model_name
+        self.embedding_model = get_embedding_worker(model_name, model_cache_dir)
         
         self._create_neo4j_indexes()
     
@@ -127,7 +129,7 @@ class HyperRelationStorage:
     def _store_to_chromadb(self, hyperrel_id: str, data: Dict[str, Any]):
         """存储超关系到ChromaDB"""
         text_description = self._generate_text_description(data)
-        embedding = self.embedding_model.encode(text_description)
+        embedding = encode_texts([text_description], self.embedding_model_name, self.embedding_model.encode)[0]
         self.chroma_collection.add(
             ids=[hyperrel_id],
             embeddings=[embedding.tolist()],
@@ -151,7 +153,7 @@ class HyperRelationStorage:
     
     def semantic_search(self, query: str, top_k: int = 10) -> List[Dict[str, Any]]:
         """语义检索超关系"""
-        query_vector = self.embedding_model.encode(query)
+        query_vector = encode_texts([query], self.embedding_model_name, self.embedding_model.encode)[0]
         results = self.chroma_collection.query(
             query_embeddings=[query_vector.tolist()], n_results=top_k
         )
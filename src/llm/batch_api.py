@@ -0,0 +1,283 @@
+# src/llm/batch_api.py
+"""
+Support for OpenAI-compatible Batch APIs.
+
+A batch job uploads a JSONL file of chat completion requests, each tagged with a
+`custom_id` (the master_state record id), lets the provider process it
+asynchronously (typically at a discount and outside the online rate limits), and
+downloads a JSONL file of results that are mapped back by `custom_id`.
+
+Every step is recorded in a JSON manifest under the job directory:
+
+    <job_dir>/<name>/manifest.json   # input_file_id, batch_id, status, ...
+    <job_dir>/<name>/input.jsonl     # the submitted requests
+    <job_dir>/<name>/output.jsonl    # downloaded results (and errors)
+
+so a process that is restarted picks up the existing batch instead of
+submitting (and paying for) the same requests again. The manifest also lists
+the job's record ids, which is how `record_jobs` maps a record back to the job
+it was submitted in. A job that ends expired, failed or cancelled is moved to
+`<job_dir>/archive/` when it is next submitted, and only the requests it left
+without a result are sent again under the same name.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+DEFAULT_JOB_DIR = "output/batches"
+DEFAULT_POLL_INTERVAL_SECONDS = 60
+DEFAULT_COMPLETION_WINDOW = "24h"
+CHAT_COMPLETIONS_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def completion_window_seconds(completion_window: str) -> float:
+    """Converts a completion window such as "24h" (or "30m", "2d") to seconds."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", completion_window)
+    if not match:
+        raise ValueError(f"Unrecognized completion window '{completion_window}'.")
+    value, unit = match.groups()
+    return float(value) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[unit or "s"]
+
+
+class BatchJobRunner:
+    """Submits, polls and collects batch jobs through an AsyncOpenAI-compatible client."""
+
+    def __init__(
+        self,
+        client: Any,
+        job_dir: str | Path = DEFAULT_JOB_DIR,
+        poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+        completion_window: str = DEFAULT_COMPLETION_WINDOW,
+        endpoint: str = CHAT_COMPLETIONS_ENDPOINT,
+    ):
+        """
+        Initializes the runner.
+
+        Args:
+            client: An AsyncOpenAI client (anything exposing `files` and `batches`).
+            job_dir: Directory holding one sub-directory per job.
+            poll_interval: Seconds between status checks.
+            completion_window: Completion window requested from the provider.
+            endpoint: The endpoint the batched requests are sent to.
+        """
+        self.client = client
+        self.job_dir = Path(job_dir)
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.endpoint = endpoint
+
+    def _job_path(self, name: str) -> Path:
+        return self.job_dir / name
+
+    def record_jobs(self, prefix: str) -> Dict[str, str]:
+        """
+        Maps each record id to the job it was submitted in, for the jobs named
+        `<prefix>-<id>` that have not been consumed yet (see `mark_consumed`).
+        """
+        pattern = re.compile(re.escape(prefix) + r"-[0-9a-f]{12}")
+        assignments = {}
+        if not self.job_dir.is_dir():
+            return assignments
+        for job_path in sorted(self.job_dir.iterdir()):
+            if not pattern.fullmatch(job_path.name):
+                continue
+            manifest = self.load_manifest(job_path.name)
+            if manifest is None or manifest.get("consumed"):
+                continue
+            for record_id in self._record_ids(manifest):
+                assignments[record_id] = job_path.name
+        return assignments
+
+    def _record_ids(self, manifest: Dict[str, Any]) -> list[str]:
+        """Returns a job's record ids; manifests written before they were recorded fall back to the input file."""
+        if "record_ids" in manifest:
+            return manifest["record_ids"]
+        with open(manifest["input_path"], "r", encoding="utf-8") as f:
+            return [json.loads(line)["custom_id"] for line in f if line.strip()]
+
+    def mark_consumed(self, name: str):
+        """Marks a collected job as handed to the caller, so `record_jobs` no longer assigns its records to it."""
+        manifest = self.load_manifest(name)
+        if manifest is not None and not manifest.get("consumed"):
+            manifest["consumed"] = True
+            self._save_manifest(name, manifest)
+
+    def _archive(self, name: str, manifest: Dict[str, Any]) -> Path:
+        """Moves a finished job's directory under `archive/` and returns its new path."""
+        archive_dir = self.job_dir / "archive"
+        archive_dir.mkdir(parents=True, exist_ok=True)
+        archived_path = archive_dir / f"{name}.{manifest['status']}-{int(time.time() * 1000)}"
+        os.replace(self._job_path(name), archived_path)
+        return archived_path
+
+    def load_manifest(self, name: str) -> Dict[str, Any] | None:
+        """Returns the saved manifest for a job, or None if it was never started."""
+        manifest_path = self._job_path(name) / "manifest.json"
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self, name: str, manifest: Dict[str, Any]):
+        """Writes the manifest atomically so a crash never leaves it half-written."""
+        manifest["updated_at"] = time.time()
+        manifest_path = self._job_path(name) / "manifest.json"
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    def write_input_file(self, name: str, requests: Dict[str, Dict[str, Any]]) -> Path:
+        """Writes the batch input JSONL: one request line per custom_id."""
+        job_path = self._job_path(name)
+        job_path.mkdir(parents=True, exist_ok=True)
+        input_path = job_path / "input.jsonl"
+        with open(input_path, "w", encoding="utf-8") as f:
+            for custom_id, body in requests.items():
+                line = {"custom_id": custom_id, "method": "POST", "url": self.endpoint, "body": body}
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        return input_path
+
+    async def submit(self, name: str, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Uploads the input file and creates the batch, resuming from whatever
+        step a previous run of the same job reached.
+
+        If the previous batch ended without completing (expired, failed or
+        cancelled), its partial results are kept, the job is archived, and
+        the requests still lacking a result are submitted as a new batch.
+        """
+        manifest = self.load_manifest(name)
+        archived_jobs = []
+        if manifest is not None and manifest["status"] in TERMINAL_STATUSES - {"completed"}:
+            answered = {custom_id for custom_id, result in (await self.collect(name)).items()
+                        if result["content"] is not None}
+            archived_jobs = manifest.get("archived_jobs", []) + [str(self._archive(name, manifest))]
+            print(f"Batch job '{name}' ended with status '{manifest['status']}'; "
+                  f"resubmitting the requests it left without a result.")
+            requests = {custom_id: body for custom_id, body in requests.items() if custom_id not in answered}
+            manifest = None
+
+        if manifest is None:
+            input_path = self.write_input_file(name, requests)
+            manifest = {
+                "name": name,
+                "status": "created",
+                "request_count": len(requests),
+                "record_ids": list(requests),
+                "input_path": str(input_path),
+                "archived_jobs": archived_jobs,
+                "created_at": time.time(),
+            }
+            if not requests:
+                # Everything was answered by the archived attempts; there is nothing left to submit.
+                manifest["status"] = "completed"
+            self._save_manifest(name, manifest)
+            if not requests:
+                return manifest
+
+        if not manifest.get("input_file_id"):
+            with open(manifest["input_path"], "rb") as f:
+                uploaded = await self.client.files.create(file=f, purpose="batch")
+            manifest["input_file_id"] = uploaded.id
+            self._save_manifest(name, manifest)
+
+        if not manifest.get("batch_id"):
+            batch = await self.client.batches.create(
+                input_file_id=manifest["input_file_id"],
+                endpoint=self.endpoint,
+                completion_window=self.completion_window,
+                metadata={"job_name": name},
+            )
+            manifest["batch_id"] = batch.id
+            manifest["status"] = batch.status
+            self._save_manifest(name, manifest)
+            print(f"Submitted batch job '{name}' ({manifest['request_count']} requests) as {batch.id}.")
+        else:
+            print(f"Resuming batch job '{name}' ({manifest['batch_id']}, last status '{manifest['status']}').")
+        return manifest
+
+    async def wait(self, name: str) -> Dict[str, Any]:
+        """Polls the batch until it reaches a terminal status."""
+        manifest = self.load_manifest(name)
+        while manifest["status"] not in TERMINAL_STATUSES:
+            batch = await self.client.batches.retrieve(manifest["batch_id"])
+            counts = getattr(batch, "request_counts", None)
+            if batch.status != manifest["status"] or counts is not None:
+                progress = f" ({counts.completed}/{counts.total} done)" if counts is not None else ""
+                print(f"Batch job '{name}': {batch.status}{progress}")
+            manifest["status"] = batch.status
+            manifest["output_file_id"] = getattr(batch, "output_file_id", None)
+            manifest["error_file_id"] = getattr(batch, "error_file_id", None)
+            self._save_manifest(name, manifest)
+            if manifest["status"] not in TERMINAL_STATUSES:
+                await asyncio.sleep(self.poll_interval)
+        return manifest
+
+    async def collect(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Downloads (once) and parses the results of a finished batch.
+
+        Results from archived attempts of the job are included, overridden by
+        those of the latest attempt.
+
+        Returns:
+            A dict mapping custom_id to `{"content": str | None, "error": str | None}`.
+            Requests without a result line (e.g. an expired batch) are absent.
+        """
+        manifest = self.load_manifest(name)
+        output_path = self._job_path(name) / "output.jsonl"
+        if not manifest.get("output_path"):
+            with open(output_path, "w", encoding="utf-8") as f:
+                for file_id in (manifest.get("output_file_id"), manifest.get("error_file_id")):
+                    if file_id:
+                        content = await self.client.files.content(file_id)
+                        text = content.text
+                        f.write(text if text.endswith("\n") or not text else text + "\n")
+            manifest["output_path"] = str(output_path)
+            self._save_manifest(name, manifest)
+
+        results = {}
+        output_paths = [Path(path) / "output.jsonl" for path in manifest.get("archived_jobs", [])]
+        for path in output_paths + [Path(manifest["output_path"])]:
+            if not path.exists():
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        item = json.loads(line)
+                        result = _parse_result_line(item)
+                        if result["content"] is not None or item["custom_id"] not in results:
+                            results[item["custom_id"]] = result
+        return results
+
+    async def run(self, name: str, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Submits (or resumes) a job, waits for it and returns its results."""
+        await self.submit(name, requests)
+        return await self.finish(name)
+
+    async def finish(self, name: str) -> Dict[str, Dict[str, Any]]:
+        """Waits for a submitted job and returns its results."""
+        manifest = await self.wait(name)
+        if manifest["status"] != "completed":
+            print(f"Batch job '{name}' ended with status '{manifest['status']}'; collecting partial results.")
+        return await self.collect(name)
+
+
+def _parse_result_line(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Extracts the message content or an error description from one output line."""
+    if item.get("error"):
+        return {"content": None, "error": json.dumps(item["error"], ensure_ascii=False)}
+    response = item.get("response") or {}
+    if response.get("status_code", 200) != 200:
+        return {"content": None, "error": f"HTTP {response.get('status_code')}: {json.dumps(response.get('body'), ensure_ascii=False)}"}
+    try:
+        return {"content": response["body"]["choices"][0]["message"]["content"], "error": None}
+    except (KeyError, IndexError, TypeError):
+        return {"content": None, "error": "Malformed batch result line."}
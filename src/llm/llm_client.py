@@ -9,8 +9,19 @@ import os
 import json
 import re
 import ast # Import the ast module
-from openai import AsyncOpenAI, APIError
-from typing import Dict, Any, Literal
+import asyncio
+import time
+import uuid
+from openai import (
+    AsyncOpenAI,
+    APIError,
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from collections import Counter
+from typing import Dict, Any, AsyncIterator, Callable, Iterable, Literal
 
 # Add project root to sys.path
 import sys
@@ -19,6 +30,19 @@ project_root = Path(__file__).resolve().parents[2]
 sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import get_config
+from src.llm.response_cache import LLMResponseCache, compute_cache_key
+from src.llm.batch_api import BatchJobRunner
+from src.llm.stream_parser import IncrementalJSONArrayParser, MalformedStreamError, StreamBudgetExceededError
+from src.event_extraction.json_parser import EnhancedJSONParser
+from src.llm.rate_limiter import (
+    RateLimiter,
+    compute_backoff_delay,
+    estimate_text_tokens,
+    estimate_tokens,
+    get_rate_limiter,
+    get_rate_limiter_stats,
+    parse_retry_after,
+)
 
 # Define valid task types for type hinting and validation
 TaskType = Literal["triage", "schema_generation", "extraction", "relationship_analysis"]
@@ -35,6 +59,41 @@ class LLMClient:
             raise ValueError("LLM configuration is missing or incomplete in config.yaml.")
         
         self.provider_clients: Dict[str, AsyncOpenAI] = {}
+        # Persistent response cache; None when `llm.cache.enabled` is false.
+        self.response_cache = LLMResponseCache.from_config(self.config.get('cache', {}))
+        # Client-side rate limiting and retry policy (`llm.rate_limiting`).
+        self.rate_limit_config = self.config.get('rate_limiting', {})
+        # Local structured-output parsing; an LLM repair call is the last resort (`llm.json_repair`).
+        self.json_parser = EnhancedJSONParser()
+        self.json_repair_config = self.config.get('json_repair', {})
+        self.json_parse_stats: Counter = Counter()
+        self.streaming_config = self.config.get('streaming', {})
+
+    @property
+    def max_concurrency(self) -> int:
+        """
+        The upper bound on in-flight requests per model. Workflows size their
+        task pools with it and let the adaptive limiter decide the actual level.
+        """
+        return self.rate_limit_config.get('max_concurrency', 32)
+
+    def _get_rate_limiter(self, provider: str, model_name: str, api_params: Dict[str, Any]) -> RateLimiter:
+        """
+        Returns the process-wide limiter for a provider model. RPM/TPM quotas come
+        from the provider's `rate_limits`, overridden by the task's `rate_limits`.
+        """
+        limits = dict(self.config['providers'].get(provider, {}).get('rate_limits') or {})
+        limits.update(api_params.get('rate_limits') or {})
+        return get_rate_limiter(
+            provider,
+            model_name,
+            rpm=limits.get('rpm'),
+            tpm=limits.get('tpm'),
+            initial_concurrency=self.rate_limit_config.get('initial_concurrency', 4),
+            min_concurrency=self.rate_limit_config.get('min_concurrency', 1),
+            max_concurrency=self.max_concurrency,
+            target_latency=limits.get('target_latency_seconds'),
+        )
 
     def _get_client_for_provider(self, provider: str) -> AsyncOpenAI:
         """
@@ -55,24 +114,29 @@ class LLMClient:
             raise ValueError(f"API key for provider '{provider}' not found. "
                              f"Please set the {api_key_env_var} environment variable or add '{config_key_name}' to the provider config.")
         
+        # Retries are handled in get_raw_response so they go through the rate limiter.
         client = AsyncOpenAI(
             api_key=api_key,
-            base_url=provider_config['base_url']
+            base_url=provider_config['base_url'],
+            max_retries=0
         )
         self.provider_clients[provider] = client
         return client
 
-    async def get_raw_response(
-        self, 
+    def _resolve_call_params(
+        self,
         messages: list[dict],
         task_type: TaskType = None,
         provider: str = None,
         model_name: str = None,
         **kwargs
-    ) -> str | None:
+    ) -> tuple[str, Dict[str, Any], Dict[str, Any]]:
         """
-        Sends a list of messages and returns the raw string response from the LLM.
-        Allows for overriding config-based settings with direct parameters.
+        Resolves the provider and the chat completion parameters for a request
+        from the task's config route, explicit overrides and keyword arguments.
+
+        Returns:
+            A tuple (provider, call_params, api_params).
         """
         api_params = {}
         
@@ -97,8 +161,6 @@ class LLMClient:
             raise ValueError("Could not determine provider and model_name. "
                              "Provide a valid task_type or specify provider and model_name directly.")
 
-        print(f"Routing task to provider '{final_provider}' using model '{final_model_name}'...")
-
         # Prepare the final parameters for the API call
         call_params = {
             "model": final_model_name,
@@ -126,11 +188,58 @@ class LLMClient:
                 del call_params['temperature']
                 print("Notice: Both temperature and top_p found. Using top_p sampling and ignoring temperature.")
 
+        return final_provider, call_params, api_params
+
+    async def get_raw_response(
+        self, 
+        messages: list[dict],
+        task_type: TaskType = None,
+        provider: str = None,
+        model_name: str = None,
+        use_cache: bool = True,
+        validate: Callable[[str], bool] | None = None,
+        **kwargs
+    ) -> str | None:
+        """
+        Sends a list of messages and returns the raw string response from the LLM.
+        Allows for overriding config-based settings with direct parameters.
+
+        Identical requests (same provider, model, messages and sampling
+        parameters) are answered from the persistent response cache when it is
+        enabled for the task type; pass `use_cache=False` to force a fresh call.
+        A fresh response is only cached if `validate` (when given) accepts it,
+        so output the caller cannot parse is requested again on a retry.
+
+        Calls go through the shared rate limiter for the model. Throttled (429),
+        timed-out, connection and 5xx errors are retried with exponential backoff
+        and jitter, honouring the provider's Retry-After header.
+        """
+        final_provider, call_params, api_params = self._resolve_call_params(
+            messages, task_type, provider, model_name, **kwargs
+        )
+        final_model_name = call_params['model']
+
+        print(f"Routing task to provider '{final_provider}' using model '{final_model_name}'...")
+
+        cache_key = None
+        if use_cache and self.response_cache and self.response_cache.is_enabled_for(task_type):
+            cache_key = compute_cache_key(final_provider, call_params)
+            cached_response = self.response_cache.get(cache_key, task_type)
+            if cached_response is not None:
+                print(f"Cache hit for task '{task_type}' (model '{final_model_name}').")
+                return cached_response
+
         try:
             client = self._get_client_for_provider(final_provider)
-            response = await client.chat.completions.create(**call_params)
-            return response.choices[0].message.content
-            
+            limiter = self._get_rate_limiter(final_provider, final_model_name, api_params)
+            response = await self._create_with_retries(
+                client, limiter, call_params, estimate_tokens(messages, call_params.get('max_tokens'))
+            )
+            content = response.choices[0].message.content
+            if cache_key and content and (validate is None or validate(content)):
+                self.response_cache.set(cache_key, content, task_type, final_model_name)
+            return content
+
         except APIError as e:
             print(f"An API error occurred with provider '{final_provider}': {e}")
             return None
@@ -140,6 +249,327 @@ class LLMClient:
             traceback.print_exc()
             return None
 
+    async def _create_with_retries(
+        self,
+        client: AsyncOpenAI,
+        limiter: RateLimiter,
+        call_params: Dict[str, Any],
+        estimated_tokens: int,
+    ):
+        """
+        Sends a chat completion request within the limiter, retrying transient
+        failures. The last error is re-raised once retries are exhausted.
+        """
+        max_retries = self.rate_limit_config.get('max_retries', 5)
+
+        for attempt in range(max_retries + 1):
+            async with limiter.limit(estimated_tokens) as permit:
+                try:
+                    response = await client.chat.completions.create(**call_params)
+                    usage = getattr(response, 'usage', None)
+                    if usage is not None and getattr(usage, 'total_tokens', None) is not None:
+                        permit.actual_tokens = usage.total_tokens
+                    return response
+                except RateLimitError as e:
+                    permit.throttled = True
+                    error = e
+                except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+                    permit.failed = True
+                    error = e
+
+            if attempt == max_retries:
+                raise error
+            delay = self._get_retry_delay(error, attempt)
+            print(f"Request to '{call_params['model']}' failed ({type(error).__name__}); "
+                  f"retry {attempt + 1}/{max_retries} in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+
+    def _get_retry_delay(self, error: Exception, attempt: int) -> float:
+        """Returns the provider's Retry-After for throttling errors, else a jittered backoff."""
+        if isinstance(error, RateLimitError):
+            retry_after = parse_retry_after(error.response.headers)
+            if retry_after is not None:
+                return retry_after
+        return compute_backoff_delay(
+            attempt,
+            self.rate_limit_config.get('base_delay_seconds', 1.0),
+            self.rate_limit_config.get('max_delay_seconds', 60.0),
+        )
+
+    async def stream_raw_response(
+        self,
+        messages: list[dict],
+        task_type: TaskType = None,
+        provider: str = None,
+        model_name: str = None,
+        use_cache: bool = True,
+        budget_tokens: int | None = None,
+        validate: Callable[[str], bool] | None = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        Sends a request with `stream=True` and yields the response text in
+        chunks as the model generates them.
+
+        Closing the iterator early (e.g. the caller found the output unusable)
+        closes the HTTP stream, which stops generation. The request is retried
+        like `get_raw_response` only until the first chunk has arrived; later
+        errors are raised. A complete response is stored in the response cache,
+        and a cache hit is yielded as a single chunk.
+
+        Args:
+            budget_tokens: Optional limit on the estimated output tokens; the
+                stream is aborted with StreamBudgetExceededError beyond it.
+            validate: Called with the complete response before it is cached;
+                a response it rejects is not cached.
+
+        Raises:
+            APIError: If the request fails after retries, or the stream breaks.
+            StreamBudgetExceededError: If the output exceeds `budget_tokens`.
+        """
+        final_provider, call_params, api_params = self._resolve_call_params(
+            messages, task_type, provider, model_name, **kwargs
+        )
+        final_model_name = call_params['model']
+        print(f"Streaming task from provider '{final_provider}' using model '{final_model_name}'...")
+
+        cache_key = None
+        if use_cache and self.response_cache and self.response_cache.is_enabled_for(task_type):
+            cache_key = compute_cache_key(final_provider, call_params)
+            cached_response = self.response_cache.get(cache_key, task_type)
+            if cached_response is not None:
+                print(f"Cache hit for task '{task_type}' (model '{final_model_name}').")
+                yield cached_response
+                return
+
+        client = self._get_client_for_provider(final_provider)
+        limiter = self._get_rate_limiter(final_provider, final_model_name, api_params)
+        stream_params = {**call_params, "stream": True}
+        if self.streaming_config.get('include_usage', True):
+            stream_params["stream_options"] = {"include_usage": True}
+        max_retries = self.rate_limit_config.get('max_retries', 5)
+
+        for attempt in range(max_retries + 1):
+            async with limiter.limit(estimate_tokens(messages, call_params.get('max_tokens'))) as permit:
+                try:
+                    stream = await client.chat.completions.create(**stream_params)
+                except RateLimitError as e:
+                    permit.throttled = True
+                    error = e
+                except (APIConnectionError, APITimeoutError, InternalServerError) as e:
+                    permit.failed = True
+                    error = e
+                else:
+                    chunks = []
+                    output_tokens = 0
+                    try:
+                        async for chunk in stream:
+                            usage = getattr(chunk, 'usage', None)
+                            if usage is not None and getattr(usage, 'total_tokens', None) is not None:
+                                permit.actual_tokens = usage.total_tokens
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if not delta:
+                                continue
+                            chunks.append(delta)
+                            output_tokens += estimate_text_tokens(delta)
+                            if budget_tokens is not None and output_tokens > budget_tokens:
+                                raise StreamBudgetExceededError(
+                                    f"Output exceeded the budget of {budget_tokens} tokens; generation aborted."
+                                )
+                            # The consumer's time between chunks is not provider latency.
+                            paused_at = time.monotonic()
+                            yield delta
+                            permit.idle_seconds += time.monotonic() - paused_at
+                    finally:
+                        await stream.close()
+                    content = "".join(chunks)
+                    if cache_key and content and (validate is None or validate(content)):
+                        self.response_cache.set(cache_key, content, task_type, final_model_name)
+                    return
+
+            if attempt == max_retries:
+                raise error
+            delay = self._get_retry_delay(error, attempt)
+            print(f"Streaming request to '{final_model_name}' failed ({type(error).__name__}); "
+                  f"retry {attempt + 1}/{max_retries} in {delay:.1f}s.")
+            await asyncio.sleep(delay)
+
+    async def stream_json_array(
+        self,
+        messages: list[dict],
+        task_type: TaskType = None,
+        budget_tokens: int | None = None,
+        **kwargs
+    ) -> AsyncIterator[Any]:
+        """
+        Streams a response that must be a JSON array and yields each element as
+        soon as it is complete.
+
+        Generation is aborted as soon as the output cannot become a JSON array
+        (prose instead of `[`, an invalid element) or exceeds `budget_tokens`.
+
+        Raises:
+            MalformedStreamError: If the output is not a (complete) JSON array.
+            StreamBudgetExceededError: If the output exceeds `budget_tokens`.
+            APIError: If the request fails.
+        """
+        parser = IncrementalJSONArrayParser(self.streaming_config.get('max_preamble_chars', 200))
+        # Only a response that was read to the end of a complete array is cached.
+        stream = self.stream_raw_response(
+            messages, task_type=task_type, budget_tokens=budget_tokens, validate=lambda _: parser.done, **kwargs
+        )
+        try:
+            async for delta in stream:
+                for item in parser.feed(delta):
+                    yield item
+        finally:
+            await stream.aclose()
+        if not parser.done:
+            raise MalformedStreamError(f"Output ended before the JSON array was closed ({parser.items_parsed} elements parsed).")
+
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """Returns request/throttle counters and the current concurrency limit per model."""
+        return get_rate_limiter_stats()
+
+    async def run_batch(
+        self,
+        requests: Dict[str, list[dict]] | Iterable[Dict[str, list[dict]]],
+        task_type: TaskType = None,
+        job_name: str | None = None,
+        validate: Callable[[str], bool] | None = None,
+        **kwargs
+    ) -> Dict[str, str | None]:
+        """
+        Sends many independent requests through the provider's Batch API
+        instead of one online call each (`llm.batch` in config.yaml).
+
+        Requests are split into jobs of at most `max_requests_per_batch`. Every
+        job is submitted before any of them is awaited, so the jobs run at the
+        provider side by side. Each job's manifest records its record ids, and a
+        record that already belongs to an unfinished job is resumed in that job
+        rather than submitted (and paid for) again, however the pending set has
+        changed since. Requests answered by the response cache are not
+        submitted, and batch results that `validate` (when given) accepts are
+        written back to the cache; a cached response it rejects is dropped and
+        submitted again.
+
+        Args:
+            requests: A dict mapping a record id to its messages, or an iterable of
+                such dicts (e.g. one per claimed chunk), each submitted as it arrives.
+            task_type: The task whose model route is used for every request.
+            job_name: Prefix for the job names; defaults to the task type.
+            validate: Called with each cached response and each result before it
+                is cached; a response it rejects is not cached (or served).
+            **kwargs: Parameter overrides, as for `get_raw_response`.
+
+        Returns:
+            A dict mapping each record id to the response content, or None if
+            the request failed or the batch ended without a result for it.
+        """
+        batch_config = self.config.get('batch', {})
+        max_per_batch = batch_config.get('max_requests_per_batch', 5000)
+        job_name = job_name or task_type or "batch"
+        chunks = [requests] if isinstance(requests, dict) else requests
+
+        provider = None
+        runner = None
+        use_cache = False
+        assignments: Dict[str, str] = {}
+        record_ids: list[str] = []
+        models: Dict[str, str] = {}
+        cache_keys: Dict[str, str] = {}
+        results: Dict[str, str | None] = {}
+        jobs: Dict[str, set] = {}
+
+        for chunk in chunks:
+            resolved = {}
+            for record_id, messages in chunk.items():
+                resolved[record_id] = self._resolve_call_params(messages, task_type, **kwargs)
+            providers = {route[0] for route in resolved.values()} | ({provider} if provider else set())
+            if len(providers) > 1:
+                raise ValueError(f"A batch must target a single provider, got {sorted(providers)}.")
+            if not resolved:
+                continue
+            record_ids.extend(resolved)
+
+            if runner is None:
+                provider = providers.pop()
+                runner = BatchJobRunner(
+                    self._get_client_for_provider(provider),
+                    job_dir=batch_config.get('job_dir', 'output/batches'),
+                    poll_interval=batch_config.get('poll_interval_seconds', 60),
+                    completion_window=batch_config.get('completion_window', '24h'),
+                )
+                use_cache = self.response_cache and self.response_cache.is_enabled_for(task_type)
+                assignments = runner.record_jobs(job_name)
+
+            resumed: Dict[str, Dict[str, Any]] = {}
+            new: Dict[str, Dict[str, Any]] = {}
+            for record_id, (_, params, _) in resolved.items():
+                models[record_id] = params['model']
+                if use_cache:
+                    cache_keys[record_id] = compute_cache_key(provider, params)
+                if record_id in assignments:
+                    resumed.setdefault(assignments[record_id], {})[record_id] = params
+                    continue
+                cached = self.response_cache.get(cache_keys[record_id], task_type) if use_cache else None
+                if cached is not None and validate is not None and not validate(cached):
+                    self.response_cache.delete(cache_keys[record_id])
+                    cached = None
+                if cached is not None:
+                    results[record_id] = cached
+                else:
+                    new[record_id] = params
+
+            for name, pending in resumed.items():
+                await runner.submit(name, pending)
+                jobs.setdefault(name, set()).update(pending)
+            new_ids = list(new)
+            for start in range(0, len(new_ids), max_per_batch):
+                name = f"{job_name}-{uuid.uuid4().hex[:12]}"
+                pending = {record_id: new[record_id] for record_id in new_ids[start:start + max_per_batch]}
+                await runner.submit(name, pending)
+                jobs[name] = set(pending)
+
+        names = list(jobs)
+        collected = await asyncio.gather(*(runner.finish(name) for name in names)) if names else []
+        for name, job_results in zip(names, collected):
+            for record_id in jobs[name]:
+                result = job_results.get(record_id)
+                if result is None:
+                    continue
+                content = result["content"]
+                if result["error"]:
+                    print(f"Batch request '{record_id}' failed: {result['error']}")
+                if use_cache and content and (validate is None or validate(content)):
+                    self.response_cache.set(cache_keys[record_id], content, task_type, models[record_id])
+                results[record_id] = content
+            runner.mark_consumed(name)
+
+        return {record_id: results.get(record_id) for record_id in record_ids}
+
+    def get_cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the response cache's hit/miss counters per task type."""
+        return self.response_cache.stats() if self.response_cache else {}
+
+    def discard_cached_response(
+        self,
+        messages: list[dict],
+        task_type: TaskType = None,
+        provider: str = None,
+        model_name: str = None,
+        **kwargs
+    ):
+        """
+        Removes the cached response for a request, so that a retry after the
+        caller failed to use the response goes to the model again. Takes the
+        same arguments as the `get_raw_response` call that produced it.
+        """
+        if not self.response_cache or not self.response_cache.is_enabled_for(task_type):
+            return
+        final_provider, call_params, _ = self._resolve_call_params(messages, task_type, provider, model_name, **kwargs)
+        self.response_cache.delete(compute_cache_key(final_provider, call_params))
+
     def _extract_json_from_response(self, text: str) -> str:
         """
         Extracts a JSON string from a text that might contain markdown code blocks.
@@ -156,51 +586,162 @@ class LLMClient:
         # If no markdown, assume the whole string is JSON
         return text
 
+    @staticmethod
+    def add_json_system_message(messages: list[dict]) -> list[dict]:
+        """Prepends the default JSON-only system message unless one is already present."""
+        has_system_message = any(msg.get("role") == "system" for msg in messages)
+        if not has_system_message:
+            messages.insert(0, {"role": "system", "content": "You are a helpful assistant designed to output JSON. Please ensure your entire response is a single, valid JSON object or array, without any markdown formatting like ```json."})
+        return messages
+
     async def get_json_response(
         self, 
         messages: list[dict],
         task_type: TaskType = None,
+        expected_type: type | None = None,
         **kwargs
     ) -> Dict[str, Any] | list | None:
         """
         Sends messages and returns a parsed JSON object (dict or list).
+        Unparseable output is repaired as in `parse_or_repair_json` and is not
+        kept in the response cache.
         """
-        # Construct default system message if not provided
-        has_system_message = any(msg.get("role") == "system" for msg in messages)
-        if not has_system_message:
-            messages.insert(0, {"role": "system", "content": "You are a helpful assistant designed to output JSON. Please ensure your entire response is a single, valid JSON object or array, without any markdown formatting like ```json."})
+        self.add_json_system_message(messages)
 
-        raw_response = await self.get_raw_response(messages=messages, task_type=task_type, **kwargs)
+        raw_response, parsed = await self._get_parsed_response(messages, task_type, expected_type, **kwargs)
         if not raw_response:
             return None
-        
+        if parsed is None and self.json_repair_config.get('enabled', True):
+            parsed = await self._repair_json(raw_response, task_type, expected_type)
+        if parsed is None:
+            # A response cached before it was known not to parse must not be replayed.
+            self.discard_cached_response(messages, task_type, **kwargs)
+        return parsed
+
+    async def _get_parsed_response(
+        self,
+        messages: list[dict],
+        task_type: TaskType = None,
+        expected_type: type | None = None,
+        **kwargs
+    ) -> tuple[str | None, Dict[str, Any] | list | None]:
+        """
+        Returns the raw response and its local parse (None if it does not parse).
+        The response is parsed before it is cached, and only cached if it parses.
+        """
+        parsed = {}
+
+        def parses(text: str) -> bool:
+            parsed['data'] = self.parse_json_text(text, expected_type)
+            return parsed['data'] is not None
+
+        raw_response = await self.get_raw_response(messages=messages, task_type=task_type, validate=parses, **kwargs)
+        if not raw_response:
+            return raw_response, None
+        if 'data' not in parsed:
+            # Answered from the cache, or caching is off for this task.
+            parses(raw_response)
+        return raw_response, parsed['data']
+
+    async def parse_or_repair_json(
+        self,
+        raw_response: str,
+        task_type: TaskType = None,
+        expected_type: type | None = None,
+    ) -> Dict[str, Any] | list | None:
+        """
+        Parses a model response locally and, only if that fails, asks a model
+        to rewrite it as valid JSON (`llm.json_repair`). Outcomes are counted in
+        `json_parse_stats` so the cost of repairs stays visible.
+
+        Args:
+            raw_response: The model output to parse.
+            task_type: The task that produced the output; used for the repair
+                call unless `llm.json_repair.task_type` names a cheaper route.
+            expected_type: `dict` or `list` to reject a top-level value of the wrong type.
+        """
+        parsed = self.parse_json_text(raw_response, expected_type)
+        if parsed is not None or not self.json_repair_config.get('enabled', True):
+            return parsed
+        return await self._repair_json(raw_response, task_type, expected_type)
+
+    async def _repair_json(
+        self,
+        raw_response: str,
+        task_type: TaskType = None,
+        expected_type: type | None = None,
+    ) -> Dict[str, Any] | list | None:
+        """Asks a model to rewrite output that failed local parsing as valid JSON."""
+        self.json_parse_stats['llm_repair'] += 1
+        print("Local JSON parsing failed; asking the model to repair the output.")
+        shape = {list: "JSON array", dict: "JSON object"}.get(expected_type, "JSON object or array")
+        _, parsed = await self._get_parsed_response(
+            [
+                {"role": "system", "content": f"You convert text into a single valid {shape}. Output only the JSON, without markdown or explanations."},
+                {"role": "user", "content": raw_response},
+            ],
+            task_type=self.json_repair_config.get('task_type') or task_type,
+            expected_type=expected_type,
+        )
+        self.json_parse_stats['llm_repair_succeeded' if parsed is not None else 'llm_repair_failed'] += 1
+        return parsed
+
+    def get_json_parse_stats(self) -> Dict[str, int]:
+        """Returns how often each parsing stage (and the LLM repair fallback) was needed."""
+        return dict(self.json_parse_stats)
+
+    def parse_json_text(self, raw_response: str, expected_type: type | None = None) -> Dict[str, Any] | list | None:
+        """
+        Parses a model response into a JSON object or array without any LLM call:
+        strict JSON, then the EnhancedJSONParser strategies (embedded JSON,
+        light repairs, truncated arrays), then Python literals.
+        Returns None if nothing parses to the expected type.
+        """
+        def matches(data) -> bool:
+            return isinstance(data, expected_type) if expected_type else True
+
         cleaned_response = self._extract_json_from_response(raw_response)
             
         # Stage 1: Try the standard and strict JSON parser
         try:
-            return json.loads(cleaned_response)
+            data = json.loads(cleaned_response)
+            if matches(data):
+                self.json_parse_stats['direct_json'] += 1
+                return data
         except json.JSONDecodeError:
-            # Stage 2: If it fails, try the more lenient Python literal evaluator
+            pass
+
+        # Stage 2: Local extraction and repair strategies. Key/value text scraping is
+        # skipped: it turns arbitrary prose into a dict.
+        result = self.json_parser.parse(raw_response, expected_type=expected_type)
+        if result.success and result.parsing_method != "structured_text":
+            self.json_parse_stats[result.parsing_method] += 1
+            return result.data
+
+        # Stage 3: Try the more lenient Python literal evaluator
+        try:
+            evaluated = ast.literal_eval(cleaned_response)
+            if isinstance(evaluated, (dict, list)) and matches(evaluated):
+                self.json_parse_stats['python_literal'] += 1
+                return evaluated
+        except (ValueError, SyntaxError, MemoryError, TypeError):
+            # Stage 4: If both fail, attempt manual regex-based list parsing
             try:
-                evaluated = ast.literal_eval(cleaned_response)
-                if isinstance(evaluated, (dict, list)):
-                    return evaluated
-            except (ValueError, SyntaxError, MemoryError, TypeError):
-                # Stage 3: If both fail, attempt manual regex-based list parsing
-                try:
-                    # Check if it looks like a list of unquoted strings
-                    if cleaned_response.strip().startswith('[') and cleaned_response.strip().endswith(']'):
-                        # Extract content within the brackets
-                        content = cleaned_response.strip()[1:-1]
-                        # Split by comma and clean up each item
-                        items = [item.strip().strip("'\"") for item in content.split(',') if item.strip()]
-                        return items
-                except Exception as e:
-                    # If manual parsing also fails, log everything and give up
-                    print(f"Manual parsing also failed: {e}")
-                    pass # Fall through to the final error logging
+                # Check if it looks like a list of unquoted strings
+                if cleaned_response.strip().startswith('[') and cleaned_response.strip().endswith(']') and matches([]):
+                    # Extract content within the brackets
+                    content = cleaned_response.strip()[1:-1]
+                    # Split by comma and clean up each item
+                    items = [item.strip().strip("'\"") for item in content.split(',') if item.strip()]
+                    self.json_parse_stats['bare_list'] += 1
+                    return items
+            except Exception as e:
+                # If manual parsing also fails, log everything and give up
+                print(f"Manual parsing also failed: {e}")
+                pass # Fall through to the final error logging
 
         # If all parsing attempts fail, log the error and the problematic response
+        self.json_parse_stats['failed'] += 1
         print(f"Failed to decode JSON with all methods.")
         print(f"Raw response: \n{raw_response}")
         print(f"Cleaned response attempt: \n{cleaned_response}")
@@ -0,0 +1,285 @@
+# src/llm/rate_limiter.py
+"""
+Adaptive client-side rate limiting for LLM calls.
+
+Each (provider, model) pair gets one `RateLimiter` per process, shared by every
+`LLMClient` instance. A limiter combines:
+
+- two token buckets, one for requests per minute (RPM) and one for tokens per
+  minute (TPM). A request reserves its estimated prompt tokens plus its
+  `max_tokens` budget up front; the reservation is corrected with the real
+  usage reported by the provider once the response arrives;
+- an AIMD concurrency limit: the number of in-flight requests grows by about
+  one per "window" of successful requests, and is halved when the provider
+  throttles us (HTTP 429) or latency exceeds a target.
+
+Waiting is done with `asyncio.sleep` and condition variables, never by polling.
+"""
+
+import asyncio
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Tuple
+
+# Rough tokenizer-free estimate: CJK characters are about one token each,
+# other text about four characters per token, plus a few tokens per message.
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+_TOKENS_PER_MESSAGE = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Estimates the number of tokens in a piece of text."""
+    cjk_chars = len(_CJK_PATTERN.findall(text))
+    return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int | None = None) -> int:
+    """
+    Estimates the tokens a chat request will count against a TPM quota:
+    the prompt plus the completion budget.
+    """
+    prompt_tokens = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if not isinstance(content, str):
+            content = str(content)
+        prompt_tokens += estimate_text_tokens(content) + _TOKENS_PER_MESSAGE
+    return prompt_tokens + (max_tokens or 0)
+
+
+def compute_backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given zero-based retry attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def parse_retry_after(headers: Any) -> float | None:
+    """
+    Returns the server-requested delay in seconds from `retry-after-ms` or
+    `retry-after` (delta-seconds or HTTP date) headers, if present.
+    """
+    if not headers:
+        return None
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000.0)
+        except ValueError:
+            pass
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _LoopBound(ABC):
+    """Recreates asyncio primitives when the limiter is used from a new event loop."""
+
+    def __init__(self):
+        self._loop = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._reset_primitives()
+
+    @abstractmethod
+    def _reset_primitives(self):
+        """Creates the asyncio primitives bound to the current event loop."""
+
+
+class TokenBucket(_LoopBound):
+    """A token bucket that refills continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute: float):
+        super().__init__()
+        self.capacity = float(rate_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _reset_primitives(self):
+        # Waiters queue on the lock, so they are served in FIFO order.
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    async def acquire(self, amount: float):
+        """Waits until `amount` tokens are available and takes them."""
+        self._check_loop()
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.refill_per_second)
+
+    def adjust(self, delta: float):
+        """Returns (delta > 0) or charges (delta < 0) tokens after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + delta)
+
+
+class AdaptiveConcurrencyLimiter(_LoopBound):
+    """Bounds in-flight requests with an AIMD-controlled limit."""
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        target_latency: float | None = None,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 5.0,
+    ):
+        super().__init__()
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.in_flight = 0
+        self._last_decrease = float("-inf")
+
+    def _reset_primitives(self):
+        self._cond = asyncio.Condition()
+        self.in_flight = 0
+
+    async def acquire(self):
+        """Waits for a free slot under the current limit."""
+        self._check_loop()
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float | None = None, throttled: bool = False):
+        """Frees a slot and adapts the limit to the outcome of the request."""
+        async with self._cond:
+            self.in_flight -= 1
+            overloaded = throttled or (
+                latency is not None and self.target_latency is not None and latency > self.target_latency
+            )
+            if overloaded:
+                # Many requests fail together when a quota is hit; back off once per cooldown.
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            elif latency is not None:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+@dataclass
+class Permit:
+    """Handed to the caller for one request; fill in the outcome before leaving the context."""
+    estimated_tokens: int
+    actual_tokens: int | None = None
+    throttled: bool = False
+    failed: bool = False
+    # Time inside the context not spent waiting on the provider (e.g. the consumer
+    # of a stream processing a chunk); it is left out of the measured latency.
+    idle_seconds: float = 0.0
+
+
+class RateLimiter:
+    """RPM/TPM token buckets plus adaptive concurrency for one provider model."""
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 32,
+        target_latency: float | None = None,
+    ):
+        self.request_bucket = TokenBucket(rpm) if rpm else None
+        self.token_bucket = TokenBucket(tpm) if tpm else None
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=initial_concurrency,
+            minimum=min_concurrency,
+            maximum=max_concurrency,
+            target_latency=target_latency,
+        )
+        self.stats = {"requests": 0, "throttled": 0, "failed": 0}
+
+    @asynccontextmanager
+    async def limit(self, estimated_tokens: int) -> AsyncIterator[Permit]:
+        """
+        Holds a concurrency slot and the RPM/TPM budget for one request.
+        Set `permit.actual_tokens` from the response usage, or
+        `permit.throttled` / `permit.failed` on errors, before the block ends.
+        Any exception leaving the block (including cancellation) marks the
+        permit failed unless it was marked throttled.
+
+        The latency fed to the concurrency limiter is measured from the moment
+        the RPM/TPM buckets let the request through, minus `permit.idle_seconds`.
+        """
+        await self.concurrency.acquire()
+        permit = Permit(estimated_tokens)
+        start = None
+        try:
+            if self.request_bucket:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket:
+                await self.token_bucket.acquire(estimated_tokens)
+            start = time.monotonic()
+            yield permit
+        except BaseException:
+            if not permit.throttled:
+                permit.failed = True
+            raise
+        finally:
+            latency = None if start is None else max(0.0, time.monotonic() - start - permit.idle_seconds)
+            if self.token_bucket and permit.actual_tokens is not None:
+                self.token_bucket.adjust(estimated_tokens - permit.actual_tokens)
+            self.stats["requests"] += 1
+            if permit.throttled:
+                self.stats["throttled"] += 1
+            elif permit.failed:
+                self.stats["failed"] += 1
+            await self.concurrency.release(
+                latency=None if (permit.throttled or permit.failed or latency is None) else latency,
+                throttled=permit.throttled,
+            )
+
+
+_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+
+
+def get_rate_limiter(provider: str, model: str, **settings) -> RateLimiter:
+    """
+    Returns the process-wide limiter for a provider model, creating it with
+    `settings` (see `RateLimiter`) on first use.
+    """
+    key = (provider, model)
+    if key not in _limiters:
+        _limiters[key] = RateLimiter(**settings)
+    return _limiters[key]
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, int]]:
+    """Returns request/throttle counters and the current concurrency limit per provider model."""
+    return {
+        f"{provider}/{model}": {**limiter.stats, "concurrency_limit": int(limiter.concurrency.limit)}
+        for (provider, model), limiter in _limiters.items()
+    }
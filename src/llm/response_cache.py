@@ -0,0 +1,231 @@
+# src/llm/response_cache.py
+"""
+A persistent, content-addressed cache for LLM responses.
+
+Responses are stored in a small SQLite database keyed by a SHA-256 hash of the
+fully resolved call parameters (provider, model, messages, sampling settings),
+so re-running a workflow after a crash or a status reset does not pay for
+identical requests twice, while any change to the prompt or model is a miss.
+
+Entries expire after a TTL, and the cache is kept under a maximum number of
+entries and bytes by evicting the least recently used entries. Caching can be
+switched on or off per task type, and hits and misses are counted per task type.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict
+
+DEFAULT_CACHE_PATH = "output/cache/llm_response_cache.db"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 200_000
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Eviction runs after this many writes rather than on every write.
+EVICTION_CHECK_INTERVAL = 100
+
+
+def compute_cache_key(provider: str, call_params: Dict[str, Any]) -> str:
+    """
+    Returns a stable hash of the resolved call parameters. Keys are sorted so
+    the hash does not depend on dict insertion order.
+    """
+    payload = json.dumps(
+        {"provider": provider, **call_params},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache with TTL, LRU size bounds and per-task switches."""
+
+    def __init__(
+        self,
+        path: str | Path = DEFAULT_CACHE_PATH,
+        ttl_seconds: float | None = DEFAULT_TTL_SECONDS,
+        max_entries: int | None = DEFAULT_MAX_ENTRIES,
+        max_bytes: int | None = DEFAULT_MAX_BYTES,
+        task_types: Dict[str, bool] | None = None,
+    ):
+        """
+        Initializes the cache and creates its table if needed.
+
+        Args:
+            path: Path to the SQLite cache file.
+            ttl_seconds: Age after which an entry is ignored and evicted; None disables expiry.
+            max_entries: Maximum number of entries kept; None for no limit.
+            max_bytes: Maximum total size of cached responses; None for no limit.
+            task_types: Per-task-type enable flags. Task types that are not
+                listed are cached.
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.task_types = task_types or {}
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "writes": 0})
+
+        with self._get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    key TEXT PRIMARY KEY,
+                    task_type TEXT,
+                    model TEXT,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_accessed ON llm_response_cache (last_accessed)")
+
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> "LLMResponseCache | None":
+        """
+        Creates a cache from the `llm.cache` section of config.yaml, or returns
+        None if caching is disabled.
+        """
+        if not cache_config.get('enabled', False):
+            return None
+        return cls(
+            path=cache_config.get('path', DEFAULT_CACHE_PATH),
+            ttl_seconds=cache_config.get('ttl_seconds', DEFAULT_TTL_SECONDS),
+            max_entries=cache_config.get('max_entries', DEFAULT_MAX_ENTRIES),
+            max_bytes=cache_config.get('max_bytes', DEFAULT_MAX_BYTES),
+            task_types=cache_config.get('task_types'),
+        )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """Returns this thread's persistent connection to the cache file."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_enabled_for(self, task_type: str | None) -> bool:
+        """Returns whether responses for this task type are cached."""
+        return self.task_types.get(task_type or "default", True)
+
+    def get(self, key: str, task_type: str | None = None) -> str | None:
+        """
+        Returns the cached response for a key, or None on a miss or if the
+        entry has expired.
+        """
+        stats = self._stats[task_type or "default"]
+        now = time.time()
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute(
+                    "SELECT response, created_at FROM llm_response_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and self.ttl_seconds is not None and now - row[1] > self.ttl_seconds:
+                    conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+                    row = None
+                if row is not None:
+                    conn.execute("UPDATE llm_response_cache SET last_accessed = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"LLM cache read failed: {e}")
+            row = None
+
+        with self._lock:
+            stats["hits" if row is not None else "misses"] += 1
+        return row[0] if row is not None else None
+
+    def set(self, key: str, response: str, task_type: str | None = None, model: str | None = None):
+        """Stores a response, evicting old entries periodically to honour the size bounds."""
+        now = time.time()
+        try:
+            with self._get_connection() as conn:
+                conn.execute(
+                    """
+                    INSERT OR REPLACE INTO llm_response_cache
+                        (key, task_type, model, response, size, created_at, last_accessed)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (key, task_type, model, response, len(response.encode("utf-8")), now, now),
+                )
+        except sqlite3.Error as e:
+            print(f"LLM cache write failed: {e}")
+            return
+
+        with self._lock:
+            self._stats[task_type or "default"]["writes"] += 1
+            self._writes_since_eviction += 1
+            should_evict = self._writes_since_eviction >= EVICTION_CHECK_INTERVAL
+            if should_evict:
+                self._writes_since_eviction = 0
+        if should_evict:
+            self.evict()
+
+    def delete(self, key: str):
+        """Removes an entry, e.g. a response the caller turned out not to be able to use."""
+        try:
+            with self._get_connection() as conn:
+                conn.execute("DELETE FROM llm_response_cache WHERE key = ?", (key,))
+        except sqlite3.Error as e:
+            print(f"LLM cache delete failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Removes expired entries, then the least recently used entries until
+        both the entry and byte limits are met.
+
+        Returns:
+            The number of entries removed.
+        """
+        removed = 0
+        try:
+            with self._get_connection() as conn:
+                if self.ttl_seconds is not None:
+                    removed += conn.execute(
+                        "DELETE FROM llm_response_cache WHERE created_at < ?",
+                        (time.time() - self.ttl_seconds,),
+                    ).rowcount
+
+                count, total_bytes = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_response_cache"
+                ).fetchone()
+                excess_entries = max(0, count - self.max_entries) if self.max_entries is not None else 0
+                excess_bytes = max(0, total_bytes - self.max_bytes) if self.max_bytes is not None else 0
+                if excess_entries or excess_bytes:
+                    victims = []
+                    freed = 0
+                    for key, size in conn.execute(
+                        "SELECT key, size FROM llm_response_cache ORDER BY last_accessed"
+                    ):
+                        if len(victims) >= excess_entries and freed >= excess_bytes:
+                            break
+                        victims.append((key,))
+                        freed += size
+                    conn.executemany("DELETE FROM llm_response_cache WHERE key = ?", victims)
+                    removed += len(victims)
+        except sqlite3.Error as e:
+            print(f"LLM cache eviction failed: {e}")
+        return removed
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns hit/miss/write counters per task type for this process."""
+        with self._lock:
+            return {task_type: dict(counters) for task_type, counters in self._stats.items()}
+
+    def close(self):
+        """Closes the calling thread's connection."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
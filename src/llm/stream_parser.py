@@ -0,0 +1,127 @@
+# src/llm/stream_parser.py
+"""
+Incremental parsing of a JSON array that arrives as a stream of text chunks.
+
+`IncrementalJSONArrayParser.feed` returns each array element as soon as its
+closing brace or bracket has been received, so callers can act on complete
+items while the model is still generating the rest. Each character is scanned
+once and chunks are never concatenated into a growing buffer, so the cost is
+linear in the length of the output.
+
+The parser decides as early as possible that the output is not going to be a
+JSON array (prose instead of `[`, an element that is not valid JSON) so the
+generation can be aborted instead of paid for to the end.
+"""
+
+import json
+from typing import Any, List
+
+
+class StreamAbortedError(ValueError):
+    """Raised when a streamed generation is stopped before the model finished."""
+
+
+class MalformedStreamError(StreamAbortedError):
+    """Raised when streamed output can no longer turn into a valid JSON array."""
+
+
+class StreamBudgetExceededError(StreamAbortedError):
+    """Raised when streamed output grows beyond its token budget."""
+
+
+class IncrementalJSONArrayParser:
+    """Feeds on text chunks and yields the elements of a top-level JSON array."""
+
+    def __init__(self, max_preamble_chars: int = 200):
+        """
+        Args:
+            max_preamble_chars: How much text (markdown fences, a short lead-in)
+                may precede the opening `[` before the output is declared malformed.
+        """
+        self.max_preamble_chars = max_preamble_chars
+        self.items_parsed = 0
+        self.done = False
+        self._preamble_chars = 0   # Characters seen before the opening `[`
+        self._in_array = False
+        self._depth = 0            # Nesting depth inside the current element
+        self._in_string = False
+        self._escape = False
+        self._element_start = None # Start of the current element in the chunk being scanned
+        self._element_parts = []   # Text of the current element from earlier chunks
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Adds a chunk of text and returns the elements completed by it. Only the
+        text of an element that is still incomplete is kept between chunks.
+
+        Raises:
+            MalformedStreamError: If the output cannot be a JSON array.
+        """
+        if self.done or not chunk:
+            return []
+        items = []
+        pos = 0
+        while pos < len(chunk):
+            char = chunk[pos]
+
+            if not self._in_array:
+                if char == '[':
+                    self._in_array = True
+                elif char == '{':
+                    raise MalformedStreamError("Output is a JSON object, expected an array.")
+                elif self._preamble_chars >= self.max_preamble_chars:
+                    raise MalformedStreamError(f"No JSON array started within {self.max_preamble_chars} characters.")
+                self._preamble_chars += 1
+                pos += 1
+                continue
+
+            if self._element_start is None:
+                # Between elements: only whitespace, commas or the closing bracket.
+                if char == ']':
+                    self.done = True
+                    break
+                if char in ' \t\r\n,':
+                    pos += 1
+                    continue
+                self._element_start = pos
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]' and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    items.append(self._parse_element(chunk, pos + 1))
+            elif self._depth == 0 and char in ',]':
+                # End of a scalar element.
+                items.append(self._parse_element(chunk, pos))
+                if char == ']':
+                    self.done = True
+                    break
+            pos += 1
+
+        if self._element_start is not None:
+            # The element continues in the next chunk.
+            self._element_parts.append(chunk[self._element_start:])
+            self._element_start = 0
+        return items
+
+    def _parse_element(self, chunk: str, end: int) -> Any:
+        self._element_parts.append(chunk[self._element_start:end])
+        text = "".join(self._element_parts)
+        self._element_parts = []
+        self._element_start = None
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise MalformedStreamError(f"Array element {self.items_parsed + 1} is not valid JSON: {e}") from e
+        self.items_parsed += 1
+        return item
@@ -9,6 +9,8 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
 import json
 import csv
+import hashlib
+import sqlite3
 
 try:
     from neo4j import GraphDatabase
@@ -16,6 +18,17 @@ except ImportError:
     GraphDatabase = None
 
 
+# neo4j-admin import 的带类型表头；ID空间与事务写入（StorageAgent）使用的唯一键一致：
+# Event.eventId、Entity.name，事后增量 MERGE 可以直接命中导入的节点
+ADMIN_EVENT_HEADER = [
+    "eventId:ID(Event)", "event_type", "micro_event_type", "event_date", "description",
+    "quantitative_data", "source_id", "source_text", "story_id", "cluster_id:long", "current_status", ":LABEL"
+]
+ADMIN_ENTITY_HEADER = ["name:ID(Entity)", "type", ":LABEL"]
+ADMIN_INVOLVED_IN_HEADER = [":START_ID(Entity)", ":END_ID(Event)", "role", ":TYPE"]
+ADMIN_RELATES_TO_HEADER = [":START_ID(Event)", ":END_ID(Event)", "type", "reason", ":TYPE"]
+
+
 class GraphExporter:
     """图谱导出管理器"""
     
@@ -338,6 +351,201 @@ class GraphExporter:
         
         return result
     
+    def export_neo4j_admin_import(self,
+                                  events_jsonl: Union[str, Path] = None,
+                                  db_path: Union[str, Path] = None,
+                                  relationships_jsonl: Union[str, Path] = None,
+                                  dirname: str = "neo4j_import") -> Dict[str, Any]:
+        """导出为 neo4j-admin import 可直接导入的节点/关系CSV，用于首次全量建图
+        
+        逐行流式读取抽取结果（structured_events.jsonl）和 master_state 表，边读边写，
+        内存中只保留已写出的事件ID和实体名称用于去重。事件ID取自抽取结果的 event_id
+        或 master_state.id，缺失时由事件内容哈希生成，重复导出结果一致。
+        
+        同一条记录以 master_state 为准：_source_id 已在 master_state 中导出的JSONL事件
+        会被跳过。
+        端点事件不存在的关系不会写出，而是计入 dangling_relationships。
+        
+        Args:
+            events_jsonl: 抽取工作流输出的事件JSONL文件
+            db_path: 主状态数据库路径，导出含 structured_data 或 involved_entities 的记录
+            relationships_jsonl: 关系分析的原始输出日志（含 parsed_relationships），可选
+            dirname: 输出子目录名
+            
+        Returns:
+            Dict[str, Any]: 各CSV文件路径（files）、行数统计（counts）和导入命令（command）
+        """
+        if not events_jsonl and not db_path:
+            raise ValueError("events_jsonl or db_path is required")
+        
+        export_dir = self.output_dir / dirname
+        export_dir.mkdir(parents=True, exist_ok=True)
+        files = {
+            'events': export_dir / "events.csv",
+            'entities': export_dir / "entities.csv",
+            'involved_in': export_dir / "involved_in.csv",
+            'relates_to': export_dir / "relates_to.csv",
+        }
+        headers = {
+            'events': ADMIN_EVENT_HEADER,
+            'entities': ADMIN_ENTITY_HEADER,
+            'involved_in': ADMIN_INVOLVED_IN_HEADER,
+            'relates_to': ADMIN_RELATES_TO_HEADER,
+        }
+        counts = {key: 0 for key in files}
+        counts['duplicate_events'] = 0
+        counts['dangling_relationships'] = 0
+        seen_events = set()
+        # master_state 中会导出的记录ID，对应的JSONL事件以数据库为准
+        db_record_ids = set(self._iter_master_state_ids(db_path)) if db_path else set()
+        seen_entities = set()
+        
+        handles = {key: open(path, 'w', newline='', encoding='utf-8') for key, path in files.items()}
+        try:
+            writers = {key: csv.writer(handle) for key, handle in handles.items()}
+            for key, writer in writers.items():
+                writer.writerow(headers[key])
+            
+            def write_event(event_id: str, row: List[Any], entities: Any):
+                if event_id in seen_events:
+                    counts['duplicate_events'] += 1
+                    return
+                seen_events.add(event_id)
+                writers['events'].writerow([event_id, *row, "Event"])
+                counts['events'] += 1
+                
+                linked = set()
+                for entity in self._parse_json_list(entities):
+                    if not isinstance(entity, dict) or not entity.get('entity_name'):
+                        continue
+                    name = entity['entity_name']
+                    if name not in seen_entities:
+                        seen_entities.add(name)
+                        writers['entities'].writerow([name, entity.get('entity_type', 'Unknown'), "Entity"])
+                        counts['entities'] += 1
+                    if name not in linked:
+                        linked.add(name)
+                        writers['involved_in'].writerow([name, event_id, entity.get('role_in_event'), "INVOLVED_IN"])
+                        counts['involved_in'] += 1
+            
+            if events_jsonl:
+                for event in self._iter_jsonl(events_jsonl):
+                    if event.get('_source_id') in db_record_ids:
+                        counts['duplicate_events'] += 1
+                        continue
+                    event_id = event.get('event_id') or self._content_id("evt", event)
+                    write_event(event_id, [
+                        event.get('event_type'), event.get('micro_event_type'), event.get('event_date'),
+                        event.get('description'), self._json_or_none(event.get('quantitative_data')),
+                        event.get('_source_id'), event.get('text'), None, None, None,
+                    ], event.get('involved_entities'))
+            
+            if db_path:
+                for record in self._iter_master_state_events(db_path):
+                    structured = self._parse_json_dict(record['structured_data'])
+                    write_event(record['id'], [
+                        record['assigned_event_type'] or structured.get('event_type'),
+                        structured.get('micro_event_type'), structured.get('event_date'),
+                        structured.get('description'), self._json_or_none(structured.get('quantitative_data')),
+                        None, record['source_text'], record['story_id'], record['cluster_id'], record['current_status'],
+                    ], record['involved_entities'])
+            
+            if relationships_jsonl:
+                for entry in self._iter_jsonl(relationships_jsonl):
+                    for rel in entry.get('parsed_relationships') or []:
+                        if not all(rel.get(k) for k in ['source_event_id', 'target_event_id', 'relationship_type']):
+                            continue
+                        if rel['source_event_id'] not in seen_events or rel['target_event_id'] not in seen_events:
+                            counts['dangling_relationships'] += 1
+                            continue
+                        writers['relates_to'].writerow([
+                            rel['source_event_id'], rel['target_event_id'],
+                            rel['relationship_type'].upper(), rel.get('analysis_reason', ''), "RELATES_TO"
+                        ])
+                        counts['relates_to'] += 1
+        finally:
+            for handle in handles.values():
+                handle.close()
+        
+        command = (
+            "neo4j-admin database import full neo4j"
+            f" --nodes={files['events']} --nodes={files['entities']}"
+            f" --relationships={files['involved_in']} --relationships={files['relates_to']}"
+            " --multiline-fields=true"
+        )
+        print(f"neo4j-admin import files written to {export_dir}: {counts}")
+        return {'files': {key: str(path) for key, path in files.items()}, 'counts': counts, 'command': command}
+    
+    def _iter_jsonl(self, path: Union[str, Path]):
+        """逐行读取JSONL文件，跳过损坏的行"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Warning: Skipping corrupted line {line_no} in {path}")
+                    continue
+                if isinstance(data, dict):
+                    yield data
+    
+    def _iter_master_state_ids(self, db_path: Union[str, Path]):
+        """以只读方式流式读取会被导出的 master_state 记录ID"""
+        conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+        try:
+            cursor = conn.execute(
+                "SELECT id FROM master_state WHERE structured_data IS NOT NULL OR involved_entities IS NOT NULL"
+            )
+            for (record_id,) in cursor:
+                yield record_id
+        finally:
+            conn.close()
+    
+    def _iter_master_state_events(self, db_path: Union[str, Path], fetch_size: int = 1000):
+        """以只读方式按 id 顺序流式读取含事件数据的 master_state 记录"""
+        conn = sqlite3.connect(f"file:{Path(db_path).resolve()}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute("""
+                SELECT id, source_text, current_status, assigned_event_type, structured_data,
+                       involved_entities, story_id, cluster_id
+                FROM master_state
+                WHERE structured_data IS NOT NULL OR involved_entities IS NOT NULL
+                ORDER BY id
+            """)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def _content_id(self, prefix: str, data: Dict[str, Any]) -> str:
+        """由内容生成确定性的ID"""
+        digest = hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+        return f"{prefix}_{digest[:32]}"
+    
+    def _parse_json_list(self, value: Any) -> List[Any]:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                return []
+        return value if isinstance(value, list) else []
+    
+    def _parse_json_dict(self, value: Any) -> Dict[str, Any]:
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except json.JSONDecodeError:
+                return {}
+        return value if isinstance(value, dict) else {}
+    
+    def _json_or_none(self, value: Any) -> Optional[str]:
+        return json.dumps(value, ensure_ascii=False) if value is not None else None
+    
     def export_to_json(self, 
                       nodes: List[Dict[str, Any]] = None, 
                       edges: List[Dict[str, Any]] = None,
@@ -178,6 +178,57 @@ class TestGraphExporter(unittest.TestCase):
         self.assertEqual(len(data['nodes']), 2)
         self.assertEqual(len(data['edges']), 1)
 
+    def test_export_neo4j_admin_import(self):
+        """测试导出为neo4j-admin import的CSV（实体去重、ID确定）"""
+        import sqlite3
+        events_file = Path(self.temp_dir) / 'structured_events.jsonl'
+        entities = [{'entity_name': '甲公司', 'entity_type': 'Company', 'role_in_event': '买方'}]
+        with open(events_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'event_id': 'evt_1', 'event_type': 'MarketAction', 'description': '降价',
+                                'involved_entities': entities, '_source_id': 'doc1', 'text': '原文\n第二行'}, ensure_ascii=False) + '\n')
+            f.write('not json\n')
+            f.write(json.dumps({'event_type': 'Partnership', 'involved_entities': entities * 2}, ensure_ascii=False) + '\n')
+            # 已在 master_state 中的记录不应重复导出
+            f.write(json.dumps({'event_id': 'evt_rec1', 'event_type': 'PolicyChange', '_source_id': 'rec1'},
+                               ensure_ascii=False) + '\n')
+        relationships_file = Path(self.temp_dir) / 'relationships_raw.jsonl'
+        with open(relationships_file, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'parsed_relationships': [
+                {'source_event_id': 'evt_1', 'target_event_id': 'rec1', 'relationship_type': 'causal'},
+                {'source_event_id': 'evt_1', 'target_event_id': 'evt_missing', 'relationship_type': 'causal'},
+            ]}) + '\n')
+
+        db_file = Path(self.temp_dir) / 'master_state.db'
+        with sqlite3.connect(db_file) as conn:
+            conn.execute("""CREATE TABLE master_state (id TEXT PRIMARY KEY, source_text TEXT, current_status TEXT,
+                            assigned_event_type TEXT, structured_data TEXT, involved_entities TEXT, story_id TEXT, cluster_id INTEGER)""")
+            conn.execute("INSERT INTO master_state VALUES ('rec1', '文本', 'completed', 'PolicyChange', ?, ?, 'story_1', 3)",
+                         (json.dumps({'description': '出口管制'}), json.dumps([{'entity_name': '乙机构', 'entity_type': 'GovernmentAgency'}])))
+            conn.execute("INSERT INTO master_state VALUES ('rec2', '未抽取', 'pending_triage', NULL, NULL, NULL, NULL, NULL)")
+
+        result = self.exporter.export_neo4j_admin_import(events_jsonl=events_file, db_path=db_file,
+                                                         relationships_jsonl=relationships_file)
+        self.assertEqual(result['counts']['events'], 3)
+        self.assertEqual(result['counts']['entities'], 2)
+        self.assertEqual(result['counts']['involved_in'], 3)
+        self.assertEqual(result['counts']['duplicate_events'], 1)
+        self.assertEqual(result['counts']['relates_to'], 1)
+        self.assertEqual(result['counts']['dangling_relationships'], 1)
+        self.assertIn('neo4j-admin database import full', result['command'])
+        self.assertNotIn('--skip-bad-relationships', result['command'])
+
+        with open(result['files']['events'], newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0][0], 'eventId:ID(Event)')
+        self.assertEqual(rows[1][rows[0].index('source_text')], '原文\n第二行')
+        self.assertEqual(rows[3][rows[0].index('cluster_id:long')], '3')
+
+        # 重复导出得到相同的文件
+        first = Path(result['files']['events']).read_text(encoding='utf-8')
+        self.exporter.export_neo4j_admin_import(events_jsonl=events_file, db_path=db_file,
+                                                relationships_jsonl=relationships_file)
+        self.assertEqual(Path(result['files']['events']).read_text(encoding='utf-8'), first)
+
 
 class TestFormatValidator(unittest.TestCase):
     """测试格式验证器"""
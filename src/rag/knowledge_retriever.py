@@ -161,7 +161,8 @@ class KnowledgeRetriever:
                 if BGEEmbedder is not None:
                     self.embedder = BGEEmbedder(
                         ollama_url=self.hybrid_config.get('ollama_url', 'http://localhost:11434'),
-                        model_name=self.hybrid_config.get('model_name', 'smartcreation/bge-large-zh-v1.5:latest')
+                        model_name=self.hybrid_config.get('model_name', 'smartcreation/bge-large-zh-v1.5:latest'),
+                        batch_size=self.hybrid_config.get('batch_size', 32)
                     )
                     
                 self.logger.info("混合检索器初始化成功")
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Neo4j批量导入
+
+将成千上万的事件、实体和事件关系按 `batch_size` 行一批，以参数化的
+`UNWIND $rows` 语句写入Neo4j：每批一个事务，每种节点标签/关系类型一条语句。
+所有写入都以 MERGE 作用于受唯一约束的 id，重复导入是幂等的；
+瞬时错误（集群切主、死锁、连接中断）按批重试，重试耗尽的批次记入报告，不影响其余批次。
+"""
+
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.models.event_data_model import Event, EventRelation
+
+try:
+    from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
+    RETRYABLE_ERRORS: tuple = (ServiceUnavailable, SessionExpired, TransientError)
+except ImportError:
+    RETRYABLE_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MAX_RETRIES = 3
+
+ENTITY_QUERY = """
+UNWIND $rows AS row
+MERGE (ent:Entity {id: row.id})
+SET ent += row.props
+"""
+
+EVENT_QUERY = """
+UNWIND $rows AS row
+MERGE (e:Event {id: row.id})
+SET e += row.props
+"""
+
+# 关系类型不能参数化，每种事件-实体关系各一条语句
+LINK_QUERIES = {
+    role: f"""
+UNWIND $rows AS row
+MATCH (e:Event {{id: row.event_id}}), (ent:Entity {{id: row.entity_id}})
+MERGE (e)-[:{role}]->(ent)
+"""
+    for role in ("HAS_SUBJECT", "HAS_OBJECT", "HAS_PARTICIPANT")
+}
+
+RELATION_QUERY = """
+UNWIND $rows AS row
+MATCH (e1:Event {id: row.source_id}), (e2:Event {id: row.target_id})
+MERGE (e1)-[r:EVENT_RELATION {id: row.id}]->(e2)
+SET r += row.props
+"""
+
+
+def entity_id_for_name(name: str) -> str:
+    """没有id的实体（字符串或缺少id的对象）按名称生成确定性的id，跨进程稳定"""
+    return f"entity_{hashlib.md5(name.encode('utf-8')).hexdigest()[:16]}"
+
+
+@dataclass
+class BulkLoadReport:
+    """批量导入的吞吐量报告"""
+    events: int = 0
+    entities: int = 0
+    links: int = 0
+    relations: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed_batches: int = 0
+    failed_event_ids: Set[str] = field(default_factory=set)
+    failed_relation_ids: Set[str] = field(default_factory=set)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def rows_written(self) -> int:
+        return self.events + self.entities + self.links + self.relations
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_written / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'events': self.events,
+            'entities': self.entities,
+            'links': self.links,
+            'relations': self.relations,
+            'batches': self.batches,
+            'retries': self.retries,
+            'failed_batches': self.failed_batches,
+            'failed_events': len(self.failed_event_ids),
+            'failed_relations': len(self.failed_relation_ids),
+            'elapsed_seconds': round(self.elapsed_seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class Neo4jBulkLoader:
+    """基于 UNWIND 批次的Neo4j批量导入器，可使用真实驱动或测试用的内存替身"""
+
+    def __init__(self, driver, database: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_retries: int = DEFAULT_MAX_RETRIES, retry_backoff: float = 0.5):
+        """
+        Args:
+            driver: neo4j.Driver，或提供相同 session()/execute_write 接口的替身
+            database: 目标数据库，None 表示服务器默认库
+            batch_size: 每个事务写入的行数
+            max_retries: 每批遇到瞬时错误时的最大重试次数
+            retry_backoff: 首次重试前的等待秒数，之后指数退避
+        """
+        self.driver = driver
+        self.database = database
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        if RETRYABLE_ERRORS and isinstance(error, RETRYABLE_ERRORS):
+            return True
+        is_retryable = getattr(error, 'is_retryable', None)
+        return callable(is_retryable) and bool(is_retryable())
+
+    def _run_batch(self, query: str, rows: List[Dict[str, Any]], report: BulkLoadReport) -> bool:
+        """在一个写事务中执行一批，瞬时错误按指数退避重试；返回是否成功"""
+        report.batches += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                session_kwargs = {'database': self.database} if self.database else {}
+                with self.driver.session(**session_kwargs) as session:
+                    session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+                return True
+            except Exception as e:
+                if attempt < self.max_retries and self._is_transient(e):
+                    report.retries += 1
+                    delay = self.retry_backoff * (2 ** attempt)
+                    logger.warning(f"批次写入遇到瞬时错误，{delay:.1f}秒后重试 ({attempt + 1}/{self.max_retries}): {e}")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"❌ 批次写入失败 ({len(rows)} 行): {e}")
+                report.failed_batches += 1
+                return False
+        return False
+
+    def _run_batches(self, query: str, rows: List[Dict[str, Any]], report: BulkLoadReport) -> List[Dict[str, Any]]:
+        """分批写入，返回写入失败的行"""
+        failed = []
+        for start in range(0, len(rows), self.batch_size):
+            batch = rows[start:start + self.batch_size]
+            if not self._run_batch(query, batch, report):
+                failed.extend(batch)
+        return failed
+
+    @staticmethod
+    def _entity_row(entity) -> Dict[str, Any]:
+        """与 Neo4jEventStorage.store_event 相同的实体属性"""
+        if isinstance(entity, str):
+            return {'id': entity_id_for_name(entity), 'props': {
+                'name': entity, 'entity_type': 'PERSON', 'properties': '{}', 'aliases': [], 'confidence': 1.0
+            }}
+        if getattr(entity, 'id', None):
+            return {'id': entity.id, 'props': {
+                'name': entity.name,
+                'entity_type': entity.entity_type,
+                'properties': json.dumps(entity.properties),
+                'aliases': entity.aliases,
+                'confidence': entity.confidence,
+            }}
+        name = getattr(entity, 'name', str(entity))
+        return {'id': entity_id_for_name(name), 'props': {
+            'name': name, 'entity_type': getattr(entity, 'entity_type', 'PERSON'),
+            'properties': '{}', 'aliases': [], 'confidence': 1.0
+        }}
+
+    @staticmethod
+    def _event_row(event: Event) -> Dict[str, Any]:
+        """与 Neo4jEventStorage._create_event_node 相同的事件属性"""
+        event_type_value = event.event_type.value if hasattr(event.event_type, 'value') else str(event.event_type)
+        return {'id': event.id, 'props': {
+            'event_type': event_type_value,
+            'text': event.text,
+            'summary': event.summary,
+            'timestamp': event.timestamp.isoformat() if hasattr(event.timestamp, 'isoformat') else event.timestamp,
+            'location': event.location,
+            'properties': json.dumps(event.properties),
+            'confidence': event.confidence,
+            'source': event.source,
+            'created_at': event.created_at.isoformat(),
+            'updated_at': event.updated_at.isoformat(),
+        }}
+
+    @staticmethod
+    def _relation_row(relation: EventRelation) -> Dict[str, Any]:
+        """与 Neo4jEventStorage.store_event_relation 相同的关系属性"""
+        return {'id': relation.id, 'source_id': relation.source_event_id, 'target_id': relation.target_event_id, 'props': {
+            'relation_type': relation.relation_type.value,
+            'confidence': relation.confidence,
+            'strength': relation.strength,
+            'properties': json.dumps(relation.properties),
+            'created_at': relation.created_at.isoformat(),
+            'source': relation.source,
+        }}
+
+    def load(self, events: Iterable[Event], relations: Iterable[EventRelation] = ()) -> BulkLoadReport:
+        """
+        批量写入事件（含其主体、客体和参与者）以及事件关系。
+
+        先写实体和事件节点，再写事件-实体关系和事件关系，保证 MATCH 时两端节点已存在。
+
+        Returns:
+            BulkLoadReport: 写入行数、批次数、重试次数、失败的事件/关系及吞吐量
+        """
+        start_time = time.time()
+        report = BulkLoadReport()
+
+        event_rows, entity_rows = [], {}
+        link_rows: Dict[str, List[Dict[str, Any]]] = {role: [] for role in LINK_QUERIES}
+        for event in events:
+            event_rows.append(self._event_row(event))
+            roles = [('HAS_SUBJECT', event.subject), ('HAS_OBJECT', event.object)]
+            roles += [('HAS_PARTICIPANT', participant) for participant in event.participants]
+            for role, entity in roles:
+                if not entity:
+                    continue
+                entity_row = self._entity_row(entity)
+                entity_rows[entity_row['id']] = entity_row
+                link_rows[role].append({'event_id': event.id, 'entity_id': entity_row['id']})
+        relation_rows = [self._relation_row(relation) for relation in relations]
+
+        failed_entities = {row['id'] for row in self._run_batches(ENTITY_QUERY, list(entity_rows.values()), report)}
+        failed_events = {row['id'] for row in self._run_batches(EVENT_QUERY, event_rows, report)}
+        for role, rows in link_rows.items():
+            # 实体写入失败的事件不再建立关联，整体记为失败
+            failed_events.update(row['event_id'] for row in rows if row['entity_id'] in failed_entities)
+            rows = [row for row in rows if row['event_id'] not in failed_events]
+            failed_events.update(row['event_id'] for row in self._run_batches(LINK_QUERIES[role], rows, report))
+        failed_relations = {row['id'] for row in self._run_batches(RELATION_QUERY, relation_rows, report)}
+
+        report.entities = len(entity_rows) - len(failed_entities)
+        report.events = len(event_rows) - len(failed_events)
+        report.links = sum(1 for rows in link_rows.values() for row in rows if row['event_id'] not in failed_events)
+        report.relations = len(relation_rows) - len(failed_relations)
+        report.failed_event_ids = failed_events
+        report.failed_relation_ids = failed_relations
+        report.elapsed_seconds = time.time() - start_time
+        logger.info(f"✅ 批量导入完成: {report.to_dict()}")
+        return report
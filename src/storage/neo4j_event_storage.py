@@ -16,6 +16,7 @@ from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable, TransientError
 
 from src.models.event_data_model import Event, Entity, EventRelation, EventPattern, EventType, RelationType
+from src.storage.neo4j_bulk_loader import BulkLoadReport, Neo4jBulkLoader, entity_id_for_name
 
 logger = logging.getLogger(__name__)
 
@@ -26,7 +27,8 @@ class Neo4jConfig:
     def __init__(self, uri: str = "bolt://localhost:7687", username: str = "neo4j", 
                  password: str = "password", database: str = "neo4j",
                  max_connection_lifetime: int = 3600, max_connection_pool_size: int = 50,
-                 connection_acquisition_timeout: int = 60):
+                 connection_acquisition_timeout: int = 60,
+                 bulk_batch_size: int = 1000, bulk_max_retries: int = 3):
         self.uri = uri
         self.username = username
         self.password = password
@@ -34,6 +36,9 @@ class Neo4jConfig:
         self.max_connection_lifetime = max_connection_lifetime
         self.max_connection_pool_size = max_connection_pool_size
         self.connection_acquisition_timeout = connection_acquisition_timeout
+        # 批量导入：每个 UNWIND 事务的行数，及每批瞬时错误的重试次数
+        self.bulk_batch_size = bulk_batch_size
+        self.bulk_max_retries = bulk_max_retries
     
     @classmethod
     def from_env(cls) -> 'Neo4jConfig':
@@ -43,7 +48,8 @@ class Neo4jConfig:
             uri=os.getenv('NEO4J_URI', 'bolt://localhost:7687'),
             username=os.getenv('NEO4J_USER', os.getenv('NEO4J_USERNAME', 'neo4j')),
             password=os.getenv('NEO4J_PASSWORD', 'password'),
-            database=os.getenv('NEO4J_DATABASE', 'neo4j')
+            database=os.getenv('NEO4J_DATABASE', 'neo4j'),
+            bulk_batch_size=int(os.getenv('NEO4J_BULK_BATCH_SIZE', 1000))
         )
     
     def to_dict(self) -> Dict[str, Any]:
@@ -259,7 +265,7 @@ class Neo4jEventStorage:
         if event.subject:
             if isinstance(event.subject, str):
                 # 如果是字符串，创建简单的实体节点
-                subject_id = f"entity_{hash(event.subject)}"
+                subject_id = entity_id_for_name(event.subject)
                 tx.run("""
                     MERGE (ent:Entity {id: $entity_id})
                     SET ent.name = $name,
@@ -280,7 +286,7 @@ class Neo4jEventStorage:
         if event.object:
             if isinstance(event.object, str):
                 # 如果是字符串，创建简单的实体节点
-                object_id = f"entity_{hash(event.object)}"
+                object_id = entity_id_for_name(event.object)
                 tx.run("""
                     MERGE (ent:Entity {id: $entity_id})
                     SET ent.name = $name,
@@ -302,7 +308,7 @@ class Neo4jEventStorage:
             # 处理参与者可能是字符串或Entity对象的情况
             if isinstance(participant, str):
                 # 如果是字符串，创建简单的实体节点
-                participant_id = f"entity_{hash(participant)}"
+                participant_id = entity_id_for_name(participant)
                 tx.run("""
                     MERGE (ent:Entity {id: $entity_id})
                     SET ent.name = $name,
@@ -319,7 +325,7 @@ class Neo4jEventStorage:
                     self._create_entity_node(tx, participant)
                 else:
                     # 如果Entity对象没有id，生成一个
-                    participant_id = f"entity_{hash(participant.name if hasattr(participant, 'name') else str(participant))}"
+                    participant_id = entity_id_for_name(participant.name if hasattr(participant, 'name') else str(participant))
                     # 创建简单的实体节点
                     tx.run("""
                         MERGE (ent:Entity {id: $entity_id})
@@ -337,6 +343,36 @@ class Neo4jEventStorage:
                 MERGE (e)-[:HAS_PARTICIPANT]->(ent)
                 """, event_id=event.id, entity_id=participant_id)
     
+    def bulk_load(self, events: List[Event], relations: List[EventRelation] = (),
+                  batch_size: int = None) -> BulkLoadReport:
+        """
+        以 UNWIND 批次批量写入事件、实体和事件关系，适合成千上万条数据的导入
+        
+        Args:
+            events: 事件列表
+            relations: 事件关系列表
+            batch_size: 每个事务的行数，默认取配置中的 bulk_batch_size
+            
+        Returns:
+            BulkLoadReport: 吞吐量报告，含写入失败的事件和关系ID
+        """
+        loader = Neo4jBulkLoader(
+            self.driver,
+            batch_size=batch_size or self.config.bulk_batch_size,
+            max_retries=self.config.bulk_max_retries
+        )
+        return loader.load(events, relations)
+    
+    def store_events_batch(self, events: List[Event]) -> Dict[str, bool]:
+        """
+        批量存储事件（EventLayerManager.add_events_batch 的批量路径）
+        
+        Returns:
+            Dict[str, bool]: 事件ID -> 是否成功
+        """
+        report = self.bulk_load(events)
+        return {event.id: event.id not in report.failed_event_ids for event in events}
+    
     def store_event_relation(self, relation: EventRelation) -> bool:
         """
         存储事件关系
@@ -0,0 +1,91 @@
+# tests/test_bge_embedder.py
+import unittest
+from unittest.mock import MagicMock
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.event_logic.hybrid_retriever import BGEEmbedder
+
+class RecordingModel:
+    """Fake SentenceTransformer that records the batches it encodes."""
+
+    def __init__(self):
+        self.batches = []
+
+    def encode(self, texts, **kwargs):
+        self.batches.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+def ollama_response(status_code, payload):
+    response = MagicMock()
+    response.status_code = status_code
+    response.json.return_value = payload
+    return response
+
+class TestBGEEmbedder(unittest.TestCase):
+
+    def test_local_batches_are_length_sorted(self):
+        """Texts are encoded in batch_size buckets of similar length and returned in input order."""
+        model = RecordingModel()
+        embedder = BGEEmbedder(embedding_model=model, batch_size=2)
+        texts = ["aaaa", "a", "aaa", "aa", "aaaaa"]
+        embeddings = embedder.embed_batch(texts)
+
+        self.assertEqual(model.batches, [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]])
+        self.assertEqual([e.vector[0] for e in embeddings], [4, 1, 3, 2, 5])
+        self.assertEqual(embedder.embed_text("abc").vector, [3.0, 1.0])
+
+    def test_ollama_uses_batched_endpoint_on_one_session(self):
+        embedder = BGEEmbedder(batch_size=2)
+        embedder.session = MagicMock()
+        embedder.session.post.side_effect = lambda url, json, timeout: ollama_response(
+            200, {"embeddings": [[float(len(text))] for text in json["input"]]}
+        )
+        embeddings = embedder.embed_batch(["ccc", "a", "bb"])
+
+        self.assertEqual([e.vector for e in embeddings], [[3.0], [1.0], [2.0]])
+        urls = [call.args[0] for call in embedder.session.post.call_args_list]
+        self.assertEqual(urls, ["http://localhost:11434/api/embed"] * 2)
+
+    def test_old_ollama_falls_back_to_single_text_endpoint(self):
+        embedder = BGEEmbedder()
+        embedder.session = MagicMock()
+        def post(url, json, timeout):
+            if url.endswith("/api/embed"):
+                return ollama_response(404, {})
+            return ollama_response(200, {"embedding": [float(len(json["prompt"]))]})
+        embedder.session.post.side_effect = post
+
+        self.assertEqual([e.vector for e in embedder.embed_batch(["a", "bb"])], [[1.0], [2.0]])
+
+    def test_failure_returns_zero_vectors(self):
+        embedder = BGEEmbedder()
+        embedder.session = MagicMock()
+        embedder.session.post.return_value = ollama_response(200, {"embeddings": []})
+        embeddings = embedder.embed_batch(["a", "b"])
+        self.assertEqual(len(embeddings), 2)
+        self.assertTrue(all(e.vector == [0.0] * 1024 for e in embeddings))
+
+    def test_failed_bucket_keeps_other_buckets(self):
+        """Only the texts of the failing batch get zero vectors, sized like the successful ones."""
+        model = RecordingModel()
+        encode = model.encode
+        def flaky_encode(texts, **kwargs):
+            if "aaa" in texts:
+                raise RuntimeError("CUDA out of memory")
+            return encode(texts, **kwargs)
+        model.encode = flaky_encode
+        embedder = BGEEmbedder(embedding_model=model, batch_size=2)
+        embeddings = embedder.embed_batch(["aaaa", "a", "aaa", "aa", "aaaaa"])
+
+        self.assertEqual([e.vector for e in embeddings],
+                         [[0.0, 0.0], [1.0, 1.0], [0.0, 0.0], [2.0, 1.0], [5.0, 1.0]])
+        self.assertEqual(model.batches, [["a", "aa"], ["aaaaa"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+# tests/test_clustering_orchestrator.py
+import unittest
+import json
+import shutil
+import numpy as np
+import yaml
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.core.config_loader import load_config
+from src.cortex.clustering_orchestrator import ClusteringOrchestrator
+
+class FakeVectorizationService:
+    """Returns fixed embeddings instead of running a model."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def get_embeddings(self, texts):
+        return self.vectors[:len(texts)]
+
+def reference_jaccard_distance(entity_sets):
+    """The original pairwise set-based computation."""
+    n = len(entity_sets)
+    matrix = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            union = len(entity_sets[i] | entity_sets[j])
+            similarity = len(entity_sets[i] & entity_sets[j]) / union if union else 0.0
+            matrix[i, j] = matrix[j, i] = 1.0 - similarity
+    return matrix
+
+class TestClusteringOrchestrator(unittest.TestCase):
+
+    def setUp(self):
+        """Load a config with a small distance block size so several blocks are exercised."""
+        self.test_dir = Path("temp_clustering_test_dir")
+        self.test_dir.mkdir(exist_ok=True)
+        self._load_clustering_config()
+
+        rng = np.random.default_rng(0)
+        names = [f"实体{i}" for i in range(12)]
+        self.entity_sets = [set(rng.choice(names, size=rng.integers(0, 4), replace=False)) for _ in range(30)]
+        self.events = []
+        for i, entity_set in enumerate(self.entity_sets):
+            entities = json.dumps([{"entity_name": name} for name in entity_set], ensure_ascii=False)
+            self.events.append({"id": f"e{i}", "source_text": f"text {i}", "involved_entities": entities if entity_set else None})
+        self.vectors = rng.normal(size=(30, 16))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _load_clustering_config(self, **overrides):
+        clustering = {"dbscan_eps": 0.3, "dbscan_min_samples": 2, "entity_weight": 0.3, "distance_block_size": 7}
+        clustering.update(overrides)
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"cortex": {"clustering": clustering}}, f)
+        load_config(config_path)
+
+    def _new_stats(self):
+        return {'entity_parsing_success': 0, 'entity_parsing_warnings': 0}
+
+    def test_jaccard_matches_reference(self):
+        """The sparse blocked computation matches the set-based one, in float32."""
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(self.vectors))
+        stats = self._new_stats()
+        incidence = orchestrator._build_entity_incidence(orchestrator._parse_entity_sets(self.events, stats))
+        set_sizes = np.asarray(incidence.sum(axis=1), dtype=np.float32).ravel()
+        blocks = [orchestrator._jaccard_distance_block(incidence, set_sizes, start, min(start + 7, 30))
+                  for start in range(0, 30, 7)]
+        matrix = np.vstack(blocks)
+        np.fill_diagonal(matrix, 0.0)
+
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(matrix, reference_jaccard_distance(self.entity_sets), atol=1e-6)
+        self.assertEqual(stats['entity_parsing_success'] + stats['entity_parsing_warnings'], len(self.events))
+
+    def test_combined_distance_matches_reference(self):
+        """Cosine and Jaccard are combined with entity_weight, as with the dense computation."""
+        from sklearn.metrics.pairwise import pairwise_distances
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(self.vectors))
+        combined = orchestrator._calculate_combined_distance(self.vectors, self.events, self._new_stats())
+
+        expected = 0.7 * pairwise_distances(self.vectors, metric='cosine') + 0.3 * reference_jaccard_distance(self.entity_sets)
+        self.assertEqual(combined.dtype, np.float32)
+        np.testing.assert_allclose(combined, expected, atol=1e-5)
+
+    def test_cluster_events(self):
+        """Events with near-identical embeddings and shared entities end up in one cluster."""
+        vectors = np.vstack([np.tile([1.0, 0.0], (3, 1)), np.tile([0.0, 1.0], (3, 1))])
+        events = [
+            {"id": f"e{i}", "source_text": "", "involved_entities": json.dumps([{"entity_name": "A" if i < 3 else "B"}])}
+            for i in range(6)
+        ]
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(vectors))
+        assignments, stats = orchestrator.cluster_events(events)
+
+        self.assertEqual(stats['clusters_found'], 2)
+        self.assertEqual(len({assignments[f"e{i}"] for i in range(3)}), 1)
+        self.assertNotEqual(assignments["e0"], assignments["e3"])
+
+    def test_sparse_graph_matches_dense_within_eps(self):
+        """With enough neighbors the sparse graph holds exactly the dense pairs within eps."""
+        self._load_clustering_config(backend="sparse", dbscan_eps=0.8, sparse={"n_neighbors": 29})
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(self.vectors))
+        stats = self._new_stats()
+        stats['candidate_pairs'] = 0
+        graph = orchestrator._calculate_sparse_distance_graph(self.vectors, self.events, stats)
+        dense = orchestrator._calculate_combined_distance(self.vectors, self.events, self._new_stats())
+
+        expected = (dense <= 0.8) & ~np.eye(30, dtype=bool)
+        self.assertEqual(graph.nnz, expected.sum())
+        np.testing.assert_allclose(graph.toarray()[expected], dense[expected], atol=1e-5)
+        self.assertEqual((graph != graph.T).nnz, 0)
+
+    def test_exact_neighbor_search_is_chunked_to_memory_budget(self):
+        """Without hnswlib the exact search gives the same neighbors however small its memory budget."""
+        self._load_clustering_config(backend="sparse", sparse={"n_neighbors": 4, "exact_search_memory_mb": 1e-6})
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(self.vectors))
+        unit_vectors = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        neighbors = orchestrator._semantic_neighbors(unit_vectors.astype(np.float32), None, 3, 10)
+
+        expected = np.argsort(-(unit_vectors[3:10] @ unit_vectors.T), axis=1)[:, :5]
+        self.assertEqual(neighbors.shape, (7, 5))
+        self.assertEqual([set(row) for row in neighbors], [set(row) for row in expected])
+
+    def test_sparse_backend_clusters_like_dense(self):
+        """Entity postings find neighbors the embedding search misses; duplicates (distance 0) stay linked."""
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(4, 16))
+        vectors = np.repeat(centers, 5, axis=0) + rng.normal(scale=0.05, size=(20, 16))
+        vectors[1] = vectors[0]
+        events = [
+            {"id": f"e{i}", "source_text": "", "involved_entities": json.dumps([{"entity_name": f"实体{i // 5}"}])}
+            for i in range(20)
+        ]
+        dense_assignments, dense_stats = ClusteringOrchestrator(FakeVectorizationService(vectors)).cluster_events(events)
+
+        self._load_clustering_config(backend="sparse", sparse={"n_neighbors": 1})
+        sparse_assignments, sparse_stats = ClusteringOrchestrator(FakeVectorizationService(vectors)).cluster_events(events)
+        self.assertEqual(sparse_stats['clusters_found'], 4)
+        self.assertEqual(sparse_assignments, dense_assignments)
+
+        self._load_clustering_config(backend="sparse", sparse={"n_neighbors": 1, "max_posting_size": 2})
+        _, capped_stats = ClusteringOrchestrator(FakeVectorizationService(vectors)).cluster_events(events)
+        self.assertLess(capped_stats['candidate_pairs'], sparse_stats['candidate_pairs'])
+
+        self._load_clustering_config(backend="sparse", sparse={"algorithm": "hdbscan", "hdbscan_min_cluster_size": 3})
+        _, hdbscan_stats = ClusteringOrchestrator(FakeVectorizationService(vectors)).cluster_events(events)
+        self.assertEqual(hdbscan_stats['clusters_found'], 4)
+
+    def test_hdbscan_on_disconnected_graph(self):
+        """Groups that share no candidate edges are still clustered by HDBSCAN."""
+        rng = np.random.default_rng(2)
+        vectors = np.repeat(np.eye(16)[:2], 10, axis=0) + rng.normal(scale=0.05, size=(20, 16))
+        events = [{"id": f"e{i}", "source_text": "", "involved_entities": None} for i in range(20)]
+
+        self._load_clustering_config(backend="sparse", sparse={"algorithm": "hdbscan", "n_neighbors": 3, "hdbscan_min_cluster_size": 5})
+        orchestrator = ClusteringOrchestrator(FakeVectorizationService(vectors))
+        assignments, stats = orchestrator.cluster_events(events)
+
+        self.assertEqual(stats['graph_components'], 2)
+        self.assertEqual(stats['clusters_found'], 2)
+        self.assertEqual(len({assignments[f"e{i}"] for i in range(10)}), 1)
+        self.assertEqual(len({assignments[f"e{i}"] for i in range(10, 20)}), 1)
+        self.assertNotEqual(assignments["e0"], assignments["e10"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,8 @@ project_root = Path(__file__).parent.parent
 import sys
 sys.path.insert(0, str(project_root))
 
-from src.core.database_manager import initialize_database
+from src.core.database_manager import DatabaseManager, IN_PROGRESS_STATUS, initialize_database
+from src.core.db_migrations import MIGRATIONS, get_schema_version
 
 class TestDatabaseManager(unittest.TestCase):
 
@@ -64,7 +65,14 @@ class TestDatabaseManager(unittest.TestCase):
                     "triage_confidence": "REAL",
                     "assigned_event_type": "TEXT",
                     "notes": "TEXT",
-                    "last_updated": "TIMESTAMP"
+                    "last_updated": "TIMESTAMP",
+                    "involved_entities": "TEXT",
+                    "cluster_id": "INTEGER",
+                    "story_id": "TEXT",
+                    "structured_data": "TEXT",
+                    "claimed_from_status": "TEXT",
+                    "lease_owner": "TEXT",
+                    "lease_expires_at": "REAL"
                 }
                 actual_columns = {info[1]: info[2] for info in columns_info}
 
@@ -73,5 +81,242 @@ class TestDatabaseManager(unittest.TestCase):
         except sqlite3.Error as e:
             self.fail(f"Database verification failed with error: {e}")
 
+    def test_connection_uses_wal_and_is_reused(self):
+        """
+        Test that connections are persistent per thread and tuned for WAL.
+        """
+        db_manager = DatabaseManager(self.db_path, synchronous="NORMAL")
+        try:
+            conn = db_manager._get_connection()
+            self.assertIs(conn, db_manager._get_connection())
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0].lower(), "wal")
+            # NORMAL == 1
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+        finally:
+            db_manager.close()
+
+    def test_deferred_writes_are_batched(self):
+        """
+        Test that deferred status updates are queued and flushed together.
+        """
+        db_manager = DatabaseManager(self.db_path, write_batch_size=1000, write_flush_interval_ms=60000)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                    [(f"id{i}", f"text {i}", "pending_triage") for i in range(10)]
+                )
+
+            for i in range(10):
+                db_manager.update_record_after_triage(f"id{i}", "pending_review", "type_a", 0.9, "ok", deferred=True)
+
+            # Nothing is written until the queue is flushed.
+            self.assertEqual(db_manager.get_status_summary(), {"pending_triage": 10})
+            self.assertEqual(db_manager.flush_pending_writes(), 10)
+            self.assertEqual(db_manager.get_status_summary(), {"pending_review": 10})
+        finally:
+            db_manager.close()
+
+    def test_deferred_writes_flush_when_batch_is_full(self):
+        """
+        Test that reaching `write_batch_size` triggers an inline flush.
+        """
+        db_manager = DatabaseManager(self.db_path, write_batch_size=3, write_flush_interval_ms=60000)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                    [(f"id{i}", f"text {i}", "pending_extraction") for i in range(3)]
+                )
+
+            for i in range(3):
+                db_manager.update_status_and_schema(f"id{i}", "pending_clustering", "", "done", deferred=True)
+
+            self.assertEqual(db_manager.get_status_summary(), {"pending_clustering": 3})
+        finally:
+            db_manager.close()
+
+    def test_failed_flush_keeps_writes_queued(self):
+        """
+        Test that a flush that cannot commit raises and leaves the writes queued for a retry.
+        """
+        db_manager = DatabaseManager(self.db_path, busy_timeout_ms=50, write_batch_size=1000,
+                                     write_flush_interval_ms=60000)
+        blocker = sqlite3.connect(self.db_path, timeout=0.05)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                    [(f"id{i}", f"text {i}", "pending_triage") for i in range(3)]
+                )
+            for i in range(3):
+                db_manager.update_record_after_triage(f"id{i}", "pending_review", "type_a", 0.9, "ok", deferred=True)
+
+            blocker.execute("BEGIN IMMEDIATE")
+            with self.assertRaises(sqlite3.OperationalError):
+                db_manager.flush_pending_writes()
+            self.assertEqual(len(db_manager._write_queue), 3)
+
+            blocker.rollback()
+            self.assertEqual(db_manager.flush_pending_writes(), 3)
+            self.assertEqual(db_manager.get_status_summary(), {"pending_review": 3})
+        finally:
+            blocker.close()
+            db_manager.close()
+
+    def test_unclosed_manager_is_collected_and_flushed(self):
+        """
+        Test that pending writes do not keep a manager alive and are flushed when it is collected.
+        """
+        import gc
+        import weakref
+        db_manager = DatabaseManager(self.db_path, write_batch_size=1000, write_flush_interval_ms=60000)
+        with db_manager._get_connection() as conn:
+            conn.execute("INSERT INTO master_state (id, source_text, current_status) VALUES ('id0', 'text', 'pending_triage')")
+        db_manager.update_record_after_triage("id0", "pending_review", "type_a", 0.9, "ok", deferred=True)
+
+        ref = weakref.ref(db_manager)
+        del db_manager, conn
+        gc.collect()
+        self.assertIsNone(ref())
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("SELECT current_status FROM master_state").fetchone()[0], "pending_review")
+        conn.close()
+
+    def test_migrations_create_indexes_and_set_version(self):
+        """
+        Test that migrations record the schema version and create the indexes.
+        """
+        DatabaseManager(self.db_path).close()
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(get_schema_version(conn), MIGRATIONS[-1].version)
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+            for name in ("idx_master_state_status_updated", "idx_master_state_story_id",
+                         "idx_master_state_cluster_id", "idx_event_data_processed_id"):
+                self.assertIn(name, indexes)
+
+    def test_migrations_upgrade_legacy_database(self):
+        """
+        Test that a pre-migration database that already has some columns is upgraded in place.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE master_state (
+                    id TEXT PRIMARY KEY, source_text TEXT NOT NULL, current_status TEXT NOT NULL,
+                    triage_confidence REAL, assigned_event_type TEXT, notes TEXT, last_updated TIMESTAMP,
+                    involved_entities TEXT
+                )
+            """)
+            conn.execute("INSERT INTO master_state (id, source_text, current_status) VALUES ('a', 't', 'pending_triage')")
+
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            self.assertIn("structured_data", db_manager._get_table_columns())
+            self.assertEqual(db_manager.get_record_count_by_status("pending_triage"), 1)
+        finally:
+            db_manager.close()
+
+    def test_keyset_pagination_by_status(self):
+        """
+        Test that paging with the returned cursor visits every record exactly once.
+        """
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status, last_updated) VALUES (?, ?, ?, ?)",
+                    # Half of the rows have never been updated (NULL last_updated).
+                    [(f"id{i:02d}", f"text {i}", "pending_clustering", None if i % 2 else f"2024-01-{i + 1:02d}")
+                     for i in range(25)] + [("other", "text", "completed", None)]
+                )
+
+            for descending in (False, True):
+                seen, cursor = [], None
+                while True:
+                    page, cursor = db_manager.get_records_page_by_status(
+                        "pending_clustering", page_size=10, after=cursor, columns=["source_text"],
+                        descending=descending
+                    )
+                    seen.extend(page)
+                    if cursor is None:
+                        break
+
+                self.assertEqual(len(seen), 25)
+                self.assertEqual(len({row["id"] for row in seen}), 25)
+                self.assertEqual(set(seen[0].keys()), {"id", "source_text"})
+
+            with self.assertRaises(ValueError):
+                db_manager.get_records_page_by_status("pending_clustering", columns=["no_such_column"])
+        finally:
+            db_manager.close()
+
+    def test_iter_records_by_status_streams_batches(self):
+        """
+        Test that records are streamed in fixed-size batches with column projection.
+        """
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status, structured_data) VALUES (?, ?, ?, ?)",
+                    [(f"id{i:02d}", f"text {i}", "pending_extraction", "{}") for i in range(12)]
+                )
+
+            batches = list(db_manager.iter_records_by_status("pending_extraction", batch_size=5, columns=["source_text"]))
+
+            self.assertEqual([len(batch) for batch in batches], [5, 5, 2])
+            self.assertEqual(set(batches[0][0].keys()), {"id", "source_text"})
+            # Plain iteration does not change the records' status.
+            self.assertEqual(db_manager.get_record_count_by_status("pending_extraction"), 12)
+        finally:
+            db_manager.close()
+
+    def test_claim_records_never_share_a_record(self):
+        """
+        Test that two workers claiming the same status never receive the same record.
+        """
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                    [(f"id{i:02d}", f"text {i}", "pending_triage") for i in range(10)]
+                )
+
+            claimed = []
+            while True:
+                batches = [db_manager.claim_records("pending_triage", 4, owner) for owner in ("first", "second")]
+                if not any(batches):
+                    break
+                claimed += [record["id"] for batch in batches for record in batch]
+
+            self.assertEqual(sorted(claimed), [f"id{i:02d}" for i in range(10)])
+            self.assertEqual(db_manager.get_status_summary(), {IN_PROGRESS_STATUS: 10})
+        finally:
+            db_manager.close()
+
+    def test_get_records_by_story(self):
+        """
+        Test story-scoped reads, including records that have no story yet.
+        """
+        db_manager = DatabaseManager(self.db_path)
+        try:
+            with db_manager._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO master_state (id, source_text, current_status, story_id) VALUES (?, ?, ?, ?)",
+                    [("a", "t", "pending_relationship_analysis", "story_1"),
+                     ("b", "t", "pending_relationship_analysis", "story_1"),
+                     ("c", "t", "pending_relationship_analysis", None),
+                     ("d", "t", "completed", "story_1")]
+                )
+
+            status = "pending_relationship_analysis"
+            self.assertEqual(sorted(db_manager.get_story_ids_by_status(status), key=str), [None, "story_1"])
+            self.assertEqual([r["id"] for r in db_manager.get_records_by_story("story_1", status)], ["a", "b"])
+            self.assertEqual([r["id"] for r in db_manager.get_records_by_story(None, status)], ["c"])
+        finally:
+            db_manager.close()
+
 if __name__ == '__main__':
     unittest.main(argv=['first-arg-is-ignored'], exit=False)
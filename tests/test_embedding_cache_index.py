@@ -0,0 +1,84 @@
+# tests/test_embedding_cache_index.py
+import unittest
+import asyncio
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.hypergraphrag.base import BaseKVStorage
+from src.hypergraphrag.utils import (
+    CacheData, cosine_similarity, dequantize_embedding, get_best_cached_response,
+    get_embedding_cache_index, quantize_embedding, save_to_cache,
+)
+
+class DictKV(BaseKVStorage):
+    """Minimal stand-in for JsonKVStorage: get_by_id hands out the stored dict itself."""
+
+    def __init__(self):
+        self._data = {}
+        self.global_config = {}
+
+    async def get_by_id(self, id):
+        return self._data.get(id)
+
+    async def upsert(self, data):
+        self._data.update(data)
+
+def cached(rng, dim=16):
+    embedding = rng.normal(size=dim).astype(np.float32)
+    return embedding, quantize_embedding(embedding)
+
+class TestEmbeddingCacheIndex(unittest.TestCase):
+
+    def test_lookup_matches_per_entry_cosine(self):
+        rng = np.random.default_rng(0)
+        kv = DictKV()
+
+        async def scenario():
+            entries = []
+            for i in range(50):
+                _, (quantized, min_val, max_val) = cached(rng)
+                entries.append((quantized, min_val, max_val))
+                await save_to_cache(kv, CacheData(args_hash=f"h{i}", content=f"answer {i}", prompt=f"q{i}",
+                                                  quantized=quantized, min_val=min_val, max_val=max_val, mode="local"))
+            await save_to_cache(kv, CacheData(args_hash="no-embedding", content="x", prompt="x", mode="local"))
+
+            query = rng.normal(size=16).astype(np.float32)
+            expected = [cosine_similarity(query, dequantize_embedding(*entry)) for entry in entries]
+            best_id, best_similarity = get_embedding_cache_index(kv, "local").best_match(query)
+            self.assertEqual(best_id, f"h{int(np.argmax(expected))}")
+            self.assertAlmostEqual(best_similarity, max(expected), places=4)
+
+            # a near-duplicate of a cached query is a hit, an unrelated query is not
+            target = dequantize_embedding(*entries[7]) + 0.001
+            self.assertEqual(await get_best_cached_response(kv, target, mode="local"), "answer 7")
+            self.assertIsNone(await get_best_cached_response(kv, -target, mode="local"))
+        asyncio.run(scenario())
+
+    def test_index_is_built_from_stored_cache(self):
+        """A fresh process indexes entries written earlier, including hex-encoded ones from older caches."""
+        rng = np.random.default_rng(1)
+        kv = DictKV()
+        embedding, (quantized, min_val, max_val) = cached(rng)
+        other, (other_quantized, other_min, other_max) = cached(rng)
+        kv._data["global"] = {
+            "legacy": {"return": "old answer", "embedding": quantized.tobytes().hex(), "embedding_shape": [16],
+                       "embedding_min": float(min_val), "embedding_max": float(max_val), "original_prompt": "old"},
+        }
+
+        async def scenario():
+            await save_to_cache(kv, CacheData(args_hash="new", content="new answer", prompt="new",
+                                              quantized=other_quantized, min_val=other_min, max_val=other_max,
+                                              mode="global"))
+            self.assertEqual(kv._data["global"]["new"]["embedding_encoding"], "base64")
+            self.assertEqual(await get_best_cached_response(kv, embedding, mode="global"), "old answer")
+            self.assertEqual(await get_best_cached_response(kv, other, mode="global"), "new answer")
+            self.assertEqual(len(get_embedding_cache_index(kv, "global")), 2)
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+# tests/test_embedding_models.py
+import unittest
+import asyncio
+import threading
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.core.embedding_models import EmbeddingInferenceWorker
+
+class RecordingModel:
+    """Fake SentenceTransformer that records the batches it encodes."""
+
+    def __init__(self, release: threading.Event | None = None):
+        self.batches = []
+        self.release = release
+        self.busy = threading.Event()
+
+    def encode(self, texts, **kwargs):
+        self.busy.set()
+        if self.release is not None:
+            self.release.wait(5)
+        self.batches.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+class TestEmbeddingInferenceWorker(unittest.TestCase):
+
+    def test_model_is_loaded_once_on_first_request(self):
+        loads = []
+        def loader():
+            loads.append(1)
+            return RecordingModel()
+        worker = EmbeddingInferenceWorker("fake", loader=loader)
+        self.assertEqual(loads, [])
+        worker.encode(["a"])
+        worker.encode(["bb"])
+        self.assertEqual(loads, [1])
+
+    def test_concurrent_async_requests_are_coalesced(self):
+        """Requests queued while the model is busy are encoded together, each caller getting its own rows."""
+        release = threading.Event()
+        model = RecordingModel(release)
+        worker = EmbeddingInferenceWorker("fake", batch_size=64, max_batch_wait_ms=0, loader=lambda: model)
+        blocker = worker.submit(["first"])
+        model.busy.wait(5)
+
+        async def encode_all():
+            tasks = [asyncio.create_task(worker.encode_async(["x" * i, "y"])) for i in range(1, 6)]
+            await asyncio.sleep(0.01)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        results = asyncio.run(encode_all())
+        blocker.result()
+        self.assertEqual(len(model.batches), 2)
+        self.assertEqual(len(model.batches[1]), 10)
+        for i, vectors in enumerate(results, start=1):
+            np.testing.assert_array_equal(vectors[:, 0], [i, 1])
+        self.assertEqual(worker.stats(), {"requests": 6, "texts": 11, "batches": 2})
+
+    def test_errors_reach_every_caller_in_the_batch(self):
+        def loader():
+            raise RuntimeError("model unavailable")
+        worker = EmbeddingInferenceWorker("fake", loader=loader)
+        with self.assertRaises(RuntimeError):
+            worker.encode(["a"])
+        # The worker keeps serving after a failure.
+        with self.assertRaises(RuntimeError):
+            worker.encode(["b"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+# tests/test_embedding_store.py
+import unittest
+import asyncio
+import shutil
+import tempfile
+import numpy as np
+import yaml
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.core import config_loader, embedding_store
+from src.core.config_loader import load_config
+from src.core.embedding_store import EmbeddingStore, encode_texts, encode_texts_async, get_embedding_store
+
+class CountingEncoder:
+    """Deterministic fake model that records which texts it was asked to encode."""
+
+    def __init__(self, dimension=8):
+        self.dimension = dimension
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text) + i / 10 for i in range(self.dimension)] for text in texts], dtype=np.float32)
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        # Restored afterwards so the config and shared stores loaded here do not leak into other tests.
+        self._saved_config = (config_loader._config, config_loader._config_path)
+
+    def tearDown(self):
+        config_loader._config, config_loader._config_path = self._saved_config
+        with embedding_store._stores_lock:
+            embedding_store._stores.clear()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_each_text_is_encoded_once(self):
+        """Only distinct texts missing from the store reach the model, across store instances."""
+        encoder = CountingEncoder()
+        store = EmbeddingStore("bge", path=self.test_dir, dtype="float32")
+        first = store.encode(["a", "bb", "a"], encoder)
+        self.assertEqual(encoder.calls, [["a", "bb"]])
+        np.testing.assert_array_equal(first[0], first[2])
+
+        reopened = EmbeddingStore("bge", path=self.test_dir, dtype="float32")
+        second = reopened.encode(["bb", "ccc", "a"], encoder)
+        self.assertEqual(encoder.calls[1:], [["ccc"]])
+        np.testing.assert_array_equal(second[0], first[1])
+        np.testing.assert_array_equal(second[2], first[0])
+        np.testing.assert_array_equal(second[1], encoder(["ccc"])[0])
+        self.assertEqual(reopened.stats(), {"hits": 2, "misses": 1, "writes": 1})
+
+    def test_encode_async_shares_the_store(self):
+        encoder = CountingEncoder()
+
+        async def encode_async(texts):
+            return encoder(texts)
+
+        store = EmbeddingStore("bge", path=self.test_dir, dtype="float32")
+        first = store.encode(["a", "bb"], encoder)
+        second = asyncio.run(store.encode_async(["bb", "ccc", "a"], encode_async))
+        self.assertEqual(encoder.calls, [["a", "bb"], ["ccc"]])
+        np.testing.assert_array_equal(second[[2, 0]], first)
+        np.testing.assert_array_equal(second[1], encoder(["ccc"])[0])
+
+    def test_model_name_and_version_are_part_of_the_key(self):
+        encoder = CountingEncoder()
+        EmbeddingStore("bge", path=self.test_dir).encode(["a"], encoder)
+        EmbeddingStore("other-model", path=self.test_dir).encode(["a"], encoder)
+        EmbeddingStore("bge", model_version="2", path=self.test_dir).encode(["a"], encoder)
+        EmbeddingStore("bge", path=self.test_dir).encode(["a"], encoder)
+        self.assertEqual(len(encoder.calls), 3)
+
+    def test_float16_storage(self):
+        """Vectors are stored at half precision and returned as float32."""
+        encoder = CountingEncoder()
+        EmbeddingStore("bge", path=self.test_dir).encode(["hello"], encoder)
+        vectors, missing = EmbeddingStore("bge", path=self.test_dir).get_many(["hello"])
+        self.assertEqual(missing, [])
+        self.assertEqual(vectors.dtype, np.float32)
+        np.testing.assert_allclose(vectors[0], encoder(["hello"])[0], rtol=1e-3)
+
+    def test_dimension_mismatch_is_not_stored(self):
+        store = EmbeddingStore("bge", path=self.test_dir)
+        store.encode(["a"], CountingEncoder(dimension=8))
+        store.put_many(["b"], CountingEncoder(dimension=4)(["b"]))
+        _, missing = store.get_many(["a", "b"])
+        self.assertEqual(missing, [1])
+
+    def test_encode_texts_follows_config(self):
+        """With the store disabled, texts are always encoded; enabled stores are shared per model."""
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"embedding_store": {"enabled": False}}, f)
+        load_config(config_path)
+        encoder = CountingEncoder()
+        encode_texts(["a"], "bge", encoder)
+        encode_texts(["a"], "bge", encoder)
+        self.assertEqual(len(encoder.calls), 2)
+        self.assertIsNone(get_embedding_store("bge"))
+
+        async def encode_async(texts):
+            return encoder(texts)
+        self.assertEqual(asyncio.run(encode_texts_async(["a"], "bge", encode_async)).dtype, np.float32)
+        self.assertEqual(len(encoder.calls), 3)
+
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"embedding_store": {"enabled": True, "path": str(self.test_dir / "store")}}, f)
+        load_config(config_path)
+        encode_texts(["a"], "bge", encoder)
+        encode_texts(["a"], "bge", encoder)
+        self.assertEqual(len(encoder.calls), 4)
+        self.assertIs(get_embedding_store("bge"), get_embedding_store("bge"))
+
+if __name__ == '__main__':
+    unittest.main()
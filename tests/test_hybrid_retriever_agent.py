@@ -0,0 +1,100 @@
+# tests/test_hybrid_retriever_agent.py
+import unittest
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.agents.hybrid_retriever_agent import HybridRetrieverAgent, RETRIEVAL_WORKERS
+
+class BarrierCollection:
+    """Fake ChromaDB collection whose query only returns once all three collections are queried at the same time."""
+
+    def __init__(self, barrier, documents):
+        self.barrier = barrier
+        self.documents = documents
+        self.embeddings = []
+
+    def query(self, query_embeddings, n_results):
+        self.embeddings.append(query_embeddings[0])
+        self.barrier.wait()
+        return {"documents": [self.documents[:n_results]]}
+
+def encode_directly(texts, model_name, encode_fn):
+    """Stands in for encode_texts, bypassing the embedding store whatever config is loaded."""
+    return np.asarray(encode_fn(texts), dtype=np.float32)
+
+async def encode_directly_async(texts, model_name, encode_fn):
+    return np.asarray(await encode_fn(texts), dtype=np.float32)
+
+def make_agent():
+    agent = HybridRetrieverAgent.__new__(HybridRetrieverAgent)
+    agent._executor = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS)
+    agent.last_timings = {}
+    agent._embedding_model_name = "fake-model"
+    agent._embedding_model = MagicMock()
+    agent._embedding_model.encode.side_effect = lambda texts: np.ones((len(texts), 4), dtype=np.float32)
+    async def encode_async(texts):
+        return np.ones((len(texts), 4), dtype=np.float32)
+    agent._embedding_model.encode_async = MagicMock(side_effect=encode_async)
+
+    barrier = threading.Barrier(3, timeout=5)
+    storage_agent = MagicMock()
+    storage_agent._source_text_collection = BarrierCollection(barrier, ["原文A", "原文B"])
+    storage_agent._event_desc_collection = BarrierCollection(barrier, ["事件A"])
+    storage_agent._entity_context_collection = BarrierCollection(barrier, ["原文A"])
+    session = storage_agent._neo4j_driver.session.return_value.__enter__.return_value
+    session.run.return_value = [
+        {"entity": "中芯国际", "relationship": "RELATES_TO", "related_event_id": "e2", "event_type": "MarketAction"},
+        {"entity": "台积电", "relationship": None, "related_event_id": None, "event_type": "Partnership"},
+    ]
+    agent.storage_agent = storage_agent
+    agent._extract_key_entities = lambda text, top_k: ["中芯国际", "台积电"]
+    return agent
+
+class TestHybridRetrieverAgent(unittest.TestCase):
+
+    def setUp(self):
+        for name, replacement in (("encode_texts", encode_directly), ("encode_texts_async", encode_directly_async)):
+            patcher = patch(f"src.agents.hybrid_retriever_agent.{name}", replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_queries_run_concurrently_with_one_embedding(self):
+        agent = make_agent()
+        summary = agent.retrieve_context("中芯国际与台积电", top_k_similar=2)
+
+        agent._embedding_model.encode.assert_called_once()
+        collections = [agent.storage_agent._source_text_collection, agent.storage_agent._event_desc_collection,
+                       agent.storage_agent._entity_context_collection]
+        self.assertTrue(all(collection.embeddings == [[1.0] * 4] for collection in collections))
+        self.assertEqual(summary.count("原文A"), 1)
+        self.assertIn("事件A", summary)
+
+        session = agent.storage_agent._neo4j_driver.session.return_value.__enter__.return_value
+        session.run.assert_called_once()
+        self.assertIn("UNWIND $entity_names", session.run.call_args.args[0])
+        self.assertEqual(session.run.call_args.kwargs, {"entity_names": ["中芯国际", "台积电"]})
+        self.assertIn("存在 'RELATES_TO' 关系", summary)
+
+        self.assertEqual(set(agent.last_timings), {"entities_ms", "embedding_ms", "vector_ms", "graph_ms", "total_ms"})
+
+    def test_async_retrieval_uses_encode_async(self):
+        agent = make_agent()
+        summary = asyncio.run(agent.retrieve_context_async("中芯国际与台积电", top_k_similar=2))
+
+        agent._embedding_model.encode_async.assert_called_once_with(["中芯国际与台积电"])
+        agent._embedding_model.encode.assert_not_called()
+        self.assertIn("事件A", summary)
+        self.assertIn("存在 'RELATES_TO' 关系", summary)
+        self.assertEqual(set(agent.last_timings), {"entities_ms", "embedding_ms", "vector_ms", "graph_ms", "total_ms"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,200 @@
+# tests/test_incremental_clusterer.py
+import unittest
+import json
+import shutil
+import time
+import yaml
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.core.config_loader import load_config
+from src.core.database_manager import DatabaseManager, RECLUSTERED_NOISE_CLUSTER_ID
+from src.cortex.incremental_clusterer import IncrementalClusterer
+
+VECTORS = {
+    "a": [1.0, 0.0, 0.0],
+    "a2": [0.98, 0.2, 0.0],
+    "b": [0.0, 1.0, 0.0],
+    "c": [0.0, 0.0, 1.0],
+    "ab": [0.7, 0.7, 0.0],
+}
+
+class FakeVectorizationService:
+    """Maps each text to a fixed embedding instead of running a model."""
+
+    def get_embeddings(self, texts):
+        return [VECTORS[text] for text in texts]
+
+def make_event(event_id, text, entity):
+    return {"id": event_id, "source_text": text, "involved_entities": json.dumps([{"entity_name": entity}])}
+
+class TestIncrementalClusterer(unittest.TestCase):
+
+    def setUp(self):
+        """Create a temporary database and config."""
+        self.test_dir = Path("temp_incremental_clustering_test_dir")
+        self.test_dir.mkdir(exist_ok=True)
+        self._load_config()
+        self.db_manager = DatabaseManager(self.test_dir / "test_db.sqlite")
+        with self.db_manager._get_connection() as conn:
+            conn.execute("INSERT INTO master_state (id, source_text, current_status, cluster_id) VALUES ('old', 't', 'done', 41)")
+
+    def tearDown(self):
+        self.db_manager.close()
+        for _ in range(3):
+            try:
+                shutil.rmtree(self.test_dir)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+    def _load_config(self, **incremental):
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"cortex": {
+                "clustering": {"dbscan_eps": 0.3, "dbscan_min_samples": 2, "entity_weight": 0.3},
+                "incremental": {"recluster_min_events": 4, **incremental},
+            }}, f)
+        load_config(config_path)
+
+    def _seed_clusters(self):
+        """Clusters two groups of events from scratch and returns the assignments."""
+        clusterer = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        events = [make_event(f"a{i}", "a", "甲公司") for i in range(3)] + [make_event(f"b{i}", "b", "乙公司") for i in range(3)]
+        assignments, stats = clusterer.process_events(events)
+        self.assertEqual(stats['clusters_found'], 2)
+        return assignments
+
+    def test_remainder_is_reclustered_into_new_clusters(self):
+        """Cluster IDs continue after the ones already in use, and the state is persisted."""
+        assignments = self._seed_clusters()
+        self.assertEqual(len({assignments[f"a{i}"] for i in range(3)}), 1)
+        self.assertEqual(sorted(set(assignments.values())), [42, 43])
+
+        reloaded = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        self.assertEqual(reloaded.cluster_ids, [42, 43])
+
+    def test_new_events_attach_without_reclustering(self):
+        """Nearby events join existing clusters; unrelated ones wait for the remainder threshold."""
+        seeded = self._seed_clusters()
+        clusterer = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        assignments, stats = clusterer.process_events([make_event("a9", "a2", "甲公司"), make_event("c1", "c", "丙公司")])
+
+        self.assertEqual(assignments, {"a9": seeded["a0"]})
+        self.assertEqual(stats['attached_events'], 1)
+        self.assertEqual(stats['reclustered_events'], 0)
+        self.assertEqual(stats['noise_points'], 1)
+
+        clusters, postings = self.db_manager.load_cluster_state()
+        counts = {c['cluster_id']: c['event_count'] for c in clusters}
+        self.assertEqual(counts[seeded["a0"]], 4)
+        self.assertIn(("甲公司", seeded["a0"], 4), postings)
+
+    def test_noise_marker_excludes_scored_events_from_trigger_count(self):
+        """Unassigned events stay pending clustering but no longer count as unscored."""
+        with self.db_manager._get_connection() as conn:
+            conn.executemany("INSERT INTO master_state (id, source_text, current_status) VALUES (?, 't', 'pending_clustering')",
+                             [("c1",), ("c2",), ("c3",)])
+            conn.commit()
+        self.assertEqual(self.db_manager.get_unscored_clustering_count(), 3)
+
+        self.db_manager.mark_clustering_noise(["c1", "c2", "old"])
+        self.assertEqual(self.db_manager.get_unscored_clustering_count(), 1)
+        self.assertEqual(self.db_manager.get_record_count_by_status('pending_clustering'), 3)
+        self.assertEqual(self.db_manager.get_max_cluster_id(), 41)
+
+        # a noise event attached by a later run loses the marker
+        self.db_manager.update_cluster_info("c1", 42, "pending_refinement")
+        self.assertEqual(self.db_manager.get_unscored_clustering_count(), 1)
+
+    def test_trigger_counts_follow_incremental_mode(self):
+        """The trigger shared by trigger_cortex.py and the extraction workflow ignores the noise remainder."""
+        from trigger_cortex import get_cortex_trigger_counts
+        with self.db_manager._get_connection() as conn:
+            conn.executemany("INSERT INTO master_state (id, source_text, current_status) VALUES (?, 't', 'pending_clustering')",
+                             [("c1",), ("c2",)])
+            conn.commit()
+        self.db_manager.mark_clustering_noise(["c1", "c2"])
+        self.assertEqual(get_cortex_trigger_counts(self.db_manager), (2, 100))
+
+        self._load_config(enabled=True)
+        self.assertEqual(get_cortex_trigger_counts(self.db_manager), (0, 1))
+
+    def _run_on_pending(self, *events):
+        """Adds events pending clustering and runs the clusterer on the unscored ones, as the Cortex workflow does."""
+        with self.db_manager._get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO master_state (id, source_text, involved_entities, current_status) VALUES (?, ?, ?, 'pending_clustering')",
+                [(event['id'], event['source_text'], event['involved_entities']) for event in events]
+            )
+            conn.commit()
+        columns = ['source_text', 'involved_entities']
+        unscored = [event for batch in self.db_manager.iter_unscored_clustering_records(columns=columns) for event in batch]
+        pool_loads = []
+
+        def load_noise_pool():
+            pool_loads.append(1)
+            return [event for batch in self.db_manager.iter_clustering_noise_records(columns=columns) for event in batch]
+
+        clusterer = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        assignments, stats = clusterer.process_events(unscored, load_noise_pool)
+        for event_id, cluster_id in assignments.items():
+            self.db_manager.update_cluster_info(event_id, cluster_id, 'pending_refinement')
+        return unscored, assignments, stats, len(pool_loads)
+
+    def test_noise_pool_is_reclustered_only_after_enough_new_noise(self):
+        """Noise is not scored again by later runs; the pool is re-clustered once recluster_min_events joined it."""
+        self._seed_clusters()
+        unscored, _, stats, pool_loads = self._run_on_pending(make_event("c1", "c", "丙公司"), make_event("c2", "c", "丙公司"))
+        self.assertEqual(len(unscored), 2)
+        self.assertEqual((stats['noise_points'], pool_loads), (2, 0))
+
+        unscored, _, stats, pool_loads = self._run_on_pending(make_event("c3", "c", "丙公司"))
+        self.assertEqual([event['id'] for event in unscored], ["c3"])
+        self.assertEqual((stats['reclustered_events'], pool_loads), (0, 0))
+        self.assertEqual(self.db_manager.get_clustering_noise_count(), 3)
+
+        _, assignments, stats, pool_loads = self._run_on_pending(make_event("c4", "c", "丙公司"), make_event("d1", "ab", "丁公司"))
+        self.assertEqual(pool_loads, 1)
+        self.assertEqual(stats['reclustered_events'], 5)
+        self.assertEqual(len({assignments[f"c{i}"] for i in range(1, 5)}), 1)
+        self.assertNotIn("d1", assignments)
+
+        # The leftover is only retried with the next re-clustering, and no longer counts as new noise.
+        self.assertEqual(self.db_manager.get_clustering_noise_count(), 0)
+        self.assertEqual(self.db_manager.get_unscored_clustering_count(), 0)
+        noise_pool = [event for batch in self.db_manager.iter_clustering_noise_records() for event in batch]
+        self.assertEqual([(event['id'], event['cluster_id']) for event in noise_pool], [("d1", RECLUSTERED_NOISE_CLUSTER_ID)])
+
+    def test_story_link_is_persisted(self):
+        seeded = self._seed_clusters()
+        clusterer = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        clusterer.link_story(seeded["a0"], "story_1")
+        clusterer.link_story(seeded["a0"], "story_2")
+
+        reloaded = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        self.assertEqual(reloaded.story_of(seeded["a0"]), "story_1")
+        self.assertIsNone(reloaded.story_of(seeded["b0"]))
+
+    def test_drifted_cluster_stops_accepting_events(self):
+        """A cluster pulled away from where it started is closed and triggers a re-cluster."""
+        seeded = self._seed_clusters()
+        self._load_config(drift_threshold=0.01, attach_eps=0.5)
+        clusterer = IncrementalClusterer(FakeVectorizationService(), self.db_manager)
+        events = [make_event(f"ab{i}", "ab", "甲公司") for i in range(3)]
+        assignments, stats = clusterer.process_events(events)
+
+        self.assertEqual(stats['drifted_clusters'], 1)
+        self.assertEqual(assignments["ab0"], seeded["a0"])
+        clusters, _ = self.db_manager.load_cluster_state()
+        self.assertTrue({c['cluster_id']: c['closed'] for c in clusters}[seeded["a0"]])
+
+        _, stats = clusterer.process_events([make_event("a9", "a", "甲公司")])
+        self.assertEqual(stats['attached_events'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
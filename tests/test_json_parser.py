@@ -0,0 +1,104 @@
+# tests/test_json_parser.py
+import unittest
+import json
+import shutil
+import yaml
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.event_extraction.json_parser import EnhancedJSONParser
+
+RELATIONSHIPS = [
+    {"source_event_id": "e1", "target_event_id": "e2", "relationship_type": "Causal"},
+    {"source_event_id": "e2", "target_event_id": "e3", "relationship_type": "Temporal"},
+]
+
+class TestEnhancedJSONParser(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = EnhancedJSONParser()
+
+    def test_array_embedded_in_prose(self):
+        """An array surrounded by explanations is returned whole, not its first object."""
+        text = f"分析如下：\n{json.dumps(RELATIONSHIPS, ensure_ascii=False)}\n以上为全部关系。"
+        result = self.parser.parse(text, expected_type=list)
+        self.assertTrue(result.success)
+        self.assertEqual(result.data, RELATIONSHIPS)
+
+    def test_reasoning_block_is_ignored(self):
+        """<think> blocks from reasoning models do not confuse extraction."""
+        text = "<think>Event {1} causes [2]...</think>\n" + json.dumps(RELATIONSHIPS)
+        result = self.parser.parse(text, expected_type=list)
+        self.assertEqual(result.data, RELATIONSHIPS)
+
+    def test_truncated_array_keeps_complete_elements(self):
+        """Output cut off by max_tokens still yields the elements that were completed."""
+        text = json.dumps(RELATIONSHIPS)[:-30]
+        result = self.parser.parse(text, expected_type=list)
+        self.assertTrue(result.success)
+        self.assertEqual(result.parsing_method, "truncated_array")
+        self.assertEqual(result.data, RELATIONSHIPS[:1])
+
+    def test_expected_type_rejects_wrong_top_level(self):
+        """A dict is not accepted when a list is expected."""
+        result = self.parser.parse('{"event_type": "merger"}', expected_type=list)
+        self.assertFalse(result.success)
+
+
+class TestLLMClientJSONPipeline(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Load a minimal LLM configuration."""
+        try:
+            from src.core.config_loader import load_config
+            from src.llm.llm_client import LLMClient
+        except ImportError as e:
+            self.skipTest(f"LLMClient dependencies missing: {e}")
+        self.test_dir = Path("temp_json_parser_test_dir")
+        self.test_dir.mkdir(exist_ok=True)
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"llm": {
+                "providers": {"fake": {"base_url": "http://127.0.0.1:9/v1", "api_key": "test-key"}},
+                "models": {
+                    "relationship_analysis": {"provider": "fake", "name": "reasoning-model"},
+                    "triage": {"provider": "fake", "name": "fast-model"},
+                },
+                "cache": {"enabled": False},
+                "json_repair": {"enabled": True, "task_type": "triage"},
+            }}, f)
+        load_config(config_path)
+        self.client = LLMClient()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    async def test_local_parse_needs_no_model_call(self):
+        """Prose-wrapped output is parsed without any extra LLM round trip."""
+        raw = "Here are the relationships:\n```json\n" + json.dumps(RELATIONSHIPS) + "\n```"
+        with patch.object(self.client, "get_raw_response", new=AsyncMock()) as mock_call:
+            parsed = await self.client.parse_or_repair_json(raw, "relationship_analysis", expected_type=list)
+        self.assertEqual(parsed, RELATIONSHIPS)
+        mock_call.assert_not_called()
+
+    async def test_repair_is_last_resort_on_cheap_route(self):
+        """Unparseable output triggers one repair call on the configured route, and it is counted."""
+        repaired = json.dumps(RELATIONSHIPS)
+        with patch.object(self.client, "get_raw_response", new=AsyncMock(return_value=repaired)) as mock_call:
+            parsed = await self.client.parse_or_repair_json(
+                "e1 causes e2; e2 precedes e3", "relationship_analysis", expected_type=list
+            )
+        self.assertEqual(parsed, RELATIONSHIPS)
+        mock_call.assert_awaited_once()
+        self.assertEqual(mock_call.await_args.kwargs["task_type"], "triage")
+        stats = self.client.get_json_parse_stats()
+        self.assertEqual(stats["llm_repair"], 1)
+        self.assertEqual(stats["llm_repair_succeeded"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,293 @@
+# tests/test_llm_batch_api.py
+import unittest
+import json
+import re
+import shutil
+import threading
+import time
+import yaml
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+try:
+    from openai import AsyncOpenAI
+except ImportError:  # The batch tests talk to the fake server through the real SDK.
+    AsyncOpenAI = None
+
+
+class FakeBatchServer:
+    """
+    A local stand-in for the OpenAI-compatible Files and Batches endpoints.
+
+    Each batch reports `in_progress` on its first poll and `completed` on the
+    next. Every request is answered with a JSON triage result that echoes its
+    last message; requests whose custom_id starts with "bad" get an error line.
+    With `expire_next` set, the next batch created expires after answering only
+    its first request.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+        self.batch_create_count = 0
+        self.expire_next = False
+        self.upload_count = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload, status=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path == "/v1/files":
+                    self._send_json(server.upload(self.headers.get("Content-Type"), body))
+                elif self.path == "/v1/batches":
+                    self._send_json(server.create_batch(json.loads(body)))
+                else:
+                    self._send_json({"error": {"message": "not found"}}, 404)
+
+            def do_GET(self):
+                match = re.fullmatch(r"/v1/batches/([\w-]+)", self.path)
+                if match:
+                    return self._send_json(server.poll_batch(match.group(1)))
+                match = re.fullmatch(r"/v1/files/([\w-]+)/content", self.path)
+                if match:
+                    content = server.files[match.group(1)].encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/octet-stream")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+                self._send_json({"error": {"message": "not found"}}, 404)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _file_object(self, file_id, content):
+        return {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                "filename": f"{file_id}.jsonl", "purpose": "batch", "status": "processed"}
+
+    def upload(self, content_type, body):
+        boundary = content_type.split("boundary=")[1].encode("utf-8")
+        for part in body.split(b"--" + boundary):
+            if b'name="file"' in part:
+                content = part.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n", 1)[0].decode("utf-8")
+        self.upload_count += 1
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        return self._file_object(file_id, content)
+
+    def _batch_object(self, batch):
+        return {key: value for key, value in batch.items() if not key.startswith("_")}
+
+    def create_batch(self, params):
+        self.batch_create_count += 1
+        batch_id = f"batch-{self.batch_create_count}"
+        requests = [json.loads(line) for line in self.files[params["input_file_id"]].splitlines() if line.strip()]
+        self.batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": params["endpoint"],
+            "input_file_id": params["input_file_id"], "completion_window": params["completion_window"],
+            "status": "validating", "created_at": int(time.time()),
+            "request_counts": {"total": len(requests), "completed": 0, "failed": 0},
+            "_requests": requests, "_polls": 0, "_expire": self.expire_next,
+        }
+        self.expire_next = False
+        return self._batch_object(self.batches[batch_id])
+
+    def poll_batch(self, batch_id):
+        batch = self.batches[batch_id]
+        batch["_polls"] += 1
+        if batch["_polls"] == 1:
+            batch["status"] = "in_progress"
+        elif batch["status"] != "completed":
+            output_lines, error_lines = [], []
+            answered = batch["_requests"][:1] if batch["_expire"] else batch["_requests"]
+            for request in answered:
+                custom_id = request["custom_id"]
+                if custom_id.startswith("bad"):
+                    error_lines.append({"id": f"req-{custom_id}", "custom_id": custom_id, "response": None,
+                                        "error": {"code": "invalid_request", "message": "bad request"}})
+                    continue
+                content = json.dumps({"event_type": "echo", "confidence": 0.9,
+                                      "explanation": request["body"]["messages"][-1]["content"]})
+                output_lines.append({"id": f"req-{custom_id}", "custom_id": custom_id, "error": None,
+                                     "response": {"status_code": 200, "body": {"choices": [{"message": {"content": content}}]}}})
+            batch["output_file_id"] = f"file-out-{batch_id}"
+            self.files[batch["output_file_id"]] = "".join(json.dumps(line) + "\n" for line in output_lines)
+            if error_lines:
+                batch["error_file_id"] = f"file-err-{batch_id}"
+                self.files[batch["error_file_id"]] = "".join(json.dumps(line) + "\n" for line in error_lines)
+            batch["status"] = "expired" if batch["_expire"] else "completed"
+            batch["request_counts"] = {"total": len(batch["_requests"]),
+                                       "completed": len(output_lines), "failed": len(error_lines)}
+        return self._batch_object(batch)
+
+
+@unittest.skipIf(AsyncOpenAI is None, "openai is not installed")
+class TestBatchJobRunner(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Start the fake batch server and create a temporary job directory."""
+        self.server = FakeBatchServer()
+        self.server.start()
+        self.client = AsyncOpenAI(api_key="test-key", base_url=self.server.base_url, max_retries=0)
+        self.test_dir = Path("temp_llm_batch_test_dir")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir, ignore_errors=True)
+        self.test_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        """Stop the server and remove the temporary directory."""
+        self.server.stop()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _requests(self, ids):
+        return {record_id: {"model": "test-model", "messages": [{"role": "user", "content": f"text {record_id}"}]}
+                for record_id in ids}
+
+    async def test_run_maps_results_to_record_ids(self):
+        """Results and per-request errors are mapped back by custom_id."""
+        from src.llm.batch_api import BatchJobRunner
+        runner = BatchJobRunner(self.client, job_dir=self.test_dir, poll_interval=0)
+        results = await runner.run("triage-test", self._requests(["rec-1", "rec-2", "bad-3"]))
+
+        self.assertEqual(set(results), {"rec-1", "rec-2", "bad-3"})
+        self.assertEqual(json.loads(results["rec-2"]["content"])["explanation"], "text rec-2")
+        self.assertIsNone(results["bad-3"]["content"])
+        self.assertIn("bad request", results["bad-3"]["error"])
+        self.assertEqual(runner.load_manifest("triage-test")["status"], "completed")
+
+    async def test_restart_resumes_submitted_job(self):
+        """A new runner (e.g. after a restart) polls the existing batch instead of resubmitting."""
+        from src.llm.batch_api import BatchJobRunner
+        requests = self._requests(["rec-1", "rec-2"])
+        await BatchJobRunner(self.client, job_dir=self.test_dir, poll_interval=0).submit("resume-test", requests)
+
+        restarted = BatchJobRunner(self.client, job_dir=self.test_dir, poll_interval=0)
+        results = await restarted.run("resume-test", requests)
+        self.assertEqual(self.server.batch_create_count, 1)
+        self.assertEqual(self.server.upload_count, 1)
+        self.assertEqual(len(results), 2)
+
+        # Once collected, results are read from the local output file.
+        again = await restarted.run("resume-test", requests)
+        self.assertEqual(again, results)
+        self.assertEqual(self.server.batch_create_count, 1)
+
+    async def test_expired_job_resubmits_unanswered_requests(self):
+        """An expired job is archived and only the requests it left without a result are sent again."""
+        from src.llm.batch_api import BatchJobRunner
+        runner = BatchJobRunner(self.client, job_dir=self.test_dir, poll_interval=0)
+        requests = self._requests(["rec-1", "rec-2", "rec-3"])
+        self.server.expire_next = True
+        partial = await runner.run("expire-test", requests)
+        self.assertEqual(set(partial), {"rec-1"})
+        self.assertEqual(runner.load_manifest("expire-test")["status"], "expired")
+
+        results = await runner.run("expire-test", requests)
+        self.assertEqual(self.server.batch_create_count, 2)
+        self.assertEqual([r["custom_id"] for r in self.server.batches["batch-2"]["_requests"]], ["rec-2", "rec-3"])
+        self.assertEqual(set(results), {"rec-1", "rec-2", "rec-3"})
+        self.assertEqual(json.loads(results["rec-1"]["content"])["explanation"], "text rec-1")
+        self.assertEqual(len(list((self.test_dir / "archive").iterdir())), 1)
+
+    def _write_client_config(self, database=None, **batch_overrides):
+        from src.core.config_loader import load_config
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"database": database or {}, "llm": {
+                "providers": {"fake": {"base_url": self.server.base_url, "api_key": "test-key"}},
+                "models": {"triage": {"provider": "fake", "name": "test-model", "temperature": 0.1}},
+                "cache": {"enabled": False},
+                "batch": {"job_dir": str(self.test_dir / "jobs"), "poll_interval_seconds": 0,
+                          "max_requests_per_batch": 2, **batch_overrides},
+            }}, f)
+        load_config(config_path)
+
+    async def test_llm_client_run_batch_resumes_by_record_id(self):
+        """Records already submitted in an unfinished job are resumed there even when new records arrive."""
+        from src.llm.batch_api import BatchJobRunner
+        from src.llm.llm_client import LLMClient
+        self._write_client_config()
+        client = LLMClient()
+        runner = BatchJobRunner(client._get_client_for_provider("fake"), job_dir=self.test_dir / "jobs")
+        await runner.submit("triage-0123456789ab", {
+            record_id: {"model": "test-model", "messages": [{"role": "user", "content": f"text {record_id}"}]}
+            for record_id in ["rec-1", "rec-2"]})
+        self.assertEqual(runner.record_jobs("triage"), {"rec-1": "triage-0123456789ab", "rec-2": "triage-0123456789ab"})
+
+        chunks = [{f"rec-{i}": [{"role": "user", "content": f"text rec-{i}"}] for i in (0, 1)},
+                  {f"rec-{i}": [{"role": "user", "content": f"text rec-{i}"}] for i in (2, 3)}]
+        results = await client.run_batch(iter(chunks), task_type="triage")
+
+        self.assertEqual(list(results), ["rec-0", "rec-1", "rec-2", "rec-3"])
+        # one batch for the pre-existing job, one per chunk's new records
+        self.assertEqual(self.server.batch_create_count, 3)
+        self.assertEqual(client.parse_json_text(results["rec-2"])["explanation"], "text rec-2")
+        self.assertEqual(runner.record_jobs("triage"), {})
+
+    async def test_llm_client_run_batch(self):
+        """LLMClient.run_batch resolves the task route, chunks requests and returns content per record."""
+        from src.llm.llm_client import LLMClient
+        self._write_client_config()
+
+        client = LLMClient()
+        requests = {f"rec-{i}": [{"role": "user", "content": f"text {i}"}] for i in range(5)}
+        results = await client.run_batch(requests, task_type="triage")
+
+        self.assertEqual(list(results), list(requests))
+        self.assertEqual(self.server.batch_create_count, 3)
+        self.assertEqual(client.parse_json_text(results["rec-4"])["explanation"], "text 4")
+
+    async def test_batch_triage_resumes_jobs_of_a_crashed_run(self):
+        """Records leased by a batch run that died are reclaimed at startup and their job is resumed."""
+        from src.core.database_manager import DatabaseManager
+        from src.llm.batch_api import BatchJobRunner
+        from src.llm.llm_client import LLMClient
+        from run_batch_triage import run_triage_batch_workflow, BATCH_TRIAGE_OWNER_PREFIX
+        db_path = self.test_dir / "master_state.db"
+        self._write_client_config(database={"path": str(db_path)})
+        db_manager = DatabaseManager(db_path)
+        with db_manager._get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                [(f"rec-{i}", f"text {i}", "pending_triage") for i in range(3)]
+            )
+        # The crashed run claimed rec-0 and rec-1 for the full completion window and submitted their job.
+        crashed = db_manager.claim_records("pending_triage", 2, f"{BATCH_TRIAGE_OWNER_PREFIX}crashed", lease_seconds=86400)
+        runner = BatchJobRunner(LLMClient()._get_client_for_provider("fake"), job_dir=self.test_dir / "jobs")
+        await runner.submit("triage-0123456789ab", self._requests([record["id"] for record in crashed]))
+        db_manager.close()
+
+        await run_triage_batch_workflow()
+
+        with DatabaseManager(db_path) as db_manager:
+            self.assertEqual(db_manager.get_status_summary(), {"pending_review": 3})
+        self.assertEqual(self.server.batch_create_count, 2)
+        self.assertEqual(runner.record_jobs("triage"), {})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# tests/test_llm_rate_limiter.py
+import unittest
+import asyncio
+import time
+from email.utils import formatdate
+
+# Add project root to the Python path
+from pathlib import Path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.llm.rate_limiter import (
+    AdaptiveConcurrencyLimiter,
+    RateLimiter,
+    TokenBucket,
+    compute_backoff_delay,
+    estimate_tokens,
+    parse_retry_after,
+)
+
+class TestRateLimitHelpers(unittest.TestCase):
+
+    def test_estimate_tokens(self):
+        """CJK characters count as one token each, other text as ~4 characters per token."""
+        english = estimate_tokens([{"role": "user", "content": "a" * 400}])
+        chinese = estimate_tokens([{"role": "user", "content": "中" * 100}])
+        self.assertEqual(english, 100 + 4)
+        self.assertEqual(chinese, 100 + 4)
+        self.assertEqual(estimate_tokens([{"role": "user", "content": ""}], max_tokens=1024), 4 + 1024)
+
+    def test_backoff_delay_is_bounded(self):
+        """Backoff grows exponentially but never exceeds max_delay."""
+        for attempt in range(10):
+            delay = compute_backoff_delay(attempt, base_delay=1.0, max_delay=8.0)
+            self.assertGreaterEqual(delay, 0.0)
+            self.assertLessEqual(delay, min(8.0, 2 ** attempt))
+
+    def test_parse_retry_after(self):
+        """Retry-After is read as seconds, milliseconds or an HTTP date."""
+        self.assertEqual(parse_retry_after({"retry-after": "7"}), 7.0)
+        self.assertEqual(parse_retry_after({"retry-after-ms": "250"}), 0.25)
+        http_date = parse_retry_after({"retry-after": formatdate(time.time() + 30, usegmt=True)})
+        self.assertTrue(25 <= http_date <= 31)
+        self.assertIsNone(parse_retry_after({}))
+        self.assertIsNone(parse_retry_after({"retry-after": "soon"}))
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def test_token_bucket_waits_for_refill(self):
+        """A bucket that is drained makes the next caller sleep until enough tokens refill."""
+        bucket = TokenBucket(rate_per_minute=600)  # 10 tokens per second
+        await bucket.acquire(600)
+        start = time.monotonic()
+        await bucket.acquire(2)
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    async def test_concurrency_limit_is_enforced(self):
+        """No more requests run at once than the current limit."""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, minimum=1, maximum=2)
+        running = 0
+        peak = 0
+
+        async def request():
+            nonlocal running, peak
+            await limiter.acquire()
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            await limiter.release(latency=0.01)
+
+        await asyncio.gather(*(request() for _ in range(10)))
+        self.assertEqual(peak, 2)
+
+    async def test_aimd_adjustment(self):
+        """Successes raise the limit additively; a throttle halves it once per cooldown."""
+        limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=8, decrease_cooldown=60)
+        for _ in range(8):
+            await limiter.acquire()
+            await limiter.release(latency=0.1)
+        self.assertGreaterEqual(int(limiter.limit), 5)
+
+        before = limiter.limit
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release(throttled=True)
+        self.assertAlmostEqual(limiter.limit, before * 0.5)
+
+    async def test_slow_responses_reduce_concurrency(self):
+        """Latency above the target counts as overload."""
+        limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=8, target_latency=1.0)
+        await limiter.acquire()
+        await limiter.release(latency=5.0)
+        self.assertEqual(limiter.limit, 2.0)
+
+    async def test_actual_usage_corrects_token_reservation(self):
+        """Unused reserved tokens are returned to the TPM bucket after the response."""
+        limiter = RateLimiter(tpm=10000)
+        async with limiter.limit(estimated_tokens=5000) as permit:
+            self.assertLess(limiter.token_bucket.tokens, 5001)
+            permit.actual_tokens = 1000
+        self.assertGreater(limiter.token_bucket.tokens, 8900)
+        self.assertEqual(limiter.stats["requests"], 1)
+
+    async def test_any_exception_marks_the_permit_failed(self):
+        """Errors the caller did not classify, and cancellation, still count as failures and free the slot."""
+        limiter = RateLimiter(initial_concurrency=2)
+        with self.assertRaises(ValueError):
+            async with limiter.limit(estimated_tokens=10):
+                raise ValueError("bad request")
+
+        async def cancelled():
+            async with limiter.limit(estimated_tokens=10):
+                await asyncio.sleep(10)
+        task = asyncio.create_task(cancelled())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(limiter.stats, {"requests": 2, "throttled": 0, "failed": 2})
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+        self.assertEqual(limiter.concurrency.limit, 2.0)
+
+    async def test_latency_excludes_bucket_wait_and_idle_time(self):
+        """Waiting for the RPM bucket or on the consumer is not mistaken for a slow provider."""
+        limiter = RateLimiter(rpm=600, initial_concurrency=4, target_latency=0.05)
+        await limiter.request_bucket.acquire(600)
+        async with limiter.limit(estimated_tokens=10) as permit:
+            await asyncio.sleep(0.1)
+            permit.idle_seconds += 0.1
+        self.assertGreater(limiter.concurrency.limit, 4.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# tests/test_llm_response_cache.py
+import unittest
+from pathlib import Path
+import shutil
+import time
+import yaml
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.llm.response_cache import LLMResponseCache, compute_cache_key
+
+class TestLLMResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary directory for the cache database."""
+        self.test_dir = Path("temp_llm_cache_test_dir")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir, ignore_errors=True)
+        self.test_dir.mkdir(exist_ok=True)
+        self.cache_path = self.test_dir / "cache.db"
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        for i in range(3):
+            try:
+                if self.test_dir.exists():
+                    shutil.rmtree(self.test_dir)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+    def test_cache_key_is_stable_and_parameter_sensitive(self):
+        params = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0.3}
+        reordered = {"temperature": 0.3, "messages": [{"role": "user", "content": "hi"}], "model": "m"}
+
+        self.assertEqual(compute_cache_key("p", params), compute_cache_key("p", reordered))
+        self.assertNotEqual(compute_cache_key("p", params), compute_cache_key("p", {**params, "temperature": 0.4}))
+        self.assertNotEqual(compute_cache_key("p", params), compute_cache_key("other", params))
+
+    def test_hit_miss_and_persistence(self):
+        cache = LLMResponseCache(self.cache_path)
+        self.assertIsNone(cache.get("k", "triage"))
+        cache.set("k", "response", "triage", "model")
+        self.assertEqual(cache.get("k", "triage"), "response")
+        self.assertEqual(cache.stats()["triage"], {"hits": 1, "misses": 1, "writes": 1})
+        cache.close()
+
+        reopened = LLMResponseCache(self.cache_path)
+        self.assertEqual(reopened.get("k", "triage"), "response")
+        reopened.close()
+
+    def test_expired_entries_are_misses(self):
+        cache = LLMResponseCache(self.cache_path, ttl_seconds=0.05)
+        cache.set("k", "response")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+        cache.close()
+
+    def test_eviction_respects_entry_and_byte_limits(self):
+        cache = LLMResponseCache(self.cache_path, max_entries=3, max_bytes=None)
+        for i in range(5):
+            cache.set(f"k{i}", f"r{i}")
+            time.sleep(0.01)
+        cache.get("k0")  # k0 becomes the most recently used entry
+        self.assertEqual(cache.evict(), 2)
+        self.assertIsNotNone(cache.get("k0"))
+        self.assertIsNone(cache.get("k1"))
+        self.assertIsNone(cache.get("k2"))
+
+        cache.max_entries, cache.max_bytes = None, 4
+        cache.evict()
+        remaining = [key for key in ("k0", "k3", "k4") if cache.get(key) is not None]
+        self.assertEqual(len(remaining), 2)
+        cache.close()
+
+    def test_per_task_type_switches(self):
+        cache = LLMResponseCache.from_config({
+            "enabled": True,
+            "path": str(self.cache_path),
+            "task_types": {"relationship_analysis": False},
+        })
+        self.assertTrue(cache.is_enabled_for("triage"))
+        self.assertFalse(cache.is_enabled_for("relationship_analysis"))
+        self.assertIsNone(LLMResponseCache.from_config({"enabled": False}))
+        cache.close()
+
+    def test_delete(self):
+        cache = LLMResponseCache(self.cache_path)
+        cache.set("k", "response")
+        cache.delete("k")
+        cache.delete("missing")
+        self.assertIsNone(cache.get("k"))
+        cache.close()
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class TestLLMClientResponseCaching(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        try:
+            from src.core.config_loader import load_config
+            from src.llm.llm_client import LLMClient
+        except ImportError as e:
+            self.skipTest(f"LLMClient dependencies missing: {e}")
+        self.test_dir = Path("temp_llm_client_cache_test_dir")
+        self.test_dir.mkdir(exist_ok=True)
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"llm": {
+                "providers": {"fake": {"base_url": "http://127.0.0.1:1/v1", "api_key": "test-key"}},
+                "models": {"extraction": {"provider": "fake", "name": "m"}},
+                "cache": {"enabled": True, "path": str(self.test_dir / "cache.db")},
+                "json_repair": {"enabled": False},
+            }}, f)
+        load_config(config_path)
+        self.client = LLMClient()
+        self.client._get_client_for_provider = lambda provider: None
+        self.client._get_rate_limiter = lambda *args: None
+
+    def tearDown(self):
+        self.client.response_cache.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def _messages(self):
+        return [{"role": "user", "content": "extract"}]
+
+    async def test_unparseable_response_is_not_cached(self):
+        """A response that fails to parse is requested again instead of being replayed from the cache."""
+        self.client._create_with_retries = AsyncMock(side_effect=[
+            _completion("Sorry, I cannot help with that."), _completion('[{"event_type": "merger"}]')
+        ])
+        self.assertIsNone(await self.client.get_json_response(self._messages(), "extraction", expected_type=list))
+        expected = [{"event_type": "merger"}]
+        self.assertEqual(await self.client.get_json_response(self._messages(), "extraction", expected_type=list), expected)
+        self.assertEqual(await self.client.get_json_response(self._messages(), "extraction", expected_type=list), expected)
+        self.assertEqual(self.client._create_with_retries.await_count, 2)
+
+    async def test_discard_cached_response(self):
+        """A cached response the caller could not use is dropped, so the retry reaches the model."""
+        self.client._create_with_retries = AsyncMock(side_effect=[_completion("[1]"), _completion("[2]")])
+        self.assertEqual(await self.client.get_raw_response(self._messages(), "extraction"), "[1]")
+        self.assertEqual(await self.client.get_raw_response(self._messages(), "extraction"), "[1]")
+        self.client.discard_cached_response(self._messages(), "extraction")
+        self.assertEqual(await self.client.get_raw_response(self._messages(), "extraction"), "[2]")
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
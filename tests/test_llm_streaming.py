@@ -0,0 +1,176 @@
+# tests/test_llm_streaming.py
+import unittest
+import json
+import shutil
+import threading
+import time
+import yaml
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.llm.stream_parser import IncrementalJSONArrayParser, MalformedStreamError
+
+EVENTS = [
+    {"event_type": "merger", "trigger": "收购", "entities": ["A公司", "B公司"]},
+    {"event_type": "financing", "trigger": "融资", "summary": "brackets } ] and \"quotes\" in strings"},
+    {"event_type": "executive_change", "trigger": "辞职", "details": {"roles": ["CEO", "CFO"]}},
+]
+
+def _chunks(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestIncrementalJSONArrayParser(unittest.TestCase):
+
+    def test_elements_are_emitted_as_they_complete(self):
+        """Each element is returned by the feed call that completes it, whatever the chunking."""
+        text = "```json\n" + json.dumps(EVENTS, ensure_ascii=False) + "\n```"
+        for size in (1, 3, 17, len(text)):
+            parser = IncrementalJSONArrayParser()
+            items = []
+            for chunk in _chunks(text, size):
+                items.extend(parser.feed(chunk))
+            self.assertEqual(items, EVENTS)
+            self.assertTrue(parser.done)
+
+    def test_first_element_available_before_array_ends(self):
+        """The first event is usable while the rest is still being generated."""
+        text = json.dumps(EVENTS, ensure_ascii=False)
+        first_end = text.index("}") + 1
+        parser = IncrementalJSONArrayParser()
+        self.assertEqual(parser.feed(text[:first_end + 5]), [EVENTS[0]])
+        self.assertFalse(parser.done)
+
+    def test_only_the_incomplete_element_is_kept(self):
+        """Consumed text is dropped between chunks instead of growing a buffer."""
+        text = json.dumps(EVENTS, ensure_ascii=False)
+        second_start = text.index("}") + 3
+        parser = IncrementalJSONArrayParser()
+        parser.feed(text[:second_start + 4])
+        parser.feed(text[second_start + 4:second_start + 8])
+        self.assertEqual("".join(parser._element_parts), text[second_start:second_start + 8])
+
+    def test_scalar_elements(self):
+        parser = IncrementalJSONArrayParser()
+        self.assertEqual(parser.feed('["a", 1, true, null]'), ["a", 1, True, None])
+
+    def test_prose_is_rejected_early(self):
+        """Output that does not start an array soon is malformed."""
+        parser = IncrementalJSONArrayParser(max_preamble_chars=20)
+        with self.assertRaises(MalformedStreamError):
+            parser.feed("I'm sorry, but I cannot extract any events from this text because")
+
+    def test_invalid_element_is_rejected(self):
+        parser = IncrementalJSONArrayParser()
+        with self.assertRaises(MalformedStreamError):
+            parser.feed('[{"event_type": merger}]')
+
+
+class FakeStreamingServer:
+    """Serves chat completions as server-sent events, one chunk per `chunk_size` characters."""
+
+    def __init__(self, content, chunk_size=8, delay=0.0):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.chunks_sent = 0
+        self.request_bodies = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                server.request_bodies.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                try:
+                    for piece in _chunks(server.content, server.chunk_size):
+                        chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "m",
+                                 "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                        server.chunks_sent += 1
+                        time.sleep(server.delay)
+                    usage = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "m", "choices": [],
+                             "usage": {"prompt_tokens": 10, "completion_tokens": 20, "total_tokens": 30}}
+                    self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client closed the stream: generation stops here.
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TestLLMClientStreaming(unittest.IsolatedAsyncioTestCase):
+
+    def _make_client(self, server):
+        try:
+            from src.core.config_loader import load_config
+            from src.llm.llm_client import LLMClient
+        except ImportError as e:
+            self.skipTest(f"LLMClient dependencies missing: {e}")
+        self.test_dir = Path("temp_llm_streaming_test_dir")
+        self.test_dir.mkdir(exist_ok=True)
+        config_path = self.test_dir / "config.yaml"
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.dump({"llm": {
+                "providers": {"fake": {"base_url": server.base_url, "api_key": "test-key"}},
+                "models": {"extraction": {"provider": "fake", "name": "m", "max_tokens": 100}},
+                "cache": {"enabled": False},
+            }}, f)
+        load_config(config_path)
+        return LLMClient()
+
+    def tearDown(self):
+        self.server.stop()
+        if hasattr(self, "test_dir"):
+            shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    async def test_stream_json_array_yields_events(self):
+        """Events are yielded one by one from a streamed response."""
+        self.server = FakeStreamingServer(json.dumps(EVENTS, ensure_ascii=False))
+        client = self._make_client(self.server)
+        events = [event async for event in client.stream_json_array([{"role": "user", "content": "x"}], "extraction")]
+        self.assertEqual(events, EVENTS)
+        self.assertTrue(self.server.request_bodies[0]["stream"])
+
+    async def test_malformed_output_aborts_generation(self):
+        """A response that is clearly not a JSON array is cut off instead of read to the end."""
+        self.server = FakeStreamingServer("Sorry, I can't help with that. " * 200, delay=0.005)
+        client = self._make_client(self.server)
+        with self.assertRaises(MalformedStreamError):
+            async for _ in client.stream_json_array([{"role": "user", "content": "x"}], "extraction"):
+                pass
+        total_chunks = len(_chunks(self.server.content, self.server.chunk_size))
+        time.sleep(0.2)
+        self.assertLess(self.server.chunks_sent, total_chunks)
+
+    async def test_budget_aborts_runaway_generation(self):
+        from src.llm.stream_parser import StreamBudgetExceededError
+        self.server = FakeStreamingServer(json.dumps(EVENTS * 50, ensure_ascii=False), delay=0.002)
+        client = self._make_client(self.server)
+        received = []
+        with self.assertRaises(StreamBudgetExceededError):
+            async for event in client.stream_json_array([{"role": "user", "content": "x"}], "extraction", budget_tokens=200):
+                received.append(event)
+        self.assertLess(len(received), len(EVENTS) * 50)
+
+if __name__ == '__main__':
+    unittest.main()
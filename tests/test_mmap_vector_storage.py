@@ -0,0 +1,139 @@
+# tests/test_mmap_vector_storage.py
+import unittest
+import asyncio
+import base64
+import json
+import os
+import tempfile
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.hypergraphrag.storage import MmapVectorDBStorage
+from src.hypergraphrag.utils import compute_mdhash_id
+
+DIM = 8
+
+async def fake_embedding(texts):
+    """Each text maps to a one-hot vector, so the nearest neighbor of a text is itself."""
+    vectors = np.zeros((len(texts), DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        vectors[i, sum(map(ord, text)) % DIM] = 1.0
+        vectors[i, (sum(map(ord, text)) + 1) % DIM] = 0.1
+    return vectors
+
+fake_embedding.embedding_dim = DIM
+
+def make_storage(working_dir, **storage_kwargs):
+    return MmapVectorDBStorage(
+        namespace="entities",
+        global_config={"working_dir": working_dir, "embedding_batch_num": 2,
+                       "vector_db_storage_cls_kwargs": storage_kwargs},
+        embedding_func=fake_embedding,
+        meta_fields={"entity_name"},
+    )
+
+def entity_data(*names):
+    return {compute_mdhash_id(name, prefix="ent-"): {"content": name, "entity_name": name} for name in names}
+
+class TestMmapVectorDBStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+
+    def test_upsert_query_and_reopen(self):
+        async def scenario():
+            vdb = make_storage(self.working_dir)
+            result = await vdb.upsert(entity_data("a", "b", "c"))
+            self.assertEqual(len(result["insert"]), 3)
+
+            hits = await vdb.query("b", top_k=2)
+            self.assertEqual(hits[0]["entity_name"], "b")
+            self.assertEqual(hits[0]["id"], compute_mdhash_id("b", prefix="ent-"))
+            self.assertAlmostEqual(hits[0]["distance"], 1.0, places=5)
+
+            # re-upserting tombstones the old row instead of rewriting the file
+            result = await vdb.upsert(entity_data("b"))
+            self.assertEqual(result["update"], [compute_mdhash_id("b", prefix="ent-")])
+            self.assertEqual(len(await vdb.query("b", top_k=5)), 1)
+
+            await vdb.index_done_callback()
+            reopened = make_storage(self.working_dir)
+            self.assertEqual([hit["entity_name"] for hit in await reopened.query("c", top_k=1)], ["c"])
+        asyncio.run(scenario())
+
+    def test_delete_and_compact(self):
+        async def scenario():
+            vdb = make_storage(self.working_dir, dtype="float16")
+            await vdb.upsert(entity_data("a", "b", "c", "d"))
+            await vdb.delete_entity("a")
+            await vdb.delete_entity("b")
+            self.assertEqual(await vdb.query("a", top_k=1), [])
+
+            await vdb.index_done_callback()
+            self.assertEqual(vdb._rows, 2)
+            self.assertFalse(os.path.exists(os.path.join(self.working_dir, "vdb_entities.0.bin")))
+
+            reopened = make_storage(self.working_dir)
+            self.assertEqual(reopened._matrix.dtype, np.float16)
+            self.assertEqual([hit["entity_name"] for hit in await reopened.query("d", top_k=1)], ["d"])
+        asyncio.run(scenario())
+
+    def test_imports_nano_vectordb_file(self):
+        matrix = np.asarray(asyncio.run(fake_embedding(["x", "y"])), dtype=np.float32)
+        with open(os.path.join(self.working_dir, "vdb_entities.json"), "w") as f:
+            json.dump({
+                "embedding_dim": DIM,
+                "data": [{"__id__": "ent-x", "entity_name": "x"}, {"__id__": "ent-y", "entity_name": "y"}],
+                "matrix": base64.b64encode(matrix.tobytes()).decode(),
+            }, f)
+
+        hits = asyncio.run(make_storage(self.working_dir).query("y", top_k=1))
+        self.assertEqual(hits[0]["id"], "ent-y")
+
+    def test_hnsw_index(self):
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            self.skipTest("hnswlib not installed")
+
+        async def scenario():
+            vdb = make_storage(self.working_dir, hnsw_min_rows=1)
+            await vdb.upsert(entity_data("a", "b", "c"))
+            await vdb.delete_entity("c")
+            self.assertEqual([hit["entity_name"] for hit in await vdb.query("b", top_k=1)], ["b"])
+            self.assertIsNotNone(vdb._index)
+            self.assertNotIn("c", [hit["entity_name"] for hit in await vdb.query("c", top_k=2)])
+        asyncio.run(scenario())
+
+    def test_saved_hnsw_index_skips_later_tombstones(self):
+        try:
+            import hnswlib  # noqa: F401
+        except ImportError:
+            self.skipTest("hnswlib not installed")
+        names = [f"t{i}" for i in range(5)]
+
+        async def build_and_save():
+            vdb = make_storage(self.working_dir, hnsw_min_rows=2)
+            await vdb.upsert(entity_data(*names))
+            await vdb.query("t0", top_k=1)
+            await vdb.index_done_callback()
+
+        async def delete_without_index():
+            vdb = make_storage(self.working_dir, hnsw_min_rows=2)
+            await vdb.delete_entity("t0")
+            await vdb.index_done_callback()
+
+        asyncio.run(build_and_save())
+        asyncio.run(delete_without_index())
+        vdb = make_storage(self.working_dir, hnsw_min_rows=2)
+        self.assertNotIn("t0", [hit["entity_name"] for hit in asyncio.run(vdb.query("t0", top_k=5))])
+        self.assertIsNotNone(vdb._index)
+        self.assertEqual([hit["entity_name"] for hit in asyncio.run(vdb.query("t1", top_k=1))], ["t1"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+# tests/test_neo4j_bulk_loader.py
+import unittest
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.models.event_data_model import Entity, Event, EventRelation, RelationType
+from src.storage.neo4j_bulk_loader import (
+    ENTITY_QUERY, EVENT_QUERY, LINK_QUERIES, RELATION_QUERY, Neo4jBulkLoader, entity_id_for_name
+)
+
+class FlakyError(Exception):
+    """Stands in for a neo4j TransientError."""
+
+    def is_retryable(self):
+        return True
+
+class FakeNeo4jDriver:
+    """In-memory stand-in for neo4j.Driver that applies the loader's UNWIND statements to dicts."""
+
+    def __init__(self, failures=0):
+        self.nodes = {"Event": {}, "Entity": {}}
+        self.edges = {}
+        self.transactions = 0
+        self.failures = failures
+
+    @contextmanager
+    def session(self, **kwargs):
+        yield self
+
+    def execute_write(self, work):
+        if self.failures:
+            self.failures -= 1
+            raise FlakyError("leader switch")
+        self.transactions += 1
+        return work(self)
+
+    def run(self, query, rows):
+        for row in rows:
+            if query == ENTITY_QUERY:
+                self.nodes["Entity"].setdefault(row["id"], {}).update(row["props"])
+            elif query == EVENT_QUERY:
+                self.nodes["Event"].setdefault(row["id"], {}).update(row["props"])
+            elif query == RELATION_QUERY:
+                if row["source_id"] in self.nodes["Event"] and row["target_id"] in self.nodes["Event"]:
+                    key = ("EVENT_RELATION", row["source_id"], row["target_id"], row["id"])
+                    self.edges.setdefault(key, {}).update(row["props"])
+            else:
+                role = next(role for role, link_query in LINK_QUERIES.items() if link_query == query)
+                if row["event_id"] in self.nodes["Event"] and row["entity_id"] in self.nodes["Entity"]:
+                    self.edges.setdefault((role, row["event_id"], row["entity_id"]), {})
+        return self
+
+    def consume(self):
+        return None
+
+def make_events(count):
+    company = Entity(id="ent_company", name="甲公司", entity_type="organization")
+    return [
+        Event(id=f"e{i}", text=f"事件{i}", subject=company, object="乙公司", participants=[company, f"人物{i % 3}"])
+        for i in range(count)
+    ]
+
+class TestNeo4jBulkLoader(unittest.TestCase):
+
+    def test_batches_and_idempotency(self):
+        driver = FakeNeo4jDriver()
+        loader = Neo4jBulkLoader(driver, batch_size=4)
+        events = make_events(10)
+        relations = [EventRelation(id=f"r{i}", relation_type=RelationType.CAUSAL, source_event_id=f"e{i}",
+                                   target_event_id=f"e{i + 1}") for i in range(9)]
+        report = loader.load(events, relations)
+
+        self.assertEqual(len(driver.nodes["Event"]), 10)
+        # 甲公司, 乙公司 and three people, deduplicated across events
+        self.assertEqual(len(driver.nodes["Entity"]), 5)
+        self.assertIn(entity_id_for_name("乙公司"), driver.nodes["Entity"])
+        self.assertEqual(len(driver.edges), 10 * 4 + 9)
+        self.assertEqual((report.events, report.entities, report.links, report.relations), (10, 5, 40, 9))
+        # entities 2 + events 3 + subject/object/participant links 3 + 3 + 5 + relations 3
+        self.assertEqual(report.batches, 19)
+        self.assertEqual(driver.transactions, 19)
+        self.assertEqual(report.failed_batches, 0)
+
+        loader.load(events, relations)
+        self.assertEqual(len(driver.nodes["Event"]), 10)
+        self.assertEqual(len(driver.nodes["Entity"]), 5)
+        self.assertEqual(len(driver.edges), 49)
+
+    def test_transient_errors_are_retried(self):
+        driver = FakeNeo4jDriver(failures=2)
+        report = Neo4jBulkLoader(driver, retry_backoff=0).load(make_events(2))
+        self.assertEqual(report.retries, 2)
+        self.assertEqual(report.failed_batches, 0)
+        self.assertEqual(len(driver.nodes["Event"]), 2)
+
+    def test_exhausted_retries_mark_events_failed(self):
+        driver = FakeNeo4jDriver(failures=100)
+        report = Neo4jBulkLoader(driver, max_retries=1, retry_backoff=0).load(make_events(2))
+        self.assertEqual(report.failed_event_ids, {"e0", "e1"})
+        self.assertEqual(report.events, 0)
+        self.assertGreater(report.failed_batches, 0)
+
+    @unittest.skipUnless(os.getenv("NEO4J_TEST_URI"), "set NEO4J_TEST_URI to run against a local Neo4j container")
+    def test_against_neo4j(self):
+        from src.storage.neo4j_event_storage import Neo4jConfig, Neo4jEventStorage
+        storage = Neo4jEventStorage(Neo4jConfig(
+            uri=os.environ["NEO4J_TEST_URI"],
+            username=os.getenv("NEO4J_TEST_USER", "neo4j"),
+            password=os.getenv("NEO4J_TEST_PASSWORD", "password"),
+        ))
+        try:
+            events = make_events(50)
+            self.assertTrue(all(storage.store_events_batch(events).values()))
+            self.assertTrue(all(storage.store_events_batch(events).values()))
+            self.assertIsNotNone(storage.get_event("e0"))
+        finally:
+            storage.close()
+
+if __name__ == '__main__':
+    unittest.main()
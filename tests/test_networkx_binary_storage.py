@@ -0,0 +1,95 @@
+# tests/test_networkx_binary_storage.py
+import unittest
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+import networkx as nx
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.hypergraphrag.storage import NetworkXBinaryStorage
+
+def make_storage(working_dir):
+    return NetworkXBinaryStorage(namespace="chunk_entity_relation", global_config={"working_dir": working_dir})
+
+def graph_state(storage):
+    graph = storage._graph
+    return (
+        sorted(graph.nodes(data=True)),
+        sorted((tuple(sorted((u, v))), data) for u, v, data in graph.edges(data=True)),
+    )
+
+class TestNetworkXBinaryStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.delta_file = os.path.join(self.working_dir, "graph_chunk_entity_relation.delta")
+        self.snapshot_file = os.path.join(self.working_dir, "graph_chunk_entity_relation.snapshot")
+
+    def test_batches_append_to_delta_log(self):
+        async def scenario():
+            graph = make_storage(self.working_dir)
+            await graph.upsert_node("甲公司", {"entity_type": "organization", "description": "a"})
+            await graph.upsert_node("<hyperedge>合作", {"role": "hyperedge", "weight": 1.0})
+            await graph.upsert_edge("<hyperedge>合作", "甲公司", {"weight": 1.0})
+            await graph.index_done_callback()
+            first_size = os.path.getsize(self.delta_file)
+
+            await graph.batch_upsert_nodes([{"node_id": "乙公司", "node_data": {"entity_type": "organization"}}])
+            await graph.batch_upsert_edges([{"source_node_id": "<hyperedge>合作", "target_node_id": "乙公司",
+                                             "edge_data": {"weight": 2.0}}])
+            await graph.upsert_node("甲公司", {"description": "b"})
+            await graph.index_done_callback()
+            second_size = os.path.getsize(self.delta_file)
+            # the second batch is appended, the first frame is not rewritten
+            self.assertLess(second_size - first_size, first_size * 2)
+            self.assertFalse(os.path.exists(self.snapshot_file))
+
+            reopened = make_storage(self.working_dir)
+            self.assertEqual(graph_state(reopened), graph_state(graph))
+            self.assertEqual((await reopened.get_node("甲公司"))["description"], "b")
+
+            await reopened.delete_node("乙公司")
+            await reopened.index_done_callback()
+            self.assertFalse(await make_storage(self.working_dir).has_node("乙公司"))
+        asyncio.run(scenario())
+
+    def test_torn_frame_is_dropped_and_log_compacts(self):
+        async def scenario():
+            graph = make_storage(self.working_dir)
+            await graph.upsert_edge("a", "b", {"weight": 1.0})
+            await graph.index_done_callback()
+            with open(self.delta_file, "ab") as f:
+                f.write(b"\x40\x00\x00\x00partial")
+
+            reopened = make_storage(self.working_dir)
+            self.assertTrue(await reopened.has_edge("a", "b"))
+            await reopened.upsert_edge("b", "c", {"weight": 2.0})
+            reopened._COMPACT_MIN_BYTES = 0
+            await reopened.index_done_callback()
+            self.assertTrue(os.path.exists(self.snapshot_file))
+            self.assertEqual(os.path.getsize(self.delta_file), 0)
+
+            self.assertEqual(graph_state(make_storage(self.working_dir)), graph_state(reopened))
+        asyncio.run(scenario())
+
+    def test_graphml_import_and_export(self):
+        legacy = nx.Graph()
+        legacy.add_node("x", entity_type="person")
+        legacy.add_edge("x", "y", weight=3.0)
+        nx.write_graphml(legacy, os.path.join(self.working_dir, "graph_chunk_entity_relation.graphml"))
+
+        graph = make_storage(self.working_dir)
+        self.assertTrue(os.path.exists(self.snapshot_file))
+        self.assertEqual(graph._graph.edges["x", "y"]["weight"], 3.0)
+
+        exported = graph.export_graphml(os.path.join(self.working_dir, "export.graphml"))
+        self.assertEqual(sorted(nx.read_graphml(exported).nodes), ["x", "y"])
+
+if __name__ == '__main__':
+    unittest.main()
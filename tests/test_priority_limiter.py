@@ -0,0 +1,77 @@
+# tests/test_priority_limiter.py
+import unittest
+import asyncio
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.hypergraphrag.utils import (
+    PRIORITY_INSERT, PRIORITY_QUERY, PriorityLimiter, call_priority, limit_async_func_call,
+)
+
+class TestPriorityLimiter(unittest.TestCase):
+
+    def test_query_calls_preempt_queued_insert_calls(self):
+        order = []
+
+        async def scenario():
+            release = asyncio.Event()
+
+            @limit_async_func_call(1)
+            async def llm(name):
+                order.append(name)
+                if name == "first":
+                    await release.wait()
+                return name
+
+            first = asyncio.create_task(llm("first"))
+            await asyncio.sleep(0)
+            inserts = [asyncio.create_task(llm(f"insert-{i}")) for i in range(3)]
+            with call_priority(PRIORITY_QUERY):
+                query = asyncio.create_task(llm("query"))
+            await asyncio.sleep(0)
+
+            metrics = llm.limiter.metrics()
+            self.assertEqual(metrics["active"], 1)
+            self.assertEqual(metrics["queue_depth"], 4)
+            self.assertEqual(metrics["queue_depth_by_priority"], {PRIORITY_QUERY: 1, PRIORITY_INSERT: 3})
+
+            release.set()
+            await asyncio.gather(first, query, *inserts)
+            metrics = llm.limiter.metrics()
+            self.assertEqual((metrics["active"], metrics["queue_depth"], metrics["acquired"], metrics["waited"]), (0, 0, 5, 4))
+            self.assertGreaterEqual(metrics["max_wait_seconds"], 0.0)
+
+        asyncio.run(scenario())
+        # the query overtakes the inserts, which stay in FIFO order
+        self.assertEqual(order, ["first", "query", "insert-0", "insert-1", "insert-2"])
+
+    def test_slot_is_released_on_error_and_cancellation(self):
+        async def scenario():
+            @limit_async_func_call(1)
+            async def failing():
+                raise RuntimeError("boom")
+
+            for _ in range(3):
+                with self.assertRaises(RuntimeError):
+                    await failing()
+            self.assertEqual(failing.limiter.metrics()["active"], 0)
+
+            limiter = PriorityLimiter(1)
+            await limiter.acquire()
+            waiter = asyncio.create_task(limiter.acquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            limiter.release()
+            self.assertEqual(limiter.metrics()["active"], 0)
+            await asyncio.wait_for(limiter.acquire(), timeout=1)
+
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
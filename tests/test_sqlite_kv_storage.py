@@ -0,0 +1,124 @@
+# tests/test_sqlite_kv_storage.py
+import unittest
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.hypergraphrag.storage import SQLiteKVStorage
+from src.hypergraphrag.utils import CacheData, handle_cache, save_to_cache
+
+def make_storage(working_dir, namespace="full_docs"):
+    return SQLiteKVStorage(namespace=namespace, global_config={"working_dir": working_dir}, embedding_func=None)
+
+class TestSQLiteKVStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+
+    def test_commit_and_reopen(self):
+        async def scenario():
+            kv = make_storage(self.working_dir)
+            inserted = await kv.upsert({"doc-1": {"content": "a"}, "doc-2": {"content": "b"}})
+            self.assertEqual(set(inserted), {"doc-1", "doc-2"})
+            # existing keys are not overwritten, matching JsonKVStorage
+            self.assertEqual(await kv.upsert({"doc-1": {"content": "changed"}}), {})
+            self.assertEqual(await kv.filter_keys(["doc-1", "doc-3"]), {"doc-3"})
+
+            # nothing reaches disk before index_done_callback
+            self.assertEqual(sorted(await make_storage(self.working_dir).all_keys()), [])
+            await kv.index_done_callback()
+
+            reopened = make_storage(self.working_dir)
+            self.assertEqual(sorted(await reopened.all_keys()), ["doc-1", "doc-2"])
+            self.assertEqual(await reopened.get_by_id("doc-1"), {"content": "a"})
+            self.assertEqual(await reopened.get_by_ids(["doc-2", "missing"], fields={"content"}),
+                             [{"content": "b"}, None])
+        asyncio.run(scenario())
+
+    def test_in_place_cache_update_is_persisted(self):
+        """save_to_cache mutates the mode dict from get_by_id and upserts it under the same key."""
+        async def scenario():
+            kv = make_storage(self.working_dir, "llm_response_cache")
+            await kv.upsert({"default": {}})
+            await kv.index_done_callback()
+
+            mode_cache = await kv.get_by_id("default")
+            mode_cache["hash"] = {"return": "answer"}
+            await kv.upsert({"default": mode_cache})
+            await kv.index_done_callback()
+
+            reopened = make_storage(self.working_dir, "llm_response_cache")
+            self.assertEqual(await reopened.get_by_id("default"), {"hash": {"return": "answer"}})
+        asyncio.run(scenario())
+
+    def test_imports_json_store_and_drop(self):
+        with open(os.path.join(self.working_dir, "kv_store_text_chunks.json"), "w", encoding="utf-8") as f:
+            json.dump({"chunk-1": {"content": "旧数据"}}, f, ensure_ascii=False)
+
+        async def scenario():
+            kv = make_storage(self.working_dir, "text_chunks")
+            self.assertEqual(await kv.get_by_id("chunk-1"), {"content": "旧数据"})
+            await kv.drop()
+            self.assertIsNone(await kv.get_by_id("chunk-1"))
+            await kv.upsert({"chunk-2": {"content": "new"}})
+            await kv.index_done_callback()
+            kv.compact()
+
+            # the JSON file is not imported again once the table has data
+            reopened = make_storage(self.working_dir, "text_chunks")
+            self.assertEqual(await reopened.all_keys(), ["chunk-2"])
+        asyncio.run(scenario())
+
+    def test_llm_cache_entries_are_stored_per_row(self):
+        """save_to_cache and handle_cache read and write single (mode, args_hash) rows."""
+        with open(os.path.join(self.working_dir, "kv_store_llm_response_cache.json"), "w", encoding="utf-8") as f:
+            json.dump({"local": {"old": {"return": "旧答案", "original_prompt": "q0"}}}, f, ensure_ascii=False)
+
+        async def scenario():
+            kv = make_storage(self.working_dir, "llm_response_cache")
+            for i in range(3):
+                await save_to_cache(kv, CacheData(args_hash=f"h{i}", content=f"answer {i}", prompt=f"q{i}", mode="local"))
+            self.assertEqual((await handle_cache(kv, "h1", "q1", mode="local"))[0], "answer 1")
+            await kv.index_done_callback()
+
+            with sqlite3.connect(kv._file_name) as conn:
+                rows = conn.execute("SELECT id, sub_id FROM kv_entries ORDER BY sub_id").fetchall()
+                self.assertEqual(conn.execute("SELECT COUNT(*) FROM kv").fetchone()[0], 0)
+            conn.close()
+            # the imported whole-mode record was split into rows as well
+            self.assertEqual(rows, [("local", "h0"), ("local", "h1"), ("local", "h2"), ("local", "old")])
+
+            reopened = make_storage(self.working_dir, "llm_response_cache")
+            self.assertEqual((await handle_cache(reopened, "old", "q0", mode="local"))[0], "旧答案")
+            self.assertEqual((await handle_cache(reopened, "h2", "q2", mode="naive"))[0], None)
+            self.assertEqual(len(await reopened.get_entries("local")), 4)
+        asyncio.run(scenario())
+
+    def test_index_done_callback_compacts_free_pages(self):
+        async def scenario():
+            kv = make_storage(self.working_dir, "text_chunks")
+            kv._COMPACT_MIN_BYTES = 0
+            await kv.upsert({f"chunk-{i}": {"content": "x" * 2000} for i in range(200)})
+            await kv.index_done_callback()
+            pages = kv._conn.execute("PRAGMA page_count").fetchone()[0]
+
+            await kv.drop()
+            await kv.upsert({"chunk-new": {"content": "y"}})
+            await kv.index_done_callback()
+            # the freed pages were vacuumed away and the WAL truncated
+            self.assertLess(kv._conn.execute("PRAGMA page_count").fetchone()[0], pages / 4)
+            self.assertEqual(kv._conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+            self.assertEqual(os.path.getsize(kv._file_name + "-wal"), 0)
+            self.assertEqual(await make_storage(self.working_dir, "text_chunks").all_keys(), ["chunk-new"])
+        asyncio.run(scenario())
+
+if __name__ == '__main__':
+    unittest.main()
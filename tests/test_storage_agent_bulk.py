@@ -0,0 +1,96 @@
+# tests/test_storage_agent_bulk.py
+import unittest
+import asyncio
+import json
+from unittest.mock import MagicMock
+import numpy as np
+from pathlib import Path
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.agents.storage_agent import StorageAgent
+
+class RecordingTx:
+    def __init__(self):
+        self.runs = []
+
+    def run(self, query, **params):
+        self.runs.append((query, params))
+
+def make_agent():
+    """Builds a StorageAgent around fakes instead of live Neo4j/ChromaDB connections."""
+    agent = StorageAgent.__new__(StorageAgent)
+    agent.tx = RecordingTx()
+    session = MagicMock()
+    session.execute_write.side_effect = lambda fn, *args: fn(agent.tx, *args)
+    agent._neo4j_driver = MagicMock()
+    agent._neo4j_driver.session.return_value.__enter__.return_value = session
+    agent._source_text_collection = MagicMock()
+    agent._event_desc_collection = MagicMock()
+    agent._entity_context_collection = MagicMock()
+    agent._embedding_model = MagicMock()
+    agent.encoded = []
+    def encode(texts):
+        agent.encoded.append(list(texts))
+        return np.array([[float(len(text))] for text in texts], dtype=np.float32)
+    agent._encode = encode
+    async def encode_async(texts):
+        return encode(texts)
+    agent._encode_async = encode_async
+    return agent
+
+def make_event(event_id, entities):
+    return {
+        "id": event_id,
+        "source_text": f"text of {event_id}",
+        "structured_data": json.dumps({"description": f"desc {event_id}"}),
+        "involved_entities": json.dumps([{"entity_name": name, "entity_type": "组织"} for name in entities]),
+    }
+
+class TestStoreEventsBulk(unittest.TestCase):
+
+    def test_story_is_written_in_one_pass(self):
+        """One encode call, one upsert per collection and one UNWIND statement per label."""
+        agent = make_agent()
+        agent.store_events_bulk([make_event("e1", ["甲公司", "乙公司"]), make_event("e2", ["甲公司"])])
+
+        self.assertEqual(len(agent.encoded), 1)
+        self.assertEqual(len(agent.encoded[0]), 2 + 2 + 3)
+        self.assertEqual(len(agent.tx.runs), 2)
+        (_, events), (_, entities) = agent.tx.runs
+        self.assertEqual([row["event_id"] for row in events["rows"]], ["e1", "e2"])
+        self.assertEqual(events["rows"][0]["props"]["eventId"], "e1")
+        self.assertEqual(
+            [(row["event_id"], row["entity_name"]) for row in entities["rows"]],
+            [("e1", "甲公司"), ("e1", "乙公司"), ("e2", "甲公司")],
+        )
+
+        agent._source_text_collection.upsert.assert_called_once()
+        agent._event_desc_collection.upsert.assert_called_once()
+        entity_call = agent._entity_context_collection.upsert.call_args.kwargs
+        self.assertEqual(entity_call["ids"], ["e1_entity_0", "e1_entity_1", "e2_entity_0"])
+        self.assertEqual(entity_call["embeddings"], [[float(len(doc))] for doc in entity_call["documents"]])
+
+    def test_async_variant_writes_the_same_story(self):
+        agent = make_agent()
+        asyncio.run(agent.store_events_bulk_async([make_event("e1", ["甲公司", "乙公司"]), make_event("e2", ["甲公司"])]))
+
+        self.assertEqual(len(agent.encoded), 1)
+        self.assertEqual(len(agent.encoded[0]), 2 + 2 + 3)
+        self.assertEqual(len(agent.tx.runs), 2)
+        entity_call = agent._entity_context_collection.upsert.call_args.kwargs
+        self.assertEqual(entity_call["ids"], ["e1_entity_0", "e1_entity_1", "e2_entity_0"])
+        self.assertEqual(entity_call["embeddings"], [[float(len(doc))] for doc in entity_call["documents"]])
+
+    def test_graph_failure_is_raised(self):
+        agent = make_agent()
+        agent._neo4j_driver.session.return_value.__enter__.return_value.execute_write.side_effect = RuntimeError("down")
+        with self.assertRaises(RuntimeError):
+            agent.store_events_bulk([make_event("e1", [])])
+        agent._source_text_collection.upsert.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# tests/test_triage_grouping.py
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from run_batch_triage import TriageAgent, get_triage_vocabulary, group_records
+
+class TestTriageGrouping(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Create a TriageAgent with a mocked LLM client."""
+        self.agent = TriageAgent.__new__(TriageAgent)
+        self.agent.llm_client = MagicMock()
+
+    def test_group_records(self):
+        """Short texts are packed K at a time; long texts go alone."""
+        rows = [{'id': f'r{i}', 'source_text': 'short'} for i in range(5)]
+        rows.insert(2, {'id': 'long', 'source_text': 'x' * 1000})
+        groups = group_records(rows, records_per_request=2, max_chars_per_record=500)
+        self.assertEqual([[row['id'] for row in group] for group in groups],
+                         [['r0', 'r1'], ['long'], ['r2', 'r3'], ['r4']])
+        self.assertEqual(len(group_records(rows, 1, 500)), len(rows))
+
+    def test_shared_prefix_is_identical_across_groups(self):
+        """The system message does not depend on the texts, so providers can cache it."""
+        first = self.agent.build_group_messages(["文本一", "文本二"])
+        second = self.agent.build_group_messages(["another", "batch", "of texts"])
+        self.assertEqual(first[0], second[0])
+        self.assertIn("[2] 文本二", first[1]['content'])
+        self.assertIs(get_triage_vocabulary(), get_triage_vocabulary())
+
+    async def test_keyed_results_are_mapped_back(self):
+        """Results are matched by key, not by position, and missing ones are triaged individually."""
+        self.agent.llm_client.get_json_response = AsyncMock(side_effect=[
+            [
+                {"id": "3", "event_type": "executive_change", "confidence": 0.7},
+                {"id": "1", "event_type": "company_merger_and_acquisition", "confidence": 0.9},
+            ],
+            {"event_type": "investment_and_financing", "confidence": 0.8},
+        ])
+        results = await self.agent.triage_group(["merger text", "financing text", "ceo text"])
+
+        self.assertEqual([r['event_type'] for r in results],
+                         ["company_merger_and_acquisition", "investment_and_financing", "executive_change"])
+        self.assertEqual(self.agent.llm_client.get_json_response.await_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
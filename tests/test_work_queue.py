@@ -0,0 +1,137 @@
+# tests/test_work_queue.py
+import asyncio
+import unittest
+from pathlib import Path
+import shutil
+import time
+
+# Add project root to the Python path
+project_root = Path(__file__).parent.parent
+import sys
+sys.path.insert(0, str(project_root))
+
+from src.core.database_manager import DatabaseManager, IN_PROGRESS_STATUS
+from src.core.work_queue import WorkQueue, WorkflowLock, CORTEX_WORKFLOW_LOCK
+
+class TestWorkQueue(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a temporary database with records pending triage."""
+        self.test_dir = Path("temp_work_queue_test_dir")
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir, ignore_errors=True)
+        self.test_dir.mkdir(exist_ok=True)
+        self.db_path = self.test_dir / "test_db.sqlite"
+
+        self.db_manager = DatabaseManager(self.db_path)
+        with self.db_manager._get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO master_state (id, source_text, current_status) VALUES (?, ?, ?)",
+                [(f"id{i:02d}", f"text {i}", "pending_triage") for i in range(10)]
+            )
+
+    def tearDown(self):
+        """Close the manager and remove the temporary directory."""
+        self.db_manager.close()
+        for i in range(3):
+            try:
+                if self.test_dir.exists():
+                    shutil.rmtree(self.test_dir)
+                break
+            except OSError:
+                time.sleep(0.1)
+
+    def test_workers_claim_disjoint_records(self):
+        """Two workers on the same status never receive the same record."""
+        queue_a = WorkQueue(self.db_manager, "pending_triage", owner="worker-a")
+        queue_b = WorkQueue(DatabaseManager(self.db_path), "pending_triage", owner="worker-b")
+        try:
+            claimed_a = [r["id"] for r in queue_a.claim(6)]
+            claimed_b = [r["id"] for r in queue_b.claim(6)]
+
+            self.assertEqual(len(claimed_a), 6)
+            self.assertEqual(len(claimed_b), 4)
+            self.assertFalse(set(claimed_a) & set(claimed_b))
+            self.assertEqual(self.db_manager.get_status_summary(), {IN_PROGRESS_STATUS: 10})
+            self.assertEqual(queue_a.claim(1), [])
+        finally:
+            queue_b.db_manager.close()
+
+    def test_expired_leases_are_reclaimed(self):
+        """Records held by a worker that stopped heartbeating become claimable again."""
+        crashed = WorkQueue(self.db_manager, "pending_triage", owner="crashed", lease_seconds=0.05)
+        self.assertEqual(len(crashed.claim(3)), 3)
+
+        time.sleep(0.1)
+        survivor = WorkQueue(self.db_manager, "pending_triage", owner="survivor")
+        claimed = [r["id"] for batch in survivor.iter_batches(4) for r in batch]
+
+        self.assertEqual(sorted(claimed), [f"id{i:02d}" for i in range(10)])
+
+    def test_heartbeat_keeps_leases_alive(self):
+        """Renewed leases are not reclaimed by other workers."""
+        queue = WorkQueue(self.db_manager, "pending_triage", owner="worker", lease_seconds=0.2)
+        queue.claim(10)
+        time.sleep(0.1)
+        self.assertEqual(queue.heartbeat(), 10)
+        time.sleep(0.15)
+
+        self.assertEqual(self.db_manager.reclaim_expired_leases(), 0)
+
+    def test_exit_releases_unfinished_records(self):
+        """Leaving the queue context returns unfinished records and keeps finished ones."""
+        async def run():
+            async with WorkQueue(self.db_manager, "pending_triage", owner="worker") as queue:
+                batch = queue.claim(4)
+                queue.update_status_and_schema(batch[0]["id"], "pending_review", "", "done", deferred=True)
+
+        asyncio.run(run())
+
+        self.assertEqual(self.db_manager.get_status_summary(), {"pending_review": 1, "pending_triage": 9})
+
+    def test_updates_are_fenced_by_lease_owner(self):
+        """A worker whose lease expired cannot overwrite a record another worker has claimed since."""
+        stale = WorkQueue(self.db_manager, "pending_triage", owner="stale", lease_seconds=0.05)
+        record_id = stale.claim(1)[0]["id"]
+        time.sleep(0.1)
+        current = WorkQueue(self.db_manager, "pending_triage", owner="current")
+        self.assertIn(record_id, [r["id"] for r in current.claim(10)])
+
+        stale.update_record_after_triage(record_id, "pending_review", "stale_type", 0.1, "late")
+        current.update_record_after_triage(record_id, "pending_review", "current_type", 0.9, "ok", deferred=True)
+        stale.update_status_and_schema(record_id, "extraction_failed", "", "late", deferred=True)
+        self.db_manager.flush_pending_writes()
+
+        with self.db_manager._get_connection() as conn:
+            row = conn.execute(
+                "SELECT current_status, assigned_event_type, lease_owner, lease_expires_at FROM master_state WHERE id = ?",
+                (record_id,)
+            ).fetchone()
+        self.assertEqual(row, ("pending_review", "current_type", None, None))
+
+    def test_workflow_lock_is_held_by_one_owner(self):
+        """A second run cannot take the workflow lock until the first releases it."""
+        with WorkflowLock(self.db_manager, CORTEX_WORKFLOW_LOCK, owner="run-a") as first:
+            self.assertTrue(first.acquired)
+            self.assertTrue(self.db_manager.is_workflow_locked(CORTEX_WORKFLOW_LOCK))
+            with WorkflowLock(DatabaseManager(self.db_path), CORTEX_WORKFLOW_LOCK, owner="run-b") as second:
+                self.assertFalse(second.acquired)
+                second.db_manager.close()
+
+        self.assertFalse(self.db_manager.is_workflow_locked(CORTEX_WORKFLOW_LOCK))
+        self.assertTrue(self.db_manager.acquire_workflow_lock(CORTEX_WORKFLOW_LOCK, "run-b"))
+
+    def test_workflow_lock_expires_without_heartbeat(self):
+        """The lock of a run that stopped renewing it can be taken over; a renewed lock cannot."""
+        self.assertTrue(self.db_manager.acquire_workflow_lock(CORTEX_WORKFLOW_LOCK, "crashed", 0.05))
+        time.sleep(0.1)
+        self.assertFalse(self.db_manager.is_workflow_locked(CORTEX_WORKFLOW_LOCK))
+
+        with WorkflowLock(self.db_manager, CORTEX_WORKFLOW_LOCK, owner="run", lease_seconds=0.2) as lock:
+            self.assertTrue(lock.acquired)
+            time.sleep(0.3)
+            self.assertFalse(self.db_manager.acquire_workflow_lock(CORTEX_WORKFLOW_LOCK, "other"))
+        self.assertFalse(self.db_manager.renew_workflow_lock(CORTEX_WORKFLOW_LOCK, "crashed"))
+
+if __name__ == '__main__':
+    unittest.main(argv=['first-arg-is-ignored'], exit=False)
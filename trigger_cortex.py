@@ -6,9 +6,18 @@ if a configurable threshold is met, it invokes the main Cortex workflow script.
 
 This script is designed to be run manually or as a scheduled task (e.g., cron job)
 to decouple the Cortex workflow from other processes like extraction.
+
+With incremental clustering enabled (`cortex.incremental.enabled`), new events
+are attached to persisted clusters instead of re-clustering the backlog, so the
+workflow is triggered as soon as any event it has not scored yet is pending,
+and `--watch` keeps polling continuously. The unassigned remainder of earlier
+runs does not trigger it on its own; it is retried when the noise pool is
+re-clustered.
 """
 
 import sys
+import time
+import argparse
 import subprocess
 from pathlib import Path
 
@@ -18,6 +27,21 @@ sys.path.insert(0, str(project_root))
 
 from src.core.config_loader import load_config, get_config
 from src.core.database_manager import DatabaseManager
+from src.core.work_queue import CORTEX_WORKFLOW_LOCK
+
+def get_cortex_trigger_counts(db_manager: DatabaseManager) -> tuple[int, int]:
+    """
+    Returns the number of events that count towards triggering the Cortex
+    workflow and the threshold they are compared with. Shared with the
+    trigger at the end of the extraction workflow.
+    """
+    cortex_config = get_config().get('cortex', {})
+    if cortex_config.get('incremental', {}).get('enabled', False):
+        # Incremental runs cost little per event; the noise remainder is only
+        # re-clustered once it reaches its own threshold. Only events not scored
+        # by an earlier run count, otherwise it would re-trigger on every poll.
+        return db_manager.get_unscored_clustering_count(), 1
+    return db_manager.get_record_count_by_status('pending_clustering'), cortex_config.get('trigger_threshold', 100)
 
 def check_and_trigger_cortex():
     """
@@ -27,24 +51,21 @@ def check_and_trigger_cortex():
     print("\n--- Checking if Cortex workflow should be triggered ---")
     config = get_config()
     db_path = config.get('database', {}).get('path')
-    trigger_threshold = config.get('cortex', {}).get('trigger_threshold', 100)
     
     if not db_path:
         print("Error: Database path not found in configuration.")
         return
         
-    db_manager = DatabaseManager(db_path)
-    
-    try:
-        df = db_manager.get_records_by_status_as_df('pending_clustering')
-        pending_count = len(df)
-    except Exception as e:
-        print(f"Error querying database: {e}")
-        return
+    # Closed before the (blocking) Cortex run, and on every --watch poll
+    with DatabaseManager(db_path) as db_manager:
+        pending_count, trigger_threshold = get_cortex_trigger_counts(db_manager)
+        cortex_running = db_manager.is_workflow_locked(CORTEX_WORKFLOW_LOCK)
     
     print(f"Found {pending_count} events pending clustering. Threshold is {trigger_threshold}.")
     
-    if pending_count >= trigger_threshold:
+    if pending_count >= trigger_threshold and cortex_running:
+        print("A Cortex run is already in progress. Skipping the trigger.")
+    elif pending_count >= trigger_threshold:
         print(f"Threshold met ({pending_count} >= {trigger_threshold}). Triggering Cortex workflow...")
         try:
             # Using subprocess to call the other script
@@ -72,11 +93,29 @@ def check_and_trigger_cortex():
     else:
         print("Threshold not met. Cortex workflow will not be triggered.")
 
+def watch_and_trigger_cortex():
+    """Checks for pending events forever, sleeping between checks."""
+    poll_interval = get_config().get('cortex', {}).get('incremental', {}).get('poll_interval_seconds', 60)
+    print(f"Watching for events pending clustering every {poll_interval} seconds. Press Ctrl+C to stop.")
+    try:
+        while True:
+            check_and_trigger_cortex()
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("Stopped watching.")
+
 def main():
     """Main entry point for the script."""
+    parser = argparse.ArgumentParser(description="Trigger the Cortex workflow when enough events are pending clustering.")
+    parser.add_argument("--watch", action="store_true", help="Keep checking at cortex.incremental.poll_interval_seconds.")
+    args = parser.parse_args()
+
     print("Loading configuration...")
     load_config("config.yaml")
-    check_and_trigger_cortex()
+    if args.watch:
+        watch_and_trigger_cortex()
+    else:
+        check_and_trigger_cortex()
 
 if __name__ == "__main__":
     main()